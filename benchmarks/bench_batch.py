@@ -0,0 +1,97 @@
+"""Benchmark training several models on one data file, separate runs against a batch.
+
+Separate runs load and clean the data per model like `ml2sql run`, the batch loads
+and casts it once and trains the models n_jobs at a time (`ml2sql run-batch`).
+
+Usage:
+    python benchmarks/bench_batch.py [--rows 200000] [--models 6] [--n-jobs 1 2]
+"""
+
+import argparse
+import json
+import logging
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from ml2sql.cli_run import make_model_dir
+from ml2sql.utils.modelcreater import batch_modelcreater, modelcreater
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--features", type=int, default=10)
+    parser.add_argument("--models", type=int, default=6)
+    parser.add_argument("--model", default="decision_tree")
+    parser.add_argument("--n-jobs", type=int, nargs="+", default=[1, 2])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    features = [f"feature_{i}" for i in range(args.features)]
+    data = pd.DataFrame(rng.normal(size=(args.rows, args.features)), columns=features)
+    data["segment"] = rng.choice([f"segment_{i}" for i in range(20)], size=args.rows)
+    # One target per model, e.g. one per market
+    for i in range(args.models):
+        data[f"target_{i}"] = (data[features[i % args.features]] > 0).astype(int)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_dir = Path(tmp_dir)
+        data_path = tmp_dir / "data.csv"
+        data.to_csv(data_path, index=False)
+
+        config_paths = []
+        for i in range(args.models):
+            config_path = tmp_dir / f"config_{i}.json"
+            config = {
+                "target": f"target_{i}",
+                "features": features + ["segment"],
+                "model_params": {"max_depth": 5},
+                # Only the model and SQL, the graphs take the same time either way
+                "post_params": {"artifacts": "minimal"},
+            }
+            config_path.write_text(json.dumps(config))
+            config_paths.append(config_path)
+
+        def models(run_name):
+            for i, config_path in enumerate(config_paths):
+                make_model_dir(tmp_dir / run_name / f"model_{i}")
+            return [
+                {
+                    "config_path": config_path,
+                    "model_name": args.model,
+                    "project_name": tmp_dir / run_name / f"model_{i}",
+                }
+                for i, config_path in enumerate(config_paths)
+            ]
+
+        # Warm the CSV dtype cache, all runs then read with the same reader
+        make_model_dir(tmp_dir / "warm")
+        modelcreater(data_path, config_paths[0], args.model, tmp_dir / "warm")
+        logging.disable(logging.INFO)
+
+        print(f"{args.rows} rows, {args.models} {args.model} models")
+        print(f"{'method':>16} {'time (s)':>9}")
+        start = time.perf_counter()
+        for model in models("separate"):
+            modelcreater(data_path, **model)
+        print(f"{'separate runs':>16} {time.perf_counter() - start:>9.2f}")
+
+        for n_jobs in args.n_jobs:
+            start = time.perf_counter()
+            report = batch_modelcreater(
+                data_path,
+                models(f"batch_{n_jobs}"),
+                tmp_dir / f"batch_{n_jobs}.log",
+                n_jobs=n_jobs,
+            )
+            elapsed = time.perf_counter() - start
+            assert all(m["status"] == "done" for m in report["models"])
+            print(f"{f'batch n_jobs={n_jobs}':>16} {elapsed:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
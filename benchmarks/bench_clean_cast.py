@@ -0,0 +1,50 @@
+"""Benchmark cleaning and casting the columns of a data set (cleanAndCastColumns).
+
+The data has numeric features, a low and a high cardinality string feature and a
+boolean object feature, the string columns as Python objects or pyarrow strings.
+
+Usage:
+    python benchmarks/bench_clean_cast.py [--rows 1000000] [--features 10]
+"""
+
+import argparse
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+from ml2sql.utils.pre_processing.pre_process import cleanAndCastColumns
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--features", type=int, default=10)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame(
+        rng.normal(size=(args.rows, args.features)),
+        columns=[f"num{i}" for i in range(args.features)],
+    )
+    data["low_card"] = rng.choice(["a", "b", "c", None], size=args.rows)
+    data["high_card"] = rng.integers(0, args.rows, size=args.rows).astype(str)
+    data["flag"] = rng.choice([True, False], size=args.rows).astype(object)
+    data["target"] = rng.integers(0, 2, size=args.rows)
+    features = [c for c in data.columns if c != "target"]
+
+    print(f"{args.rows} rows, {len(features)} features")
+    print(f"{'strings':>8} {'time (s)':>9}")
+    for strings in ["object", "pyarrow"]:
+        if strings == "pyarrow":
+            for col in ["low_card", "high_card"]:
+                data[col] = data[col].astype("string[pyarrow]")
+        start = time.perf_counter()
+        cleanAndCastColumns(data, features, "target", "ebm", "classification")
+        print(f"{strings:>8} {time.perf_counter() - start:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Benchmark the correlation matrix engine for a growing number of features.
+
+Usage:
+    python benchmarks/bench_correlations.py [--rows 5000] [--features 20 50] [--n-jobs 1 -1]
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from ml2sql.utils.feature_selection.correlations import create_correlation_matrix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=5_000)
+    parser.add_argument("--features", type=int, nargs="+", default=[20, 50])
+    parser.add_argument("--n-jobs", type=int, nargs="+", default=[1, -1])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'features':>9} {'type':>8} {'n_jobs':>7} {'time (s)':>9}")
+    for n_features in args.features:
+        numerical = pd.DataFrame(
+            rng.integers(0, 50, size=(args.rows, n_features)),
+            columns=[f"num{i}" for i in range(n_features)],
+        )
+        categorical = pd.DataFrame(
+            rng.choice(list("abcdefgh"), size=(args.rows, n_features)),
+            columns=[f"cat{i}" for i in range(n_features)],
+        )
+        for corr_type, df in [("xi", numerical), ("cramerv", categorical)]:
+            for n_jobs in args.n_jobs:
+                start = time.perf_counter()
+                create_correlation_matrix(df, corr_type, n_jobs=n_jobs)
+                elapsed = time.perf_counter() - start
+                print(f"{n_features:>9} {corr_type:>8} {n_jobs:>7} {elapsed:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
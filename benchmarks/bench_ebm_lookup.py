@@ -0,0 +1,439 @@
+"""Benchmark extracting the EBM lookup table against the previous pandas implementation.
+
+Uses synthetic EBMs with many terms of many bins, with runs of equal scores as a
+trained EBM has them, and checks both implementations write the same SQL.
+
+Usage:
+    python benchmarks/bench_ebm_lookup.py [--terms 50 200] [--bins 1024] [--legacy-max-terms 200]
+"""
+
+import argparse
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from ml2sql.utils.output_scripts.ebm_as_code import ebm_to_sql, extractLookupTable
+
+
+def reduce_single_feature_legacy(df_):
+    # For safety
+    df = df_.copy()
+
+    # drop any duplicates (which should not exist)
+    df_feat_types = (
+        df[["feature", "feat_type"]].drop_duplicates().reset_index(drop=True).copy()
+    )
+
+    # Set index
+    df = df.set_index(["feature"])
+
+    # Explode per column
+    lookup_df = (
+        df[["feat_bound", "score", "score_lower_bound", "score_upper_bound"]]
+        .apply(lambda x: x.apply(pd.Series).stack())
+        .reset_index()
+        .drop("level_1", axis=1)
+    )
+
+    # add feature type back in
+    lookup_df = lookup_df.merge(df_feat_types, on="feature", how="left")
+
+    # sort_values but None will be in the bottom
+    lookup_df.sort_values(["feature", "feat_bound"], inplace=True, ascending=False)
+
+    # So reverse the ordering
+    lookup_df = lookup_df.iloc[::-1]
+
+    lookup_df["nr_features"] = 1
+
+    # being able for score arrays to be grouped
+    # for categorical features do not group by score hence we include value in score_hash
+    lookup_df["pre_hash_column"] = np.where(
+        lookup_df["feat_type"] == "categorical",
+        lookup_df["score"].astype(str) + lookup_df["feat_bound"].astype(str),
+        lookup_df["score"].astype(str),
+    )
+    lookup_df["score_hash"] = pd.util.hash_pandas_object(
+        lookup_df["pre_hash_column"], index=False
+    )
+    hash_lookup_df = (
+        lookup_df[["score_hash", "score"]]
+        .drop_duplicates("score_hash")
+        .reset_index(drop=True)
+        .copy()
+    )
+
+    # to group by score but keep them in order (not grouping similar scores for different feature values)
+    adj_check = (lookup_df.score_hash != lookup_df.score_hash.shift()).cumsum()
+
+    lookup_df["adj_score"] = adj_check
+    lookup_df_simple = (
+        lookup_df.groupby(["feature", "feat_type", "score_hash", "adj_score"])
+        .agg(
+            {
+                "feat_bound": "last",
+                "score_lower_bound": "first",
+                "score_upper_bound": "last",
+            },
+            sort=False,
+        )
+        .reset_index(drop=False)
+    )
+
+    lookup_df_grouped = lookup_df_simple.merge(
+        hash_lookup_df, on="score_hash", how="left"
+    )
+    # ordering sets None in last place
+    lookup_df_grouped.sort_values(
+        ["feature", "feat_bound"], inplace=True, ascending=False
+    )
+    # So reverse the ordering
+    lookup_df_grouped = lookup_df_grouped.iloc[::-1].reset_index(drop=True)
+
+    return lookup_df_grouped
+
+
+def restructure_reduce_interactions_legacy(df_):
+    # for safety
+    df = df_.copy()
+
+    # Restructure
+    # loop over rows
+    for index, row in df.iterrows():
+        # Swap features position if first feature has more bound values then second feature
+        if (row["score"].shape[0] > row["score"].shape[1]) & (
+            row["feat_type"][0] == "numeric"
+        ):
+            # loop over column needed to be transposed
+            for c in ["feature", "feat_bound", "score", "feat_type"]:
+                if isinstance(df.loc[index, c], list):
+                    df.at[index, c] = [df.at[index, c][1], df.at[index, c][0]]
+                elif isinstance(df.loc[index, c], np.ndarray):
+                    df.at[index, c] = np.transpose(df.at[index, c])
+
+    # Reduce
+
+    # Split list valued columns into two columns
+    df[["feat_1", "feat_2"]] = df["feature"].apply(pd.Series)
+    df[["feat_bound_1", "feat_bound_2"]] = df["feat_bound"].apply(pd.Series)
+    df[["feat_type_1", "feat_type_2"]] = df["feat_type"].apply(pd.Series)
+
+    # Drop unused column
+    df = df.drop(["feat_bound"], axis=1)
+
+    # Set index
+    df = df.set_index(["feature"])
+
+    # first explode on score and feat_bound_1 (same dimensions)
+    df_explode_1 = df.explode(["score", "feat_bound_1"])
+    lookup_df = df_explode_1.explode(["score", "feat_bound_2"])
+
+    # sort_values but None will be in the bottom
+    lookup_df = lookup_df.sort_values(
+        ["feat_1", "feat_2", "feat_bound_1", "feat_bound_2"], ascending=False
+    )
+
+    # So reverse the ordering
+    lookup_df = lookup_df.iloc[::-1]
+
+    lookup_df["nr_features"] = 2
+
+    # being able for score arrays to be grouped
+    # for categorical features do not group by score hence we include value in score_hash
+    mask_category = ["categorical" in x for x in lookup_df["feat_type_2"]]
+    mask_inf_bound = [np.inf == x for x in lookup_df["feat_bound_2"]]
+    mask = [a or b for a, b in zip(mask_category, mask_inf_bound)]
+
+    lookup_df["pre_hash_column"] = np.where(
+        mask,
+        lookup_df["score"].astype(str)
+        + lookup_df["feat_bound_1"].astype(str)
+        + lookup_df["feat_bound_2"].astype(str),
+        lookup_df["score"].astype(str) + lookup_df["feat_bound_1"].astype(str),
+    )
+    lookup_df["score_hash"] = pd.util.hash_pandas_object(
+        lookup_df["pre_hash_column"], index=False
+    )
+    hash_lookup_df = (
+        lookup_df[["score_hash", "score"]]
+        .drop_duplicates("score_hash")
+        .reset_index(drop=True)
+        .copy()
+    )
+
+    # to group by score but keep them in order (not grouping similar scores for different feature values)
+    adj_check = (lookup_df.score_hash != lookup_df.score_hash.shift()).cumsum()
+
+    lookup_df["adj_score"] = adj_check
+
+    lookup_df_simple = (
+        lookup_df.groupby(
+            [
+                "feat_1",
+                "feat_2",
+                "feat_type_1",
+                "feat_type_2",
+                "score_hash",
+                "adj_score",
+            ]
+        )
+        .agg(
+            {
+                "feat_bound_1": "first",
+                "feat_bound_2": "last",  # last to have numeric bounds correctly (with the existence of inf)
+                "score_lower_bound": "first",
+                "score_upper_bound": "last",
+            },
+            sort=False,
+        )
+        .reset_index(drop=False)
+    )
+
+    lookup_df_grouped = lookup_df_simple.merge(
+        hash_lookup_df, on="score_hash", how="left"
+    )
+
+    # ordering sets None in last place
+    lookup_df_grouped.sort_values(
+        ["feat_1", "feat_2", "feat_bound_1", "feat_bound_2"],
+        inplace=True,
+        ascending=False,
+    )
+
+    # So reverse the ordering
+    lookup_df_grouped = lookup_df_grouped.iloc[::-1].reset_index(drop=True)
+
+    # Group second feature to list again for easier SQL writing
+    # Keep the missing value bin (None) of the first feature, in first place
+    lookup_df_group_feat2 = (
+        lookup_df_grouped.groupby(
+            ["feat_1", "feat_2", "feat_type_1", "feat_type_2", "feat_bound_1"],
+            sort=False,
+            dropna=False,
+        )
+        .agg({"feat_bound_2": list, "score": list})
+        .reset_index(drop=False)
+    )
+
+    return lookup_df_group_feat2
+
+
+def extract_lookup_table_legacy(ebm, post_params):
+    # Implementation before the NumPy rewrite, kept for comparison only
+
+    # Add per feature graph
+    lookup_dicts = []
+
+    for feature_group_index, feature_indexes in enumerate(ebm.term_features_):
+        # below includes treatment for missing values
+        model_graph = ebm.term_scores_[feature_group_index]
+
+        # NOTE: This uses stddev. for bounds, consider issue warnings.
+        errors = ebm.standard_deviations_[feature_group_index]
+
+        if len(feature_indexes) == 1:
+            # hack. remove the last index which is for unknown values
+            model_graph = model_graph[0:-1]
+            errors = errors[0:-1]
+
+            feature_bins = ebm.bins_[feature_group_index][0]
+
+            scores = list(model_graph)
+            upper_bounds = list(model_graph + errors)
+            lower_bounds = list(model_graph - errors)
+
+            if isinstance(feature_bins, dict):
+                # categorical
+                feat_bound = list(feature_bins.keys())
+                feat_bound.insert(0, None)
+                feat_type = "categorical"
+
+            else:
+                feat_bound = np.append(feature_bins, np.inf)
+                feat_bound = np.append(None, feat_bound)
+                feat_type = "numeric"
+
+            score = scores
+            score_lower_bound = lower_bounds
+            score_upper_bound = upper_bounds
+
+            lookup_dict = {
+                "nr_features": 1,
+                "feature": ebm.feature_names[feature_indexes[0]],
+                "feat_bound": feat_bound,
+                "score": list(
+                    np.round(score, post_params["sql_decimals"])
+                ),  ## To avoid data type overflow
+                "score_lower_bound": score_lower_bound,
+                "score_upper_bound": score_upper_bound,
+                "feat_type": feat_type,
+            }
+
+            lookup_dicts.append(lookup_dict)
+
+        elif len(feature_indexes) == 2:
+            # hack. remove the last index which is for unknown values and just zeros
+            model_graph = model_graph[0:-1, 0:-1]
+
+            score = model_graph
+
+            feat_bound = [[]] * len(feature_indexes)
+            feat_type = [[]] * len(feature_indexes)
+
+            # Make loop over labels to update the score and features bounds
+            # Check for non binary variable
+            for b in range(len(feature_indexes)):
+                bin_levels = ebm.bins_[feature_indexes[b]]
+                feature_bins = bin_levels[
+                    min(len(feature_indexes), len(bin_levels)) - 1
+                ]
+
+                if isinstance(feature_bins, dict):
+                    feat_bound[b] = list(feature_bins.keys())
+                    feat_bound[b].insert(0, None)
+                    feat_type[b] = "categorical"
+                else:
+                    feat_bound[b] = np.append(feature_bins, np.inf)
+                    feat_bound[b] = np.append(None, feat_bound[b])
+                    feat_type[b] = "numeric"
+
+            lookup_dict = {
+                "nr_features": 2,
+                "feature": [
+                    ebm.feature_names[feature_indexes[0]],
+                    ebm.feature_names[feature_indexes[1]],
+                ],
+                "feat_bound": feat_bound,
+                "score": np.round(score, post_params["sql_decimals"]),
+                "feat_type": feat_type,
+                # not implemented for interaction terms
+                # , 'score_lower_bound': score_lower_bound
+                # , 'score_upper_bound': score_upper_bound
+            }
+
+            lookup_dicts.append(lookup_dict)
+
+        else:  # pragma: no cover
+            raise Exception("Interactions greater than 2 not supported.")
+
+    df_of_lists = pd.DataFrame(lookup_dicts)
+
+    # we treat single and double features differently
+    df_of_lists_single = df_of_lists[df_of_lists["nr_features"] == 1].reset_index(
+        drop=True
+    )
+    df_of_lists_double = df_of_lists[df_of_lists["nr_features"] == 2].reset_index(
+        drop=True
+    )
+
+    # Reduce Single featuers lookup
+    lookup_df_single = reduce_single_feature_legacy(df_of_lists_single)
+
+    # Check if interactions exist
+    if len(df_of_lists_double) > 0:
+        # Restructure and reduce double feature df
+        lookup_df_double = restructure_reduce_interactions_legacy(df_of_lists_double)
+
+    else:
+        lookup_df_double = None
+
+    return {
+        "intercept": ebm.intercept_,
+        "feature_single": lookup_df_single,
+        "feature_double": lookup_df_double,
+    }
+
+
+def step_scores(rng, shape, n_steps):
+    # Piecewise constant scores, like the shape functions of a trained EBM
+    scores = np.zeros(shape)
+    for axis, size in enumerate(shape):
+        steps = np.zeros(size)
+        steps[rng.choice(size, size=min(n_steps, size), replace=False)] = rng.normal(
+            size=min(n_steps, size)
+        )
+        scores += np.cumsum(steps).reshape(
+            [-1 if a == axis else 1 for a in range(len(shape))]
+        )
+    return scores
+
+
+def synthetic_ebm(rng, n_terms, n_bins, n_interactions):
+    """EBM like object with numeric and categorical single terms and interactions"""
+    n_features = n_terms - n_interactions
+    feature_names = [f"feature_{i}" for i in range(n_features)]
+    bins = []
+    for i in range(n_features):
+        if i % 5 == 4:
+            categories = {f"cat_{c}": c + 1 for c in range(min(n_bins, 50))}
+            bins.append([categories, categories])
+        else:
+            edges = np.sort(rng.choice(100 * n_bins, size=n_bins, replace=False)) / 10
+            bins.append([edges, edges[:: max(1, n_bins // 32)]])
+
+    def n_scores(feature, level):
+        feature_bins = bins[feature][level]
+        # Missing value and unknown bins, plus one more bin than edges for numeric
+        return len(feature_bins) + (2 if isinstance(feature_bins, dict) else 3)
+
+    term_features = [(i,) for i in range(n_features)]
+    term_features += [(i, i + 1) for i in range(n_interactions)]
+
+    term_scores, standard_deviations = [], []
+    for features in term_features:
+        level = len(features) - 1
+        shape = tuple(n_scores(f, level) for f in features)
+        term_scores.append(step_scores(rng, shape, n_steps=max(2, shape[0] // 16)))
+        standard_deviations.append(np.abs(rng.normal(scale=0.1, size=shape)))
+
+    return SimpleNamespace(
+        feature_names=feature_names,
+        term_features_=term_features,
+        term_scores_=term_scores,
+        standard_deviations_=standard_deviations,
+        bins_=bins,
+        intercept_=np.array([0.5]),
+        classes_=np.array([0, 1]),
+    )
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--terms", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--bins", type=int, default=1024)
+    parser.add_argument("--legacy-max-terms", type=int, default=200)
+    args = parser.parse_args()
+
+    post_params = {"sql_decimals": 15}
+    print(
+        f"{'terms':>6} {'bins':>6} {'legacy (s)':>11} {'numpy (s)':>10} {'speedup':>8}"
+    )
+    for n_terms in args.terms:
+        rng = np.random.default_rng(0)
+        ebm = synthetic_ebm(rng, n_terms, args.bins, n_interactions=n_terms // 10)
+
+        lookup, new_time = timed(extractLookupTable, ebm, post_params)
+        if n_terms <= args.legacy_max_terms:
+            legacy_lookup, legacy_time = timed(
+                extract_lookup_table_legacy, ebm, post_params
+            )
+            assert ebm_to_sql("bench", lookup, ebm.classes_) == ebm_to_sql(
+                "bench", legacy_lookup, ebm.classes_
+            )
+            legacy = f"{legacy_time:>11.2f}"
+            speedup = f"{legacy_time / new_time:>7.0f}x"
+        else:
+            legacy, speedup = f"{'-':>11}", f"{'-':>8}"
+        print(f"{n_terms:>6} {args.bins:>6} {legacy} {new_time:>10.3f} {speedup}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Benchmark writing EBM term plots synchronously against the figure export pool.
+
+Usage:
+    python benchmarks/bench_figure_export.py [--figures 200] [--workers 1 2 4 8]
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import plotly.graph_objects as go
+
+from ml2sql.utils.helper_functions.figure_export import figure_export_pool, write_image
+
+
+def term_figure(rng, i):
+    # Shaped like an EBM term explanation: a step function with a density bar chart
+    x = np.sort(rng.normal(size=256))
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=x, y=np.cumsum(rng.normal(size=256)), line_shape="hv"))
+    fig.add_trace(go.Bar(x=x[::8], y=rng.integers(0, 100, size=32), yaxis="y2"))
+    fig.update_layout(
+        title=f"Term {i}",
+        yaxis2={"overlaying": "y", "side": "right", "showgrid": False},
+    )
+    return fig
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--figures", type=int, default=200)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    figures = [term_figure(rng, i) for i in range(args.figures)]
+
+    print(f"{'workers':>8} {'total (s)':>10} {'figures/s':>10}")
+    for n_workers in args.workers:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # Includes starting the workers, as in a modelling run
+            start = time.perf_counter()
+            with figure_export_pool(n_workers):
+                for i, fig in enumerate(figures):
+                    write_image(fig, Path(tmp_dir) / f"explain_{i}.png")
+            total = time.perf_counter() - start
+        print(f"{n_workers:>8} {total:>10.2f} {len(figures) / total:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
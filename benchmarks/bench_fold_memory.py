@@ -0,0 +1,78 @@
+"""Measure memory held by the pre processed folds and the peak while training them.
+
+Usage:
+    python benchmarks/bench_fold_memory.py [--rows 200000] [--features 20]
+"""
+
+import argparse
+import tempfile
+import tracemalloc
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from ml2sql.utils.modelling.main_modeler import make_model
+from ml2sql.utils.pre_processing.pre_process import pre_process_kfold
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--features", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    features = [f"f{i}" for i in range(args.features)]
+    data = pd.DataFrame(rng.normal(size=(args.rows, args.features)), columns=features)
+    data["target"] = rng.integers(0, 2, size=args.rows)
+    raw_size = data.memory_usage(deep=True).sum()
+
+    given_name = Path(tempfile.mkdtemp())
+    (given_name / "model").mkdir()
+
+    # Plots are skipped, they would keep references to the data
+    with mock.patch(
+        "ml2sql.utils.pre_processing.pre_process.plot_correlations",
+        new=lambda *args, **kwargs: None,
+    ), mock.patch(
+        "ml2sql.utils.modelling.main_modeler.postModellingPlots",
+        new=lambda *args, **kwargs: None,
+    ):
+        tracemalloc.start()
+        datasets = pre_process_kfold(
+            given_name,
+            data,
+            "target",
+            features,
+            model_name="decision_tree",
+            model_type="classification",
+            pre_params={
+                "cv_type": "kfold_cv",
+                "upsampling": "false",
+                "oot_set": "false",
+            },
+            post_params={"file_type": "png"},
+        )
+        del data
+        held, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+
+        make_model(
+            given_name,
+            datasets,
+            model_name="decision_tree",
+            model_type="classification",
+            model_params={"max_depth": 3},
+            post_params={"calibration": "false", "file_type": "png"},
+        )
+        _, peak = tracemalloc.get_traced_memory()
+
+    print(f"raw data:               {raw_size / 1e6:8.1f} MB")
+    print(f"held by datasets:       {held / 1e6:8.1f} MB ({held / raw_size:.2f}x)")
+    print(f"peak while training CV: {peak / 1e6:8.1f} MB ({peak / raw_size:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
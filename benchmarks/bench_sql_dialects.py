@@ -0,0 +1,69 @@
+"""Benchmark scoring EBM SQL in DuckDB, per SQL dialect and numeric bins format.
+
+Usage:
+    python benchmarks/bench_sql_dialects.py [--features 20] [--rows 100000 1000000]
+"""
+
+import argparse
+import time
+
+import duckdb
+import numpy as np
+import pandas as pd
+from interpret.glassbox import ExplainableBoostingClassifier
+
+from ml2sql.utils.output_scripts.ebm_as_code import ebm_to_sql, extractLookupTable
+from ml2sql.utils.output_scripts.sql_dialects import get_dialect
+
+# (dialect, numeric bins) pairs to compare
+VARIANTS = [("default", "linear"), ("default", "binary"), ("duckdb", "linear")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--features", type=int, default=20)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    columns = [f"feature_{i}" for i in range(args.features)]
+    X = pd.DataFrame(rng.normal(size=(5000, args.features)), columns=columns)
+    y = (np.sin(3 * X).sum(axis=1) + rng.normal(size=len(X)) > 0).astype(int)
+    ebm = ExplainableBoostingClassifier(
+        feature_names=X.columns, interactions=0, random_state=0
+    ).fit(X, y)
+    lookup_df = extractLookupTable(ebm, {"sql_decimals": 15})
+    queries = {
+        variant: ebm_to_sql(
+            "bench", lookup_df, ebm.classes_, True, variant[1], variant[0]
+        )
+        for variant in VARIANTS
+    }
+
+    print(f"{'rows':>9} {'dialect':>8} {'bins':>7} {'time (s)':>9}")
+    for n_rows in args.rows:
+        conn = duckdb.connect()
+        source = pd.DataFrame(rng.normal(size=(n_rows, args.features)), columns=columns)
+        conn.register("source_df", source)
+        conn.execute("CREATE TABLE source AS SELECT * FROM source_df")
+
+        results = []
+        for (dialect, numeric_bins), query in queries.items():
+            start = time.perf_counter()
+            total = conn.execute(
+                "SELECT sum(probability) FROM ("
+                + query.replace("<source_table>", "source")
+                + ")"
+            ).fetchone()[0]
+            elapsed = time.perf_counter() - start
+            results.append(total)
+            # Dialects joining on the numeric bins do not use numeric_bins
+            joins = get_dialect(dialect).numeric_bins_join("x_bins", "x") is not None
+            bins = "join" if joins else numeric_bins
+            print(f"{n_rows:>9} {dialect:>8} {bins:>7} {elapsed:>9.2f}")
+        assert np.allclose(results, results[0])
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Benchmark writing EBM SQL with the SQL builder against printing under redirect_stdout.
+
+Also generates the SQL of several models in threads, which redirect_stdout did not
+allow (it replaces the process wide sys.stdout).
+
+Usage:
+    python benchmarks/bench_sql_generation.py [--features 50] [--models 4] [--threads 1 4]
+"""
+
+import argparse
+import contextlib
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from interpret.glassbox import ExplainableBoostingClassifier
+
+from ml2sql.utils.output_scripts.ebm_as_code import ebm_to_sql, extractLookupTable
+from ml2sql.utils.output_scripts.sql_builder import SQLBuilder
+
+
+def ebm_to_sql_legacy(*args):
+    # Every fragment printed to a redirected sys.stdout, as before the SQL builder
+    output = io.StringIO()
+    with mock.patch.object(
+        SQLBuilder, "print", lambda self, *values, **kwargs: print(*values, **kwargs)
+    ):
+        with contextlib.redirect_stdout(output):
+            ebm_to_sql(*args)
+    return output.getvalue()
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--features", type=int, default=50)
+    parser.add_argument("--models", type=int, default=4)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(
+        rng.normal(size=(5000, args.features)),
+        columns=[f"feature_{i}" for i in range(args.features)],
+    )
+    y = (X.sum(axis=1) + rng.normal(size=len(X)) > 0).astype(int)
+    ebm = ExplainableBoostingClassifier(
+        feature_names=X.columns, interactions=0, random_state=0
+    ).fit(X, y)
+    lookup_df = extractLookupTable(ebm, {"sql_decimals": 15})
+    sql_args = ("bench", lookup_df, ebm.classes_)
+
+    legacy_sql, legacy_time = timed(ebm_to_sql_legacy, *sql_args)
+    sql, builder_time = timed(ebm_to_sql, *sql_args)
+    assert sql == legacy_sql
+    print(f"SQL of {args.features} features: {len(sql) / 1e6:.1f}MB")
+    print(f"{'method':>16} {'time (s)':>10}")
+    print(f"{'redirect_stdout':>16} {legacy_time:>10.3f}")
+    print(f"{'SQLBuilder':>16} {builder_time:>10.3f}")
+
+    print(f"\n{args.models} models")
+    print(f"{'threads':>8} {'total (s)':>10}")
+    for n_threads in args.threads:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(n_threads) as executor:
+            results = list(
+                executor.map(lambda _: ebm_to_sql(*sql_args), range(args.models))
+            )
+        total = time.perf_counter() - start
+        assert all(result == sql for result in results)
+        print(f"{n_threads:>8} {total:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
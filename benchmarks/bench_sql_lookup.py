@@ -0,0 +1,101 @@
+"""Benchmark scoring EBM SQL in DuckDB with the score table (lookup) against CASE statements.
+
+The lookup query joins each row on the bins of its term, the joins DuckDB plans for it
+are printed (no nested loop joins checking every row against every bin). With the
+duckdb dialect the numeric bins are ASOF joined and the lookup query is as fast as the
+CASE statements, the range join of the default dialect is slower in DuckDB.
+
+Usage:
+    python benchmarks/bench_sql_lookup.py [--features 1] [--rows 500000] [--max-bins 256]
+"""
+
+import argparse
+import re
+import time
+from collections import Counter
+
+import duckdb
+import numpy as np
+import pandas as pd
+from interpret.glassbox import ExplainableBoostingClassifier
+
+from ml2sql.utils.output_scripts.ebm_as_code import (
+    ebm_to_sql,
+    extractLookupTable,
+    lookup_table_to_sql,
+    scoreTable,
+    score_table_to_sql,
+)
+
+DIALECTS = ["default", "duckdb"]
+
+
+def timed_sum(conn, query, repeat=3):
+    # Best of several runs, the sum makes DuckDB score all rows
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        total = conn.execute(f"SELECT sum(probability) FROM ({query})").fetchone()[0]
+        best = min(best, time.perf_counter() - start)
+    return total, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--features", type=int, default=1)
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--max-bins", type=int, default=256)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    columns = [f"feature_{i}" for i in range(args.features)]
+    X = pd.DataFrame(rng.normal(size=(20_000, args.features)), columns=columns)
+    X.iloc[::50] = np.nan
+    y = (np.sin(3 * X.fillna(0)).sum(axis=1) + rng.normal(size=len(X)) > 0).astype(int)
+    ebm = ExplainableBoostingClassifier(
+        feature_names=X.columns,
+        interactions=0,
+        max_bins=args.max_bins,
+        random_state=0,
+    ).fit(X, y)
+    lookup_df = extractLookupTable(ebm, {"sql_decimals": 15})
+    score_table = scoreTable(lookup_df, ebm.classes_)
+    n_bins = (lookup_df["feature_single"]["feature"] == columns[0]).sum()
+    print(f"{args.features} feature(s) of {n_bins} bins, {args.rows} rows")
+
+    conn = duckdb.connect()
+    source = pd.DataFrame(rng.normal(size=(args.rows, args.features)), columns=columns)
+    source.iloc[::50] = np.nan
+    conn.register("source_df", source)
+    conn.execute("CREATE TABLE source AS SELECT * FROM source_df")
+    conn.execute(
+        score_table_to_sql(score_table).replace("<score_table>", "score_table")
+    )
+
+    print(f"{'dialect':>8} {'format':>7} {'time (s)':>9}  joins")
+    results = []
+    for dialect in DIALECTS:
+        queries = {
+            "case": ebm_to_sql(
+                "bench", lookup_df, ebm.classes_, True, "linear", dialect
+            ),
+            "lookup": lookup_table_to_sql(
+                "bench", lookup_df, score_table, ebm.classes_, dialect
+            ),
+        }
+        for sql_format, query in queries.items():
+            query = query.replace("<source_table>", "source").replace(
+                "<score_table>", "score_table"
+            )
+            total, elapsed = timed_sum(conn, query)
+            results.append(total)
+            plan = conn.execute(f"EXPLAIN (FORMAT JSON) {query}").fetchall()[0][1]
+            joins = Counter(re.findall(r'"name": "(\w*JOIN\w*|CROSS_PRODUCT)"', plan))
+            joins = ", ".join(f"{n} {name}" for name, n in sorted(joins.items()))
+            print(f"{dialect:>8} {sql_format:>7} {elapsed:>9.2f}  {joins}")
+    assert np.allclose(results, results[0])
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Benchmark the nested CASE and flat leaf rules SQL of decision trees in DuckDB.
+
+Compiles (PREPARE) and executes the SQL of unpruned trees, as trained with
+max_depth=None, on a scoring table.
+
+Usage:
+    python benchmarks/bench_tree_sql.py [--train-rows 2000 20000] [--rows 100000]
+"""
+
+import argparse
+import time
+
+import duckdb
+import numpy as np
+import pandas as pd
+from sklearn.tree import DecisionTreeRegressor
+
+from ml2sql.utils.output_scripts.decision_tree_as_code import (
+    tree_to_sql,
+    tree_to_sql_rules,
+)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--train-rows", type=int, nargs="+", default=[2000, 20000])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--features", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    columns = [f"feature_{i}" for i in range(args.features)]
+    conn = duckdb.connect()
+    source = pd.DataFrame(rng.normal(size=(args.rows, args.features)), columns=columns)
+    conn.register("source_df", source)
+    conn.execute("CREATE TABLE source AS SELECT * FROM source_df")
+
+    print(
+        f"{'train rows':>10} {'leaves':>7} {'depth':>6} {'format':>7}"
+        f" {'write (s)':>10} {'compile (s)':>12} {'execute (s)':>12}"
+    )
+    for n_train in args.train_rows:
+        X = pd.DataFrame(rng.normal(size=(n_train, args.features)), columns=columns)
+        y = np.sin(3 * X).sum(axis=1) + rng.normal(size=n_train)
+        tree = DecisionTreeRegressor(random_state=0).fit(X, y)
+
+        results = []
+        for name, to_sql in [("nested", tree_to_sql), ("rules", tree_to_sql_rules)]:
+            sql, write_time = timed(to_sql, tree)
+            query = (
+                "SELECT sum(prediction) FROM ("
+                + sql.replace("<source_table>", "source")
+                + ")"
+            )
+            _, compile_time = timed(conn.execute, f"PREPARE q AS {query}")
+            result, execute_time = timed(lambda: conn.execute("EXECUTE q").fetchone())
+            conn.execute("DEALLOCATE q")
+            results.append(float(result[0]))
+            print(
+                f"{n_train:>10} {tree.get_n_leaves():>7} {tree.get_depth():>6}"
+                f" {name:>7} {write_time:>10.3f} {compile_time:>12.3f}"
+                f" {execute_time:>12.3f}"
+            )
+        assert np.isclose(results[0], results[1])
+
+
+if __name__ == "__main__":
+    main()
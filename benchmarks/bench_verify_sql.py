@@ -0,0 +1,85 @@
+"""Benchmark verifying EBM SQL against the model, verify_sql against a single pass.
+
+The single pass loads and scores all rows at once the way the tests do
+(execute_sql_script), verify_sql reads and scores batches on cursors of one connection.
+
+Usage:
+    python benchmarks/bench_verify_sql.py [--features 10] [--rows 200000] [--n-jobs 1 4]
+"""
+
+import argparse
+import contextlib
+import io
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from interpret.glassbox import ExplainableBoostingClassifier
+
+from ml2sql.utils.output_scripts.ebm_as_code import ebm_to_sql, extractLookupTable
+from ml2sql.utils.sqlverifier import verify_sql
+from ml2sql.utils.test_helpers.sql_model import execute_sql_script
+
+
+def single_pass(sql, model, data_path):
+    X = pd.read_parquet(data_path)
+    # execute_sql_script prints the SQL, the joins do not keep the row order
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = execute_sql_script(
+            sql, X.assign(row_id=range(len(X))), ["row_id", "probability"]
+        ).sort_values("row_id")
+    diff = np.abs(result["probability"].to_numpy() - model.predict_proba(X)[:, 1])
+    return diff.max()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--features", type=int, default=10)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    parser.add_argument("--n-jobs", type=int, nargs="+", default=[1, 4])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    columns = [f"feature_{i}" for i in range(args.features)]
+    X = pd.DataFrame(rng.normal(size=(5000, args.features)), columns=columns)
+    y = (np.sin(3 * X).sum(axis=1) + rng.normal(size=len(X)) > 0).astype(int)
+    ebm = ExplainableBoostingClassifier(
+        feature_names=X.columns, interactions=0, random_state=0
+    ).fit(X, y)
+    ebm.feature_names = columns
+    # The DuckDB dialect, long score literals overflow DuckDB DECIMALs in CASE
+    lookup_df = extractLookupTable(ebm, {"sql_decimals": 15})
+    sql = ebm_to_sql("bench", lookup_df, ebm.classes_, True, "linear", "duckdb")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_path = Path(tmp_dir) / "data.parquet"
+        pd.DataFrame(
+            rng.normal(size=(args.rows, args.features)), columns=columns
+        ).to_parquet(data_path)
+
+        print(f"{args.rows} rows, {args.features} features")
+        print(f"{'method':>18} {'time (s)':>9} {'max abs diff':>13}")
+        start = time.perf_counter()
+        max_diff = single_pass(sql, ebm, data_path)
+        print(
+            f"{'single pass':>18} {time.perf_counter() - start:>9.2f} {max_diff:>13.2e}"
+        )
+
+        for n_jobs in args.n_jobs:
+            start = time.perf_counter()
+            report = verify_sql(
+                sql, ebm, data_path, batch_size=args.batch_size, n_jobs=n_jobs
+            )
+            elapsed = time.perf_counter() - start
+            assert report["passed"] and report["n_rows"] == args.rows
+            max_diff = report["columns"]["probability"]["max_abs_diff"]
+            print(
+                f"{f'verify_sql n_jobs={n_jobs}':>18} {elapsed:>9.2f} {max_diff:>13.2e}"
+            )
+
+
+if __name__ == "__main__":
+    main()
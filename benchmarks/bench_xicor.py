@@ -0,0 +1,76 @@
+"""Benchmark the Xi correlation coefficient against the previous O(n^2) implementation.
+
+Usage:
+    python benchmarks/bench_xicor.py [--rows 10000 100000 1000000] [--legacy-max-rows 100000]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from ml2sql.utils.feature_selection.correlations import xicor
+
+
+def xicor_legacy(X, Y, ties=True):
+    # Implementation before the O(n log n) rewrite, kept for comparison only
+    np.random.seed(42)
+    X = np.asarray(X)
+    Y = np.asarray(Y)
+    n = len(X)
+    order = X.argsort()
+    Y_sorted = Y[order]
+    if ties:
+        L = np.searchsorted(Y_sorted, Y_sorted, side="right")
+        r = L.copy()
+        for j in range(n):
+            tie_index = r == r[j]
+            tie_count = tie_index.sum()
+            if tie_count > 1:
+                tie_adjustment = np.arange(tie_count)
+                np.random.shuffle(tie_adjustment)
+                r[tie_index] = r[tie_index] - tie_adjustment
+        return 1 - n * sum(abs(r[1:] - r[: n - 1])) / (2 * sum(L * (n - L)))
+    else:
+        r = np.searchsorted(Y_sorted, Y_sorted, side="right")
+        return 1 - 3 * sum(abs(r[1:] - r[: n - 1])) / (n**2 - 1)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument(
+        "--legacy-max-rows",
+        type=int,
+        default=100_000,
+        help="Skip the quadratic implementation above this number of rows",
+    )
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'rows':>10} {'new (s)':>10} {'legacy (s)':>12} {'speedup':>9}")
+    for n in args.rows:
+        # Integer valued data to include ties
+        X = rng.integers(0, n // 10 + 2, size=n)
+        Y = X + rng.integers(0, 100, size=n)
+
+        _, new_time = timed(xicor, X, Y)
+        if n <= args.legacy_max_rows:
+            _, legacy_time = timed(xicor_legacy, X, Y)
+            print(
+                f"{n:>10} {new_time:>10.3f} {legacy_time:>12.3f} {legacy_time / new_time:>8.0f}x"
+            )
+        else:
+            print(f"{n:>10} {new_time:>10.3f} {'skipped':>12} {'':>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,108 @@
 import os
 import re
 import sys
-from ml2sql.utils.modeltester import modeltester
+from pathlib import Path
+from ml2sql.utils.helper_functions.data_loading import is_data_file, list_data_files
+
+
+def cli_check_model(
+    explain_rows=10,
+    explain_selection="random",
+    figure_export_workers=1,
+    batch_size=None,
+    predictions_format="parquet",
+    data=None,
+    model=None,
+    output_dir=None,
+):
+    """
+    Test a trained model on a data set, the data and model not given are asked for.
+
+    The outputs are saved in output_dir/<data file name>, by default in the
+    tested_datasets folder of the model. Returns the folder with the outputs.
+    """
+    # Imported here as it loads all modelling libraries
+    from ml2sql.utils.modeltester import modeltester, EXPLAIN_SELECTIONS
+
+    if explain_selection not in EXPLAIN_SELECTIONS:
+        sys.exit(
+            f"Unknown explain selection '{explain_selection}', use one of {', '.join(EXPLAIN_SELECTIONS)}"
+        )
+
+    if not is_data_file(f"predictions.{predictions_format}"):
+        sys.exit(f"Unsupported predictions format '{predictions_format}'")
+
+    csv_path = str(data) if data is not None else select_data_file()
+    print(f"Data file {csv_path} will be used for testing model")
+
+    model_path = str(model) if model is not None else select_model_file()
+    model_path = model_path.replace(os.sep, "/")
+    print(f"Model {model_path} will be used for testing")
+
+    # Create extra folder in trained model folder
+    # Make directory with current data and model name
+    if output_dir is None:
+        output_dir = model_folder(model_path) / "tested_datasets"
+    csv_name = Path(csv_path).name.split(".")[0]
+    destination_path = f"{Path(output_dir).as_posix()}/{csv_name}"
+
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    try:
+        os.makedirs(destination_path)
+        os.makedirs(f"{destination_path}/performance")
+        os.makedirs(f"{destination_path}/local_explanations")
+
+    except FileExistsError as e:
+        sys.exit(f"{e}\nDataset is already tested on this model: {destination_path}")
+
+    print("Starting script to test model")
+
+    modeltester(
+        data_path=csv_path,
+        model_path=model_path,
+        destination_path=destination_path,
+        explain_rows=explain_rows,
+        explain_selection=explain_selection,
+        figure_export_workers=figure_export_workers,
+        batch_size=batch_size,
+        predictions_format=predictions_format,
+    )
+
+    print("\nModel performance outputs can be found in folder:")
+    print(f"{Path(destination_path).resolve()}/")
+
+    return Path(destination_path)
+
+
+def model_folder(model_path):
+    # Folder of a trained model, the pickled model is saved in its model folder
+    folder = Path(model_path).parent
+    return folder.parent if folder.name == "model" else folder
 
 
-def cli_check_model():
+def select_data_file():
     # Select data
     # List files in input/data/ directory
     data_dir = "input/data/"
-    files = []
-    for f in os.listdir(data_dir):
-        if f.endswith(".csv"):
-            files.append(f)
-    files.sort()
+    files = [f.name for f in list_data_files(data_dir)]
 
     print("Files in input/data/:")
     for i, file in enumerate(files, 1):
         print(f"{i}. {file}")
 
     # Ask for CSVPATH
-    csv_path = None
-    while csv_path is None:
-        csv_file_index = input("\nSelect CSV file for testing the model: ")
+    while True:
+        csv_file_index = input("\nSelect data file for testing the model: ")
         try:
             csv_file_index = int(csv_file_index) - 1
-            csv_path = os.path.join(data_dir, files[csv_file_index])
+            return os.path.join(data_dir, files[csv_file_index])
         except (ValueError, IndexError):
             print("Invalid option, try again.")
 
-    print(f"CSV file {csv_path} will be used for testing model")
 
+def select_model_file():
     # Select model
     # List files in trained_models/ directory
     model_dir = "trained_models/"
@@ -49,46 +122,15 @@ def cli_check_model():
         print(f"{i}. {re.sub(model_dir, '', file)}")
 
     # Ask for ModelPath
-    model_path = None
-    while model_path is None:
+    while True:
         model_file_index = input("\nSelect model to apply on test data: ")
         try:
             model_file_index = int(model_file_index) - 1
-            model_path = os.path.join(model_dir, files[model_file_index])
-            model_path = files[model_file_index]
-            model_path = model_path.replace(os.sep, "/")
+            return files[model_file_index]
 
         except (ValueError, IndexError):
             print("Invalid option, try again.")
 
-    print(f"Model {model_path} will be used for testing")
-
-    # Create extra folder in trained model folder
-    # Make directory with current data and model name
-    model_folder = model_path.split("trained_models/")[1].split("/")[0]
-    csv_name = csv_path.split("/")[-1].split(".")[0]
-    destination_path = f"trained_models/{model_folder}/tested_datasets/{csv_name}"
-
-    if not os.path.exists(destination_path.split(csv_name)[0]):
-        os.makedirs(destination_path.split(csv_name)[0])
-
-    try:
-        os.makedirs(destination_path)
-        os.makedirs(f"{destination_path}/performance")
-        os.makedirs(f"{destination_path}/local_explanations")
-
-    except FileExistsError as e:
-        sys.exit(f"{e}\nDataset is already tested on this model: {destination_path}")
-
-    print("Starting script to test model")
-
-    modeltester(
-        data_path=csv_path, model_path=model_path, destination_path=destination_path
-    )
-
-    print("\nModel performance outputs can be found in folder:")
-    print(f"{os.getcwd()}/trained_models/{model_folder}/tested_datasets/{csv_name}/")
-
 
 if __name__ == "__main__":
     cli_check_model()
@@ -3,11 +3,31 @@ import re
 from datetime import datetime
 import time
 from pathlib import Path
-from ml2sql.utils.modelcreater import modelcreater
-from ml2sql.utils.create_config import create_config
+from ml2sql.utils.helper_functions.data_loading import list_data_files
 
 
-def cli_run():
+# Model types to choose from and their name in the code
+MODEL_TYPES = {
+    "Explainable Boosting Machine": "ebm",
+    "Decision Tree": "decision_tree",
+    "Logistic/Linear regression": "l_regression",
+}
+
+
+def cli_run(data=None, config=None, model=None, name=None, output_dir="trained_models"):
+    """
+    Train a model, the options not given are asked for on screen.
+
+    With all of data, config, model and name given nothing is asked, so models can
+    be trained headless and several in one process.
+
+    Returns the folder with the model outputs.
+    """
+    if model is not None and model not in MODEL_TYPES.values():
+        sys.exit(
+            f"Unknown model '{model}', use one of {', '.join(MODEL_TYPES.values())}"
+        )
+
     # ASCII art
     ml2sql = r"""
   `7MMM.     ,MMF'`7MMF'                        .M"'"bgd   .g8""8q. `7MMF'
@@ -24,9 +44,52 @@ def cli_run():
     print(ml2sql)
     print("\n\n")
 
+    csv_path = Path(data) if data is not None else select_data_file()
+    print(f"Data file {csv_path} will be used for modelling")
+
+    json_path = Path(config) if config is not None else select_config_file(csv_path)
+    print(f"Configuration file {json_path} will be used for modelling")
+
+    model_type = model if model is not None else select_model_type()
+    model_types = {v: k for k, v in MODEL_TYPES.items()}
+    print(f"Algorithm chosen for modelling: {model_types[model_type]}")
+
+    output_dir = Path(output_dir)
+    if name is not None:
+        model_dir = output_dir / model_dir_name(name)
+        if model_dir.exists():
+            sys.exit(f"Error: Model directory already exists: {model_dir}")
+    else:
+        model_dir = select_model_dir(output_dir)
+    full_model_name = model_dir.name
+
+    print(f"\nProject name will be: {full_model_name}")
+
+    # Make directory with current data and model name
+    make_model_dir(model_dir)
+
+    print("\nStarting script to create model")
+
+    # Imported here as it loads all modelling libraries
+    from ml2sql.utils.modelcreater import modelcreater
+
+    modelcreater(
+        data_path=csv_path,
+        config_path=json_path,
+        model_name=model_type,
+        project_name=model_dir,
+    )
+
+    print("\nModel outputs can be found in folder:")
+    print(model_dir.resolve())
+
+    return model_dir
+
+
+def select_data_file():
     # List files in input/data/ directory
     data_dir = Path("input") / "data"
-    files = sorted([f for f in data_dir.glob("*.csv")])
+    files = list_data_files(data_dir)
 
     print("Files in input/data/:")
     for i, file in enumerate(files, 1):
@@ -36,15 +99,14 @@ def cli_run():
     while True:
         try:
             csv_file_index = (
-                int(input("\nSelect CSV file for training the model: ")) - 1
+                int(input("\nSelect data file for training the model: ")) - 1
             )
-            csv_path = files[csv_file_index]
-            break
+            return files[csv_file_index]
         except (IndexError, ValueError):
             print("Invalid input. Please enter a valid integer.")
 
-    print(f"CSV file {csv_path} will be used for modelling")
 
+def select_config_file(csv_path):
     # Ask for JSONPATH
     while True:
         configuration_dir = Path("input") / "configuration"
@@ -69,21 +131,18 @@ def cli_run():
             )
 
             if json_file_index == 0:
+                from ml2sql.utils.create_config import create_config
+
                 create_config(csv_path)
             else:
-                json_path = files[json_file_index]
-                break
+                return files[json_file_index]
         except (IndexError, ValueError):
             print("Invalid input. Please enter a valid integer.")
 
-    print(f"Configuration file {json_path} will be used for modelling")
 
+def select_model_type():
     # Ask for MODEL_TYPE
-    model_types = [
-        "Explainable Boosting Machine",
-        "Decision Tree",
-        "Logistic/Linear regression",
-    ]
+    model_types = list(MODEL_TYPES)
     model_type = None
     while model_type is None:
         print("\nWhat type of model do you want?")
@@ -98,32 +157,19 @@ def cli_run():
         except (ValueError, IndexError):
             print("Invalid option")
 
-    print(f"Algorithm chosen for modelling: {model_type}")
+    # Name of the model type in the code
+    return MODEL_TYPES[model_type]
 
-    # Rename model choice for easier reference in code later on
-    model_type = "ebm" if model_type == "Explainable Boosting Machine" else model_type
-    model_type = (
-        "l_regression" if model_type == "Logistic/Linear regression" else model_type
-    )
-    model_type = model_type.lower().replace(" ", "_")
 
-    # Model name
-    unique_name = False
-    while not unique_name:
-        model_name = input("\nGive it a name: ")
-        model_name = re.sub(r"[^0-9a-zA-Z_]+", "", model_name.lower().replace(" ", "_"))
-        current_date = datetime.today().strftime("%Y%m%d")
-        full_model_name = f"{current_date}_{model_name}"
-
-        model_dir = Path("trained_models") / full_model_name
-        if model_dir.exists():
-            print("Folder with this name already exists please try another")
-        else:
-            unique_name = True
+def model_dir_name(name):
+    # Dated folder name of a model
+    model_name = re.sub(r"[^0-9a-zA-Z_]+", "", name.lower().replace(" ", "_"))
+    current_date = datetime.today().strftime("%Y%m%d")
+    return f"{current_date}_{model_name}"
 
-    print(f"\nProject name will be: {full_model_name}")
 
-    # Make directory with current data and model name
+def make_model_dir(model_dir):
+    # Model folder with the folders of its outputs
     try:
         model_dir.mkdir(parents=True)
         (model_dir / "feature_importance").mkdir()
@@ -133,14 +179,12 @@ def cli_run():
     except FileExistsError:
         sys.exit("Error: Model directory already exists")
 
-    print("\nStarting script to create model")
-
-    modelcreater(
-        data_path=csv_path,
-        config_path=json_path,
-        model_name=model_type,
-        project_name=model_dir,
-    )
 
-    print("\nModel outputs can be found in folder:")
-    print(model_dir.resolve())
+def select_model_dir(output_dir):
+    # Model name
+    while True:
+        model_dir = output_dir / model_dir_name(input("\nGive it a name: "))
+        if model_dir.exists():
+            print("Folder with this name already exists please try another")
+        else:
+            return model_dir
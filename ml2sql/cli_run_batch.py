@@ -0,0 +1,110 @@
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+from ml2sql.cli_run import MODEL_TYPES, make_model_dir, model_dir_name
+
+
+def cli_run_batch(
+    data,
+    configs=None,
+    manifest=None,
+    model="ebm",
+    output_dir="trained_models",
+    n_jobs=1,
+):
+    """
+    Train a model per configuration file on one data file, loading the data once.
+
+    The models are given as configuration files, each trained as the given model type
+    and named after its file, or as a manifest: a JSON list of configuration file paths
+    or {"config": ..., "model": ..., "name": ...} entries (model and name optional,
+    paths relative to the manifest).
+
+    Returns the path of the batch report with the per model timings.
+    """
+    if (not configs) == (manifest is None):
+        sys.exit("Give either configuration files or a manifest")
+
+    entries = [{"config": config} for config in configs or []]
+    if manifest is not None:
+        entries = read_manifest(manifest)
+
+    output_dir = Path(output_dir)
+    models = []
+    for entry in entries:
+        config_path = Path(entry["config"])
+        model_type = entry.get("model", model)
+        if model_type not in MODEL_TYPES.values():
+            sys.exit(
+                f"Unknown model '{model_type}' for {config_path}, use one of {', '.join(MODEL_TYPES.values())}"
+            )
+        if not config_path.is_file():
+            sys.exit(f"Configuration file not found: {config_path}")
+        models.append(
+            {
+                "config_path": config_path,
+                "model_name": model_type,
+                "project_name": output_dir
+                / model_dir_name(entry.get("name", config_path.stem)),
+            }
+        )
+
+    # Check all folders before training anything
+    model_dirs = [m["project_name"] for m in models]
+    if len(set(model_dirs)) < len(model_dirs):
+        sys.exit("Error: Model names in the batch are not unique")
+    for model_dir in model_dirs:
+        if model_dir.exists():
+            sys.exit(f"Error: Model directory already exists: {model_dir}")
+
+    for model_dir in model_dirs:
+        make_model_dir(model_dir)
+
+    print(f"Training {len(models)} models on {data}, {n_jobs} at a time")
+
+    # Imported here as it loads all modelling libraries
+    from ml2sql.utils.modelcreater import batch_modelcreater
+
+    batch_name = f"batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    report = batch_modelcreater(
+        data, models, output_dir / f"{batch_name}.log", n_jobs=n_jobs
+    )
+
+    report_path = output_dir / f"{batch_name}.json"
+    with report_path.open("w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\nData loaded in {report['load_seconds']:.2f}s")
+    print(f"{'model folder':<40} {'model':<14} {'status':<7} {'time (s)':>9}")
+    for result in report["models"]:
+        print(
+            f"{Path(result['project_name']).name:<40} {result['model_name']:<14} "
+            f"{result['status']:<7} {result['seconds']:>9.2f}"
+        )
+    print(f"\nBatch report saved in {report_path}")
+
+    failed = [r["project_name"] for r in report["models"] if r["status"] != "done"]
+    if failed:
+        sys.exit(
+            f"{len(failed)} models failed, see their logging.log: {', '.join(failed)}"
+        )
+
+    return report_path
+
+
+def read_manifest(manifest):
+    # Manifest entries, with configuration paths relative to the manifest
+    manifest = Path(manifest)
+    with manifest.open() as f:
+        entries = json.load(f)
+
+    if not isinstance(entries, list):
+        sys.exit(f"Manifest {manifest} should hold a JSON list of models")
+
+    entries = [e if isinstance(e, dict) else {"config": e} for e in entries]
+    for entry in entries:
+        if "config" not in entry:
+            sys.exit(f"Manifest entry without config: {entry}")
+        entry["config"] = manifest.parent / entry["config"]
+    return entries
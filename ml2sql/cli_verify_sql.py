@@ -0,0 +1,64 @@
+import sys
+from pathlib import Path
+
+# File with the score table, written next to the SQL by the EBM lookup format
+SCORE_TABLE_SQL = "ebm_score_table.sql"
+
+
+def cli_verify_sql(
+    model_path,
+    data_path,
+    sql_path=None,
+    batch_size=100_000,
+    n_jobs=1,
+    rtol=1e-5,
+    atol=1e-8,
+    fail_fast=False,
+    report_path=None,
+):
+    # Imported here as it loads all modelling libraries
+    import joblib
+    from ml2sql.utils.sqlverifier import save_report, verify_sql
+
+    model_path = Path(model_path)
+    if sql_path is None:
+        # The SQL is saved next to the model
+        sql_files = sorted(model_path.parent.glob("*_in_sql.sql"))
+        if len(sql_files) != 1:
+            sys.exit(f"No single SQL file found next to {model_path}, use --sql")
+        sql_path = sql_files[0]
+    sql_path = Path(sql_path)
+
+    sql = sql_path.read_text()
+    setup_sql = None
+    if "<score_table>" in sql:
+        setup_sql = (sql_path.parent / SCORE_TABLE_SQL).read_text()
+
+    model = joblib.load(model_path)
+    report = verify_sql(
+        sql,
+        model,
+        data_path,
+        batch_size=batch_size,
+        n_jobs=n_jobs,
+        rtol=rtol,
+        atol=atol,
+        fail_fast=fail_fast,
+        setup_sql=setup_sql,
+    )
+
+    if report_path is None:
+        report_path = (
+            model_path.parent / f"sql_verification_{Path(data_path).stem}.json"
+        )
+    save_report(report, report_path)
+
+    for column, result in report["columns"].items():
+        line = f"{column}: {result['n_violations']}/{result['n_rows']} rows outside tolerance"
+        if "max_abs_diff" in result:
+            line += f", max abs diff {result['max_abs_diff']}, max rel diff {result['max_rel_diff']}"
+        print(line)
+    print(f"Report saved in {report_path}")
+
+    if not report["passed"]:
+        sys.exit(f"SQL predictions of {sql_path} differ from the model")
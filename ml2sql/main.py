@@ -1,13 +1,12 @@
 """ml2sql entry point script."""
 # ml2sql/main.py
 
-from ml2sql.cli_run import cli_run
-from ml2sql.cli_check_model import cli_check_model
-from ml2sql.cli_init import cli_init
-from ml2sql.quick_clean_data import quick_clean_data
+# Commands import their modules when invoked, so heavy dependencies (pandas,
+# scikit-learn, interpret, plotly, ...) do not slow down --version or init
 from ml2sql import __version__, __app_name__
 import typer
 from pathlib import Path
+from typing import List
 
 app = typer.Typer()
 
@@ -49,33 +48,241 @@ def init(
     Initialize the project by creating necessary folders
     and copying demo data to them
     """
+    from ml2sql.cli_init import cli_init
 
     cli_init(dest)
 
 
 @app.command()
-def run():
+def run(
+    data: Path = typer.Option(
+        None,
+        "--data",
+        exists=True,
+        dir_okay=False,
+        help="Path to the data file to train on, asked for when not given",
+    ),
+    config: Path = typer.Option(
+        None,
+        "--config",
+        exists=True,
+        dir_okay=False,
+        help="Path to the configuration JSON file, asked for when not given",
+    ),
+    model: str = typer.Option(
+        None,
+        "--model",
+        help="Model type: ebm, decision_tree or l_regression, asked for when not given",
+    ),
+    name: str = typer.Option(
+        None,
+        "--name",
+        help="Name of the model (folder <date>_<name>), asked for when not given",
+    ),
+    output_dir: Path = typer.Option(
+        Path("trained_models"),
+        "--output-dir",
+        file_okay=False,
+        help="Folder the model folder is created in",
+    ),
+):
     """
     Run main script: clean data, train model, plot metrics and save SQL version
     """
-    cli_run()
+    from ml2sql.cli_run import cli_run
+
+    cli_run(data=data, config=config, model=model, name=name, output_dir=output_dir)
 
 
 @app.command()
-def check_model():
+def run_batch(
+    data: Path = typer.Option(
+        ...,
+        "--data",
+        exists=True,
+        dir_okay=False,
+        help="Path to the data file all models are trained on",
+    ),
+    config: List[Path] = typer.Option(
+        None,
+        "--config",
+        exists=True,
+        dir_okay=False,
+        help="Configuration JSON file of a model (folder <date>_<file name>), repeat for more models",
+    ),
+    manifest: Path = typer.Option(
+        None,
+        "--manifest",
+        exists=True,
+        dir_okay=False,
+        help='JSON list of configuration files or {"config", "model", "name"} entries',
+    ),
+    model: str = typer.Option(
+        "ebm",
+        "--model",
+        help="Model type: ebm, decision_tree or l_regression, unless set in the manifest",
+    ),
+    output_dir: Path = typer.Option(
+        Path("trained_models"),
+        "--output-dir",
+        file_okay=False,
+        help="Folder the model folders and batch report are created in",
+    ),
+    n_jobs: int = typer.Option(
+        1, "--n-jobs", min=1, help="Number of models trained at the same time"
+    ),
+):
+    """
+    Train a model per configuration on one data file, loading the data only once
+    """
+    from ml2sql.cli_run_batch import cli_run_batch
+
+    cli_run_batch(
+        data,
+        configs=config,
+        manifest=manifest,
+        model=model,
+        output_dir=output_dir,
+        n_jobs=n_jobs,
+    )
+
+
+@app.command()
+def check_model(
+    explain_rows: int = typer.Option(
+        10,
+        "--explain-rows",
+        min=0,
+        help="Number of rows to save a local explanation for",
+    ),
+    explain_selection: str = typer.Option(
+        "random",
+        "--explain-selection",
+        help="Rows to explain: random, top-score (highest prediction) or worst-error",
+    ),
+    figure_export_workers: int = typer.Option(
+        1,
+        "--figure-export-workers",
+        help="Number of processes writing the images (local explanations and graphs)",
+    ),
+    batch_size: int = typer.Option(
+        None,
+        "--batch-size",
+        min=1,
+        help="Score the data in batches of this many rows (bounded memory, no performance plots)",
+    ),
+    predictions_format: str = typer.Option(
+        "parquet",
+        "--predictions-format",
+        help="File type of the predictions saved with --batch-size: parquet, csv, feather or arrow",
+    ),
+    data: Path = typer.Option(
+        None,
+        "--data",
+        exists=True,
+        dir_okay=False,
+        help="Path to the data file to test on, asked for when not given",
+    ),
+    model: Path = typer.Option(
+        None,
+        "--model",
+        exists=True,
+        dir_okay=False,
+        help="Path to the trained model (.sav), asked for when not given",
+    ),
+    output_dir: Path = typer.Option(
+        None,
+        "--output-dir",
+        file_okay=False,
+        help="Folder the outputs are saved in (per data file), defaults to tested_datasets of the model",
+    ),
+):
     """
     Run model check script: load trained model and apply on new data
     """
-    cli_check_model()
+    from ml2sql.cli_check_model import cli_check_model
+
+    cli_check_model(
+        explain_rows=explain_rows,
+        explain_selection=explain_selection,
+        figure_export_workers=figure_export_workers,
+        batch_size=batch_size,
+        predictions_format=predictions_format,
+        data=data,
+        model=model,
+        output_dir=output_dir,
+    )
+
+
+@app.command()
+def verify_sql(
+    model: Path = typer.Option(
+        ...,
+        "--model",
+        exists=True,
+        dir_okay=False,
+        help="Path to the trained model (.sav)",
+    ),
+    data: Path = typer.Option(
+        ...,
+        "--data",
+        exists=True,
+        dir_okay=False,
+        help="Path to the data file (CSV, Parquet, Feather or Arrow) to verify on",
+    ),
+    sql: Path = typer.Option(
+        None,
+        "--sql",
+        exists=True,
+        dir_okay=False,
+        help="Path to the SQL of the model, defaults to the SQL saved next to the model",
+    ),
+    batch_size: int = typer.Option(
+        100_000, "--batch-size", min=1, help="Number of rows per batch"
+    ),
+    n_jobs: int = typer.Option(
+        1, "--n-jobs", min=1, help="Number of batches verified at the same time"
+    ),
+    rtol: float = typer.Option(1e-5, "--rtol", min=0, help="Relative tolerance"),
+    atol: float = typer.Option(1e-8, "--atol", min=0, help="Absolute tolerance"),
+    fail_fast: bool = typer.Option(
+        False, "--fail-fast", help="Stop at the first batch outside the tolerance"
+    ),
+    report: Path = typer.Option(
+        None,
+        "--report",
+        help="Path of the JSON report, defaults to next to the model",
+    ),
+):
+    """
+    Check the SQL version of a model gives the same predictions as the model (in DuckDB)
+    """
+    from ml2sql.cli_verify_sql import cli_verify_sql
+
+    cli_verify_sql(
+        model,
+        data,
+        sql_path=sql,
+        batch_size=batch_size,
+        n_jobs=n_jobs,
+        rtol=rtol,
+        atol=atol,
+        fail_fast=fail_fast,
+        report_path=report,
+    )
 
 
 @app.command()
 def clean_data(
     data_path: str = typer.Option(
-        None, "--data-path", help="Path to the CSV file to be cleaned"
+        None,
+        "--data-path",
+        help="Path to the data file (CSV, Parquet, Feather or Arrow) to be cleaned",
     ),
 ):
     """
-    Select a csv file and have it cleaned to be used for modeling
+    Select a data file and have it cleaned to be used for modeling
     """
+    from ml2sql.quick_clean_data import quick_clean_data
+
     quick_clean_data(data_path)
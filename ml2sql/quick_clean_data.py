@@ -3,6 +3,12 @@ import numpy as np
 import re
 import os
 import warnings
+from pathlib import Path
+from ml2sql.utils.helper_functions.data_loading import (
+    list_data_files,
+    load_data,
+    write_data,
+)
 
 warnings.simplefilter("ignore", UserWarning)
 
@@ -30,11 +36,7 @@ def quick_clean_data(data_path: str = None):
     if data_path is None:
         # List files in input/data/ directory
         data_dir = "input/data/"
-        files = []
-        for f in os.listdir(data_dir):
-            if f.endswith(".csv"):
-                files.append(f)
-        files.sort()
+        files = [f.name for f in list_data_files(data_dir)]
 
         print("Files in input/data/:")
         for i, file in enumerate(files, 1):
@@ -43,7 +45,7 @@ def quick_clean_data(data_path: str = None):
         # Ask for CSVPATH
         while True:
             try:
-                csv_file_index = input("\nSelect CSV file for training the model: ")
+                csv_file_index = input("\nSelect data file for training the model: ")
                 csv_file_index = int(csv_file_index) - 1
                 data_path = os.path.join(data_dir, files[csv_file_index])
                 break
@@ -52,10 +54,9 @@ def quick_clean_data(data_path: str = None):
             except ValueError:
                 print("Invalid input. Please enter an integer.")
 
-        print(f"CSV file {data_path} will be cleaned and saved")
+        print(f"Data file {data_path} will be cleaned and saved")
 
-    # df = pd.read_csv(data_path, dtype='object', dtype_backend='pyarrow')
-    df = pd.read_csv(data_path)
+    df = load_data(data_path)
     print(f"\nOriginal variables and dtypes:\n{df.dtypes}")
 
     # Iterate over the columns and handle specific cases
@@ -142,6 +143,7 @@ def quick_clean_data(data_path: str = None):
     print(f"\nNew variables and inferred dtypes:\n{df.dtypes}")
 
     # Save processed file
-    new_data_path = f"{data_path.split('.csv')[0]}_processed.csv"
-    df.to_csv(new_data_path, index=False)
+    data_path = Path(data_path)
+    new_data_path = data_path.with_name(f"{data_path.stem}_processed{data_path.suffix}")
+    write_data(df, new_data_path)
     print(f"\nCleaned file saved as {new_data_path}")
@@ -1,7 +1,13 @@
 import pandas as pd
 import json
 import random
+from pathlib import Path
 from ml2sql.utils.helper_functions.config_handling import select_ml_cols
+from ml2sql.utils.helper_functions.data_loading import (
+    CSV_EXTENSIONS,
+    NA_VALUES,
+    load_data,
+)
 
 
 def get_input(options, message):
@@ -22,26 +28,31 @@ def get_input(options, message):
 
 def create_config(data_path):
     # Read in sample of data
-    #  try different %, until the nr of rows is at least 500 (or until we use 50% sample size)
-    nrows = 0
-    p = 0.005
-    while nrows < 500:
-        # if sample is 50% of all rows then continue
-        if p >= 0.5:
-            break
+    if Path(data_path).suffix.lower() in CSV_EXTENSIONS:
+        #  try different %, until the nr of rows is at least 500 (or until we use 50% sample size)
+        nrows = 0
+        p = 0.005
+        while nrows < 500:
+            # if sample is 50% of all rows then continue
+            if p >= 0.5:
+                break
 
-        # increase p 10 fold with every loop
-        p = p * 10
+            # increase p 10 fold with every loop
+            p = p * 10
 
-        # if random from [0,1] interval is greater than p the row will be skipped
-        data = pd.read_csv(
-            data_path,
-            keep_default_na=False,
-            na_values=["", "N/A", "NULL", "None", "NONE"],
-            header=0,
-            skiprows=lambda i: i > 0 and random.random() > p,
-        )
-        nrows = len(data)
+            # if random from [0,1] interval is greater than p the row will be skipped
+            data = pd.read_csv(
+                data_path,
+                keep_default_na=False,
+                na_values=NA_VALUES,
+                header=0,
+                skiprows=lambda i: i > 0 and random.random() > p,
+            )
+            nrows = len(data)
+    else:
+        # Columnar files are read at once, take a sample of at least 500 rows
+        data = load_data(data_path)
+        data = data.sample(n=min(len(data), max(500, len(data) // 20)))
 
     # Create a dictionary to store the features and their indices
     features_dict = {}
@@ -1,12 +1,17 @@
 import logging
-from typing import Optional
+import os
+from functools import partial
+from typing import Optional, Tuple, Union
 
 import numpy as np
 import pandas as pd
+from joblib import Parallel, delayed
 import plotly.figure_factory as ff
 import plotly.graph_objects as go
 import scipy.stats as ss
 
+from ml2sql.utils.helper_functions.figure_export import write_image
+
 logger = logging.getLogger(__name__)
 
 # Define constants
@@ -19,13 +24,13 @@ PEARSON_COLORSCALE = [
 OTHER_COLORSCALE = [[0, "rgba(255, 255, 255, 0.85)"], [1, "rgba(6,54,21, 0.85)"]]
 
 
-def cramers_corrected_stat(confusion_matrix: pd.DataFrame) -> float:
+def cramers_corrected_stat(confusion_matrix: Union[pd.DataFrame, np.ndarray]) -> float:
     """
     Calculates the corrected Cramer's V statistic for categorical-categorical association.
 
     Parameters
     ----------
-    confusion_matrix : pd.DataFrame
+    confusion_matrix : pd.DataFrame or np.ndarray
         A confusion matrix representing the association between two categorical variables.
 
     Returns
@@ -39,7 +44,7 @@ def cramers_corrected_stat(confusion_matrix: pd.DataFrame) -> float:
     2. Bergsma, Wicher, and Marcel A. Croon. "Reply to 'A note on the gamma statistic for measuring nominal association'." Journal of the Korean Statistical Society 42.3 (2013): 323-328.
     """
     chi2 = ss.chi2_contingency(confusion_matrix)[0]
-    n = confusion_matrix.to_numpy().sum()
+    n = np.asarray(confusion_matrix).sum()
     phi2 = chi2 / n
     r, k = confusion_matrix.shape
     phi2corr = max(0, phi2 - ((k - 1) * (r - 1)) / (n - 1))
@@ -48,7 +53,103 @@ def cramers_corrected_stat(confusion_matrix: pd.DataFrame) -> float:
     return np.sqrt(phi2corr / min((kcorr - 1), (rcorr - 1)))
 
 
-def xicor(X: np.ndarray, Y: np.ndarray, ties: bool = True) -> float:
+def xi_order(X: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """
+    Order of the observations when sorted on X, with ties in X broken at random.
+
+    Parameters
+    ----------
+    X : np.ndarray
+        The numerical variable to sort on.
+    rng : np.random.Generator
+        Random generator used to break ties.
+
+    Returns
+    -------
+    np.ndarray
+        Indices which sort X.
+    """
+    X = np.asarray(X)
+    return np.lexsort((rng.random(len(X)), X))
+
+
+def xi_ranks(Y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Rank statistics of Y needed for the Xi correlation coefficient.
+
+    Ties are grouped with `np.unique` so all ranks are computed in O(n log n).
+
+    Parameters
+    ----------
+    Y : np.ndarray
+        The numerical variable to rank.
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        Per observation the number of values smaller than or equal to it (r) and
+        the number of values greater than or equal to it (L).
+    """
+    Y = np.asarray(Y)
+    _, inverse, counts = np.unique(Y, return_inverse=True, return_counts=True)
+    cum_counts = np.cumsum(counts)
+    r = cum_counts[inverse.ravel()]
+    L = len(Y) - (cum_counts - counts)[inverse.ravel()]
+    return r, L
+
+
+def xi_tie_denominator(L: np.ndarray) -> float:
+    """
+    Denominator of the Xi correlation coefficient accounting for ties in Y, 2 * sum(L * (n - L)).
+
+    It only depends on Y, so it is computed once per column.
+
+    Parameters
+    ----------
+    L : np.ndarray
+        Number of values of Y greater than or equal to each observation (see `xi_ranks`).
+
+    Returns
+    -------
+    float
+        The denominator.
+    """
+    L = L.astype(np.float64)
+    return 2 * np.sum(L * (len(L) - L))
+
+
+def xi_from_ranks(
+    order: np.ndarray, r: np.ndarray, tie_denominator: float, ties: bool = True
+) -> float:
+    """
+    Calculates the Xi correlation coefficient from precomputed orders and ranks.
+
+    Parameters
+    ----------
+    order : np.ndarray
+        Order of the observations sorted on X (see `xi_order`).
+    r : np.ndarray
+        Number of values of Y smaller than or equal to each observation (see `xi_ranks`).
+    tie_denominator : float
+        Denominator accounting for ties in Y (see `xi_tie_denominator`), only used
+        when `ties` is True.
+    ties : bool, optional
+        Whether to use the formula which accounts for ties in Y, by default True.
+
+    Returns
+    -------
+    float
+        The Xi correlation coefficient.
+    """
+    n = len(order)
+    abs_diff_sum = np.abs(np.diff(r[order].astype(np.float64))).sum()
+    if ties:
+        return 1 - n * abs_diff_sum / tie_denominator
+    else:
+        return 1 - 3 * abs_diff_sum / (n**2 - 1)
+
+
+def xicor(X: np.ndarray, Y: np.ndarray, ties: bool = True, seed: int = 42) -> float:
     """
     Calculates the Xi correlation coefficient between two numerical variables.
 
@@ -60,6 +161,8 @@ def xicor(X: np.ndarray, Y: np.ndarray, ties: bool = True) -> float:
         The second numerical variable.
     ties : bool, optional
         Whether to handle ties in the data, by default True.
+    seed : int, optional
+        Seed of the random generator used to break ties in X, by default 42.
 
     Returns
     -------
@@ -70,30 +173,114 @@ def xicor(X: np.ndarray, Y: np.ndarray, ties: bool = True) -> float:
     ----------
     https://arxiv.org/pdf/1909.10140.pdf
     """
-    np.random.seed(42)
-    X = np.asarray(X)
-    Y = np.asarray(Y)
-    n = len(X)
-    order = X.argsort()
-    Y_sorted = Y[order]
-    if ties:
-        L = np.searchsorted(Y_sorted, Y_sorted, side="right")
-        r = L.copy()
-        for j in range(n):
-            tie_index = r == r[j]
-            tie_count = tie_index.sum()
-            if tie_count > 1:
-                tie_adjustment = np.arange(tie_count)
-                np.random.shuffle(tie_adjustment)
-                r[tie_index] = r[tie_index] - tie_adjustment
-        return 1 - n * sum(abs(r[1:] - r[: n - 1])) / (2 * sum(L * (n - L)))
-    else:
-        r = np.searchsorted(Y_sorted, Y_sorted, side="right")
-        return 1 - 3 * sum(abs(r[1:] - r[: n - 1])) / (n**2 - 1)
+    rng = np.random.default_rng(seed)
+    order = xi_order(X, rng)
+    r, L = xi_ranks(Y)
+    return xi_from_ranks(order, r, xi_tie_denominator(L), ties=ties)
+
+
+def _cramerv_pairs(
+    codes: np.ndarray, n_categories: np.ndarray, pairs: np.ndarray
+) -> np.ndarray:
+    """
+    Corrected Cramer's V for a batch of column pairs from integer category codes.
+
+    Parameters
+    ----------
+    codes : np.ndarray
+        Integer category codes of shape (n_columns, n_rows), -1 for missing values.
+    n_categories : np.ndarray
+        Number of categories per column.
+    pairs : np.ndarray
+        Column index pairs of shape (n_pairs, 2).
+
+    Returns
+    -------
+    np.ndarray
+        Corrected Cramer's V per pair.
+    """
+    values = np.empty(len(pairs), dtype=np.float64)
+    for pair_nr, (i, j) in enumerate(pairs):
+        observed = (codes[i] >= 0) & (codes[j] >= 0)
+        k_j = n_categories[j]
+        cells = codes[i][observed].astype(np.int64) * k_j + codes[j][observed]
+        table = np.bincount(cells, minlength=n_categories[i] * k_j).reshape(-1, k_j)
+
+        # Only keep categories which occur, as a crosstab would
+        table = table[table.sum(axis=1) > 0][:, table.sum(axis=0) > 0]
+        values[pair_nr] = cramers_corrected_stat(table)
+    return values
+
+
+def _xi_pairs(
+    orders: np.ndarray,
+    r: np.ndarray,
+    denominators: np.ndarray,
+    pairs: np.ndarray,
+    ties: bool = True,
+) -> np.ndarray:
+    """
+    Xi correlation coefficient for a batch of (X, Y) column pairs from precomputed ranks.
+
+    Parameters
+    ----------
+    orders : np.ndarray
+        Per column the order of the rows sorted on that column, shape (n_columns, n_rows).
+    r : np.ndarray
+        Per column the rank statistic r (see `xi_ranks`), shape (n_columns, n_rows).
+    denominators : np.ndarray
+        Per column the denominator accounting for ties (see `xi_tie_denominator`).
+    pairs : np.ndarray
+        Column index pairs (X, Y) of shape (n_pairs, 2).
+    ties : bool, optional
+        Whether to use the formula which accounts for ties in Y, by default True.
+
+    Returns
+    -------
+    np.ndarray
+        Xi correlation coefficient per pair.
+    """
+    return np.array(
+        [xi_from_ranks(orders[i], r[j], denominators[j], ties=ties) for i, j in pairs],
+        dtype=np.float64,
+    )
+
+
+def _compute_pairs(
+    func, arrays: Tuple[np.ndarray, ...], pairs: np.ndarray, n_jobs: int
+) -> np.ndarray:
+    """
+    Evaluate a pairwise statistic over batches of column pairs, in parallel if requested.
+
+    Parameters
+    ----------
+    func : callable
+        Function taking the precomputed arrays and a batch of pairs.
+    arrays : Tuple[np.ndarray, ...]
+        Per column precomputed data, shared by all batches.
+    pairs : np.ndarray
+        Column index pairs of shape (n_pairs, 2).
+    n_jobs : int
+        Number of worker processes (-1 for all cores).
+
+    Returns
+    -------
+    np.ndarray
+        Statistic per pair, in the order of `pairs`.
+    """
+    if n_jobs == 1 or len(pairs) < 2:
+        return func(*arrays, pairs)
+
+    n_batches = min(len(pairs), 4 * (os.cpu_count() or 1))
+    batches = np.array_split(pairs, n_batches)
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(func)(*arrays, batch) for batch in batches
+    )
+    return np.concatenate(results)
 
 
 def create_correlation_matrix(
-    df: pd.DataFrame, corr_type: str
+    df: pd.DataFrame, corr_type: str, n_jobs: int = 1, ties: bool = True
 ) -> Optional[pd.DataFrame]:
     """
     Creates a correlation matrix based on the specified correlation type.
@@ -104,6 +291,10 @@ def create_correlation_matrix(
         The input DataFrame containing the data.
     corr_type : str
         The type of correlation to calculate ('pearson', 'cramerv', or 'xi').
+    n_jobs : int, optional
+        Number of processes used to compute the column pairs (-1 for all cores), by default 1.
+    ties : bool, optional
+        Whether the Xi correlation handles ties in the data (see `xicor`), by default True.
 
     Returns
     -------
@@ -134,14 +325,24 @@ def create_correlation_matrix(
             )
             return None
         cols = data.columns
-        corr_matrix = pd.DataFrame(columns=cols, index=cols)
-        for i in cols:
-            for j in cols:
-                if i == j:
-                    corr_matrix.at[i, j] = 1
-                else:
-                    cm = pd.crosstab(data[i], data[j])
-                    corr_matrix.at[i, j] = cramers_corrected_stat(cm)
+
+        # Integer category codes per column, computed once and reused for all pairs
+        codes = np.empty(data.shape[::-1], dtype=np.int64)
+        n_categories = np.empty(len(cols), dtype=np.int64)
+        for col_nr, col in enumerate(cols):
+            col_codes, uniques = pd.factorize(data[col])
+            codes[col_nr] = col_codes
+            n_categories[col_nr] = max(len(uniques), 1)
+
+        # Cramer's V is symmetric, only compute the upper triangle
+        pairs = np.column_stack(np.triu_indices(len(cols), k=1))
+        values = np.eye(len(cols), dtype=np.float64)
+        pair_values = _compute_pairs(
+            _cramerv_pairs, (codes, n_categories), pairs, n_jobs
+        )
+        values[pairs[:, 0], pairs[:, 1]] = pair_values
+        values[pairs[:, 1], pairs[:, 0]] = pair_values
+        corr_matrix = pd.DataFrame(values, columns=cols, index=cols)
     elif corr_type == "xi":
         data = df.select_dtypes(exclude=["object", "category", "bool"])
         if data.empty:
@@ -153,13 +354,26 @@ def create_correlation_matrix(
             )
             return None
         cols = data.columns
-        corr_matrix = pd.DataFrame(columns=cols, index=cols)
-        for i in cols:
-            for j in cols:
-                if i == j:
-                    corr_matrix.at[i, j] = 1
-                else:
-                    corr_matrix.at[i, j] = xicor(data[i], data[j])
+
+        # Sort order (as X) and ranks (as Y) per column, computed once and reused for all
+        # pairs. Both are at most the number of rows, so int32 halves the memory, and of
+        # the ranks L only the per column denominator is needed
+        index_dtype = np.int32 if len(data) < 2**31 else np.int64
+        orders = np.empty(data.shape[::-1], dtype=index_dtype)
+        r = np.empty(data.shape[::-1], dtype=index_dtype)
+        denominators = np.empty(len(cols), dtype=np.float64)
+        for col_nr, col in enumerate(cols):
+            orders[col_nr] = xi_order(data[col], np.random.default_rng(42))
+            r[col_nr], L = xi_ranks(data[col])
+            denominators[col_nr] = xi_tie_denominator(L)
+
+        # Xi is not symmetric, compute all off-diagonal pairs
+        pairs = np.argwhere(~np.eye(len(cols), dtype=bool))
+        values = np.eye(len(cols), dtype=np.float64)
+        values[pairs[:, 0], pairs[:, 1]] = _compute_pairs(
+            partial(_xi_pairs, ties=ties), (orders, r, denominators), pairs, n_jobs
+        )
+        corr_matrix = pd.DataFrame(values, columns=cols, index=cols)
     else:
         raise ValueError(f"Invalid correlation type: {corr_type}")
 
@@ -317,7 +531,7 @@ def plot_clustermap(
 
     output_path = f"{project_name}/feature_info/{matrix_type}_clustermap.{file_type}"
     if file_type == "png":
-        fig.write_image(output_path)
+        write_image(fig, output_path)
     elif file_type == "html":
         fig.write_html(output_path)
     else:
@@ -326,7 +540,9 @@ def plot_clustermap(
     logger.info(f"Created {matrix_type} correlation matrix clustermap")
 
 
-def plot_correlations(df: pd.DataFrame, project_name: str, file_type: str) -> None:
+def plot_correlations(
+    df: pd.DataFrame, project_name: str, file_type: str, n_jobs: int = 1
+) -> None:
     """
     Plot correlation matrices for the given DataFrame and save them as png or html files.
 
@@ -338,13 +554,15 @@ def plot_correlations(df: pd.DataFrame, project_name: str, file_type: str) -> No
         A string representing the name of the project being worked on.
     file_type : str
         A string representing the type of file to save the plots as (either 'png' or 'html').
+    n_jobs : int, optional
+        Number of processes used to compute the correlation matrices, by default 1.
 
     Returns
     -------
     None
     """
     for corr_type in ["pearson", "cramerv", "xi"]:
-        corr_matrix = create_correlation_matrix(df, corr_type)
+        corr_matrix = create_correlation_matrix(df, corr_type, n_jobs=n_jobs)
         if corr_matrix is not None:
             matrix_type = f"{corr_type}_{'numeric' if corr_type in ['pearson', 'xi'] else 'categorical'}"
             plot_clustermap(corr_matrix, matrix_type, project_name, file_type)
@@ -122,6 +122,69 @@ def config_handling(configuration, data):
     return target_col, feature_cols, model_params, pre_params, post_params
 
 
+def config_columns(configuration):
+    """
+    Columns of the data set used by the configuration.
+
+    Parameters:
+    -----------
+    configuration : dict
+        A dictionary containing configuration information.
+
+    Returns:
+    --------
+    list or None
+        The target, feature and (if used) time sensitive columns, or None when all
+        columns are needed (no features specified).
+    """
+    if "features" not in configuration.keys():
+        return None
+
+    columns = [configuration["target"]] + list(configuration["features"])
+
+    # The time column is only read when a time series split or OOT set uses it
+    pre_params = configuration.get("pre_params", {})
+    if (pre_params.get("cv_type") == "timeseriesplit") or (
+        pre_params.get("oot_set", "false") != "false"
+    ):
+        columns.append(pre_params["time_sensitive_column"])
+
+    # Remove duplicates while keeping the order
+    return list(dict.fromkeys(columns))
+
+
+# Which outputs to create, from everything to only the model and its SQL
+ARTIFACT_PROFILES = ["full", "metrics-only", "minimal"]
+
+
+def artifact_profile(post_params):
+    """
+    The configured artifact profile.
+
+    Parameters:
+    -----------
+    post_params : dict
+        The post modeling parameters.
+
+    Returns:
+    --------
+    str
+        'full' (default, all plots and metrics), 'metrics-only' (metrics JSON, no
+        plots) or 'minimal' (no cross validation, plots or test metrics).
+
+    Raises:
+    -------
+    ValueError
+        If the configured profile is unknown.
+    """
+    profile = post_params.get("artifacts", "full")
+    if profile not in ARTIFACT_PROFILES:
+        raise ValueError(
+            f"Unknown artifacts profile '{profile}', use one of {', '.join(ARTIFACT_PROFILES)}"
+        )
+    return profile
+
+
 def _get_col_dtype(col):
     """
     Sourced: https://stackoverflow.com/questions/35003138/python-pandas-inferring-column-datatypes
@@ -129,7 +192,7 @@ def _get_col_dtype(col):
     input:   col: a pandas Series representing a df column.
     """
 
-    if col.dtype == "object":
+    if col.dtype in ["object", "string"]:
         # try datetime
         try:
             col_new = pd.to_datetime(col.dropna().unique())
@@ -181,7 +244,7 @@ def select_ml_cols(df):
                     features_set.discard(col)
                     print(f'"{col}" is a date column')
 
-        elif (uniqueness_ratio > 0.4) & (df[col].dtypes == "object"):
+        elif (uniqueness_ratio > 0.4) & (df[col].dtypes in ["object", "string"]):
             features_set.discard(col)
             print(f'"{col}" is object column with high cardinality')
 
@@ -0,0 +1,441 @@
+import json
+import logging
+import sys
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Supported input data formats, columnar formats require pyarrow
+CSV_EXTENSIONS = (".csv",)
+COLUMNAR_EXTENSIONS = (".parquet", ".feather", ".arrow", ".ipc")
+DATA_EXTENSIONS = CSV_EXTENSIONS + COLUMNAR_EXTENSIONS
+
+# Values read in as NULL when loading a CSV for modelling
+NA_VALUES = ["", "N/A", "NULL", "None", "NONE"]
+
+# Directory (next to the data) holding the inferred CSV schemas
+CACHE_DIR = ".ml2sql_cache"
+
+
+def _import_pyarrow():
+    """
+    Import pyarrow, with an installation hint when it is missing.
+    """
+    try:
+        import pyarrow
+        import pyarrow.csv  # noqa: F401
+        import pyarrow.feather  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError as e:
+        raise ImportError(
+            "Reading or writing Parquet, Feather and Arrow files requires pyarrow, "
+            "install it with `pip install ml2sql[arrow]`"
+        ) from e
+    return pyarrow
+
+
+def is_data_file(path: Union[str, Path]) -> bool:
+    """
+    Check whether the file has one of the supported data extensions.
+
+    Args:
+        path (Union[str, Path]): Path to the file.
+
+    Returns:
+        bool: True if the file is a supported data file.
+    """
+    return Path(path).suffix.lower() in DATA_EXTENSIONS
+
+
+def list_data_files(data_dir: Union[str, Path]) -> List[Path]:
+    """
+    List the supported data files in a directory, sorted by name.
+
+    Args:
+        data_dir (Union[str, Path]): Directory to list.
+
+    Returns:
+        List[Path]: Sorted paths of the data files.
+    """
+    return sorted(
+        f for f in Path(data_dir).iterdir() if f.is_file() and is_data_file(f)
+    )
+
+
+def peak_memory_mb() -> Optional[float]:
+    """
+    Peak resident memory of the current process so far.
+
+    Returns:
+        Optional[float]: Peak RSS in MB, None where it can not be measured (Windows).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and in kilobytes on Linux
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+
+def _schema_path(data_path: Path) -> Path:
+    return data_path.parent / CACHE_DIR / "schemas" / f"{data_path.name}.json"
+
+
+def file_signature(data_path: Path) -> Dict[str, int]:
+    stat = data_path.stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def read_cached_schema(data_path: Union[str, Path]) -> Optional[Dict[str, str]]:
+    """
+    Read the cached column dtypes of a CSV file.
+
+    Args:
+        data_path (Union[str, Path]): Path to the CSV file.
+
+    Returns:
+        Optional[Dict[str, str]]: Column name to pandas dtype, None if there is no cached
+            schema or the file changed since it was cached.
+    """
+    data_path = Path(data_path)
+    try:
+        cached = json.loads(_schema_path(data_path).read_text())
+    except (OSError, ValueError):
+        return None
+
+    if cached.get("file") != file_signature(data_path):
+        return None
+    return cached["dtypes"]
+
+
+def write_cached_schema(data_path: Union[str, Path], dtypes: Dict[str, str]) -> None:
+    """
+    Cache the column dtypes of a CSV file, skipped when the cache can not be written.
+
+    Args:
+        data_path (Union[str, Path]): Path to the CSV file.
+        dtypes (Dict[str, str]): Column name to pandas dtype.
+    """
+    data_path = Path(data_path)
+    schema_path = _schema_path(data_path)
+    try:
+        schema_path.parent.mkdir(parents=True, exist_ok=True)
+        schema_path.write_text(
+            json.dumps({"file": file_signature(data_path), "dtypes": dtypes}, indent=2)
+        )
+    except OSError as e:
+        logger.debug(f"Could not cache schema of {data_path}: {e}")
+
+
+def _read_csv_arrow(
+    data_path: Path,
+    columns: List[str],
+    dtypes: Dict[str, str],
+    na_values: Optional[List[str]],
+) -> pd.DataFrame:
+    """
+    Read columns of a CSV with the multi-threaded pyarrow reader using known dtypes.
+    """
+    pa = _import_pyarrow()
+    arrow_types = {
+        "int64": pa.int64(),
+        "float64": pa.float64(),
+        "bool": pa.bool_(),
+        "object": pa.string(),
+    }
+    null_values = {} if na_values is None else {"null_values": na_values}
+    convert_options = pa.csv.ConvertOptions(
+        column_types={col: arrow_types[dtypes[col]] for col in columns},
+        include_columns=columns,
+        strings_can_be_null=True,
+        **null_values,
+    )
+    table = pa.csv.read_csv(
+        data_path,
+        read_options=pa.csv.ReadOptions(use_threads=True),
+        convert_options=convert_options,
+    )
+    data = table.to_pandas()
+
+    # Missing strings as NaN, like the pandas reader
+    object_cols = [col for col in columns if dtypes[col] == "object"]
+    data[object_cols] = data[object_cols].fillna(np.nan)
+    return data
+
+
+def _read_csv(
+    data_path: Path, columns: Optional[List[str]], na_values: Optional[List[str]]
+) -> pd.DataFrame:
+    """
+    Read a CSV, using the pyarrow reader with cached dtypes when available.
+
+    The first read infers the dtypes with pandas and caches them, later reads skip the
+    type inference and parse with the multi-threaded pyarrow reader. Files the pyarrow
+    reader can not handle (e.g. with an unnamed index column) use the pandas reader.
+    """
+    header = list(pd.read_csv(data_path, nrows=0).columns)
+    wanted = header if columns is None else columns
+    schema = read_cached_schema(data_path)
+
+    if (schema is not None) and all(
+        schema.get(col) in ["int64", "float64", "bool", "object"] for col in wanted
+    ):
+        try:
+            return _read_csv_arrow(data_path, wanted, schema, na_values)
+        except (ImportError, KeyError, ValueError) as e:
+            logger.debug(f"pyarrow CSV reader not used for {data_path}: {e}")
+
+    # A callable keeps rows aligned when the file has an unnamed index column
+    data = pd.read_csv(
+        data_path,
+        usecols=set(wanted).__contains__,
+        keep_default_na=na_values is None,
+        na_values=na_values,
+    )[wanted]
+
+    inferred = {
+        **(schema or {}),
+        **{col: str(dtype) for col, dtype in data.dtypes.items()},
+    }
+    if inferred != schema:
+        write_cached_schema(data_path, inferred)
+    return data
+
+
+def load_data(
+    data_path: Union[str, Path],
+    columns: Optional[List[str]] = None,
+    na_values: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """
+    Load a CSV, Parquet, Feather or Arrow IPC file into a DataFrame.
+
+    Only the requested columns are parsed. Columnar files return string columns as pyarrow
+    backed strings instead of Python objects. CSV files are parsed with the pyarrow reader
+    and dtypes cached from an earlier read, when available.
+
+    Args:
+        data_path (Union[str, Path]): Path to the data file.
+        columns (Optional[List[str]], optional): Columns to read, all columns if None. Defaults to None.
+        na_values (Optional[List[str]], optional): Values read as NULL in CSV files, the pandas defaults if None. Defaults to None.
+
+    Returns:
+        pd.DataFrame: The loaded data.
+
+    Raises:
+        ValueError: If the file extension is not supported.
+    """
+    data_path = Path(data_path)
+    extension = data_path.suffix.lower()
+
+    if extension in CSV_EXTENSIONS:
+        return _read_csv(data_path, columns, na_values)
+    elif extension not in COLUMNAR_EXTENSIONS:
+        raise ValueError(
+            f"Unsupported data file type '{extension}', use one of {', '.join(DATA_EXTENSIONS)}"
+        )
+
+    pa = _import_pyarrow()
+    if extension == ".parquet":
+        table = pa.parquet.read_table(data_path, columns=columns)
+    else:
+        # Feather (v2) and Arrow IPC files share the same format
+        table = _select_columns(
+            pa.feather.read_table(data_path, columns=columns), columns
+        )
+
+    return _arrow_to_pandas(table)
+
+
+def _arrow_to_pandas(table) -> pd.DataFrame:
+    """
+    Convert a pyarrow Table or RecordBatch, with pyarrow backed string columns.
+    """
+    pa = _import_pyarrow()
+    string_dtype = pd.StringDtype("pyarrow")
+    return table.to_pandas(
+        types_mapper={pa.string(): string_dtype, pa.large_string(): string_dtype}.get
+    )
+
+
+def strings_as_category(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cast the pyarrow backed string columns to category, models do not accept them.
+
+    Args:
+        df (pd.DataFrame): The loaded data.
+
+    Returns:
+        pd.DataFrame: The data with string columns as categoricals.
+    """
+    string_cols = df.select_dtypes(include=["string"]).columns
+    return df.astype({col: "category" for col in string_cols})
+
+
+def _select_columns(table, columns: Optional[List[str]]):
+    return table if columns is None else table.select(columns)
+
+
+def iter_data(
+    data_path: Union[str, Path],
+    batch_size: int,
+    columns: Optional[List[str]] = None,
+    na_values: Optional[List[str]] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Read a data file in batches of rows, holding only one batch in memory at a time.
+
+    CSV batches use the dtypes cached from an earlier full read (when available), so all
+    batches get the same column types.
+
+    Args:
+        data_path (Union[str, Path]): Path to the data file.
+        batch_size (int): Maximum number of rows per batch.
+        columns (Optional[List[str]], optional): Columns to read, all columns if None. Defaults to None.
+        na_values (Optional[List[str]], optional): Values read as NULL in CSV files, the pandas defaults if None. Defaults to None.
+
+    Yields:
+        pd.DataFrame: The next batch of rows, with a RangeIndex continuing over batches.
+
+    Raises:
+        ValueError: If the file extension is not supported.
+    """
+    data_path = Path(data_path)
+    extension = data_path.suffix.lower()
+
+    if extension in CSV_EXTENSIONS:
+        header = list(pd.read_csv(data_path, nrows=0).columns)
+        wanted = header if columns is None else columns
+        schema = read_cached_schema(data_path) or {}
+        reader = pd.read_csv(
+            data_path,
+            usecols=set(wanted).__contains__,
+            dtype={col: schema[col] for col in wanted if col in schema},
+            keep_default_na=na_values is None,
+            na_values=na_values,
+            chunksize=batch_size,
+        )
+        with reader:
+            for batch in reader:
+                yield batch[wanted]
+        return
+    elif extension not in COLUMNAR_EXTENSIONS:
+        raise ValueError(
+            f"Unsupported data file type '{extension}', use one of {', '.join(DATA_EXTENSIONS)}"
+        )
+
+    pa = _import_pyarrow()
+    if extension == ".parquet":
+        batches = pa.parquet.ParquetFile(data_path).iter_batches(
+            batch_size=batch_size, columns=columns
+        )
+    else:
+        # Memory mapped, record batches are only read (and decompressed) when used
+        reader = pa.ipc.open_file(pa.memory_map(str(data_path)))
+        batches = (
+            piece
+            for i in range(reader.num_record_batches)
+            for piece in _select_columns(
+                pa.Table.from_batches([reader.get_batch(i)]), columns
+            ).to_batches(max_chunksize=batch_size)
+        )
+
+    start = 0
+    for record_batch in batches:
+        batch = _arrow_to_pandas(record_batch)
+        batch.index = pd.RangeIndex(start, start + len(batch))
+        start += len(batch)
+        yield batch
+
+
+def write_data(df: pd.DataFrame, data_path: Union[str, Path]) -> None:
+    """
+    Write a DataFrame to the format given by the file extension.
+
+    Args:
+        df (pd.DataFrame): The data to write.
+        data_path (Union[str, Path]): Destination path, its extension sets the format.
+
+    Raises:
+        ValueError: If the file extension is not supported.
+    """
+    data_path = Path(data_path)
+    extension = data_path.suffix.lower()
+
+    if extension in CSV_EXTENSIONS:
+        df.to_csv(data_path, index=False)
+    elif extension == ".parquet":
+        _import_pyarrow()
+        df.to_parquet(data_path, index=False)
+    elif extension in COLUMNAR_EXTENSIONS:
+        _import_pyarrow()
+        df.reset_index(drop=True).to_feather(data_path)
+    else:
+        raise ValueError(
+            f"Unsupported data file type '{extension}', use one of {', '.join(DATA_EXTENSIONS)}"
+        )
+
+
+class BatchWriter:
+    """
+    Write DataFrames batch by batch to one file, in the format given by its extension.
+
+    Use as a context manager, the file is complete once the writer is closed. All batches
+    need the same columns, their types are taken from the first batch.
+
+    Args:
+        data_path (Union[str, Path]): Destination path, its extension sets the format.
+
+    Raises:
+        ValueError: If the file extension is not supported.
+    """
+
+    def __init__(self, data_path: Union[str, Path]) -> None:
+        self.data_path = Path(data_path)
+        self.extension = self.data_path.suffix.lower()
+        if self.extension not in DATA_EXTENSIONS:
+            raise ValueError(
+                f"Unsupported data file type '{self.extension}', use one of {', '.join(DATA_EXTENSIONS)}"
+            )
+        self._writer = None
+        self._schema = None
+        self.n_rows = 0
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self.extension in CSV_EXTENSIONS:
+            df.to_csv(
+                self.data_path,
+                mode="w" if self.n_rows == 0 else "a",
+                header=self.n_rows == 0,
+                index=False,
+            )
+        else:
+            pa = _import_pyarrow()
+            table = pa.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+            if self._writer is None:
+                self._schema = table.schema
+                if self.extension == ".parquet":
+                    self._writer = pa.parquet.ParquetWriter(
+                        self.data_path, self._schema
+                    )
+                else:
+                    self._writer = pa.ipc.new_file(str(self.data_path), self._schema)
+            self._writer.write_table(table)
+        self.n_rows += len(df)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self) -> "BatchWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,122 @@
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Union
+
+logger = logging.getLogger(__name__)
+
+# Pool rendering the queued figures, None when figures are written synchronously
+_executor = None
+_pending = []
+
+
+def _warm_up() -> None:
+    """
+    Start kaleido in a worker process, so the first queued figure does not pay for it.
+    """
+    import plotly.graph_objects as go
+    import plotly.io as pio
+
+    pio.to_image(go.Figure(), format="png")
+
+
+def _render(fig_dict: dict, output_path: str, kwargs: dict) -> None:
+    import plotly.io as pio
+
+    pio.write_image(fig_dict, output_path, validate=False, **kwargs)
+
+
+def write_image(fig, output_path: Union[str, Path], **kwargs) -> None:
+    """
+    Write a plotly figure as a static image, queued in the export pool when one is running.
+
+    Args:
+        fig (plotly.graph_objects.Figure): The figure to write.
+        output_path (Union[str, Path]): Destination path, its extension sets the format.
+        **kwargs: Passed on to plotly's write_image (e.g. width, height, scale).
+    """
+    if _executor is None:
+        fig.write_image(output_path, **kwargs)
+        return
+
+    # Send the (already validated) figure data, not the figure object
+    _pending.append(
+        (
+            output_path,
+            _executor.submit(_render, fig.to_dict(), str(output_path), kwargs),
+        )
+    )
+
+
+def wait_for_figures() -> None:
+    """
+    Block until all queued figures are written.
+
+    Raises:
+        Exception: The first error raised while writing a figure, after all figures
+            were attempted.
+    """
+    if not _pending:
+        return
+
+    start_time = time.perf_counter()
+    n_figures = len(_pending)
+    errors = []
+    while _pending:
+        output_path, future = _pending.pop(0)
+        try:
+            future.result()
+        except Exception as e:
+            logger.error(f"Could not write figure {output_path}: {e}")
+            errors.append(e)
+
+    logger.info(
+        f"Waited {time.perf_counter() - start_time:.2f}s for {n_figures} queued figures"
+    )
+    if errors:
+        raise errors[0]
+
+
+@contextmanager
+def figure_export_pool(n_workers: int) -> Iterator[None]:
+    """
+    Write the figures of write_image in a pool of worker processes within this context.
+
+    Each worker keeps its own kaleido renderer running. Figures are written in the
+    background until wait_for_figures is called or the context exits. With one worker
+    or less figures are written synchronously.
+
+    Args:
+        n_workers (int): Number of worker processes.
+    """
+    global _executor
+
+    if n_workers <= 1 or _executor is not None:
+        yield
+        return
+
+    # Spawned (not forked) workers, the parent's kaleido process can not be shared
+    _executor = ProcessPoolExecutor(
+        max_workers=n_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_warm_up,
+    )
+    # Start all workers (and their renderers) now instead of on the first figures
+    for _ in range(n_workers):
+        _executor.submit(int)
+    logger.info(f"Writing figures with {n_workers} worker processes")
+
+    try:
+        yield
+        wait_for_figures()
+    finally:
+        executor, _executor = _executor, None
+        # Figures not written yet after an error are dropped (shutdown has no
+        # cancel_futures before Python 3.9)
+        for _, future in _pending:
+            future.cancel()
+        _pending.clear()
+        executor.shutdown(wait=True)
@@ -2,13 +2,26 @@ import logging
 import logging.handlers
 
 
+# Handlers added by setup_logger, replaced by the next model trained or tested in
+# the same process (basicConfig alone only configures the first one)
+_handlers = []
+
+
 def setup_logger(log_file_path):
-    # Create a logger
-    logging.basicConfig(
-        level=logging.DEBUG,
-        format="%(asctime)s [%(levelname)s] %(message)s",
-        handlers=[logging.FileHandler(log_file_path), logging.StreamHandler()],
-    )
+    root = logging.getLogger()
+    # Like basicConfig, logging configured elsewhere is left as is
+    if all(handler in _handlers for handler in root.handlers):
+        for handler in _handlers:
+            root.removeHandler(handler)
+            handler.close()
+        _handlers[:] = [logging.FileHandler(log_file_path), logging.StreamHandler()]
+
+        # Create a logger
+        logging.basicConfig(
+            level=logging.DEBUG,
+            format="%(asctime)s [%(levelname)s] %(message)s",
+            handlers=_handlers,
+        )
 
     # disable certain matplotlib warnings
     # logging.getLogger('matplotlib.font_manager').disabled = True # ignore matplotlibs font warnings
@@ -1,9 +1,11 @@
 # Load packages
 import logging
-import pandas as pd
 import json
+import time
 from pathlib import Path
 
+from joblib import Parallel, delayed
+
 # Main modelling function
 from ml2sql.utils.modelling.main_modeler import make_model
 
@@ -15,8 +17,20 @@ from ml2sql.utils.output_scripts import l_regression_as_code  # noqa: F401
 from ml2sql.utils.helper_functions.checks import checkInputData
 from ml2sql.utils.helper_functions.setup_logger import setup_logger
 
-from ml2sql.utils.helper_functions.config_handling import config_handling
-from ml2sql.utils.pre_processing.pre_process import pre_process_kfold
+from ml2sql.utils.helper_functions.config_handling import (
+    config_columns,
+    config_handling,
+)
+from ml2sql.utils.helper_functions.figure_export import figure_export_pool
+from ml2sql.utils.helper_functions.data_loading import (
+    NA_VALUES,
+    load_data,
+    peak_memory_mb,
+)
+from ml2sql.utils.pre_processing.pre_process import (
+    cast_object_columns,
+    pre_process_kfold,
+)
 
 
 def modelcreater(data_path, config_path, model_name, project_name):
@@ -36,19 +50,41 @@ def modelcreater(data_path, config_path, model_name, project_name):
         f"Script input arguments: \ndata_path: {data_path} \nconfig_path: {config_path} \nmodel_name: {model_name} \nproject_name: {project_name}"
     )
 
-    # Load data
-    logger.info(f"Loading data from {data_path}...")
-    data = pd.read_csv(
-        data_path,
-        keep_default_na=False,
-        na_values=["", "N/A", "NULL", "None", "NONE"],
-    )
-
     # Load configuration
     logger.info(f"Loading configuration from {config_path}...")
     with config_path.open() as json_file:
         configuration = json.load(json_file)
 
+    # Load data, only reading the columns used by the configuration
+    logger.info(f"Loading data from {data_path}...")
+    start_time = time.perf_counter()
+    data = load_data(
+        data_path, columns=config_columns(configuration), na_values=NA_VALUES
+    )
+    peak_memory = peak_memory_mb()
+    logger.info(
+        f"Loaded data with shape {data.shape} in {time.perf_counter() - start_time:.2f}s, "
+        f"peak memory {'n/a' if peak_memory is None else f'{peak_memory:.0f} MB'}"
+    )
+
+    create_model(data, configuration, model_name, project_name, data_path=data_path)
+
+    logger.info("Script finished.")
+
+
+def create_model(
+    data, configuration, model_name, project_name, data_path=None, n_concurrent_models=1
+):
+    """
+    Train a model on loaded data and save it along with its SQL representation.
+
+    The data_path is only used for the fold cache (pre_params fold_cache). With
+    n_concurrent_models models trained at the same time (batch) the cores are divided
+    over them.
+    """
+    logger = logging.getLogger(__name__)
+    project_name = Path(project_name)
+
     # Handle the configuration file
     target_col, feature_cols, model_params, pre_params, post_params = config_handling(
         configuration, data
@@ -70,30 +106,39 @@ def modelcreater(data_path, config_path, model_name, project_name):
     logger.info(f"Target column has {data[target_col].nunique()} unique values")
     logger.info(f"This problem will be treated as a {model_type} problem")
 
-    # Preprocess data
-    logger.info("Preprocessing data...")
-    datasets = pre_process_kfold(
-        project_name,
-        data,
-        target_col,
-        feature_cols,
-        model_name=model_name,
-        model_type=model_type,
-        pre_params=pre_params,
-        post_params=post_params,
-        random_seed=42,
-    )
+    # Write figures in background processes (when configured), started before pre
+    # processing so the correlation plots are queued too and the renderers are warm
+    with figure_export_pool(int(post_params.get("figure_export_workers", 1))):
+        # Preprocess data
+        logger.info("Preprocessing data...")
+        datasets = pre_process_kfold(
+            project_name,
+            data,
+            target_col,
+            feature_cols,
+            model_name=model_name,
+            model_type=model_type,
+            pre_params=pre_params,
+            post_params=post_params,
+            random_seed=42,
+            data_path=data_path,
+        )
 
-    # Train model
-    logger.info(f"Training {model_name} model...")
-    clf = make_model(
-        project_name,
-        datasets,
-        model_name=model_name,
-        model_type=model_type,
-        model_params=model_params,
-        post_params=post_params,
-    )
+        # Release the raw data, training only uses the cleaned data and its folds
+        del data
+
+        # Train model
+        logger.info(f"Training {model_name} model...")
+        clf = make_model(
+            project_name,
+            datasets,
+            model_name=model_name,
+            model_type=model_type,
+            model_params=model_params,
+            post_params=post_params,
+            n_jobs=int(pre_params.get("cv_n_jobs", 1)),
+            n_concurrent_models=n_concurrent_models,
+        )
 
     # Create SQL version of model and save it
     logger.info(f"Saving {model_name} model and its SQL representation...")
@@ -101,4 +146,133 @@ def modelcreater(data_path, config_path, model_name, project_name):
         clf, project_name, post_params
     )
 
-    logger.info("Script finished.")
+
+def batch_modelcreater(data_path, models, log_path, n_jobs=1):
+    """
+    Train several models on one data file, loading and casting the data only once.
+
+    models is a list of dicts with the config_path, model_name and project_name of each
+    model, as given to modelcreater. The models are trained n_jobs at a time in one pool
+    of worker processes, a failing model does not stop the others.
+
+    Returns a report with the shared loading time and per model its status and time.
+    """
+    data_path = Path(data_path)
+
+    setup_logger(log_path)
+    logger = logging.getLogger(__name__)
+    logger.info(
+        f"Batch of {len(models)} models on {data_path}, {n_jobs} at a time: "
+        f"{', '.join(str(m['project_name']) for m in models)}"
+    )
+
+    configurations = []
+    for model in models:
+        with Path(model["config_path"]).open() as json_file:
+            configurations.append(json.load(json_file))
+    columns = [config_columns(configuration) for configuration in configurations]
+
+    # Load data once, with the columns used by any of the configurations
+    logger.info(f"Loading data from {data_path}...")
+    start_time = time.perf_counter()
+    data = load_data(
+        data_path,
+        columns=None
+        if None in columns
+        else list(dict.fromkeys(c for cols in columns for c in cols)),
+        na_values=NA_VALUES,
+    )
+
+    # Cast the string features once, not the target and time columns of any model as
+    # casting changes their handling. Per model the categories without rows after its
+    # cleaning are removed again
+    not_cast = {configuration["target"] for configuration in configurations} | {
+        configuration.get("pre_params", {}).get("time_sensitive_column")
+        for configuration in configurations
+    }
+    features = [
+        c
+        for configuration in configurations
+        for c in configuration.get("features", data.columns)
+        if c not in not_cast
+    ]
+    data = cast_object_columns(data, list(dict.fromkeys(features)))
+    load_seconds = time.perf_counter() - start_time
+    peak_memory = peak_memory_mb()
+    logger.info(
+        f"Loaded and cast data with shape {data.shape} in {load_seconds:.2f}s, "
+        f"peak memory {'n/a' if peak_memory is None else f'{peak_memory:.0f} MB'}"
+    )
+
+    # The data is passed whole to every task. joblib memory maps its large numeric
+    # blocks to the workers, object and category columns are pickled per task
+    n_concurrent_models = min(n_jobs, len(models))
+    results = Parallel(n_jobs=n_jobs, pre_dispatch="n_jobs")(
+        delayed(_batch_model)(
+            data,
+            cols,
+            configuration,
+            model["model_name"],
+            model["project_name"],
+            data_path,
+            n_concurrent_models,
+        )
+        for model, configuration, cols in zip(models, configurations, columns)
+    )
+
+    # Training sequentially switched the logging to the model folders
+    setup_logger(log_path)
+    for result in results:
+        logger.info(
+            f"{result['project_name']}: {result['status']} in {result['seconds']:.2f}s"
+        )
+
+    return {
+        "data_path": str(data_path),
+        "n_rows": len(data),
+        "load_seconds": round(load_seconds, 2),
+        "n_jobs": n_jobs,
+        "models": results,
+    }
+
+
+def _batch_model(
+    data,
+    columns,
+    configuration,
+    model_name,
+    project_name,
+    data_path,
+    n_concurrent_models,
+):
+    # Train one model of a batch, logging to its own folder
+    start_time = time.perf_counter()
+    project_name = Path(project_name)
+    setup_logger(project_name / "logging.log")
+    logger = logging.getLogger(__name__)
+    logger.info(
+        f"Batch model input arguments: \ndata_path: {data_path} \nmodel_name: {model_name} \nproject_name: {project_name}"
+    )
+
+    error = None
+    try:
+        create_model(
+            data if columns is None else data[columns],
+            configuration,
+            model_name,
+            project_name,
+            data_path=data_path,
+            n_concurrent_models=n_concurrent_models,
+        )
+        logger.info("Script finished.")
+    except Exception as e:
+        logger.exception(f"Training {model_name} model failed")
+        error = f"{type(e).__name__}: {e}"
+
+    return {
+        "project_name": str(project_name),
+        "model_name": model_name,
+        "status": "done" if error is None else "failed",
+        "error": error,
+        "seconds": round(time.perf_counter() - start_time, 2),
+    }
@@ -1,11 +1,21 @@
+import os
 import joblib
 import random
+import time
+from itertools import chain
 import numpy as np
-from typing import Any, Dict, Tuple
+from joblib import Parallel, delayed
+from typing import Any, Dict, Optional, Tuple
 
 from sklearn.model_selection import train_test_split
 from ml2sql.utils.modelling.performance import postModellingPlots
 from ml2sql.utils.modelling.calibration import calibrateModel
+from ml2sql.utils.modelling.metrics import (
+    MetricsCollector,
+    collectPerformanceMetrics,
+)
+from ml2sql.utils.helper_functions.config_handling import artifact_profile
+from ml2sql.utils.pre_processing.folds import FoldView
 
 # Algorithms (imported dynamically)
 from ml2sql.utils.modelling.models import ebm  # noqa: F401
@@ -23,6 +33,7 @@ def train_model(
     model_params: Dict[str, Any],
     model_type: str,
     model_name: str,
+    label: Optional[str] = None,
 ):
     """
     Train a machine learning model.
@@ -33,17 +44,23 @@ def train_model(
         model_params (dict): Model hyperparameters.
         model_type (str): Type of model (classification or regression).
         model_name (str): Name of model (EBM, linear regression or decision tree).
+        label (Optional[str], optional): Name of the fit in the log (e.g. the fold), the start and end of the fit are logged when given. Defaults to None.
 
     Returns:
         Trained machine learning model.
     """
+    if label is not None:
+        logger.info(f"{label} - Training on {len(X_train)} rows")
+    start_time = time.perf_counter()
     try:
         clf = globals()[model_name].trainModel(
             X_train, y_train, model_params, model_type
         )
     except Exception as e:
-        logger.error(f"Error training model: {e}")
+        logger.error(f"{label or 'Model'} - Error training model: {e}")
         raise
+    if label is not None:
+        logger.info(f"{label} - Trained in {time.perf_counter() - start_time:.2f}s")
     return clf
 
 
@@ -78,6 +95,97 @@ def predict(clf, X_test: np.ndarray, model_type: str) -> Tuple[np.ndarray, np.nd
         return y_test_pred, None
 
 
+def budget_n_jobs(
+    n_fits: int,
+    n_jobs: int,
+    model_name: str,
+    model_params: Dict[str, Any],
+    n_concurrent_models: int = 1,
+) -> Tuple[int, Dict[str, Any]]:
+    """
+    Divide the available cores between concurrently trained models and the model itself.
+
+    Args:
+        n_fits (int): Number of models which can be trained concurrently.
+        n_jobs (int): Requested number of concurrent fits, negative values count back from the number of cores (-1 = all cores).
+        model_name (str): Name of model (EBM, linear regression or decision tree).
+        model_params (dict): Model hyperparameters.
+        n_concurrent_models (int, optional): Number of models (e.g. of a batch) trained at the same time in other processes, sharing the cores. Defaults to 1.
+
+    Returns:
+        Tuple[int, Dict[str, Any]]: The number of concurrent fits and the model hyperparameters to use per fit.
+    """
+    n_cores = max(1, (os.cpu_count() or 1) // max(1, n_concurrent_models))
+    if n_jobs < 0:
+        n_jobs = n_cores + 1 + n_jobs
+    n_jobs = max(1, min(n_jobs, n_fits, n_cores))
+
+    # EBM parallelises internally (by default on all cores), give each concurrent fit
+    # its share of the cores
+    shared = (n_jobs > 1) or (n_concurrent_models > 1)
+    if shared and (model_name == "ebm") and ("n_jobs" not in model_params):
+        model_params = {**model_params, "n_jobs": max(1, n_cores // n_jobs)}
+
+    return n_jobs, model_params
+
+
+def train_fold(
+    X_train: np.ndarray,
+    y_train: np.ndarray,
+    X_test: np.ndarray,
+    model_params: Dict[str, Any],
+    model_type: str,
+    model_name: str,
+    calibration: str,
+    cal_random_state: int,
+    fold_id: int = 0,
+) -> Tuple[Any, np.ndarray, np.ndarray]:
+    """
+    Train a model on a single cross-validation fold and predict its test set.
+
+    Args:
+        X_train (np.ndarray): Training data features of the fold.
+        y_train (np.ndarray): Training data target of the fold.
+        X_test (np.ndarray): Test data features of the fold.
+        model_params (dict): Model hyperparameters.
+        model_type (str): Type of model (classification or regression).
+        model_name (str): Name of model (EBM, linear regression or decision tree).
+        calibration (str): Calibration method, 'false' to skip calibration.
+        cal_random_state (int): Random state used to split off the calibration set.
+        fold_id (int, optional): Number of the fold in the log. Defaults to 0.
+
+    Returns:
+        Tuple[Any, np.ndarray, np.ndarray]: The (uncalibrated) trained model, the predicted target values and predicted probabilities (None for regression).
+    """
+    # Check if model needs to be calibrated
+    if calibration != "false":
+        X_train, X_cal, y_train, y_cal = train_test_split(
+            X_train,
+            y_train,
+            test_size=0.2,
+            random_state=cal_random_state,
+        )
+
+    # Train the model
+    clf = train_model(
+        X_train, y_train, model_params, model_type, model_name, f"Fold {fold_id}"
+    )
+
+    fold_clf = clf
+    if calibration != "false":
+        try:
+            fold_clf = calibrateModel(
+                clf, X_cal, y_cal, method=calibration, final_model=False
+            )
+        except Exception as e:
+            logger.error(f"Fold {fold_id} - Error calibrating model: {e}")
+            raise
+
+    y_test_pred, y_test_prob = predict(fold_clf, X_test, model_type)
+
+    return clf, y_test_pred, y_test_prob
+
+
 def make_model(
     given_name: str,
     datasets: Dict[str, Dict[str, np.ndarray]],
@@ -85,6 +193,8 @@ def make_model(
     model_type: str,
     model_params: Dict[str, Any],
     post_params: Dict[str, Any],
+    n_jobs: int = 1,
+    n_concurrent_models: int = 1,
 ) -> Tuple[Any, Dict[str, np.ndarray]]:
     """
     Train and save a model, and generate performance plots.
@@ -96,6 +206,8 @@ def make_model(
         model_type (str): The type of the model (classification or regression).
         model_params (dict): A dictionary containing the hyperparameters of the model.
         post_params (dict): A dictionary containing the postprocessing parameters.
+        n_jobs (int, optional): Number of cross-validation folds (and final model) to train in parallel processes. Defaults to 1.
+        n_concurrent_models (int, optional): Number of models trained at the same time in other processes (batch training), the cores are divided over them too. Defaults to 1.
 
     Returns:
         Tuple[Any, Dict[str, np.ndarray]]: A tuple containing the trained model and post-processing datasets.
@@ -108,66 +220,82 @@ def make_model(
     X_all = datasets["final_train"]["X"]
     y_all = datasets["final_train"]["y"]
 
-    # Check if X is a list (CV should be applied in that case)
-    if isinstance(X_train, list):
-        y_test_pred_list = []
-        y_test_prob_list = []
+    # The minimal artifact profile only needs the final model
+    profile = artifact_profile(post_params)
+    cross_validate = profile != "minimal"
 
-        # Save all trained models in a dictionary
-        model_dict = {"test": {}}
+    # Check if X holds folds (CV should be applied in that case)
+    if isinstance(X_train, (list, FoldView)):
+        n_folds = len(X_train) if cross_validate else 0
+        if not cross_validate:
+            logger.info("Skipping cross validation for the minimal artifact profile")
+
+        # Split the available cores between concurrent fits and the model itself
+        n_fits = n_folds + 1
+        n_jobs, fit_params = budget_n_jobs(
+            n_fits, n_jobs, model_name, model_params, n_concurrent_models
+        )
+        logger.info(f"Training {n_fits} models using {n_jobs} parallel job(s)")
+
+        # Draw calibration seeds up front so results do not depend on n_jobs
+        cal_seeds = [random.randint(0, 100) for _ in range(n_folds)]
 
-        for fold_id, (X_train_fold, y_train_fold) in enumerate(zip(X_train, y_train)):
-            logger.info(f"Fold {fold_id} - Train model on test data")
-
-            # Check if model needs to be calibrated
-            if post_params["calibration"] != "false":
-                X_train_fold, X_cal, y_train_fold, y_cal = train_test_split(
-                    X_train_fold,
-                    y_train_fold,
-                    test_size=0.2,
-                    random_state=random.randint(0, 100),
-                )
-            else:
-                X_cal, y_cal = None, None
-
-            # Train the model
-            clf = train_model(
-                X_train_fold, y_train_fold, model_params, model_type, model_name
+        # Check if model needs to be calibrated
+        if post_params["calibration"] != "false":
+            X_all, X_cal, y_all, y_cal = train_test_split(
+                X_all, y_all, test_size=0.2, random_state=123
             )
 
-            # Save model of this fold in a dict
-            model_dict["test"][fold_id] = clf
-
-            if post_params["calibration"] != "false":
-                try:
-                    clf = calibrateModel(
-                        clf,
-                        X_cal,
-                        y_cal,
-                        method=post_params["calibration"],
-                        final_model=False,
-                    )
-                except Exception as e:
-                    logger.error(f"Error calibrating model: {e}")
-                    raise
-
-            # Discrete predictions
-            y_test_pred_list.append(clf.predict(X_test[fold_id]))
+        # Train the folds and the final model concurrently (output is in task order),
+        # folds are materialized only when their task is dispatched (at most n_jobs at once)
+        fold_tasks = (
+            delayed(train_fold)(
+                X_train[fold_id],
+                y_train[fold_id],
+                X_test[fold_id],
+                fit_params,
+                model_type,
+                model_name,
+                post_params["calibration"],
+                cal_seeds[fold_id],
+                fold_id,
+            )
+            for fold_id in range(n_folds)
+        )
+        final_task = delayed(train_model)(
+            X_all, y_all, fit_params, model_type, model_name, "Final model"
+        )
+        start_time = time.perf_counter()
+        results = Parallel(n_jobs=n_jobs, pre_dispatch="n_jobs")(
+            chain(fold_tasks, [final_task])
+        )
+        clf = results.pop()
+        logger.info(
+            f"Trained {n_folds} folds and the final model in {time.perf_counter() - start_time:.2f}s"
+        )
 
-            if model_type == "classification":
-                # Probability predictions
-                y_test_pred, y_test_prob = predict(clf, X_test[fold_id], model_type)
-                y_test_prob_list.append(y_test_prob)
+        # Save all trained models in a dictionary
+        model_dict = {"test": {}}
+        y_test_pred_list = []
+        y_test_prob_list = []
+        for fold_id, (fold_clf, y_fold_pred, y_fold_prob) in enumerate(results):
+            model_dict["test"][fold_id] = fold_clf
+            y_test_pred_list.append(y_fold_pred)
+            y_test_prob_list.append(y_fold_prob)
 
-        # Merge lists of predictions into one list
-        y_test_pred = np.concatenate(y_test_pred_list, axis=0)
+        if cross_validate:
+            # Merge lists of predictions into one list
+            y_test_pred = np.concatenate(y_test_pred_list, axis=0)
 
-        if model_type == "classification":
-            # Merge lists of prediction probabilities into one list
-            y_test_prob = np.concatenate(y_test_prob_list, axis=0)
+            if model_type == "classification":
+                # Merge lists of prediction probabilities into one list
+                y_test_prob = np.concatenate(y_test_prob_list, axis=0)
 
     # If just regular train/test split has been applied
     else:
+        _, model_params = budget_n_jobs(
+            1, 1, model_name, model_params, n_concurrent_models
+        )
         clf = train_model(X_train, y_train, model_params, model_type, model_name)
 
         # Discrete prediction
@@ -177,17 +305,17 @@ def make_model(
             # Probability prediction
             y_test_pred, y_test_prob = predict(clf, X_test, model_type)
 
-    # Train model one last time on all samples (upsampled)
-    logger.info("Train final model on all data")
+        # Train model one last time on all samples (upsampled)
+        logger.info("Train final model on all data")
 
-    # Check if model needs to be calibrated
-    if post_params["calibration"] != "false":
-        X_all, X_cal, y_all, y_cal = train_test_split(
-            X_all, y_all, test_size=0.2, random_state=123
-        )
+        # Check if model needs to be calibrated
+        if post_params["calibration"] != "false":
+            X_all, X_cal, y_all, y_cal = train_test_split(
+                X_all, y_all, test_size=0.2, random_state=123
+            )
 
-    # Train final model
-    clf = train_model(X_all, y_all, model_params, model_type, model_name)
+        # Train final model
+        clf = train_model(X_all, y_all, model_params, model_type, model_name)
 
     # Save in dict
     model_dict["final"] = clf
@@ -238,40 +366,54 @@ def make_model(
             # Probability predictions
             y_all_pred, y_all_prob = predict(cal_clf, X_all, model_type)
 
-    # Concatenate y_train, X_test, and X_train into single lists
-    y_test_concat = np.concatenate(y_test, axis=0)
-    y_train_concat = np.concatenate(y_train, axis=0)
-    X_test_concat = np.concatenate(X_test, axis=0)
-    X_train_concat = np.concatenate(X_train, axis=0)
-
     post_datasets = {
-        "X_test_list": X_test,
-        "X_train_list": X_train,
-        "X_test_concat": X_test_concat,
-        "X_train_concat": X_train_concat,
         "X_all": X_all,
-        "y_train_list": y_train,
-        "y_train_concat": y_train_concat,
         "y_all": y_all,
         "y_all_pred": y_all_pred,
-        "y_test_concat": y_test_concat,
-        "y_test_pred": y_test_pred,
-        "y_test_list": y_test,
     }
-
     if model_type == "classification":
         post_datasets["y_all_prob"] = y_all_prob
-        post_datasets["y_test_prob"] = y_test_prob
-        post_datasets["y_test_prob_list"] = y_test_prob_list
+
+    if cross_validate:
+        # Test targets per fold (only a single column) and concatenated into a single list
+        y_test = list(y_test)
+        post_datasets["y_test_concat"] = np.concatenate(y_test, axis=0)
+        post_datasets["y_test_pred"] = y_test_pred
+        post_datasets["y_test_list"] = y_test
+
+        if model_type == "classification":
+            post_datasets["y_test_prob"] = y_test_prob
+            post_datasets["y_test_prob_list"] = y_test_prob_list
+
+    # Numeric metrics are saved for every artifact profile, the plots add theirs
+    collector = MetricsCollector()
+    collectPerformanceMetrics(
+        collector,
+        model_dict["final"],
+        model_type,
+        post_datasets,
+        data_types=["train", "test"] if cross_validate else ["train"],
+    )
 
     # Performance and other post modeling plots
-    try:
-        postModellingPlots(
-            model_dict, model_name, model_type, given_name, post_datasets, post_params
-        )
-    except Exception as e:
-        logger.error(f"Error generating post-modeling plots: {e}")
-        raise
+    if profile != "full":
+        logger.info(f"Skipping post modeling plots for the {profile} artifact profile")
+    else:
+        try:
+            postModellingPlots(
+                model_dict,
+                model_name,
+                model_type,
+                given_name,
+                post_datasets,
+                post_params,
+                collector=collector,
+            )
+        except Exception as e:
+            logger.error(f"Error generating post-modeling plots: {e}")
+            raise
+
+    collector.save(given_name)
 
     return clf
 
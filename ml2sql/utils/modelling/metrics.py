@@ -0,0 +1,312 @@
+import json
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import (
+    accuracy_score,
+    average_precision_score,
+    brier_score_loss,
+    explained_variance_score,
+    log_loss,
+    max_error,
+    mean_absolute_error,
+    mean_absolute_percentage_error,
+    mean_squared_error,
+    mean_squared_log_error,
+    median_absolute_error,
+    r2_score,
+    roc_auc_score,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _safe(metric, *args, **kwargs):
+    # Undefined metrics (e.g. AUC with a single class present) are reported as None
+    try:
+        return float(metric(*args, **kwargs))
+    except ValueError:
+        return None
+
+
+def classificationMetrics(y_true, y_pred, y_prob, classes):
+    """
+    Numeric performance metrics of a classification model.
+
+    Parameters
+    ----------
+    y_true : array-like
+        The true classes.
+    y_pred : array-like
+        The predicted classes.
+    y_prob : numpy.ndarray
+        The predicted probabilities, of the positive class only (1d) for binary
+        classification or one column per class.
+    classes : list
+        The classes of the model, in the order of the y_prob columns.
+
+    Returns
+    -------
+    dict
+        Metric name to value, ROC AUC and average precision per class (one vs rest)
+        for multiclass classification.
+    """
+    y_true = np.asarray(y_true)
+    y_prob = np.asarray(y_prob)
+
+    metrics = {
+        "n_rows": int(len(y_true)),
+        "accuracy": _safe(accuracy_score, y_true, y_pred),
+    }
+
+    if y_prob.ndim == 1:
+        metrics["log_loss"] = _safe(
+            log_loss, y_true, np.column_stack([1 - y_prob, y_prob]), labels=classes
+        )
+        metrics["brier_score"] = _safe(brier_score_loss, y_true == classes[1], y_prob)
+        metrics["roc_auc"] = _safe(roc_auc_score, y_true == classes[1], y_prob)
+        metrics["average_precision"] = _safe(
+            average_precision_score, y_true == classes[1], y_prob
+        )
+    else:
+        metrics["log_loss"] = _safe(log_loss, y_true, y_prob, labels=classes)
+        for i, c in enumerate(classes):
+            metrics[f"roc_auc_class_{c}"] = _safe(
+                roc_auc_score, y_true == c, y_prob[:, i]
+            )
+            metrics[f"average_precision_class_{c}"] = _safe(
+                average_precision_score, y_true == c, y_prob[:, i]
+            )
+
+    return metrics
+
+
+def regressionMetrics(y_true, y_pred, n_features=None):
+    """
+    Numeric performance metrics of a regression model.
+
+    Parameters
+    ----------
+    y_true : array-like
+        The true target values.
+    y_pred : array-like
+        The predicted values.
+    n_features : int, optional
+        Number of model features, used for the adjusted R2, by default None.
+
+    Returns
+    -------
+    dict
+        Metric name to value.
+    """
+    y_true = np.asarray(y_true, dtype=float)
+    y_pred = np.asarray(y_pred, dtype=float)
+    n = len(y_true)
+
+    mse = mean_squared_error(y_true, y_pred)
+    msle = mean_squared_log_error(np.clip(y_true, 0, None), np.clip(y_pred, 0, None))
+    r2 = _safe(r2_score, y_true, y_pred)
+
+    metrics = {
+        "n_rows": int(n),
+        "mae": float(mean_absolute_error(y_true, y_pred)),
+        "mse": float(mse),
+        "rmse": float(mse**0.5),
+        "r2": r2,
+        "mape": float(mean_absolute_percentage_error(y_true, y_pred)),
+        "explained_variance": _safe(explained_variance_score, y_true, y_pred),
+        "max_error": float(max_error(y_true, y_pred)),
+        "median_absolute_error": float(median_absolute_error(y_true, y_pred)),
+        "msle": float(msle),
+        "rmsle": float(msle**0.5),
+    }
+    if (n_features is not None) and (r2 is not None) and (n - n_features - 1 > 0):
+        metrics["adj_r2"] = float(1 - (1 - r2) * (n - 1) / (n - n_features - 1))
+    return metrics
+
+
+class MetricsCollector:
+    """
+    Collects numeric metrics per data set, as aggregate or per cross validation fold.
+
+    The performance functions report the metrics they compute into the collector, so
+    they are available without rendering (or reading) any plot. Recording a metric
+    again for the same data set and fold replaces the earlier value.
+    """
+
+    def __init__(self):
+        self._values = {}
+
+    def record(self, dataset, metric, value, fold=None):
+        """
+        Record a single metric value.
+
+        Parameters
+        ----------
+        dataset : str
+            Name of the data set (e.g. 'train', 'test' or 'test_class_1').
+        metric : str
+            Name of the metric.
+        value : float or None
+            The value, None when undefined.
+        fold : int, optional
+            Cross validation fold, None for the aggregate over all rows, by default None.
+        """
+        if isinstance(value, (int, np.integer)):
+            value = int(value)
+        elif value is not None:
+            value = float(value)
+            if not np.isfinite(value):
+                value = None
+        self._values[(dataset, None if fold is None else int(fold), metric)] = value
+
+    def record_all(self, dataset, metrics, fold=None):
+        """
+        Record all metrics of a dictionary, see record.
+        """
+        for metric, value in metrics.items():
+            self.record(dataset, metric, value, fold=fold)
+
+    def to_frame(self):
+        """
+        All recorded metrics in long format.
+
+        Returns
+        -------
+        pandas.DataFrame
+            Columns dataset, fold (missing for aggregates), metric and value.
+        """
+        df = pd.DataFrame(
+            [
+                (dataset, fold, metric, value)
+                for (dataset, fold, metric), value in self._values.items()
+            ],
+            columns=["dataset", "fold", "metric", "value"],
+        )
+        return df.astype({"fold": "Int64", "value": "float64"})
+
+    def to_dict(self):
+        """
+        All recorded metrics, nested per data set.
+
+        Returns
+        -------
+        dict
+            {dataset: {'aggregate': {metric: value}, 'folds': [{metric: value}, ...]}}
+        """
+        result = {}
+        for (dataset, fold, metric), value in self._values.items():
+            entry = result.setdefault(dataset, {"aggregate": {}, "folds": []})
+            if fold is None:
+                entry["aggregate"][metric] = value
+            else:
+                while len(entry["folds"]) <= fold:
+                    entry["folds"].append({})
+                entry["folds"][fold][metric] = value
+        return result
+
+    def save(self, given_name):
+        """
+        Save the metrics as metrics.json and metrics.parquet in the performance folder.
+
+        The Parquet file requires pyarrow, without it only the JSON file is written.
+
+        Parameters
+        ----------
+        given_name : str
+            The folder of the model.
+
+        Returns
+        -------
+        pathlib.Path
+            Path of the JSON file.
+        """
+        output_path = saveMetrics(given_name, self.to_dict())
+        try:
+            self.to_frame().to_parquet(output_path.with_suffix(".parquet"), index=False)
+        except ImportError:
+            logger.warning("pyarrow is not installed, metrics not saved as Parquet")
+        return output_path
+
+
+def collectPerformanceMetrics(collector, clf, model_type, post_datasets, data_types):
+    """
+    Record the numeric metrics of the final model (train) and cross validation (test).
+
+    Test metrics are recorded for all predictions together and per fold.
+
+    Parameters
+    ----------
+    collector : MetricsCollector
+        Collector to record the metrics in.
+    clf : object
+        The final trained model.
+    model_type : str
+        'classification' or 'regression'.
+    post_datasets : dict
+        The (predicted) targets as created by make_model.
+    data_types : list of str
+        Which metrics to compute, 'train' and/or 'test'.
+    """
+
+    def _metrics(y_true, y_pred, y_prob):
+        if model_type == "classification":
+            return classificationMetrics(y_true, y_pred, y_prob, list(clf.classes_))
+        return regressionMetrics(
+            y_true, y_pred, n_features=post_datasets["X_all"].shape[1]
+        )
+
+    if "train" in data_types:
+        collector.record_all(
+            "train",
+            _metrics(
+                post_datasets["y_all"],
+                post_datasets["y_all_pred"],
+                post_datasets.get("y_all_prob"),
+            ),
+        )
+
+    if "test" in data_types:
+        collector.record_all(
+            "test",
+            _metrics(
+                post_datasets["y_test_concat"],
+                post_datasets["y_test_pred"],
+                post_datasets.get("y_test_prob"),
+            ),
+        )
+
+        # Predictions are concatenated in fold order
+        y_test_list = post_datasets["y_test_list"]
+        split_ix = np.cumsum([len(y) for y in y_test_list])[:-1]
+        y_pred_list = np.split(np.asarray(post_datasets["y_test_pred"]), split_ix)
+        y_prob_list = post_datasets.get("y_test_prob_list", [None] * len(y_test_list))
+        for fold_id, (y_true, y_pred, y_prob) in enumerate(
+            zip(y_test_list, y_pred_list, y_prob_list)
+        ):
+            collector.record_all("test", _metrics(y_true, y_pred, y_prob), fold=fold_id)
+
+
+def saveMetrics(given_name, metrics):
+    """
+    Save metrics as JSON in the performance folder of the model.
+
+    Parameters
+    ----------
+    given_name : str
+        The folder of the model.
+    metrics : dict
+        The metrics to save.
+
+    Returns
+    -------
+    pathlib.Path
+        Path of the saved file.
+    """
+    output_path = Path(given_name) / "performance" / "metrics.json"
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_text(json.dumps(metrics, indent=2))
+    logger.info(f"Saved performance metrics in {output_path}")
+    return output_path
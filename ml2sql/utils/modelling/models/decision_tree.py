@@ -3,6 +3,7 @@ import pandas as pd
 import numpy as np
 import plotly.express as px
 import logging
+from ml2sql.utils.helper_functions.figure_export import write_image
 
 logger = logging.getLogger(__name__)
 
@@ -103,7 +104,7 @@ def featureImportanceSave(clf, given_name, file_type):
     )
 
     if file_type == "png":
-        plotly_fig.write_image(f"{given_name}/gini_feature_importance.png")
+        write_image(plotly_fig, f"{given_name}/gini_feature_importance.png")
     elif file_type == "html":
         plotly_fig.write_html(f"{given_name}/gini_feature_importance.html")
 
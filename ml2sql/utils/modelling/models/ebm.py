@@ -3,6 +3,7 @@ from interpret.glassbox import (
     ExplainableBoostingRegressor,
 )
 import logging
+from ml2sql.utils.helper_functions.figure_export import write_image
 
 logger = logging.getLogger(__name__)
 
@@ -103,10 +104,11 @@ def featureExplanationSave(clf, given_name, file_type):
     plotly_fig = clf_global.visualize()
 
     if file_type == "png":
-        plotly_fig.write_image(
+        write_image(
+            plotly_fig,
             "{given_name}/1_overall_feature_importance.png".format(
                 given_name=given_name
-            )
+            ),
         )
     elif file_type == "html":
         plotly_fig.write_html(
@@ -134,7 +136,7 @@ def featureExplanationSave(clf, given_name, file_type):
                 feature_name = feature_name.replace(c, "_")
 
         if file_type == "png":
-            plotly_fig.write_image(f"{given_name}/explain_{feature_name}.png")
+            write_image(plotly_fig, f"{given_name}/explain_{feature_name}.png")
         elif file_type == "html":
             # or as html file
             plotly_fig.write_html(f"{given_name}/explain_{feature_name}.html")
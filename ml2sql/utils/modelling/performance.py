@@ -10,28 +10,52 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from sklearn.calibration import calibration_curve
 from sklearn.metrics import brier_score_loss
-from sklearn.metrics import classification_report
-from sklearn.metrics import (
-    mean_absolute_error,
-    mean_squared_error,
-    r2_score,
-    mean_absolute_percentage_error,
-    explained_variance_score,
-    max_error,
-    median_absolute_error,
-    mean_squared_log_error,
-)
 
 # The actual algorithms (grey as we refer to them dynamically)
 from ml2sql.utils.modelling.models import ebm  # noqa: F401
 from ml2sql.utils.modelling.models import decision_tree  # noqa: F401
 from ml2sql.utils.modelling.models import l_regression  # noqa: F401
+from ml2sql.utils.modelling.metrics import regressionMetrics
+from ml2sql.utils.helper_functions.figure_export import (
+    figure_export_pool,
+    wait_for_figures,
+    write_image,
+)
 
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+def recordFoldMetric(collector, data_type, metric, values, per_fold):
+    """
+    Record a metric computed by a plot, per fold with the mean over the folds, or for
+    all rows at once.
+
+    Parameters
+    ----------
+    collector : MetricsCollector or None
+        Collector to record the metric in, nothing is recorded when None.
+    data_type : str
+        Name of the data set the plot is made for.
+    metric : str
+        Name of the metric.
+    values : list of float
+        The value per fold, or a single value for all rows.
+    per_fold : bool
+        Whether the values are per cross validation fold.
+    """
+    if collector is None:
+        return
+
+    if per_fold:
+        for fold_id, value in enumerate(values):
+            collector.record(data_type, metric, value, fold=fold_id)
+        collector.record(data_type, f"{metric}_fold_mean", np.mean(values))
+    else:
+        collector.record(data_type, metric, values[0])
+
+
 def plotConfusionMatrixStatic(given_name, y_true, y_pred, data_type):
     from sklearn.metrics import ConfusionMatrixDisplay
 
@@ -47,86 +71,170 @@ def plotConfusionMatrixStatic(given_name, y_true, y_pred, data_type):
     logger.info(f"Created and saved confusion matrix for {data_type} data")
 
 
+def thresholdConfusionCounts(y_true, y_prob, thresholds):
+    """
+    Count true/false positives/negatives for many thresholds in a single pass.
+
+    A sample is predicted positive when its probability is strictly greater than the threshold.
+    The probabilities are sorted once, after which every threshold is a binary search, so the
+    cost is O(n log n + k log n) for n samples and k thresholds.
+
+    Parameters
+    ----------
+    y_true : array-like of shape (n_samples,)
+        True binary labels (0 and 1).
+    y_prob : array-like of shape (n_samples,)
+        Predicted probabilities of the positive class.
+    thresholds : array-like of shape (n_thresholds,)
+        Thresholds to evaluate.
+
+    Returns
+    -------
+    dict
+        Arrays of shape (n_thresholds,) with keys 'tp', 'fp', 'tn' and 'fn'.
+    """
+    y_true = np.asarray(y_true) == 1
+    y_prob = np.asarray(y_prob, dtype=float)
+    thresholds = np.asarray(thresholds, dtype=float)
+
+    order = np.argsort(y_prob, kind="mergesort")
+    prob_sorted = y_prob[order]
+    positives_below = np.concatenate(([0], np.cumsum(y_true[order])))
+
+    # Number of samples predicted negative (probability <= threshold)
+    n_neg_pred = np.searchsorted(prob_sorted, thresholds, side="right")
+
+    fn = positives_below[n_neg_pred]
+    tn = n_neg_pred - fn
+    tp = y_true.sum() - fn
+    fp = (len(y_prob) - n_neg_pred) - tp
+
+    return {"tp": tp, "fp": fp, "tn": tn, "fn": fn}
+
+
+def thresholdClassificationReport(y_true, y_prob, thresholds):
+    """
+    Precision, recall, F1-score and support per class for many thresholds at once.
+
+    Mirrors sklearn's `classification_report` (with `zero_division=0`) for binary problems,
+    but is computed from the cumulative counts of `thresholdConfusionCounts`.
+
+    Parameters
+    ----------
+    y_true : array-like of shape (n_samples,)
+        True binary labels (0 and 1).
+    y_prob : array-like of shape (n_samples,)
+        Predicted probabilities of the positive class.
+    thresholds : array-like of shape (n_thresholds,)
+        Thresholds to evaluate.
+
+    Returns
+    -------
+    dict
+        Per label ('0', '1', 'macro avg', 'weighted avg') a dict with 'precision', 'recall',
+        'f1-score' and 'support' arrays, plus an 'accuracy' array.
+    """
+    counts = thresholdConfusionCounts(y_true, y_prob, thresholds)
+    tp, fp, tn, fn = counts["tp"], counts["fp"], counts["tn"], counts["fn"]
+    n = tp + fp + tn + fn
+
+    def _divide(numerator, denominator):
+        numerator = np.asarray(numerator, dtype=float)
+        denominator = np.asarray(denominator, dtype=float)
+        return np.divide(
+            numerator,
+            denominator,
+            out=np.zeros_like(numerator),
+            where=denominator > 0,
+        )
+
+    labels = [str(label) for label in np.unique(y_true)]
+    report = {}
+    for label, (hit, false_hit, miss) in zip(labels, [(tn, fn, fp), (tp, fp, fn)]):
+        report[label] = {
+            "precision": _divide(hit, hit + false_hit),
+            "recall": _divide(hit, hit + miss),
+            "f1-score": _divide(2 * hit, 2 * hit + false_hit + miss),
+            "support": hit + miss,
+        }
+
+    report["accuracy"] = _divide(tp + tn, n)
+
+    for avg in ["macro avg", "weighted avg"]:
+        report[avg] = {}
+        for metric in ["precision", "recall", "f1-score"]:
+            if avg == "macro avg":
+                value = np.mean([report[label][metric] for label in labels], axis=0)
+            else:
+                value = _divide(
+                    np.sum(
+                        [
+                            report[label][metric] * report[label]["support"]
+                            for label in labels
+                        ],
+                        axis=0,
+                    ),
+                    n,
+                )
+            report[avg][metric] = value
+        report[avg]["support"] = n
+
+    return report
+
+
 # Mainly meant for binary classification
-def plotConfusionMatrixSlider(given_name, y_true, y_prob, data_type):
+def plotConfusionMatrixSlider(given_name, y_true, y_prob, data_type, thresholds=None):
     conf_matrices = []
     steps = []
 
-    threshold_list = np.arange(0.0, 1.05, 0.05)
+    if thresholds is None:
+        threshold_list = np.arange(0.0, 1.05, 0.05)
+    else:
+        threshold_list = np.asarray(thresholds, dtype=float)
 
-    for threshold in threshold_list:
-        y_pred = [1 if x > threshold else 0 for x in y_prob]
+    # Compute counts and metrics for all thresholds in one go
+    counts = thresholdConfusionCounts(y_true, y_prob, threshold_list)
+    report = thresholdClassificationReport(y_true, y_prob, threshold_list)
+    n = len(y_prob)
 
-        df = pd.DataFrame({"y_true": y_true, "y_pred": y_pred})
+    # Formatting options
+    precision_format = "{:.3f}"
+    integer_format = "{:d}"
 
-        # confusion matrix
-        cm = []
-        for p in [0, 1]:
-            new_row = []
-            for a in [1, 0]:
-                new_row.append(
-                    len(df[(df["y_pred"] == p) & (df["y_true"] == a)]) / len(y_pred)
-                )
-            cm.append(new_row)
+    # Threshold closest to 0.5 is shown initially
+    active_step = int(np.argmin(np.abs(threshold_list - 0.5)))
+
+    for step_nr, threshold in enumerate(threshold_list):
+        # confusion matrix (rows predicted 0/1, columns actual 1/0)
+        cm = [
+            [counts["fn"][step_nr] / n, counts["tn"][step_nr] / n],
+            [counts["tp"][step_nr] / n, counts["fp"][step_nr] / n],
+        ]
 
         # Add to list of matrices
         conf_matrices.append(cm)
 
-        # Create sklearn summary report
-        report = classification_report(
-            y_true, y_pred, output_dict=True, zero_division=0
-        )
-
         # Create a list of lists for the matrix
         metrics_matrix = []
-
-        # Iterate over the keys and values in the summary report dictionary
         for key, value in report.items():
             if key == "accuracy":
                 metrics_matrix.append(["", "", "", "", ""])
-                metrics_matrix.append(["Accuracy", "", "", value, ""])
-            elif key.startswith(("macro", "weighted")):
+                metrics_matrix.append(
+                    ["Accuracy", "", "", precision_format.format(value[step_nr]), ""]
+                )
+            else:
                 metrics_matrix.append(
                     [
-                        key.capitalize(),
-                        value["precision"],
-                        value["recall"],
-                        value["f1-score"],
-                        value["support"],
+                        key.capitalize() if key.endswith(" avg") else key,
+                        precision_format.format(value["precision"][step_nr]),
+                        precision_format.format(value["recall"][step_nr]),
+                        precision_format.format(value["f1-score"][step_nr]),
+                        integer_format.format(int(value["support"][step_nr])),
                     ]
                 )
-            else:
-                row = [
-                    key,
-                    value["precision"],
-                    value["recall"],
-                    value["f1-score"],
-                    value["support"],
-                ]
-                metrics_matrix.append(row)
-
-        # Formatting options
-        precision_format = "{:.3f}"
-        integer_format = "{:d}"
-        empty_string_format = ""
-
-        # Format the matrix elements
-        formatted_matrix = []
-        for row in metrics_matrix:
-            formatted_row = [
-                precision_format.format(cell)
-                if isinstance(cell, float)
-                else integer_format.format(cell)
-                if isinstance(cell, int)
-                else empty_string_format
-                if cell == ""
-                else cell
-                for cell in row
-            ]
-            formatted_matrix.append(formatted_row)
 
         # transpose matrix
-        metrics = list(zip(*formatted_matrix))
+        metrics = list(zip(*metrics_matrix))
 
         # Add values to the different steps
         steps.append(
@@ -139,11 +247,11 @@ def plotConfusionMatrixSlider(given_name, y_true, y_prob, data_type):
                         "cells.values": [metrics],
                     }
                 ],
-                label=round(threshold, 2),
+                label=round(threshold, 3),
             )
         )
 
-        if threshold == 0.5:
+        if step_nr == active_step:
             conf_matrix = cm
             table_metrics = metrics
 
@@ -200,7 +308,7 @@ def plotConfusionMatrixSlider(given_name, y_true, y_prob, data_type):
 
     sliders = [
         dict(
-            active=10,
+            active=active_step,
             currentvalue={"prefix": "Threshold: "},
             pad={"t": 50},  # sort it out later
             steps=steps,
@@ -218,18 +326,22 @@ def plotConfusionMatrixSlider(given_name, y_true, y_prob, data_type):
     logger.info(f"Created and saved confusion matrix for {data_type} data")
 
 
-def plotConfusionMatrix(given_name, y_true, y_prob, y_pred, file_type, data_type):
+def plotConfusionMatrix(
+    given_name, y_true, y_prob, y_pred, file_type, data_type, thresholds=None
+):
     # If html is wanted and binary classification
     # Make confusion matrix plot with slider
     if (file_type == "html") & (len(set(y_true)) == 2):
-        plotConfusionMatrixSlider(given_name, y_true, y_prob, data_type)
+        plotConfusionMatrixSlider(given_name, y_true, y_prob, data_type, thresholds)
 
     # Otherwise make 'simple' static confusion matrix plot
     else:
         plotConfusionMatrixStatic(given_name, y_true, y_pred, data_type)
 
 
-def plotClassificationCurve(given_name, y_true, y_prob, curve_type, data_type):
+def plotClassificationCurve(
+    given_name, y_true, y_prob, curve_type, data_type, collector=None
+):
     """
     Plots the ROC or Precision-Recall curve for a binary classification model, and saves the plot image.
 
@@ -245,6 +357,8 @@ def plotClassificationCurve(given_name, y_true, y_prob, curve_type, data_type):
         Type of curve to plot. Either 'ROC' for Receiver Operating Characteristic curve, or 'PR' for Precision-Recall curve.
     data_type : str
         Type of data being plotted. This string is included in the plot title.
+    collector : MetricsCollector, optional
+        Collector to record the AUC (per fold) in.
 
     Returns:
     --------
@@ -339,6 +453,10 @@ def plotClassificationCurve(given_name, y_true, y_prob, curve_type, data_type):
         auc_list.append(auc(xVar, yVar))
         fig.add_trace(go.Scatter(x=xVar, y=yVar, mode="lines", name="Fitted model"))
 
+    recordFoldMetric(
+        collector, data_type, f"{curve_}_auc", auc_list, isinstance(y_prob, list)
+    )
+
     # add (average) auc in image
     fig.add_annotation(
         x=0.5, y=0, text=f"Mean AUC: {np.mean(auc_list)}", showarrow=False, yshift=10
@@ -348,14 +466,14 @@ def plotClassificationCurve(given_name, y_true, y_prob, curve_type, data_type):
         Path(given_name) / "performance" / f"{data_type}_{curve_type}_plot.png"
     )
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    fig.write_image(output_path)
+    write_image(fig, output_path)
 
     logger.info(f"Created and saved {curve_type} plot for {data_type} data")
 
     return np.mean(auc_list)
 
 
-def plotCalibrationCurve(given_name, y_true, y_prob, data_type):
+def plotCalibrationCurve(given_name, y_true, y_prob, data_type, collector=None):
     """
     Plot the calibration curve for a set of true and predicted values.
 
@@ -369,6 +487,8 @@ def plotCalibrationCurve(given_name, y_true, y_prob, data_type):
         The predicted probabilities of target.
     data_type : str
         The type of the given data (train or test).
+    collector : MetricsCollector, optional
+        Collector to record the Brier score loss (per fold) in.
 
     Returns
     -------
@@ -457,6 +577,10 @@ def plotCalibrationCurve(given_name, y_true, y_prob, data_type):
             )
         )
 
+    recordFoldMetric(
+        collector, data_type, "brier_score", bsl_list, isinstance(y_prob, list)
+    )
+
     # add (average) auc in image
     fig.add_annotation(
         x=0.5,
@@ -468,7 +592,7 @@ def plotCalibrationCurve(given_name, y_true, y_prob, data_type):
 
     output_path = Path(given_name) / "performance" / f"{data_type}_calibration_plot.png"
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    fig.write_image(output_path)
+    write_image(fig, output_path)
 
     logger.info(f"Created and saved calibration plot for {data_type} data")
 
@@ -597,7 +721,7 @@ def plotProbabilityDistribution(given_name, y_true, y_prob, data_type):
         Path(given_name) / "performance" / f"{data_type}_distribution_plot.png"
     )
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    fig.write_image(output_path)
+    write_image(fig, output_path)
 
     logger.info("Created and saved probability distribution plot")
 
@@ -669,7 +793,7 @@ def plotDistribution(given_name, groups, values, data_type):
         Path(given_name) / "performance" / f"{data_type}_distribution_plot.png"
     )
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    fig.write_image(output_path)
+    write_image(fig, output_path)
 
     logger.info("Created and saved probability distribution plot")
 
@@ -707,7 +831,7 @@ def plotYhatVsYSave(given_name, y_true, y_pred, data_type):
         Path(given_name) / "performance" / f"{data_type}_scatter_yhat_vs_y.png"
     )
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    fig.write_image(output_path)
+    write_image(fig, output_path)
 
     logger.info(f"Scatter plot of yhat vs y saved for {data_type}")
 
@@ -738,27 +862,18 @@ def plotQuantileError(given_name, y_true, y_pred, data_type):
         Path(given_name) / "performance" / f"{data_type}_quantile_error_plot.png"
     )
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    fig.write_image(output_path)
+    write_image(fig, output_path)
 
     logger.info(f"Quantile error plot saved for {data_type}")
 
 
-def regressionMetricsTable(given_name, y_true, y_pred, X_all, data_type):
-    y_true_pos = np.clip(y_true, 0, None)
-    y_pred_pos = np.clip(y_pred, 0, None)
-
+def regressionMetricsTable(
+    given_name, y_true, y_pred, X_all, data_type, collector=None
+):
     # Calculate metrics
-    mae = mean_absolute_error(y_true, y_pred)
-    mse = mean_squared_error(y_true, y_pred)
-    rmse = mse**0.5
-    r2 = r2_score(y_true, y_pred)
-    adj_r2 = 1 - (1 - r2) * (len(y_true) - 1) / (len(y_true) - X_all.shape[1] - 1)
-    mape = mean_absolute_percentage_error(y_true, y_pred)
-    evs = explained_variance_score(y_true, y_pred)
-    me = max_error(y_true, y_pred)
-    medae = median_absolute_error(y_true, y_pred)
-    msle = mean_squared_log_error(y_true_pos, y_pred_pos)
-    rmsle_value = msle**0.5
+    metrics = regressionMetrics(y_true, y_pred, n_features=X_all.shape[1])
+    if collector is not None:
+        collector.record_all(data_type, metrics)
 
     header = ["Metric"]
 
@@ -784,17 +899,20 @@ def regressionMetricsTable(given_name, y_true, y_pred, X_all, data_type):
 
     # Add metrics data
     metric_values = [
-        [mae],
-        [mse],
-        [rmse],
-        [r2],
-        [adj_r2],
-        [mape],
-        [evs],
-        [me],
-        [medae],
-        [msle],
-        [rmsle_value],
+        [metrics.get(name)]
+        for name in [
+            "mae",
+            "mse",
+            "rmse",
+            "r2",
+            "adj_r2",
+            "mape",
+            "explained_variance",
+            "max_error",
+            "median_absolute_error",
+            "msle",
+            "rmsle",
+        ]
     ]
 
     metric_names = [row for row in rows]
@@ -821,7 +939,7 @@ def regressionMetricsTable(given_name, y_true, y_pred, X_all, data_type):
         Path(given_name) / "performance" / f"{data_type}_regression_metrics.png"
     )
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    fig.write_image(output_path)
+    write_image(fig, output_path)
 
     logger.info("Created and saved regression metrics table")
 
@@ -888,13 +1006,20 @@ def plotDistributionViolin(given_name, feature_name, groups, values, data_type):
         Path(given_name) / "feature_info" / f"{feature_name}_distributions.png"
     )
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    fig.write_image(output_path)
+    write_image(fig, output_path)
 
     logger.info("Created and saved feature distribution plot")
 
 
 def modelPerformancePlots(
-    clf, model_name, model_type, given_name, data_type, post_datasets, post_params
+    clf,
+    model_name,
+    model_type,
+    given_name,
+    data_type,
+    post_datasets,
+    post_params,
+    collector=None,
 ):
     # Performance and other post modeling plots
     # unpack dict
@@ -906,6 +1031,12 @@ def modelPerformancePlots(
     )
     y_test_list = post_datasets["y_test_list"]
 
+    # Optional finer threshold grid for the confusion matrix slider
+    if "threshold_steps" in post_params:
+        thresholds = np.linspace(0, 1, int(post_params["threshold_steps"]) + 1)
+    else:
+        thresholds = None
+
     if model_type == "classification":
         # probabilities only for classifications
         y_test_prob, y_all_prob, y_test_prob_list = (
@@ -923,6 +1054,7 @@ def modelPerformancePlots(
                 y_test_pred,
                 post_params["file_type"],
                 data_type=data_type,
+                thresholds=thresholds,
             )
 
         elif data_type == "train":
@@ -933,6 +1065,7 @@ def modelPerformancePlots(
                 y_all_pred,
                 post_params["file_type"],
                 data_type=data_type,
+                thresholds=thresholds,
             )
 
         if len(clf["final"].classes_) == 2:
@@ -951,6 +1084,7 @@ def modelPerformancePlots(
                     y_test_prob_list,
                     curve_type="roc",
                     data_type=data_type,
+                    collector=collector,
                 )
 
                 plotClassificationCurve(
@@ -959,6 +1093,7 @@ def modelPerformancePlots(
                     y_test_prob_list,
                     curve_type="pr",
                     data_type=f"{data_type}_class_1",
+                    collector=collector,
                 )
                 plotClassificationCurve(
                     given_name,
@@ -966,6 +1101,7 @@ def modelPerformancePlots(
                     y_test_prob_list_neg,
                     curve_type="pr",
                     data_type=f"{data_type}_class_0",
+                    collector=collector,
                 )
 
                 plotCalibrationCurve(
@@ -973,6 +1109,7 @@ def modelPerformancePlots(
                     y_test_list,
                     y_test_prob_list,
                     data_type=data_type,
+                    collector=collector,
                 )
 
                 plotProbabilityDistribution(
@@ -989,6 +1126,7 @@ def modelPerformancePlots(
                     y_all_prob,
                     curve_type="roc",
                     data_type=data_type,
+                    collector=collector,
                 )
 
                 plotClassificationCurve(
@@ -997,6 +1135,7 @@ def modelPerformancePlots(
                     y_all_prob,
                     curve_type="pr",
                     data_type=f"{data_type}_class_1",
+                    collector=collector,
                 )
 
                 plotClassificationCurve(
@@ -1005,9 +1144,16 @@ def modelPerformancePlots(
                     y_all_prob_neg,
                     curve_type="pr",
                     data_type=f"{data_type}_class_0",
+                    collector=collector,
                 )
 
-                plotCalibrationCurve(given_name, y_all, y_all_prob, data_type=data_type)
+                plotCalibrationCurve(
+                    given_name,
+                    y_all,
+                    y_all_prob,
+                    data_type=data_type,
+                    collector=collector,
+                )
 
                 plotProbabilityDistribution(
                     given_name, y_all, y_all_prob, data_type=data_type
@@ -1051,6 +1197,7 @@ def modelPerformancePlots(
                         y_test_prob_list_ova,
                         curve_type="roc",
                         data_type=f"{data_type}_class_{c}",
+                        collector=collector,
                     )
 
                     # plotClassificationCurve(given_name, y_all_ova, y_all_prob_ova, curve_type='pr', data_type='train_class1')
@@ -1060,6 +1207,7 @@ def modelPerformancePlots(
                         y_test_prob_list_ova,
                         curve_type="pr",
                         data_type=f"{data_type}_class_{c}",
+                        collector=collector,
                     )
 
                     # multiClassPlotCalibrationCurvePlotly(given_name, y_all, pd.DataFrame(y_all_prob, columns=clf['final'].classes_), title='fun')
@@ -1068,6 +1216,7 @@ def modelPerformancePlots(
                         y_test_list_ova,
                         y_test_prob_list_ova,
                         data_type=f"{data_type}_class_{c}",
+                        collector=collector,
                     )
 
                     # plotProbabilityDistribution(given_name, y_all_ova, y_all_prob_ova, data_type='train')
@@ -1091,6 +1240,7 @@ def modelPerformancePlots(
                 y_test_pred,
                 X_all,
                 data_type=data_type,
+                collector=collector,
             )
         elif data_type == "train":
             plotYhatVsYSave(given_name, y_all, y_all_pred, data_type=data_type)
@@ -1101,30 +1251,37 @@ def modelPerformancePlots(
                 y_all_pred,
                 X_all,
                 data_type=data_type,
+                collector=collector,
             )
 
 
 def postModellingPlots(
-    clf, model_name, model_type, given_name, post_datasets, post_params
+    clf, model_name, model_type, given_name, post_datasets, post_params, collector=None
 ):
-    # Create model performance plots for train and test data
-    for data_type in ["train", "test"]:
-        modelPerformancePlots(
-            clf,
-            model_name,
-            model_type,
-            given_name,
-            data_type,
-            post_datasets,
-            post_params,
-        )
+    # Figures are written by the export pool (if configured) while plotting continues
+    with figure_export_pool(int(post_params.get("figure_export_workers", 1))):
+        # Create model performance plots for train and test data
+        for data_type in ["train", "test"]:
+            modelPerformancePlots(
+                clf,
+                model_name,
+                model_type,
+                given_name,
+                data_type,
+                post_datasets,
+                post_params,
+                collector=collector,
+            )
 
-    # Post modeling plots, specific per model but includes feature importance among others
-    output_path = Path(given_name) / "feature_importance"
-    output_path.parent.mkdir(parents=True, exist_ok=True)
+        # Post modeling plots, specific per model but includes feature importance among others
+        output_path = Path(given_name) / "feature_importance"
+        output_path.parent.mkdir(parents=True, exist_ok=True)
 
-    globals()[model_name].postModelPlots(
-        clf["final"],
-        output_path,
-        post_params["file_type"],
-    )
+        globals()[model_name].postModelPlots(
+            clf["final"],
+            output_path,
+            post_params["file_type"],
+        )
+
+        # Only block on the queued figures once all plots are created
+        wait_for_figures()
@@ -0,0 +1,244 @@
+import numpy as np
+
+# Score bins used for the threshold independent metrics (ROC AUC and average precision),
+# exact as long as the scores do not differ less than 1 / N_SCORE_BINS
+N_SCORE_BINS = 10_000
+
+# Probabilities are clipped to avoid an infinite log loss
+EPS = 1e-15
+
+
+def _histogram_auc(pos_counts, neg_counts):
+    """
+    ROC AUC and average precision from positive and negative counts per score bin.
+
+    Parameters
+    ----------
+    pos_counts : numpy.ndarray
+        Number of positives per score bin (ascending scores).
+    neg_counts : numpy.ndarray
+        Number of negatives per score bin (ascending scores).
+
+    Returns
+    -------
+    tuple of float
+        ROC AUC and average precision, nan when only one class is present.
+    """
+    n_pos, n_neg = pos_counts.sum(), neg_counts.sum()
+    if n_pos == 0 or n_neg == 0:
+        return np.nan, np.nan
+
+    # Thresholds from high to low score, only bins containing rows
+    used = (pos_counts + neg_counts)[::-1] > 0
+    tp = np.cumsum(pos_counts[::-1])[used]
+    fp = np.cumsum(neg_counts[::-1])[used]
+
+    tpr = np.concatenate([[0], tp / n_pos])
+    fpr = np.concatenate([[0], fp / n_neg])
+    roc_auc = np.trapz(tpr, fpr)
+
+    precision = tp / (tp + fp)
+    average_precision = np.sum(np.diff(tpr) * precision)
+    return float(roc_auc), float(average_precision)
+
+
+def _merge_moments(n, moments, values):
+    """
+    Combine the mean and sum of squared deviations of n earlier values with a batch of
+    values (Chan et al.), numerically stable unlike summing squares.
+    """
+    if len(values) == 0:
+        return moments
+    mean, m2 = moments
+    batch_mean = values.mean()
+    batch_m2 = ((values - batch_mean) ** 2).sum()
+    total = n + len(values)
+    delta = batch_mean - mean
+    return (
+        mean + delta * len(values) / total,
+        m2 + batch_m2 + delta**2 * n * len(values) / total,
+    )
+
+
+class ClassificationMetrics:
+    """
+    Classification metrics accumulated over batches of predictions.
+
+    Parameters
+    ----------
+    classes : list
+        The classes of the model, in the order of the predict_proba columns.
+    n_bins : int, optional
+        Number of score bins for ROC AUC and average precision, by default N_SCORE_BINS.
+    """
+
+    def __init__(self, classes, n_bins=N_SCORE_BINS):
+        self.classes = list(classes)
+        self.n_bins = n_bins
+        self.n_rows = 0
+        self.confusion_matrix = np.zeros((len(classes), len(classes)), dtype=np.int64)
+        self.log_loss_sum = 0.0
+        self.brier_sum = 0.0
+        # Positive and negative counts per score bin for each class (one vs rest)
+        self.pos_counts = np.zeros((len(classes), n_bins), dtype=np.int64)
+        self.neg_counts = np.zeros((len(classes), n_bins), dtype=np.int64)
+
+    def update(self, y_true, y_prob):
+        """
+        Add a batch of predictions.
+
+        Parameters
+        ----------
+        y_true : array-like
+            The true classes of the batch.
+        y_prob : numpy.ndarray
+            The predicted class probabilities of the batch (n_rows x n_classes).
+        """
+        class_index = {c: i for i, c in enumerate(self.classes)}
+        true_ix = np.array([class_index.get(c, -1) for c in np.asarray(y_true)])
+        if (true_ix < 0).any():
+            unknown = set(np.asarray(y_true)[true_ix < 0])
+            raise ValueError(f"Target contains classes unknown to the model: {unknown}")
+
+        pred_ix = y_prob.argmax(axis=1)
+        np.add.at(self.confusion_matrix, (true_ix, pred_ix), 1)
+
+        rows = np.arange(len(true_ix))
+        self.log_loss_sum -= np.log(np.clip(y_prob[rows, true_ix], EPS, 1)).sum()
+
+        one_hot = np.zeros_like(y_prob)
+        one_hot[rows, true_ix] = 1
+        if len(self.classes) == 2:
+            # Binary brier score only uses the positive class probability
+            self.brier_sum += ((y_prob[:, 1] - one_hot[:, 1]) ** 2).sum()
+        else:
+            self.brier_sum += ((y_prob - one_hot) ** 2).sum()
+
+        bins = np.clip((y_prob * self.n_bins).astype(np.int64), 0, self.n_bins - 1)
+        for c in range(len(self.classes)):
+            is_pos = true_ix == c
+            self.pos_counts[c] += np.bincount(bins[is_pos, c], minlength=self.n_bins)
+            self.neg_counts[c] += np.bincount(bins[~is_pos, c], minlength=self.n_bins)
+
+        self.n_rows += len(true_ix)
+
+    def result(self):
+        """
+        The metrics over all batches added so far.
+
+        Returns
+        -------
+        dict
+            Metric name to value, with per class (one vs rest) ROC AUC and average
+            precision (only the positive class for binary classification).
+        """
+        metrics = {
+            "n_rows": int(self.n_rows),
+            "accuracy": float(np.trace(self.confusion_matrix) / self.n_rows),
+            "log_loss": float(self.log_loss_sum / self.n_rows),
+            "brier_score": float(self.brier_sum / self.n_rows),
+            "confusion_matrix": {
+                "labels": [str(c) for c in self.classes],
+                "counts": self.confusion_matrix.tolist(),
+            },
+        }
+
+        per_class = range(1, 2) if len(self.classes) == 2 else range(len(self.classes))
+        for c in per_class:
+            roc_auc, average_precision = _histogram_auc(
+                self.pos_counts[c], self.neg_counts[c]
+            )
+            suffix = "" if len(self.classes) == 2 else f"_class_{self.classes[c]}"
+            metrics[f"roc_auc{suffix}"] = roc_auc
+            metrics[f"average_precision{suffix}"] = average_precision
+
+        return metrics
+
+
+class RegressionMetrics:
+    """
+    Regression metrics accumulated over batches of predictions.
+
+    Metrics needing all errors at once (e.g. median absolute error) are not included.
+
+    Parameters
+    ----------
+    n_features : int, optional
+        Number of model features, used for the adjusted R2, by default None.
+    """
+
+    def __init__(self, n_features=None):
+        self.n_features = n_features
+        self.n_rows = 0
+        self.sums = dict.fromkeys(["error2", "abs_error", "ape", "log_error2"], 0.0)
+        # Mean and sum of squared deviations of the target and the error
+        self.y_moments = (0.0, 0.0)
+        self.error_moments = (0.0, 0.0)
+        self.max_error = 0.0
+
+    def update(self, y_true, y_pred):
+        """
+        Add a batch of predictions.
+
+        Parameters
+        ----------
+        y_true : array-like
+            The true target values of the batch.
+        y_pred : array-like
+            The predicted values of the batch.
+        """
+        y_true = np.asarray(y_true, dtype=float)
+        y_pred = np.asarray(y_pred, dtype=float)
+        error = y_true - y_pred
+
+        self.y_moments = _merge_moments(self.n_rows, self.y_moments, y_true)
+        self.error_moments = _merge_moments(self.n_rows, self.error_moments, error)
+        self.sums["error2"] += (error**2).sum()
+        self.sums["abs_error"] += np.abs(error).sum()
+        # Same definition as sklearn's mean_absolute_percentage_error
+        self.sums["ape"] += (
+            np.abs(error) / np.maximum(np.abs(y_true), np.finfo(float).eps)
+        ).sum()
+        log_error = np.log1p(np.clip(y_true, 0, None)) - np.log1p(
+            np.clip(y_pred, 0, None)
+        )
+        self.sums["log_error2"] += (log_error**2).sum()
+        if len(error):
+            self.max_error = max(self.max_error, float(np.abs(error).max()))
+        self.n_rows += len(y_true)
+
+    def result(self):
+        """
+        The metrics over all batches added so far.
+
+        Returns
+        -------
+        dict
+            Metric name to value.
+        """
+        n = self.n_rows
+        ss_tot = self.y_moments[1]
+        mse = self.sums["error2"] / n
+        r2 = 1 - self.sums["error2"] / ss_tot if ss_tot > 0 else np.nan
+        error_var = self.error_moments[1] / n
+        msle = self.sums["log_error2"] / n
+
+        metrics = {
+            "n_rows": int(n),
+            "mae": float(self.sums["abs_error"] / n),
+            "mse": float(mse),
+            "rmse": float(mse**0.5),
+            "r2": float(r2),
+            "mape": float(self.sums["ape"] / n),
+            "explained_variance": float(1 - error_var / (ss_tot / n))
+            if ss_tot > 0
+            else np.nan,
+            "max_error": self.max_error,
+            "msle": float(msle),
+            "rmsle": float(msle**0.5),
+        }
+        if self.n_features is not None and n - self.n_features - 1 > 0:
+            metrics["adj_r2"] = float(
+                1 - (1 - r2) * (n - 1) / (n - self.n_features - 1)
+            )
+        return metrics
@@ -1,10 +1,17 @@
 import joblib
-import pandas as pd
 import logging
-import random
 import numpy as np
+import pandas as pd
 
+from ml2sql.utils.helper_functions.data_loading import (
+    BatchWriter,
+    iter_data,
+    load_data,
+    strings_as_category,
+)
+from ml2sql.utils.helper_functions.figure_export import figure_export_pool, write_image
 from ml2sql.utils.helper_functions.setup_logger import setup_logger
+from ml2sql.utils.modelling.metrics import MetricsCollector, classificationMetrics
 from ml2sql.utils.modelling.performance import (
     plotClassificationCurve,
     plotCalibrationCurve,
@@ -14,153 +21,483 @@ from ml2sql.utils.modelling.performance import (
     regressionMetricsTable,
     plotConfusionMatrix,
 )
+from ml2sql.utils.modelling.streaming_metrics import (
+    ClassificationMetrics,
+    RegressionMetrics,
+)
 
 
-def modeltester(data_path, model_path, destination_path):
-    # Set Logger
-    setup_logger(destination_path + "/logging.log")
-    logger = logging.getLogger(__name__)
+logger = logging.getLogger(__name__)
+
+# Ways of choosing the rows to save a local explanation for
+EXPLAIN_SELECTIONS = ["random", "top-score", "worst-error"]
+
+
+def explain_row_keys(y_true, y_pred, y_prob, classes, selection, rng):
+    """
+    Rank rows for a local explanation, rows with the highest key are explained.
+
+    Parameters
+    ----------
+    y_true : pandas.Series
+        The true target values.
+    y_pred : array-like
+        The predicted target values.
+    y_prob : numpy.ndarray or None
+        The predicted class probabilities (n_rows x n_classes), None for regression.
+    classes : list or None
+        The classes in the order of the columns of y_prob, None for regression.
+    selection : str
+        'random', 'top-score' (highest predicted value or class probability) or
+        'worst-error' (largest absolute error or lowest probability of the true class).
+    rng : numpy.random.Generator
+        Random generator for the random selection.
+
+    Returns
+    -------
+    numpy.ndarray
+        The key of each row.
+    """
+    if selection == "random":
+        return rng.random(len(y_true))
+
+    if y_prob is None:
+        score = np.asarray(y_pred, dtype=float)
+        error = np.abs(np.asarray(y_true, dtype=float) - score)
+    else:
+        # For binary classification the score is the probability of the positive class
+        score = y_prob[:, 1] if len(classes) == 2 else y_prob.max(axis=1)
+        # Probability of the true class, zero for classes unknown to the model
+        class_index = {c: i for i, c in enumerate(classes)}
+        true_class = pd.Series(np.asarray(y_true)).map(class_index)
+        known = true_class.notna().to_numpy()
+        true_prob = np.zeros(len(y_prob))
+        true_prob[known] = y_prob[
+            np.flatnonzero(known), true_class[known].astype(int).to_numpy()
+        ]
+        error = 1 - true_prob
+
+    if selection == "top-score":
+        return score
+    elif selection == "worst-error":
+        return error
+    else:
+        raise ValueError(
+            f"Unknown explain selection '{selection}', use one of {', '.join(EXPLAIN_SELECTIONS)}"
+        )
+
+
+def select_explain_rows(
+    y_true, y_pred, y_prob, classes, nr_rows, selection, random_seed=42
+):
+    """
+    Select the (positional) rows to save a local explanation for.
+
+    Parameters
+    ----------
+    y_true : pandas.Series
+        The true target values.
+    y_pred : array-like
+        The predicted target values.
+    y_prob : numpy.ndarray or None
+        The predicted class probabilities (n_rows x n_classes), None for regression.
+    classes : list or None
+        The classes in the order of the columns of y_prob, None for regression.
+    nr_rows : int
+        The number of rows to select (at most the number of rows in the data).
+    selection : str
+        'random', 'top-score' or 'worst-error', see explain_row_keys.
+    random_seed : int, optional
+        Seed for the random selection, by default 42.
+
+    Returns
+    -------
+    numpy.ndarray
+        Sorted positional indices of the selected rows.
+    """
+    keys = explain_row_keys(
+        y_true, y_pred, y_prob, classes, selection, np.random.default_rng(random_seed)
+    )
+    return np.sort(np.argsort(-keys, kind="stable")[:nr_rows])
+
+
+def _write_local_explanation(plotly_fig, path, file_type):
+    if file_type == "png":
+        # Queued in the figure export pool when one is running
+        write_image(plotly_fig, f"{path}.png")
+    elif file_type == "html":
+        # or as html file
+        plotly_fig.write_html(f"{path}.html")
 
-    # Load in model
+
+def saveLocalExplanations(model, X, y_true, destination_path, file_type="png"):
+    """
+    Save the local explanation of the given rows, computed in a single call.
+
+    Parameters
+    ----------
+    model : object
+        The trained model, skipped when it has no local explanations (e.g. decision tree).
+    X : pandas.DataFrame
+        The features of the rows to explain, files are named after its index.
+    y_true : pandas.Series
+        The true target values of these rows, shown next to the prediction.
+    destination_path : str
+        Folder containing the local_explanations folder.
+    file_type : str, optional
+        Type of the saved files, 'png' or 'html', by default 'png'. PNG images are
+        written by the figure export pool when one is running (see figure_export_pool).
+    """
+    if not hasattr(model, "explain_local"):
+        logger.info("Model has no local explanations, none saved")
+        return
+    if len(X) == 0:
+        return
+
+    explanation = model.explain_local(X, y_true)
+
+    for i, row in enumerate(X.index):
+        _write_local_explanation(
+            explanation.visualize(i),
+            f"{destination_path}/local_explanations/explain_row_{row}",
+            file_type,
+        )
+    logger.info(f"Saved local explanations of {len(X)} rows")
+
+
+def streamModeltester(
+    data_path,
+    model_path,
+    destination_path,
+    batch_size,
+    predictions_format="parquet",
+    explain_rows=10,
+    explain_selection="random",
+    random_seed=42,
+):
+    """
+    Test a model on a data file read in batches of rows, in memory bounded by the batch size.
+
+    Every batch is scored once (classes are derived from the predicted probabilities),
+    the metrics are accumulated and the predictions appended to
+    `<destination_path>/predictions.<predictions_format>`. The metrics are saved as data
+    set 'test' in `<destination_path>/performance/metrics.json`, like without batches,
+    performance plots (which need all rows at once) are not created.
+
+    Parameters
+    ----------
+    data_path : str
+        Path to the data file.
+    model_path : str
+        Path to the pickled model.
+    destination_path : str
+        Folder to save the outputs in.
+    batch_size : int
+        Number of rows scored at once.
+    predictions_format : str, optional
+        File type of the predictions ('parquet', 'csv', 'feather' or 'arrow'), by default 'parquet'.
+    explain_rows : int, optional
+        Number of rows to save a local explanation for, by default 10.
+    explain_selection : str, optional
+        'random', 'top-score' or 'worst-error', see explain_row_keys, by default 'random'.
+    random_seed : int, optional
+        Seed for the random selection of explained rows, by default 42.
+
+    Returns
+    -------
+    dict
+        The metrics over all rows.
+    """
     model = joblib.load(open(model_path, "rb"))
     logger.info("Loaded in model")
 
-    # Load in data
-    df = pd.read_csv(data_path)
-    logger.info(f"Loaded in dataset, shape: {df.shape}")
-
     target_col = model.target
     feature_cols = [x for x in model.feature_names if " x " not in x]
+    is_classifier = hasattr(model, "classes_")
 
-    # Perform inference
-    y_true = df[target_col]
-    X = df[feature_cols]
+    if is_classifier:
+        classes = np.asarray(model.classes_)
+        metrics = ClassificationMetrics(classes)
+    else:
+        classes = None
+        metrics = RegressionMetrics(n_features=len(feature_cols))
 
-    y_pred = model.predict(X)
+    rng = np.random.default_rng(random_seed)
+    explain_candidates = None
+    predictions_path = f"{destination_path}/predictions.{predictions_format}"
 
-    # Create performance metrics graphs
-    if hasattr(model, "classes_"):
-        # If classification make probability prediction
-        y_prob = model.predict_proba(X)
+    with BatchWriter(predictions_path) as writer:
+        for batch in iter_data(
+            data_path,
+            batch_size,
+            columns=list(dict.fromkeys([target_col] + feature_cols)),
+        ):
+            batch = strings_as_category(batch)
+            y_true = batch[target_col]
+            X = batch[feature_cols]
 
-        if len(model.classes_) == 2:
-            # for binary only take class one probabilities
-            y_prob = y_prob[:, 1]
+            # Single pass through the model per batch
+            if is_classifier:
+                y_prob = model.predict_proba(X)
+                y_pred = classes[y_prob.argmax(axis=1)]
+                metrics.update(y_true, y_prob)
+            else:
+                y_prob = None
+                y_pred = model.predict(X)
+                metrics.update(y_true, y_pred)
 
-            # Threshold dependant
-            plotConfusionMatrix(
-                destination_path,
-                y_true,
-                y_prob,
-                y_pred,
-                file_type="html",
-                data_type="test",
+            predictions = pd.DataFrame(
+                {target_col: y_true.to_numpy(), "prediction": y_pred}
             )
+            if is_classifier:
+                for i, c in enumerate(classes):
+                    predictions[f"probability_{c}"] = y_prob[:, i]
+            writer.write(predictions)
 
-            # Also create pr curve for class 0
-            y_neg = np.array([1 - j for j in list(y_true)])
-            y_prob_neg = np.array([1 - j for j in list(y_prob)])
-
-            # Threshold independant
-            plotClassificationCurve(
-                destination_path,
-                y_true,
-                y_prob,
-                curve_type="roc",
-                data_type="test",
+            # Keep the rows with the highest keys seen so far as explanation candidates
+            batch = batch.assign(
+                _explain_key=explain_row_keys(
+                    y_true, y_pred, y_prob, classes, explain_selection, rng
+                )
             )
+            explain_candidates = pd.concat(
+                [explain_candidates, batch.nlargest(explain_rows, "_explain_key")]
+            ).nlargest(explain_rows, "_explain_key")
 
-            plotClassificationCurve(
-                destination_path,
-                y_true,
-                y_prob,
-                curve_type="pr",
-                data_type="test_class1",
-            )
-            plotClassificationCurve(
+            logger.info(f"Scored {writer.n_rows} rows")
+
+    logger.info(f"Saved predictions in {predictions_path}")
+
+    result = metrics.result()
+    logger.info(f"Test metrics: {result}")
+
+    # Same files and layout as without batches, the confusion matrix is only logged
+    collector = MetricsCollector()
+    collector.record_all(
+        "test", {k: v for k, v in result.items() if k != "confusion_matrix"}
+    )
+    collector.save(destination_path)
+
+    if explain_candidates is not None:
+        explain_candidates = explain_candidates.sort_index()
+        saveLocalExplanations(
+            model,
+            explain_candidates[feature_cols],
+            explain_candidates[target_col],
+            destination_path,
+            "png",
+        )
+
+    logger.info("Script finished.")
+    return result
+
+
+def modeltester(
+    data_path,
+    model_path,
+    destination_path,
+    explain_rows=10,
+    explain_selection="random",
+    figure_export_workers=1,
+    batch_size=None,
+    predictions_format="parquet",
+):
+    if explain_selection not in EXPLAIN_SELECTIONS:
+        raise ValueError(
+            f"Unknown explain selection '{explain_selection}', use one of {', '.join(EXPLAIN_SELECTIONS)}"
+        )
+
+    # Set Logger
+    setup_logger(destination_path + "/logging.log")
+
+    # Images are written by a pool of processes (if more than one)
+    with figure_export_pool(figure_export_workers):
+        if batch_size:
+            return streamModeltester(
+                data_path,
+                model_path,
                 destination_path,
-                y_neg,
-                y_prob_neg,
-                curve_type="pr",
-                data_type="test_class0",
+                batch_size,
+                predictions_format,
+                explain_rows,
+                explain_selection,
             )
 
-            plotCalibrationCurve(destination_path, y_true, y_prob, data_type="test")
+        # Load in model
+        model = joblib.load(open(model_path, "rb"))
+        logger.info("Loaded in model")
+
+        target_col = model.target
+        feature_cols = [x for x in model.feature_names if " x " not in x]
 
-            plotProbabilityDistribution(
-                destination_path, y_true, y_prob, data_type="test"
+        # Load in data, only the target and features used by the model
+        df = load_data(
+            data_path, columns=list(dict.fromkeys([target_col] + feature_cols))
+        )
+        logger.info(f"Loaded in dataset, shape: {df.shape}")
+
+        df = strings_as_category(df)
+
+        # Perform inference
+        y_true = df[target_col]
+        X = df[feature_cols]
+
+        y_pred = model.predict(X)
+        y_prob_all = None
+        collector = MetricsCollector()
+
+        # Create performance metrics graphs
+        if hasattr(model, "classes_"):
+            # If classification make probability prediction
+            y_prob = y_prob_all = model.predict_proba(X)
+            collector.record_all(
+                "test",
+                classificationMetrics(
+                    y_true,
+                    y_pred,
+                    y_prob[:, 1] if len(model.classes_) == 2 else y_prob,
+                    list(model.classes_),
+                ),
             )
 
-        # If multiclass classification
-        elif len(model.classes_) > 2:
-            # loop through classes
-            for c in model.classes_:
-                # creating a list of all the classes except the current class
-                other_class = [x for x in model.classes_ if x != c]
+            if len(model.classes_) == 2:
+                # for binary only take class one probabilities
+                y_prob = y_prob[:, 1]
 
-                # Get index of selected class in model.classes_
-                class_index = list(model.classes_).index(c)
+                # Threshold dependant
+                plotConfusionMatrix(
+                    destination_path,
+                    y_true,
+                    y_prob,
+                    y_pred,
+                    file_type="html",
+                    data_type="test",
+                )
 
-                # marking the current class as 1 and all other classes as 0
-                y_ova = [0 if x in other_class else 1 for x in y_true]
-                y_prob_ova = [x[class_index] for x in y_prob]
+                # Also create pr curve for class 0
+                y_neg = np.array([1 - j for j in list(y_true)])
+                y_prob_neg = np.array([1 - j for j in list(y_prob)])
 
                 # Threshold independant
                 plotClassificationCurve(
                     destination_path,
-                    y_ova,
-                    y_prob_ova,
+                    y_true,
+                    y_prob,
                     curve_type="roc",
-                    data_type=f"test_class_{c}",
+                    data_type="test",
+                    collector=collector,
                 )
 
                 plotClassificationCurve(
                     destination_path,
-                    y_ova,
-                    y_prob_ova,
+                    y_true,
+                    y_prob,
+                    curve_type="pr",
+                    data_type="test_class_1",
+                    collector=collector,
+                )
+                plotClassificationCurve(
+                    destination_path,
+                    y_neg,
+                    y_prob_neg,
                     curve_type="pr",
-                    data_type=f"test_class_{c}",
+                    data_type="test_class_0",
+                    collector=collector,
                 )
 
                 plotCalibrationCurve(
                     destination_path,
-                    y_ova,
-                    y_prob_ova,
-                    data_type=f"test_class_{c}",
+                    y_true,
+                    y_prob,
+                    data_type="test",
+                    collector=collector,
                 )
 
                 plotProbabilityDistribution(
-                    destination_path,
-                    y_ova,
-                    y_prob_ova,
-                    data_type=f"test_class_{c}",
+                    destination_path, y_true, y_prob, data_type="test"
                 )
 
-    # if regression
-    else:
-        plotYhatVsYSave(destination_path, y_true, y_pred, data_type="test")
+            # If multiclass classification
+            elif len(model.classes_) > 2:
+                # loop through classes
+                for c in model.classes_:
+                    # creating a list of all the classes except the current class
+                    other_class = [x for x in model.classes_ if x != c]
 
-        plotQuantileError(destination_path, y_true, y_pred, data_type="test")
+                    # Get index of selected class in model.classes_
+                    class_index = list(model.classes_).index(c)
 
-        regressionMetricsTable(destination_path, y_true, y_pred, X, data_type="test")
+                    # marking the current class as 1 and all other classes as 0
+                    y_ova = [0 if x in other_class else 1 for x in y_true]
+                    y_prob_ova = [x[class_index] for x in y_prob]
 
-    # Save local explanations (max 10)
-    nr_rows = range(0, len(df))
-    sample = random.sample(nr_rows, 10)
-    sample.sort()
+                    # Threshold independant
+                    plotClassificationCurve(
+                        destination_path,
+                        y_ova,
+                        y_prob_ova,
+                        curve_type="roc",
+                        data_type=f"test_class_{c}",
+                        collector=collector,
+                    )
 
-    # TODO allow user to choose row to explain (and clear way of recognising which row)
-    file_type = "png"  # hardcoded for now as there is no config for this yet
-    for s in sample:
-        plotly_fig = model.explain_local(df).visualize(s)
-        if file_type == "png":
-            plotly_fig.write_image(
-                f"{destination_path}/local_explanations/explain_row_{s}.png"
-            )
-        elif file_type == "html":
-            # or as html file
-            plotly_fig.write_html(
-                f"{destination_path}/local_explanations/explain_row_{s}.html"
+                    plotClassificationCurve(
+                        destination_path,
+                        y_ova,
+                        y_prob_ova,
+                        curve_type="pr",
+                        data_type=f"test_class_{c}",
+                        collector=collector,
+                    )
+
+                    plotCalibrationCurve(
+                        destination_path,
+                        y_ova,
+                        y_prob_ova,
+                        data_type=f"test_class_{c}",
+                        collector=collector,
+                    )
+
+                    plotProbabilityDistribution(
+                        destination_path,
+                        y_ova,
+                        y_prob_ova,
+                        data_type=f"test_class_{c}",
+                    )
+
+        # if regression
+        else:
+            plotYhatVsYSave(destination_path, y_true, y_pred, data_type="test")
+
+            plotQuantileError(destination_path, y_true, y_pred, data_type="test")
+
+            regressionMetricsTable(
+                destination_path,
+                y_true,
+                y_pred,
+                X,
+                data_type="test",
+                collector=collector,
             )
 
-    logger.info("Script finished.")
+        collector.save(destination_path)
+
+        # Save local explanations of the selected rows
+        rows = select_explain_rows(
+            y_true,
+            y_pred,
+            y_prob_all,
+            getattr(model, "classes_", None),
+            explain_rows,
+            explain_selection,
+        )
+        file_type = "png"  # hardcoded for now as there is no config for this yet
+        saveLocalExplanations(
+            model,
+            X.iloc[rows],
+            y_true.iloc[rows],
+            destination_path,
+            file_type,
+        )
+
+        logger.info("Script finished.")
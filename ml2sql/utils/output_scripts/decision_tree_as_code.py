@@ -2,22 +2,78 @@ import numpy as np
 from pathlib import Path
 import logging
 from sklearn.tree import _tree
-import sys
+
+from ml2sql.utils.output_scripts.sql_builder import SQLBuilder
+from ml2sql.utils.output_scripts.sql_dialects import get_dialect
 
 logger = logging.getLogger(__name__)
 
+# Nested CASE statements following the tree, or a flat CASE with a WHEN per leaf
+SQL_TREE_FORMATS = ["nested", "rules"]
+
+
+def _split_column(tree_, feature_name, node, dialect):
+    # Thresholds halfway between whole numbers compare the column as an integer
+    name = feature_name[node]
+    threshold = tree_.threshold[node]
+    if threshold % 1 == 0.5:
+        return dialect.cast_int(name), threshold
+    return name, threshold
+
+
+def _leaf_sql(tree, node):
+    """
+    SQL value of a leaf with a comment on its train data.
 
-def tree_to_sql(tree, file=sys.stdout):
+    Parameters:
+    -----------
+    tree: sklearn decision tree model
+        The decision tree of the leaf
+    node: int
+        Index of the leaf node
+
+    Returns:
+    --------
+    str
+        The predicted value (class) followed by a comment
+    """
+    tree_ = tree.tree_
+    samples = tree_.n_node_samples[node]
+    if not hasattr(tree, "classes_"):
+        return f"{tree_.value[node][0, 0]} -- samples ({samples})"
+
+    class_values = tree_.value[node]
+    max_value = int(np.max(class_values))
+    predicted_class = tree.classes_[np.argmax(class_values)]
+    comment = (
+        f"-- train data precision: {max_value / samples:.2f} ({max_value}/{samples})"
+    )
+    if np.issubdtype(type(predicted_class), np.integer):
+        return f"{predicted_class} {comment}"
+    return f"'{predicted_class}' {comment}"
+
+
+def tree_to_sql(tree, dialect="default"):
     """
-    Outputs a decision tree model as an SQL Case When statement to a file or stdout
+    Outputs a decision tree model as an SQL Case When statement
+
+    The tree is walked with an explicit stack, so trees of any depth can be written
+    (a recursive walk hits the recursion limit of Python for very deep trees).
 
     Parameters:
     -----------
     tree: sklearn decision tree model
         The decision tree to represent as an SQL function
-    file: file object, optional (default=sys.stdout)
-        The file to write the output to. If not specified, prints to console.
+    dialect: str
+        SQL dialect, see SQL_DIALECTS
+
+    Returns:
+    --------
+    str
+        The SQL query
     """
+    dialect = get_dialect(dialect)
+    sql = SQLBuilder()
 
     tree_ = tree.tree_
     feature_name = [
@@ -25,59 +81,119 @@ def tree_to_sql(tree, file=sys.stdout):
         for i in tree_.feature
     ]
 
-    def recurse(node, depth):
-        indent = "  " * depth
+    sql.print("SELECT")
+
+    # Nodes to write and lines to write after their subtrees (ELSE and END)
+    stack = [(0, 1)]
+    while stack:
+        node, depth = stack.pop()
+        if isinstance(node, str):
+            sql.print(node)
+            continue
 
+        indent = "  " * depth
         if tree_.feature[node] != _tree.TREE_UNDEFINED:
-            name = feature_name[node]
-            threshold = tree_.threshold[node]
-
-            if threshold % 1 == 0.5:
-                cast = "::INT"
-            else:
-                cast = ""
-
-            print(f"{indent}CASE WHEN {name}{cast} <= {threshold} THEN", file=file)
-            recurse(tree_.children_left[node], depth + 1)
-            print(f"{indent}ELSE  -- if {name} > {threshold}", file=file)
-            recurse(tree_.children_right[node], depth + 1)
-            print(f"{indent}END", file=file)
+            column, threshold = _split_column(tree_, feature_name, node, dialect)
+            sql.print(f"{indent}CASE WHEN {column} <= {threshold} THEN")
+            stack.append((f"{indent}END", depth))
+            stack.append((tree_.children_right[node], depth + 1))
+            stack.append(
+                (f"{indent}ELSE  -- if {feature_name[node]} > {threshold}", depth)
+            )
+            stack.append((tree_.children_left[node], depth + 1))
         else:
-            if hasattr(tree, "classes_"):
-                class_values = tree_.value[node]
-                samples = tree_.n_node_samples[node]
-                max_value = int(np.max(class_values))
-                predicted_class = tree.classes_[np.argmax(class_values)]
-
-                if np.issubdtype(type(predicted_class), np.integer):
-                    print(
-                        f"{indent}{predicted_class} -- train data precision: {max_value / samples:.2f} ({max_value}/{samples})",
-                        file=file,
-                    )
-                else:
-                    print(
-                        f"{indent}'{predicted_class}' -- train data precision: {max_value / samples:.2f} ({max_value}/{samples})",
-                        file=file,
-                    )
-            else:
-                prediction = tree_.value[node][0, 0]
-                samples = tree_.n_node_samples[node]
-                print(f"{indent}{prediction} -- samples ({samples})", file=file)
-
-    print("SELECT", file=file)
-    recurse(0, 1)
-    print("AS prediction", file=file)
-    print("FROM <source_table> -- change to your table name", file=file)
+            sql.print(f"{indent}{_leaf_sql(tree, node)}")
+
+    sql.print("AS prediction")
+    sql.print("FROM <source_table> -- change to your table name")
+    return sql.getvalue()
+
+
+def _bounds_sql(column, lower, upper):
+    # Missing values take the ELSE (greater than) branch of every split
+    if upper is None:
+        return f"({column} > {lower} OR {column} IS NULL)"
+    if lower is None:
+        return f"{column} <= {upper}"
+    return f"{column} > {lower} AND {column} <= {upper}"
+
+
+def tree_to_sql_rules(tree, dialect="default"):
+    """
+    Outputs a decision tree model as a flat SQL Case When statement, a WHEN per leaf
+
+    The conditions of the path to a leaf are merged per column into a single lower
+    and upper bound, so the query is not nested and has at most two comparisons per
+    column per leaf. Predictions are the same as the nested CASE of tree_to_sql.
+
+    Parameters:
+    -----------
+    tree: sklearn decision tree model
+        The decision tree to represent as an SQL function
+    dialect: str
+        SQL dialect, see SQL_DIALECTS
+
+    Returns:
+    --------
+    str
+        The SQL query
+    """
+    dialect = get_dialect(dialect)
+    sql = SQLBuilder()
+
+    tree_ = tree.tree_
+    feature_name = [
+        tree.feature_names_in_[i] if i != _tree.TREE_UNDEFINED else "undefined!"
+        for i in tree_.feature
+    ]
+
+    sql.print("SELECT")
+    if tree_.feature[0] == _tree.TREE_UNDEFINED:
+        # A single leaf, no conditions
+        sql.print(f"  {_leaf_sql(tree, 0)}")
+    else:
+        sql.print("  CASE")
+
+    # Leaves in the order of the nested CASE, with the (lower, upper) bound per column
+    stack = [(0, {})]
+    while stack:
+        node, bounds = stack.pop()
+        if tree_.feature[node] == _tree.TREE_UNDEFINED:
+            if node != 0:
+                conditions = " AND ".join(
+                    _bounds_sql(column, lower, upper)
+                    for column, (lower, upper) in bounds.items()
+                )
+                sql.print(f"    WHEN {conditions} THEN {_leaf_sql(tree, node)}")
+            continue
+
+        column, threshold = _split_column(tree_, feature_name, node, dialect)
+        lower, upper = bounds.get(column, (None, None))
+        right = dict(bounds)
+        right[column] = (threshold if lower is None else max(lower, threshold), upper)
+        left = dict(bounds)
+        left[column] = (lower, threshold if upper is None else min(upper, threshold))
+        stack.append((tree_.children_right[node], right))
+        stack.append((tree_.children_left[node], left))
+
+    if tree_.feature[0] != _tree.TREE_UNDEFINED:
+        sql.print("  END")
+    sql.print("AS prediction")
+    sql.print("FROM <source_table> -- change to your table name")
+    return sql.getvalue()
 
 
 def save_model_and_extras(clf, model_name, post_params):
+    sql_tree_format = post_params.get("sql_tree_format", "nested")
+    if sql_tree_format not in SQL_TREE_FORMATS:
+        raise ValueError(
+            f"Unknown sql_tree_format '{sql_tree_format}', use one of {', '.join(SQL_TREE_FORMATS)}"
+        )
+
     output_path = Path(model_name) / "model" / "decisiontree_in_sql.sql"
     output_path.parent.mkdir(parents=True, exist_ok=True)
 
-    with open(output_path, "w") as f:
-        tree_to_sql(clf, file=f)
+    to_sql = tree_to_sql_rules if sql_tree_format == "rules" else tree_to_sql
+    output_path.write_text(to_sql(clf, post_params.get("sql_dialect", "default")))
 
     logger.info("SQL version of decision tree saved")
-
-    # If you want to also print to console, you can call the function again without the file parameter
-    # tree_to_sql(clf)
@@ -1,210 +1,202 @@
 import numpy as np
 import pandas as pd
-from contextlib import redirect_stdout
 from pathlib import Path
 import logging
 
-logger = logging.getLogger(__name__)
-
-
-def ReduceSingleFeature(df_):
-    # For safety
-    df = df_.copy()
-
-    # drop any duplicates (which should not exist)
-    df_feat_types = (
-        df[["feature", "feat_type"]].drop_duplicates().reset_index(drop=True).copy()
-    )
-
-    # Set index
-    df = df.set_index(["feature"])
-
-    # Explode per column
-    lookup_df = (
-        df[["feat_bound", "score", "score_lower_bound", "score_upper_bound"]]
-        .apply(lambda x: x.apply(pd.Series).stack())
-        .reset_index()
-        .drop("level_1", axis=1)
-    )
+from ml2sql.utils.output_scripts.sql_builder import SQLBuilder
+from ml2sql.utils.output_scripts.sql_dialects import SQLDialect, get_dialect
 
-    # add feature type back in
-    lookup_df = lookup_df.merge(df_feat_types, on="feature", how="left")
+logger = logging.getLogger(__name__)
 
-    # sort_values but None will be in the bottom
-    lookup_df.sort_values(["feature", "feat_bound"], inplace=True, ascending=False)
+# Ways of writing the bins of a numeric feature in SQL
+SQL_NUMERIC_BINS = ["linear", "binary"]
 
-    # So reverse the ordering
-    lookup_df = lookup_df.iloc[::-1]
+# Scores as CASE statements in the query, or in a separate score table joined on
+SQL_FORMATS = ["case", "lookup"]
 
-    lookup_df["nr_features"] = 1
+# Rows per INSERT statement of the score table
+SCORE_TABLE_INSERT_ROWS = 1000
 
-    # being able for score arrays to be grouped
-    # for categorical features do not group by score hence we include value in score_hash
-    lookup_df["pre_hash_column"] = np.where(
-        lookup_df["feat_type"] == "categorical",
-        lookup_df["score"].astype(str) + lookup_df["feat_bound"].astype(str),
-        lookup_df["score"].astype(str),
-    )
-    lookup_df["score_hash"] = pd.util.hash_pandas_object(
-        lookup_df["pre_hash_column"], index=False
-    )
-    hash_lookup_df = (
-        lookup_df[["score_hash", "score"]]
-        .drop_duplicates("score_hash")
-        .reset_index(drop=True)
-        .copy()
-    )
 
-    # to group by score but keep them in order (not grouping similar scores for different feature values)
-    adj_check = (lookup_df.score_hash != lookup_df.score_hash.shift()).cumsum()
-
-    lookup_df["adj_score"] = adj_check
-    lookup_df_simple = (
-        lookup_df.groupby(["feature", "feat_type", "score_hash", "adj_score"])
-        .agg(
-            {
-                "feat_bound": "last",
-                "score_lower_bound": "first",
-                "score_upper_bound": "last",
-            },
-            sort=False,
-        )
-        .reset_index(drop=False)
-    )
+def _sorted_bins(feature_bins):
+    """Bounds of the bins of a feature in SQL order, the missing value bin first
 
-    lookup_df_grouped = lookup_df_simple.merge(
-        hash_lookup_df, on="score_hash", how="left"
-    )
-    # ordering sets None in last place
-    lookup_df_grouped.sort_values(
-        ["feature", "feat_bound"], inplace=True, ascending=False
-    )
-    # So reverse the ordering
-    lookup_df_grouped = lookup_df_grouped.iloc[::-1].reset_index(drop=True)
+    Args:
+        feature_bins: Bin edges (numeric) or category to bin dict (categorical) of the EBM
 
-    return lookup_df_grouped
+    Returns:
+        The bounds (NaN for missing values, inf for the last numeric bin), the index
+        of their scores in the term scores and the feature type
+    """
+    if isinstance(feature_bins, dict):
+        # Categories map to the index of their score (the missing value bin is 0)
+        categories = sorted(feature_bins)
+        order = [0] + [feature_bins[category] for category in categories]
+        return [np.nan] + categories, np.array(order), "categorical"
 
+    bounds = [np.nan] + [float(edge) for edge in feature_bins] + [np.inf]
+    return bounds, np.arange(len(bounds)), "numeric"
 
-def RestructureReduceInteractions(df_):
-    # for safety
-    df = df_.copy()
 
-    # Restructure
-    # loop over rows
-    for index, row in df.iterrows():
-        # Swap features position if first feature has more bound values then second feature
-        if (row["score"].shape[0] > row["score"].shape[1]) & (
-            row["feat_type"][0] == "numeric"
-        ):
-            # loop over column needed to be transposed
-            for c in ["feature", "feat_bound", "score", "feat_type"]:
-                if isinstance(df.loc[index, c], list):
-                    df.at[index, c] = [df.at[index, c][1], df.at[index, c][0]]
-                elif isinstance(df.loc[index, c], np.ndarray):
-                    df.at[index, c] = np.transpose(df.at[index, c])
+def _equal_to_previous(scores):
+    """Whether each score equals the score before it (along the first axis)
 
-    # Reduce
+    Args:
+        scores: Scores, a vector of class scores per row for multiclass
 
-    # Split list valued columns into two columns
-    df[["feat_1", "feat_2"]] = df["feature"].apply(pd.Series)
-    df[["feat_bound_1", "feat_bound_2"]] = df["feat_bound"].apply(pd.Series)
-    df[["feat_type_1", "feat_type_2"]] = df["feat_type"].apply(pd.Series)
+    Returns:
+        A boolean array, one shorter than scores
+    """
+    if scores.ndim == 1:
+        # Also compare the sign, 0.0 and -0.0 are written differently
+        return (scores[1:] == scores[:-1]) & (
+            np.signbit(scores[1:]) == np.signbit(scores[:-1])
+        )
 
-    # Drop unused column
-    df = df.drop(["feat_bound"], axis=1)
+    # Class score vectors are compared on their numpy text representation
+    text = np.array([str(score) for score in scores], dtype=object)
+    return text[1:] == text[:-1]
 
-    # Set index
-    df = df.set_index(["feature"])
 
-    # first explode on score and feat_bound_1 (same dimensions)
-    df_explode_1 = df.explode(["score", "feat_bound_1"])
-    lookup_df = df_explode_1.explode(["score", "feat_bound_2"])
+def ReduceSingleFeatures(ebm, terms, sql_decimals):
+    """Lookup rows of the single feature terms, merging adjacent bins with equal scores
 
-    # sort_values but None will be in the bottom
-    lookup_df = lookup_df.sort_values(
-        ["feat_1", "feat_2", "feat_bound_1", "feat_bound_2"], ascending=False
-    )
+    Bins are sorted on feature and bound, with the missing value bin first. Adjacent
+    numeric bins (including the missing value bin) with equal scores are merged into
+    the last of them, categories are never merged.
 
-    # So reverse the ordering
-    lookup_df = lookup_df.iloc[::-1]
+    Args:
+        ebm: A trained EBM
+        terms: Indexes of the single feature terms
+        sql_decimals: Number of decimals to round the scores to
 
-    lookup_df["nr_features"] = 2
+    Returns:
+        A DataFrame with a row per (merged) bin
+    """
+    features, feat_types, bounds, mergeable = [], [], [], []
+    scores, lower_bounds, upper_bounds = [], [], []
+
+    for term in sorted(
+        terms, key=lambda t: ebm.feature_names[ebm.term_features_[t][0]]
+    ):
+        feature_index = ebm.term_features_[term][0]
+        feature_bounds, order, feat_type = _sorted_bins(ebm.bins_[feature_index][0])
+
+        # The last score is for unknown values, these are not written in SQL
+        model_graph = ebm.term_scores_[term][:-1][order]
+        errors = ebm.standard_deviations_[term][:-1][order]
+
+        n_bins = len(feature_bounds)
+        features += [ebm.feature_names[feature_index]] * n_bins
+        feat_types += [feat_type] * n_bins
+        bounds += feature_bounds
+        mergeable.append(
+            np.arange(n_bins) > 0
+            if feat_type == "numeric"
+            else np.zeros(n_bins, dtype=bool)
+        )
+        scores.append(np.round(model_graph, sql_decimals))
+        lower_bounds.append(model_graph - errors)
+        upper_bounds.append(model_graph + errors)
 
-    # being able for score arrays to be grouped
-    # for categorical features do not group by score hence we include value in score_hash
-    mask_category = ["categorical" in x for x in lookup_df["feat_type_2"]]
-    mask_inf_bound = [np.inf == x for x in lookup_df["feat_bound_2"]]
-    mask = [a or b for a, b in zip(mask_category, mask_inf_bound)]
+    scores = np.concatenate(scores)
+    lower_bounds = np.concatenate(lower_bounds)
+    upper_bounds = np.concatenate(upper_bounds)
 
-    lookup_df["pre_hash_column"] = np.where(
-        mask,
-        lookup_df["score"].astype(str)
-        + lookup_df["feat_bound_1"].astype(str)
-        + lookup_df["feat_bound_2"].astype(str),
-        lookup_df["score"].astype(str) + lookup_df["feat_bound_1"].astype(str),
+    # Runs of adjacent equal scores, a run gets the bound of its last bin
+    merge = np.concatenate(
+        [[False], _equal_to_previous(scores) & np.concatenate(mergeable)[1:]]
     )
-    lookup_df["score_hash"] = pd.util.hash_pandas_object(
-        lookup_df["pre_hash_column"], index=False
+    starts = np.flatnonzero(~merge)
+    ends = np.append(starts[1:], len(scores)) - 1
+
+    run_scores = list(scores[starts])
+    if scores.ndim > 1:
+        # Equal looking class score vectors share the first of them
+        first_scores = {}
+        run_scores = [
+            first_scores.setdefault(str(score), score) for score in run_scores
+        ]
+
+    return pd.DataFrame(
+        {
+            "feature": np.array(features, dtype=object)[starts],
+            "feat_type": np.array(feat_types, dtype=object)[starts],
+            "feat_bound": np.array(bounds, dtype=object)[ends],
+            "score_lower_bound": list(lower_bounds[starts]),
+            "score_upper_bound": list(upper_bounds[ends]),
+            "score": run_scores,
+        }
     )
-    hash_lookup_df = (
-        lookup_df[["score_hash", "score"]]
-        .drop_duplicates("score_hash")
-        .reset_index(drop=True)
-        .copy()
-    )
-
-    # to group by score but keep them in order (not grouping similar scores for different feature values)
-    adj_check = (lookup_df.score_hash != lookup_df.score_hash.shift()).cumsum()
 
-    lookup_df["adj_score"] = adj_check
 
-    lookup_df_simple = (
-        lookup_df.groupby(
-            [
-                "feat_1",
-                "feat_2",
-                "feat_type_1",
-                "feat_type_2",
-                "score_hash",
-                "adj_score",
-            ]
-        )
-        .agg(
-            {
-                "feat_bound_1": "first",
-                "feat_bound_2": "last",  # last to have numeric bounds correctly (with the existence of inf)
-                "score_lower_bound": "first",
-                "score_upper_bound": "last",
-            },
-            sort=False,
-        )
-        .reset_index(drop=False)
-    )
+def ReduceInteractions(ebm, terms, sql_decimals):
+    """Lookup rows of the interaction terms, a row per bin of the first feature
 
-    lookup_df_grouped = lookup_df_simple.merge(
-        hash_lookup_df, on="score_hash", how="left"
-    )
+    The feature with the most bins becomes the second feature (unless the first is
+    categorical), its bounds and scores are lists per bin of the first feature.
+    Adjacent numeric bins of the second feature with equal scores are merged into
+    the last of them, except for the last (infinite) bin.
 
-    # ordering sets None in last place
-    lookup_df_grouped.sort_values(
-        ["feat_1", "feat_2", "feat_bound_1", "feat_bound_2"],
-        inplace=True,
-        ascending=False,
-    )
+    Args:
+        ebm: A trained EBM
+        terms: Indexes of the interaction terms
+        sql_decimals: Number of decimals to round the scores to
 
-    # So reverse the ordering
-    lookup_df_grouped = lookup_df_grouped.iloc[::-1].reset_index(drop=True)
+    Returns:
+        A DataFrame with the features, their types and bounds and the scores
+    """
+    pairs = []
+    for term in terms:
+        feature_indexes = list(ebm.term_features_[term])
+        names = [ebm.feature_names[i] for i in feature_indexes]
+
+        # Interaction terms use their own (coarser) bins if the EBM has them
+        bins = []
+        for i in feature_indexes:
+            bin_levels = ebm.bins_[i]
+            bins.append(_sorted_bins(bin_levels[min(2, len(bin_levels)) - 1]))
+
+        # The last scores are for unknown values, these are not written in SQL
+        scores = np.round(ebm.term_scores_[term][:-1, :-1], sql_decimals)
+        if scores.shape[0] > scores.shape[1] and bins[0][2] == "numeric":
+            names, bins, scores = names[::-1], bins[::-1], np.swapaxes(scores, 0, 1)
+
+        (bounds_1, order_1, type_1), (bounds_2, order_2, type_2) = bins
+        pairs.append(
+            (names, bounds_1, type_1, bounds_2, type_2, scores[order_1][:, order_2])
+        )
 
-    # Group second feature to list again for easier SQL writing
-    lookup_df_group_feat2 = (
-        lookup_df_grouped.groupby(
-            ["feat_1", "feat_2", "feat_type_1", "feat_type_2", "feat_bound_1"]
+    rows = []
+    for names, bounds_1, type_1, bounds_2, type_2, scores in sorted(
+        pairs, key=lambda pair: pair[0]
+    ):
+        # The missing value bin can merge with the bins after it, the last bin can not
+        bounds_2 = np.array(bounds_2, dtype=object)
+        mergeable = np.array(
+            [type_2 == "numeric" and bound != np.inf for bound in bounds_2]
         )
-        .agg({"feat_bound_2": list, "score": list})
-        .reset_index(drop=False)
-    )
+        mergeable[0] = False
+
+        for bound_1, row_scores in zip(bounds_1, scores):
+            merge = np.concatenate(
+                [[False], _equal_to_previous(row_scores) & mergeable[1:]]
+            )
+            starts = np.flatnonzero(~merge)
+            ends = np.append(starts[1:], len(row_scores)) - 1
+            rows.append(
+                {
+                    "feat_1": names[0],
+                    "feat_2": names[1],
+                    "feat_type_1": type_1,
+                    "feat_type_2": type_2,
+                    "feat_bound_1": bound_1,
+                    "feat_bound_2": list(bounds_2[ends]),
+                    "score": list(row_scores[starts]),
+                }
+            )
 
-    return lookup_df_group_feat2
+    return pd.DataFrame(rows)
 
 
 def extractLookupTable(ebm, post_params):
@@ -212,124 +204,27 @@ def extractLookupTable(ebm, post_params):
 
     Args:
         ebm: A trained EBM
+        post_params: Post modelling parameters, 'sql_decimals' sets the rounding of
+            the scores
 
     Returns:
         A dict of dataframes including information to create SQL code
     """
+    if any(len(f) > 2 for f in ebm.term_features_):  # pragma: no cover
+        raise Exception("Interactions greater than 2 not supported.")
 
-    # Add per feature graph
-    lookup_dicts = []
-
-    for feature_group_index, feature_indexes in enumerate(ebm.term_features_):
-        # below includes treatment for missing values
-        model_graph = ebm.term_scores_[feature_group_index]
-
-        # NOTE: This uses stddev. for bounds, consider issue warnings.
-        errors = ebm.standard_deviations_[feature_group_index]
-
-        if len(feature_indexes) == 1:
-            # hack. remove the last index which is for unknown values
-            model_graph = model_graph[0:-1]
-            errors = errors[0:-1]
-
-            feature_bins = ebm.bins_[feature_group_index][0]
-
-            scores = list(model_graph)
-            upper_bounds = list(model_graph + errors)
-            lower_bounds = list(model_graph - errors)
-
-            if isinstance(feature_bins, dict):
-                # categorical
-                feat_bound = list(feature_bins.keys())
-                feat_bound.insert(0, None)
-                feat_type = "categorical"
-
-            else:
-                feat_bound = np.append(feature_bins, np.inf)
-                feat_bound = np.append(None, feat_bound)
-                feat_type = "numeric"
-
-            score = scores
-            score_lower_bound = lower_bounds
-            score_upper_bound = upper_bounds
-
-            lookup_dict = {
-                "nr_features": 1,
-                "feature": ebm.feature_names[feature_indexes[0]],
-                "feat_bound": feat_bound,
-                "score": list(
-                    np.round(score, post_params["sql_decimals"])
-                ),  ## To avoid data type overflow
-                "score_lower_bound": score_lower_bound,
-                "score_upper_bound": score_upper_bound,
-                "feat_type": feat_type,
-            }
-
-            lookup_dicts.append(lookup_dict)
-
-        elif len(feature_indexes) == 2:
-            # hack. remove the last index which is for unknown values and just zeros
-            model_graph = model_graph[0:-1, 0:-1]
-
-            score = model_graph
-
-            feat_bound = [[]] * len(feature_indexes)
-            feat_type = [[]] * len(feature_indexes)
+    single_terms = [t for t, f in enumerate(ebm.term_features_) if len(f) == 1]
+    double_terms = [t for t, f in enumerate(ebm.term_features_) if len(f) == 2]
 
-            # Make loop over labels to update the score and features bounds
-            # Check for non binary variable
-            for b in range(len(feature_indexes)):
-                bin_levels = ebm.bins_[feature_indexes[b]]
-                feature_bins = bin_levels[
-                    min(len(feature_indexes), len(bin_levels)) - 1
-                ]
-
-                if isinstance(feature_bins, dict):
-                    feat_bound[b] = list(feature_bins.keys())
-                    feat_bound[b].insert(0, None)
-                    feat_type[b] = "categorical"
-                else:
-                    feat_bound[b] = np.append(feature_bins, np.inf)
-                    feat_bound[b] = np.append(None, feat_bound[b])
-                    feat_type[b] = "numeric"
-
-            lookup_dict = {
-                "nr_features": 2,
-                "feature": [
-                    ebm.feature_names[feature_indexes[0]],
-                    ebm.feature_names[feature_indexes[1]],
-                ],
-                "feat_bound": feat_bound,
-                "score": np.round(score, post_params["sql_decimals"]),
-                "feat_type": feat_type,
-                # not implemented for interaction terms
-                # , 'score_lower_bound': score_lower_bound
-                # , 'score_upper_bound': score_upper_bound
-            }
-
-            lookup_dicts.append(lookup_dict)
-
-        else:  # pragma: no cover
-            raise Exception("Interactions greater than 2 not supported.")
-
-    df_of_lists = pd.DataFrame(lookup_dicts)
-
-    # we treat single and double features differently
-    df_of_lists_single = df_of_lists[df_of_lists["nr_features"] == 1].reset_index(
-        drop=True
-    )
-    df_of_lists_double = df_of_lists[df_of_lists["nr_features"] == 2].reset_index(
-        drop=True
+    lookup_df_single = ReduceSingleFeatures(
+        ebm, single_terms, post_params["sql_decimals"]
     )
 
-    # Reduce Single featuers lookup
-    lookup_df_single = ReduceSingleFeature(df_of_lists_single)
-
     # Check if interactions exist
-    if len(df_of_lists_double) > 0:
-        # Restructure and reduce double feature df
-        lookup_df_double = RestructureReduceInteractions(df_of_lists_double)
-
+    if len(double_terms) > 0:
+        lookup_df_double = ReduceInteractions(
+            ebm, double_terms, post_params["sql_decimals"]
+        )
     else:
         lookup_df_double = None
 
@@ -340,165 +235,323 @@ def extractLookupTable(ebm, post_params):
     }
 
 
-def lookup_df_to_sql(model_name, df_dict, model_type, split):
+def lookup_df_to_sql(
+    sql,
+    model_name,
+    df_dict,
+    model_type,
+    split,
+    numeric_bins="linear",
+    dialect=SQLDialect(),
+):
     # Create list for all feature score names
     feature_list = []
 
+    # Numeric bins the dialect joins on are defined first
+    joined_features = numeric_bins_ctes(sql, df_dict["feature_single"], dialect, [""])
+
     # Start with intercept term
     intercept = df_dict["intercept"][0]
     if not split:
-        print("SELECT \n")
-        print(f"'{model_name}' AS model_name \n, ")
-        print(f"{intercept} AS intercept")
+        sql.print("SELECT \n")
+        select_source_columns(sql, joined_features)
+        sql.print(f"'{model_name}' AS model_name \n, ")
+        sql.print(f"{intercept} AS intercept")
     elif split:
         # Creating CTE to create table aliases
-        print("WITH feature_scores AS (\nSELECT")
-        print(f"'{model_name}' AS model_name \n, ")
-        print(f"{intercept} AS intercept")
+        sql.print(
+            "{} feature_scores AS (\nSELECT".format(", " if joined_features else "WITH")
+        )
+        select_source_columns(sql, joined_features)
+        sql.print(f"'{model_name}' AS model_name \n, ")
+        sql.print(f"{intercept} AS intercept")
 
     feature_list.append("intercept")
 
     # for single feature
-    single_features = single_feature_handling(df_dict["feature_single"])
+    single_features = single_feature_handling(
+        sql, df_dict["feature_single"], numeric_bins, joined_features
+    )
     feature_list = feature_list + single_features
 
-    if len(df_dict["feature_double"]) > 0:
-        double_features = double_feature_sql_handling(df_dict["feature_double"])
+    if df_dict["feature_double"] is not None:
+        double_features = double_feature_sql_handling(sql, df_dict["feature_double"])
         feature_list = feature_list + double_features
 
     if not split:
         # Sum up all separate scores
-        print(", ", end="")
-        print(*feature_list, sep=" + ")
+        sql.print(", ", end="")
+        sql.print(*feature_list, sep=" + ")
 
         if model_type == "regression":
-            print(" AS prediction")
+            sql.print(" AS prediction")
         else:
-            print(" AS score")
+            sql.print(" AS score")
             # Applying softmax
-            print(", EXP(score)/(EXP(score) + 1) AS probability")
+            sql.print(
+                f", {dialect.exp('score')}/({dialect.exp('score')} + 1) AS probability"
+            )
 
         # Add placeholder for source table
-        print("FROM <source_table> -- TODO replace with correct table")
+        from_source_table(sql, joined_features, dialect)
 
     elif split:
         # Add placeholder for source table
-        print("FROM <source_table> -- TODO replace with correct table")
+        from_source_table(sql, joined_features, dialect)
 
         # Close CTE and create next SELECT statement
-        print("), add_sum_scores AS (")
-        print("SELECT *")
+        sql.print("), add_sum_scores AS (")
+        sql.print("SELECT *")
 
         # Sum up all separate scores
-        print(", ", end="")
-        print(*feature_list, sep=" + ")
+        sql.print(", ", end="")
+        sql.print(*feature_list, sep=" + ")
 
         if model_type == "regression":
-            print(" AS prediction")
+            sql.print(" AS prediction")
         else:
-            print(" AS score")
+            sql.print(" AS score")
 
-        print("FROM feature_scores")
+        sql.print("FROM feature_scores")
 
         # Close CTE and make final Select statement
-        print(")")
-        print("SELECT *")
+        sql.print(")")
+        sql.print("SELECT *")
 
         if model_type != "regression":
             # Applying softmax
-            print(", EXP(score)/(EXP(score) + 1) AS probability")
+            sql.print(
+                f", {dialect.exp('score')}/({dialect.exp('score')} + 1) AS probability"
+            )
+
+        sql.print("FROM add_sum_scores")
+
+
+def numeric_bins_ctes(sql, df, dialect, score_suffixes):
+    """Write the bins of the numeric features as CTEs, for dialects joining on them
+
+    Args:
+        sql: SQLBuilder to write the SQL to
+        df: Lookup rows of the single features
+        dialect: The SQLDialect
+        score_suffixes: Suffix of the score column per class ([""] unless multiclass)
+
+    Returns:
+        The features with a CTE, empty if the dialect does not join on numeric bins
+    """
+    features = []
+    for f in df.loc[df["feat_type"] == "numeric", "feature"].unique():
+        feature_df = df[df["feature"] == f].reset_index(drop=True)
+        scores = list(feature_df["score"])
+        if len(score_suffixes) > 1:
+            scores = [np.atleast_1d(score) for score in scores]
+        _, bounds, bin_scores = _split_missing_bin(feature_df, scores)
+        if len(score_suffixes) > 1:
+            bin_scores = {
+                suffix: [score[i] for score in bin_scores]
+                for i, suffix in enumerate(score_suffixes)
+            }
+        else:
+            bin_scores = {"": bin_scores}
+
+        cte = dialect.numeric_bins_cte(f"{f}_bins", bounds, bin_scores)
+        if cte is None:
+            # The dialect writes CASE statements
+            return []
+        sql.print("WITH" if not features else ",", cte)
+        features.append(f)
+    return features
+
+
+def select_source_columns(sql, joined_features):
+    # Joins do not keep the row order, the source columns identify the rows
+    if joined_features:
+        sql.print("src.*,")
 
-        print("FROM add_sum_scores")
 
+def from_source_table(sql, joined_features, dialect):
+    """Write the FROM clause with the source table, joined on the numeric bins CTEs
 
-def single_feature_handling(df):
+    Args:
+        sql: SQLBuilder to write the SQL to
+        joined_features: Features with a numeric bins CTE, see numeric_bins_ctes
+        dialect: The SQLDialect
+    """
+    if not joined_features:
+        sql.print("FROM <source_table> -- TODO replace with correct table")
+        return
+
+    sql.print("FROM <source_table> AS src -- TODO replace with correct table")
+    for f in joined_features:
+        sql.print(dialect.numeric_bins_join(f"{f}_bins", f))
+
+
+def single_feature_2_sql_joined(sql, df, feature, scores, score_suffix=""):
+    """Write the CASE body of a numeric feature with its bin joined on
+
+    Args:
+        sql: SQLBuilder to write the SQL to
+        df: Lookup rows of the feature, the missing value bin (if any) first
+        feature: Name of the feature column
+        scores: Score per row of df
+        score_suffix: Suffix of the score column of the bins CTE
+    """
+    null_score, _, _ = _split_missing_bin(df, scores)
+    sql.print(f" WHEN src.{feature} IS NULL THEN {null_score}")
+    sql.print(f" ELSE {feature}_bins.bin_score{score_suffix}")
+    sql.print("END")
+
+
+def single_feature_handling(sql, df, numeric_bins="linear", joined_features=()):
     feature_nr = 0
     feature_list = []
     for f in df["feature"].unique():
         feature_df = df[df["feature"] == f].reset_index(drop=True)
 
         # Each feature score as seperate column
-        print(",\nCASE")
+        sql.print(",\nCASE")
 
-        single_feature_2_sql(feature_df, f)
+        if f in joined_features:
+            single_feature_2_sql_joined(sql, feature_df, f, feature_df["score"])
+        elif numeric_bins == "binary" and feature_df["feat_type"].iloc[0] == "numeric":
+            single_feature_2_sql_binary(sql, feature_df, f, feature_df["score"])
+        else:
+            single_feature_2_sql(sql, feature_df, f)
         feature_nr += 1
         feature_list.append(f"{f}_score")
 
         # feature score alias
-        print(f"AS {f}_score")
+        sql.print(f"AS {f}_score")
 
     return feature_list
 
 
-def single_feature_2_sql(df, feature):
-    for index, row in df.iterrows():
+def single_feature_2_sql(sql, df, feature):
+    # Plain records, indexing DataFrame rows is slow for features with many bins
+    records = df.to_dict("records")
+    for index, row in enumerate(records):
         # Check if bound is for missing values (=None)
         if pd.isna(row["feat_bound"]):
-            print(
+            sql.print(
                 " WHEN {feature} IS NULL THEN {score}".format(
                     feature=feature,
                     score=row["score"],
                 )
             )
             # Add ELSE 0.0 as last entry
-            if index == df.index[-1]:
-                print(" ELSE 0.0")
+            if index == len(records) - 1:
+                sql.print(" ELSE 0.0")
 
         # check if string/category
         elif row["feat_type"] == "categorical":
             # check for manual imputed null values
-            print(
+            sql.print(
                 " WHEN {feature} = '{lb}' THEN {score}".format(
                     feature=feature, lb=row["feat_bound"], score=row["score"]
                 )
             )
             # Add ELSE 0.0 as last entry
-            if index == df.index[-1]:
-                print(" ELSE 0.0")
+            if index == len(records) - 1:
+                sql.print(" ELSE 0.0")
 
         # check for last numeric bound
         elif row["feat_bound"] == np.inf:
-            print(
+            sql.print(
                 " WHEN {feature} >= {lb} THEN {score}".format(
                     feature=feature,
-                    lb=df.iloc[index - 1, :]["feat_bound"],
+                    lb=records[index - 1]["feat_bound"],
                     score=row["score"],
                 )
             )
             # Add ELSE 0.0 as last entry
-            if index == df.index[-1]:
-                print(" ELSE 0.0")
+            if index == len(records) - 1:
+                sql.print(" ELSE 0.0")
 
         # otherwise it should be a float
         elif isinstance(row["feat_bound"], float):
             # First bound (skipping the missing values)
             if index <= 1:
-                print(
+                sql.print(
                     " WHEN {feature} <= {ub} THEN {score}".format(
                         feature=feature, ub=row["feat_bound"], score=row["score"]
                     )
                 )
 
             else:
-                print(
+                sql.print(
                     " WHEN {feature} > {lb} AND {feature} <= {ub} THEN {score}".format(
                         feature=feature,
-                        lb=df.iloc[index - 1, :]["feat_bound"],
+                        lb=records[index - 1]["feat_bound"],
                         ub=row["feat_bound"],
                         score=row["score"],
                     )
                 )
             # Add ELSE 0.0 as last entry
-            if index == df.index[-1]:
-                print(" ELSE 0.0")
+            if index == len(records) - 1:
+                sql.print(" ELSE 0.0")
 
         else:
             raise "not sure what to do"
 
-    print("END")
+    sql.print("END")
+
+
+def numeric_bins_2_sql(sql, feature, bounds, scores, depth=1):
+    """Write a balanced nested CASE over sorted numeric bins (a binary search)
+
+    A value falls in the first bin with an upper bound it does not exceed, the same
+    as the linear WHEN chain, but each row only evaluates log2(bins) comparisons.
+
+    Args:
+        sql: SQLBuilder to write the SQL to
+        feature: Name of the feature column
+        bounds: Upper bound per bin, ascending, the last bin is unbounded
+        scores: Score per bin
+        depth: Nesting level, for indentation
+    """
+    indent = "    " * depth
+    if len(scores) == 1:
+        sql.print(f"{indent}{scores[0]}")
+        return
+
+    middle = len(scores) // 2
+    sql.print(f"{indent}CASE WHEN {feature} <= {bounds[middle - 1]} THEN")
+    numeric_bins_2_sql(sql, feature, bounds[:middle], scores[:middle], depth + 1)
+    sql.print(f"{indent}ELSE")
+    numeric_bins_2_sql(sql, feature, bounds[middle:], scores[middle:], depth + 1)
+    sql.print(f"{indent}END")
+
 
+def _split_missing_bin(df, scores):
+    # Score of missing values (0.0 without a missing value bin) and the other bins
+    is_null = df["feat_bound"].isna().to_numpy()
+    null_score = scores[np.flatnonzero(is_null)[0]] if is_null.any() else 0.0
+    bounds = list(df.loc[~is_null, "feat_bound"])
+    bin_scores = [score for score, null in zip(scores, is_null) if not null]
+    return null_score, bounds, bin_scores
 
-def double_feature_sql_handling(df):
+
+def single_feature_2_sql_binary(sql, df, feature, scores):
+    """Write the CASE body of a numeric feature as a binary search over its bins
+
+    Args:
+        sql: SQLBuilder to write the SQL to
+        df: Lookup rows of the feature, the missing value bin (if any) first
+        feature: Name of the feature column
+        scores: Score per row of df
+    """
+    null_score, bounds, bin_scores = _split_missing_bin(df, scores)
+
+    sql.print(f" WHEN {feature} IS NULL THEN {null_score}")
+    if bin_scores:
+        sql.print(" ELSE")
+        numeric_bins_2_sql(sql, feature, bounds, bin_scores)
+    else:
+        sql.print(" ELSE 0.0")
+    sql.print("END")
+
+
+def double_feature_sql_handling(sql, df):
     feature_nr = 0
     feature_list = []
     df["double_feature"] = df["feat_1"] + "_x_" + df["feat_2"]
@@ -506,23 +559,25 @@ def double_feature_sql_handling(df):
         feature_df = df[df["double_feature"] == f].reset_index(drop=True)
 
         # Each double feature score as case statement
-        print(",\nCASE")
+        sql.print(",\nCASE")
 
-        double_feature_2_sql(feature_df, f)
+        double_feature_2_sql(sql, feature_df, f)
         feature_nr += 1
         feature_list.append(f"{f}_score")
 
         # feature score alias
-        print(f"AS {f}_score")
+        sql.print(f"AS {f}_score")
 
     return feature_list
 
 
-def double_feature_2_sql(df, double_feature):
-    for index, row in df.iterrows():
+def double_feature_2_sql(sql, df, double_feature):
+    # Plain records, indexing DataFrame rows is slow for features with many bins
+    records = df.to_dict("records")
+    for index, row in enumerate(records):
         # Check if bound is for missing values (=None)
         if pd.isna(row["feat_bound_1"]):
-            print(
+            sql.print(
                 " WHEN {feature} IS NULL THEN \n      CASE".format(
                     feature=row["feat_1"]
                 )
@@ -530,7 +585,7 @@ def double_feature_2_sql(df, double_feature):
 
         # check if string/category
         elif row["feat_type_1"] == "categorical":
-            print(
+            sql.print(
                 " WHEN {feature} = '{lb}' THEN \n     CASE".format(
                     feature=row["feat_1"], lb=row["feat_bound_1"]
                 )
@@ -538,9 +593,9 @@ def double_feature_2_sql(df, double_feature):
 
         # check for last numeric bound
         elif row["feat_bound_1"] == np.inf:
-            print(
+            sql.print(
                 " WHEN {feature} >= {lb} THEN \n      CASE".format(
-                    feature=row["feat_1"], lb=df.loc[index - 1, "feat_bound_1"]
+                    feature=row["feat_1"], lb=records[index - 1]["feat_bound_1"]
                 )
             )
 
@@ -548,17 +603,17 @@ def double_feature_2_sql(df, double_feature):
         elif isinstance(row["feat_bound_1"], float):
             # First bound (skipping the missing values)
             if index <= 1:
-                print(
+                sql.print(
                     " WHEN {feature} <= {ub} THEN \n      CASE".format(
                         feature=row["feat_1"], ub=row["feat_bound_1"]
                     )
                 )
 
             else:
-                print(
+                sql.print(
                     " WHEN {feature} > {lb} AND {feature} <= {ub} THEN \n     CASE".format(
                         feature=row["feat_1"],
-                        lb=df.loc[index - 1, "feat_bound_1"],
+                        lb=records[index - 1]["feat_bound_1"],
                         ub=row["feat_bound_1"],
                     )
                 )
@@ -573,7 +628,7 @@ def double_feature_2_sql(df, double_feature):
         for sf_index in range(nr_bounds):
             # Check if bound is for missing values (=None)
             if pd.isna(row["feat_bound_2"][sf_index]):
-                print(
+                sql.print(
                     "         WHEN {feature} IS NULL THEN {score}".format(
                         feature=row["feat_2"],
                         score=row["score"][sf_index],
@@ -582,18 +637,17 @@ def double_feature_2_sql(df, double_feature):
 
             # check if string/category
             elif row["feat_type_2"] == "categorical":
-                # check for manual imputed null values
-                print(
+                sql.print(
                     "         WHEN {feature} = '{lb}' THEN {score}".format(
                         feature=row["feat_2"],
-                        lb=row["feat_bound_2"][sf_index - 1],
+                        lb=row["feat_bound_2"][sf_index],
                         score=row["score"][sf_index],
                     )
                 )
 
             # check for last numeric bound
             elif row["feat_bound_2"][sf_index] == np.inf:
-                print(
+                sql.print(
                     "         WHEN {feature} >= {lb} THEN {score}".format(
                         feature=row["feat_2"],
                         lb=row["feat_bound_2"][sf_index - 1],
@@ -605,7 +659,7 @@ def double_feature_2_sql(df, double_feature):
             elif isinstance(row["feat_bound_2"][sf_index], float):
                 # First bound (skipping the missing values)
                 if sf_index <= 1:
-                    print(
+                    sql.print(
                         "         WHEN {feature} <= {ub} THEN {score}".format(
                             feature=row["feat_2"],
                             ub=row["feat_bound_2"][sf_index],
@@ -614,7 +668,7 @@ def double_feature_2_sql(df, double_feature):
                     )
 
                 else:
-                    print(
+                    sql.print(
                         "         WHEN {feature} > {lb} AND {feature} <= {ub} THEN {score}".format(
                             feature=row["feat_2"],
                             lb=row["feat_bound_2"][sf_index - 1],
@@ -628,27 +682,35 @@ def double_feature_2_sql(df, double_feature):
 
             # Add ELSE 0.0 as last entry
             if sf_index + 1 == nr_bounds:
-                print("         ELSE 0.0")
+                sql.print("         ELSE 0.0")
 
-        print("     END")
+        sql.print("     END")
     # Catch anything else
-    print(" ELSE 0.0")
-    print("END")
+    sql.print(" ELSE 0.0")
+    sql.print("END")
 
 
-def lookup_df_to_sql_multiclass(model_name, df, classes, split):
+def lookup_df_to_sql_multiclass(
+    sql, model_name, df, classes, split, numeric_bins="linear", dialect=SQLDialect()
+):
     df_single = df["feature_single"]
     intercepts = df["intercept"]
 
+    # Numeric bins the dialect joins on are defined first
+    joined_features = numeric_bins_ctes(
+        sql, df_single, dialect, [f"_{c}" for c in classes]
+    )
+
     if split:
         # Add starting cte
-        print("WITH feature_scores AS (")
+        sql.print("{} feature_scores AS (".format(", " if joined_features else "WITH"))
 
-    print("SELECT")
-    print(f"'{model_name}' AS model_name")
+    sql.print("SELECT")
+    select_source_columns(sql, joined_features)
+    sql.print(f"'{model_name}' AS model_name")
     # Add intercepts
     for i, c in enumerate(classes):
-        print(f", {intercepts[i]} AS intercept_{c}")
+        sql.print(f", {intercepts[i]} AS intercept_{c}")
 
     class_nr = 0
     feature_list = {}
@@ -662,10 +724,31 @@ def lookup_df_to_sql_multiclass(model_name, df, classes, split):
         for f in df_single["feature"].unique():
             feature_df = df_single[df_single["feature"] == f].reset_index(drop=True)
 
-            single_feature_2_sql_multiclass(feature_df, f, class_nr)
+            if f in joined_features:
+                sql.print(",\nCASE")
+                single_feature_2_sql_joined(
+                    sql,
+                    feature_df,
+                    f,
+                    [score[class_nr] for score in feature_df["score"]],
+                    f"_{c}",
+                )
+            elif (
+                numeric_bins == "binary"
+                and feature_df["feat_type"].iloc[0] == "numeric"
+            ):
+                sql.print(",\nCASE")
+                single_feature_2_sql_binary(
+                    sql,
+                    feature_df,
+                    f,
+                    [score[class_nr] for score in feature_df["score"]],
+                )
+            else:
+                single_feature_2_sql_multiclass(sql, feature_df, f, class_nr)
 
             # Feature score as alias
-            print(f"AS {f}_score_{c}")
+            sql.print(f"AS {f}_score_{c}")
             feature_list[c].append(f"{f}_score_{c}")
 
             feature_nr += 1
@@ -673,135 +756,143 @@ def lookup_df_to_sql_multiclass(model_name, df, classes, split):
 
     if split:
         # Add placeholder for source table
-        print("FROM <source_table> -- TODO replace with correct table")
+        from_source_table(sql, joined_features, dialect)
         # Close CTE and create next SELECT statement
-        print("), add_sum_scores AS (")
-        print("SELECT *")
+        sql.print("), add_sum_scores AS (")
+        sql.print("SELECT *")
 
     if not split:
         for c in classes:
             # Sum up all separate scores
-            print(", ", end="")
-            print(*feature_list[c], sep=" + ")
-            print(f" AS score_{c}")
+            sql.print(", ", end="")
+            sql.print(*feature_list[c], sep=" + ")
+            sql.print(f" AS score_{c}")
 
     elif split:
         for c in classes:
             # Create CTE with sums of all features scores per class
-            print(", ", end="")
-            print(*feature_list[c], sep=" + ")
-            print(f" AS score_{c}")
+            sql.print(", ", end="")
+            sql.print(*feature_list[c], sep=" + ")
+            sql.print(f" AS score_{c}")
         # From CTE
-        print("FROM feature_scores")
+        sql.print("FROM feature_scores")
 
     # Summing feature scores to total score per class
     if not split:
         for c in classes:
             if c == classes[0]:
-                print(f", EXP(score_{c})", end="")
+                sql.print(f", {dialect.exp(f'score_{c}')}", end="")
             else:
-                print(f" + EXP(score_{c})", end="")
-        print(" AS total_score")
+                sql.print(f" + {dialect.exp(f'score_{c}')}", end="")
+        sql.print(" AS total_score")
 
     elif split:
         # Close CTE and create next SELECT statement
-        print("), add_sum_all_scores AS (")
-        print("SELECT *")
+        sql.print("), add_sum_all_scores AS (")
+        sql.print("SELECT *")
 
         for c in classes:
             if c == classes[0]:
-                print(f", EXP(score_{c})", end="")
+                sql.print(f", {dialect.exp(f'score_{c}')}", end="")
             else:
-                print(f" + EXP(score_{c})", end="")
-        print(" AS total_score")
+                sql.print(f" + {dialect.exp(f'score_{c}')}", end="")
+        sql.print(" AS total_score")
 
         # Check class with highest score
 
         # Get max score
-        print(f", GREATEST({', '.join([f'score_{i}' for i in classes])}) AS max_score")
+        sql.print(f", {dialect.greatest([f'score_{i}' for i in classes])} AS max_score")
 
         # Close CTE and create final SELECT statement
-        print("FROM add_sum_scores")
-        print(")")
-        print("SELECT *")
+        sql.print("FROM add_sum_scores")
+        sql.print(")")
+        sql.print("SELECT *")
 
     # Applying softmax
     if not split:
         for c in classes:
-            print(f", EXP(score_{c}) / (total_score) AS probability_{c}", end="\n")
+            sql.print(
+                f", {dialect.exp(f'score_{c}')} / (total_score) AS probability_{c}",
+                end="\n",
+            )
 
-        print(
-            f", GREATEST({', '.join([f'probability_{i}' for i in classes])}) AS max_probability"
+        sql.print(
+            f", {dialect.greatest([f'probability_{i}' for i in classes])} AS max_probability"
         )
 
-        print(", CASE")
+        sql.print(", CASE")
         for c in classes:
-            print(f"\t WHEN probability_{c} = max_probability THEN '{c}'")
-        print("END AS prediction")
+            sql.print(f"\t WHEN probability_{c} = max_probability THEN '{c}'")
+        sql.print("END AS prediction")
 
         # Add placeholder for source table
-        print("FROM <source_table> -- TODO replace with correct table")
+        from_source_table(sql, joined_features, dialect)
     elif split:
         for c in classes:
-            print(f", EXP(score_{c}) / (total_score) AS probability_{c}", end="\n")
+            sql.print(
+                f", {dialect.exp(f'score_{c}')} / (total_score) AS probability_{c}",
+                end="\n",
+            )
 
-        print(", EXP(max_score) / (total_score) AS max_probability")
+        sql.print(f", {dialect.exp('max_score')} / (total_score) AS max_probability")
 
-        print(", CASE")
+        sql.print(", CASE")
         for c in classes:
-            print(f"\t WHEN score_{c} = max_score THEN '{c}'")
-        print("END AS prediction")
+            sql.print(f"\t WHEN score_{c} = max_score THEN '{c}'")
+        sql.print("END AS prediction")
 
-        print("FROM add_sum_all_scores")
+        sql.print("FROM add_sum_all_scores")
 
 
-def single_feature_2_sql_multiclass(df, feature, class_nr):
+def single_feature_2_sql_multiclass(sql, df, feature, class_nr):
     # Start new case statement
-    print(",\nCASE")
+    sql.print(",\nCASE")
 
-    for index, row in df.iterrows():
+    # Plain records, indexing DataFrame rows is slow for features with many bins
+    records = df.to_dict("records")
+    for index, row in enumerate(records):
         # Check if bound is for missing values (=None)
         if pd.isna(row["feat_bound"]):
-            print(
+            sql.print(
                 " WHEN {feature} IS NULL THEN {score}".format(
                     feature=feature,
                     score=row["score"][class_nr],
                 )
             )
             # Add ELSE 0.0 as last entry
-            if index == df.index[-1]:
-                print(" ELSE 0.0")
+            if index == len(records) - 1:
+                sql.print(" ELSE 0.0")
 
         # check if string/category
         elif row["feat_type"] == "categorical":
             # check for manual imputed null values
-            print(
+            sql.print(
                 " WHEN {feature} = '{lb}' THEN {score}".format(
                     feature=feature, lb=row["feat_bound"], score=row["score"][class_nr]
                 )
             )
             # Add ELSE 0.0 as last entry
-            if index == df.index[-1]:
-                print(" ELSE 0.0")
+            if index == len(records) - 1:
+                sql.print(" ELSE 0.0")
 
         # check for last numeric bound
         elif row["feat_bound"] == np.inf:
-            print(
+            sql.print(
                 " WHEN {feature} >= {lb} THEN {score}".format(
                     feature=feature,
-                    lb=df.iloc[index - 1, :]["feat_bound"],
+                    lb=records[index - 1]["feat_bound"],
                     score=row["score"][class_nr],
                 )
             )
             # Add ELSE 0.0 as last entry
-            if index == df.index[-1]:
-                print(" ELSE 0.0")
+            if index == len(records) - 1:
+                sql.print(" ELSE 0.0")
 
         # otherwise it should be a float
         elif isinstance(row["feat_bound"], float):
             # First bound (skipping the missing values)
             if index <= 1:
-                print(
+                sql.print(
                     " WHEN {feature} <= {ub} THEN {score}".format(
                         feature=feature,
                         ub=row["feat_bound"],
@@ -810,33 +901,457 @@ def single_feature_2_sql_multiclass(df, feature, class_nr):
                 )
 
             else:
-                print(
+                sql.print(
                     " WHEN {feature} > {lb} AND {feature} <= {ub} THEN {score}".format(
                         feature=feature,
-                        lb=df.iloc[index - 1, :]["feat_bound"],
+                        lb=records[index - 1]["feat_bound"],
                         ub=row["feat_bound"],
                         score=row["score"][class_nr],
                     )
                 )
             # Add ELSE 0.0 as last entry
-            if index == df.index[-1]:
-                print(" ELSE 0.0")
+            if index == len(records) - 1:
+                sql.print(" ELSE 0.0")
 
         else:
             raise "not sure what to do"
 
-    print("END")
+    sql.print("END")
+
 
+def ebm_to_sql(
+    model_name, df, classes, split=True, numeric_bins="linear", dialect="default"
+):
+    """SQL query of an EBM with the scores as CASE statements
+
+    Args:
+        model_name: Name of the model
+        df: Lookup tables as created by extractLookupTable
+        classes: The model classes ([0] for regression)
+        split: Whether to write the query as several CTEs
+        numeric_bins: How to write the bins of numeric features, see SQL_NUMERIC_BINS
+        dialect: SQL dialect, see SQL_DIALECTS. Dialects joining on the numeric bins
+            (duckdb) do so instead of numeric_bins and include the source columns
 
-def ebm_to_sql(model_name, df, classes, split=True):
+    Returns:
+        The SQL query
+    """
+    if numeric_bins not in SQL_NUMERIC_BINS:
+        raise ValueError(
+            f"Unknown sql_numeric_bins '{numeric_bins}', use one of {', '.join(SQL_NUMERIC_BINS)}"
+        )
+    dialect = get_dialect(dialect)
+
+    sql = SQLBuilder()
     if len(classes) > 2:
-        lookup_df_to_sql_multiclass(model_name, df, classes, split)
+        lookup_df_to_sql_multiclass(
+            sql, model_name, df, classes, split, numeric_bins, dialect
+        )
     elif len(classes) == 1:
         model_type = "regression"
-        lookup_df_to_sql(model_name, df, model_type, split)
+        lookup_df_to_sql(sql, model_name, df, model_type, split, numeric_bins, dialect)
     else:
         model_type = "binary"
-        lookup_df_to_sql(model_name, df, model_type, split)
+        lookup_df_to_sql(sql, model_name, df, model_type, split, numeric_bins, dialect)
+    return sql.getvalue()
+
+
+def bin_conditions(bounds, feat_type):
+    """Bin of each lookup bound as (missing, category, lower bound, upper bound)
+
+    A numeric value falls in the bin with lower < value <= upper, where a missing
+    (None) lower or upper bound is unbounded. The same bins as the CASE statements.
+
+    Args:
+        bounds: Bounds of the lookup rows of a feature, in order
+        feat_type: 'numeric' or 'categorical'
+
+    Returns:
+        A list with a tuple per bound
+    """
+    bins = []
+    lower = None
+    for bound in bounds:
+        if pd.isna(bound):
+            bins.append((True, None, None, None))
+        elif feat_type == "categorical":
+            bins.append((False, str(bound), None, None))
+        else:
+            upper = None if bound == np.inf else float(bound)
+            bins.append((False, None, lower, upper))
+            lower = upper
+    return bins
+
+
+def scoreTable(df_dict, classes):
+    """Score table of all EBM terms, a row per (pair of) bin(s)
+
+    Bins scoring 0.0 are left out, the scoring query defaults to 0.0. Except for the
+    numeric bins of single features, these cover all values so each value can be
+    matched to the first bin with an upper bound it does not exceed.
+
+    Args:
+        df_dict: Lookup tables as created by extractLookupTable
+        classes: The model classes, one score column per class for multiclass
+
+    Returns:
+        A DataFrame with the term, the bin of each feature (_1 and _2) and its score
+    """
+    score_columns = [f"score_{c}" for c in classes] if len(classes) > 2 else ["score"]
+    rows = []
+
+    df_single = df_dict["feature_single"]
+    for f in df_single["feature"].unique():
+        feature_df = df_single[df_single["feature"] == f]
+        bins = bin_conditions(feature_df["feat_bound"], feature_df["feat_type"].iloc[0])
+        for bin_1, score in zip(bins, feature_df["score"]):
+            rows.append((f, *bin_1, None, None, None, None, *np.atleast_1d(score)))
+
+    # Interaction terms are only written for binary classification and regression
+    df_double = df_dict["feature_double"]
+    if df_double is not None and len(classes) <= 2:
+        for (feat_1, feat_2), feature_df in df_double.groupby(
+            ["feat_1", "feat_2"], sort=False
+        ):
+            bins_1 = bin_conditions(
+                feature_df["feat_bound_1"], feature_df["feat_type_1"].iloc[0]
+            )
+            for bin_1, (_, row) in zip(bins_1, feature_df.iterrows()):
+                bins_2 = bin_conditions(row["feat_bound_2"], row["feat_type_2"])
+                for bin_2, score in zip(bins_2, row["score"]):
+                    rows.append((f"{feat_1}_x_{feat_2}", *bin_1, *bin_2, score))
+
+    score_table = pd.DataFrame(
+        rows,
+        columns=["term"]
+        + [
+            f"{c}_{i}"
+            for i in [1, 2]
+            for c in ["missing", "category", "lower", "upper"]
+        ]
+        + score_columns,
+    )
+    score_table[score_columns] = score_table[score_columns].astype(float)
+    numeric_single = (
+        score_table["missing_2"].isna()
+        & ~score_table["missing_1"]
+        & score_table["category_1"].isna()
+    )
+    return score_table[
+        (score_table[score_columns] != 0).any(axis=1) | numeric_single
+    ].reset_index(drop=True)
+
+
+def _sql_value(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return "NULL"
+    if isinstance(value, (bool, np.bool_)):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, str):
+        return "'{}'".format(value.replace("'", "''"))
+    return repr(float(value))
+
+
+def score_table_to_sql(score_table):
+    """DDL and INSERT statements creating the score table
+
+    Args:
+        score_table: The score table as created by scoreTable
+
+    Returns:
+        The SQL statements
+    """
+    sql = SQLBuilder()
+    column_types = {"term": "VARCHAR", "missing_1": "BOOLEAN", "missing_2": "BOOLEAN"}
+    column_types.update({f"category_{i}": "VARCHAR" for i in [1, 2]})
+
+    sql.print("CREATE TABLE <score_table> ( -- TODO replace with correct table")
+    sql.print(
+        ",\n".join(
+            f"    {column} {column_types.get(column, 'DOUBLE')}"
+            for column in score_table.columns
+        )
+    )
+    sql.print(");")
+
+    values = [
+        "(" + ", ".join(_sql_value(value) for value in row) + ")"
+        for row in score_table.astype(object).itertuples(index=False)
+    ]
+    for start in range(0, len(values), SCORE_TABLE_INSERT_ROWS):
+        sql.print("INSERT INTO <score_table> VALUES")
+        sql.print(",\n".join(values[start : start + SCORE_TABLE_INSERT_ROWS]) + ";")
+    return sql.getvalue()
+
+
+def _pattern_conditions(term, missing):
+    # Score table rows of a term with the given missing value bins
+    return " AND ".join(
+        [f"term = '{term}'"]
+        + [
+            f"missing_{nr}" if is_missing else f"NOT missing_{nr}"
+            for nr, is_missing in enumerate(missing, start=1)
+        ]
+    )
+
+
+def _pattern_table(nr, missing):
+    # Name of the bins table of term nr for a pattern with at most one missing feature
+    if not any(missing):
+        return f"t{nr}_bins"
+    return f"t{nr}_missing_{missing.index(True) + 1}"
+
+
+def term_bins_cte(name, term, features, missing, score_columns):
+    """CTE with the bins and scores of a term, for one pattern of missing value bins
+
+    Args:
+        name: Name of the CTE
+        term: Name of the term
+        features: (feature, feature type) per feature of the term
+        missing: Per feature of the term whether the rows are of its missing value bin
+        score_columns: Score columns of the score table
+
+    Returns:
+        The CTE definition (without WITH)
+    """
+    columns = []
+    for nr, ((_, feat_type), is_missing) in enumerate(zip(features, missing), start=1):
+        if is_missing:
+            continue
+        if feat_type == "categorical":
+            columns.append(f"category_{nr}")
+        else:
+            # Unbounded bins get infinite bounds, the join compares plain columns
+            columns.append(
+                f"COALESCE(lower_{nr}, CAST('-inf' AS DOUBLE)) AS lower_{nr}"
+            )
+            columns.append(f"COALESCE(upper_{nr}, CAST('inf' AS DOUBLE)) AS upper_{nr}")
+    return (
+        f"{name} AS (\n"
+        f"SELECT {', '.join(columns + score_columns)}\n"
+        "FROM <score_table> -- TODO replace with correct table\n"
+        f"WHERE {_pattern_conditions(term, missing)}\n"
+        ")"
+    )
+
+
+def term_bins_join(name, features, missing, dialect):
+    """Join matching each source row (src) to its bin in the CTE of a term
+
+    Categories are joined on equality and numeric bins on their bounds, so the engine
+    can use a hash join or range join. Missing values never match.
+
+    Args:
+        name: Name of the CTE, see term_bins_cte
+        features: (feature, feature type) per feature of the term
+        missing: Per feature of the term whether the CTE holds its missing value bin
+        dialect: The SQLDialect
+
+    Returns:
+        The join clause
+    """
+    if len(features) == 1 and features[0][1] == "numeric":
+        return dialect.bin_range_join(name, features[0][0], "lower_1", "upper_1")
+
+    conditions = []
+    for nr, ((feature, feat_type), is_missing) in enumerate(
+        zip(features, missing), start=1
+    ):
+        if is_missing:
+            continue
+        if feat_type == "categorical":
+            conditions.append(f"{name}.category_{nr} = CAST(src.{feature} AS VARCHAR)")
+        else:
+            conditions.append(
+                f"src.{feature} > {name}.lower_{nr}"
+                f" AND src.{feature} <= {name}.upper_{nr}"
+            )
+    return f"LEFT JOIN {name} ON {' AND '.join(conditions)}"
+
+
+def term_score_sql(nr, term, features, patterns, score_column):
+    """Score of a term for each source row, from the joined CTEs of the term
+
+    Missing values are handled in CASE statements, the bins with all features missing
+    are read from the score table with a subquery.
+
+    Args:
+        nr: Number of the term, used in the CTE names
+        term: Name of the term
+        features: (feature, feature type) per feature of the term
+        patterns: Patterns of missing value bins (see term_bins_cte) in the score table
+        score_column: Score column of the score table
+
+    Returns:
+        The SQL expression
+    """
+    whens = []
+    # Patterns with the most features missing first
+    for missing in sorted(patterns, key=lambda m: (-sum(m), m)):
+        if not any(missing):
+            continue
+        condition = " AND ".join(
+            f"src.{feature} IS NULL"
+            for (feature, _), is_missing in zip(features, missing)
+            if is_missing
+        )
+        if all(missing):
+            value = (
+                f"(\n  SELECT {score_column}"
+                " FROM <score_table> -- TODO replace with correct table\n"
+                f"  WHERE {_pattern_conditions(term, missing)})"
+            )
+        else:
+            value = f"COALESCE({_pattern_table(nr, missing)}.{score_column}, 0.0)"
+        whens.append(f" WHEN {condition} THEN {value}")
+
+    default = "0.0"
+    if (False,) * len(features) in patterns:
+        name = _pattern_table(nr, (False,) * len(features))
+        default = f"COALESCE({name}.{score_column}, 0.0)"
+
+    if not whens:
+        return default
+    return "CASE\n" + "\n".join(whens) + f"\n ELSE {default}\nEND"
+
+
+def lookup_table_to_sql(model_name, df_dict, score_table, classes, dialect="default"):
+    """Scoring query joining the source table on the score table
+
+    Every term joins the source table on CTEs with its bins in the score table, one
+    per pattern of missing value bins, using equality for categories and the bounds
+    for numeric bins (see SQLDialect.bin_range_join).
+
+    Args:
+        model_name: Name of the model
+        df_dict: Lookup tables as created by extractLookupTable
+        score_table: The score table as created by scoreTable
+        classes: The model classes ([0] for regression)
+        dialect: SQL dialect, see SQL_DIALECTS
+
+    Returns:
+        The SQL query
+    """
+    dialect = get_dialect(dialect)
+    sql = SQLBuilder()
+    multiclass = len(classes) > 2
+    intercepts = df_dict["intercept"]
+    score_columns = [f"score_{c}" for c in classes] if multiclass else ["score"]
+
+    # Features (and their type) of every term
+    terms = {
+        f: [(f, feat_type)]
+        for f, feat_type in df_dict["feature_single"][["feature", "feat_type"]]
+        .drop_duplicates("feature")
+        .itertuples(index=False)
+    }
+    if df_dict["feature_double"] is not None and not multiclass:
+        for row in (
+            df_dict["feature_double"]
+            .drop_duplicates(["feat_1", "feat_2"])
+            .itertuples(index=False)
+        ):
+            terms[f"{row.feat_1}_x_{row.feat_2}"] = [
+                (row.feat_1, row.feat_type_1),
+                (row.feat_2, row.feat_type_2),
+            ]
+
+    # Missing value bin patterns in the score table, terms without any non zero
+    # score do not need a join
+    patterns = {}
+    for row in (
+        score_table[["term", "missing_1", "missing_2"]]
+        .drop_duplicates()
+        .itertuples(index=False)
+    ):
+        patterns.setdefault(row.term, set()).add(
+            tuple(
+                bool(m) for m in (row.missing_1, row.missing_2)[: len(terms[row.term])]
+            )
+        )
+    scored_terms = [term for term in terms if term in patterns]
+
+    joins = []
+    for nr, term in enumerate(scored_terms):
+        for missing in sorted(patterns[term]):
+            if all(missing):
+                continue
+            name = _pattern_table(nr, missing)
+            sql.print(
+                "WITH" if not joins else ",",
+                term_bins_cte(name, term, terms[term], missing, score_columns),
+            )
+            joins.append(term_bins_join(name, terms[term], missing, dialect))
+
+    # Joins do not keep the row order, the source columns identify the rows
+    sql.print("WITH" if not joins else ",", "feature_scores AS (")
+    sql.print("SELECT src.*")
+    sql.print(f", '{model_name}' AS model_name")
+    if multiclass:
+        for i, c in enumerate(classes):
+            sql.print(f", {intercepts[i]} AS intercept_{c}")
+    else:
+        sql.print(f", {intercepts[0]} AS intercept")
+
+    for nr, term in enumerate(scored_terms):
+        for score_column in score_columns:
+            sql.print(
+                f", {term_score_sql(nr, term, terms[term], patterns[term], score_column)}"
+                f" AS {term}_{score_column}"
+            )
+
+    sql.print("FROM <source_table> AS src -- TODO replace with correct table")
+    for join in joins:
+        sql.print(join)
+
+    sql.print("), add_sum_scores AS (")
+    sql.print("SELECT *")
+    if multiclass:
+        for c in classes:
+            sql.print(", ", end="")
+            sql.print(
+                f"intercept_{c}",
+                *[f"{term}_score_{c}" for term in scored_terms],
+                sep=" + ",
+            )
+            sql.print(f" AS score_{c}")
+        sql.print("FROM feature_scores")
+        sql.print("), add_sum_all_scores AS (")
+        sql.print("SELECT *")
+        sql.print(
+            ", "
+            + " + ".join(dialect.exp(f"score_{c}") for c in classes)
+            + " AS total_score"
+        )
+        sql.print(f", {dialect.greatest([f'score_{c}' for c in classes])} AS max_score")
+        sql.print("FROM add_sum_scores")
+        sql.print(")")
+        sql.print("SELECT *")
+        for c in classes:
+            sql.print(
+                f", {dialect.exp(f'score_{c}')} / (total_score) AS probability_{c}"
+            )
+        sql.print(f", {dialect.exp('max_score')} / (total_score) AS max_probability")
+        sql.print(", CASE")
+        for c in classes:
+            sql.print(f"\t WHEN score_{c} = max_score THEN '{c}'")
+        sql.print("END AS prediction")
+        sql.print("FROM add_sum_all_scores")
+    else:
+        sql.print(", ", end="")
+        sql.print("intercept", *[f"{term}_score" for term in scored_terms], sep=" + ")
+        sql.print(" AS prediction" if len(classes) == 1 else " AS score")
+        sql.print("FROM feature_scores")
+        sql.print(")")
+        sql.print("SELECT *")
+        if len(classes) != 1:
+            # Applying softmax
+            sql.print(
+                f", {dialect.exp('score')}/({dialect.exp('score')} + 1) AS probability"
+            )
+        sql.print("FROM add_sum_scores")
+    return sql.getvalue()
 
 
 def save_model_and_extras(ebm, model_name, post_params):
@@ -847,14 +1362,43 @@ def save_model_and_extras(ebm, model_name, post_params):
         ebm.classes_ = [0]
         lookup_df["intercept"] = [lookup_df["intercept"]]
 
-    # Write printed output to file
+    sql_format = post_params.get("sql_format", "case")
+    if sql_format not in SQL_FORMATS:
+        raise ValueError(
+            f"Unknown sql_format '{sql_format}', use one of {', '.join(SQL_FORMATS)}"
+        )
+    sql_dialect = post_params.get("sql_dialect", "default")
+    # Unknown dialects raise before any file is written
+    get_dialect(sql_dialect)
+
     output_path = Path(model_name) / "model" / "ebm_in_sql.sql"
     output_path.parent.mkdir(parents=True, exist_ok=True)
+    model_name = Path(model_name).name
+
+    if sql_format == "lookup":
+        score_table = scoreTable(lookup_df, ebm.classes_)
+
+        # Score table as SQL statements and as CSV for bulk loading
+        (output_path.parent / "ebm_score_table.sql").write_text(
+            score_table_to_sql(score_table)
+        )
+        score_table.to_csv(output_path.parent / "ebm_score_table.csv", index=False)
+        logger.info(f"EBM score table with {len(score_table)} rows saved")
+
+        sql = lookup_table_to_sql(
+            model_name, lookup_df, score_table, ebm.classes_, sql_dialect
+        )
+    else:
+        sql = ebm_to_sql(
+            model_name,
+            lookup_df,
+            ebm.classes_,
+            post_params["sql_split"],
+            post_params.get("sql_numeric_bins", "linear"),
+            sql_dialect,
+        )
 
-    with open(output_path, "w") as f:
-        with redirect_stdout(f):
-            model_name = Path(model_name).name
-            ebm_to_sql(model_name, lookup_df, ebm.classes_, post_params["sql_split"])
+    output_path.write_text(sql)
     logger.info("SQL version of EBM saved")
 
 
@@ -1,8 +1,10 @@
 import numpy as np
-from contextlib import redirect_stdout
 from pathlib import Path
 import logging
 
+from ml2sql.utils.output_scripts.sql_builder import SQLBuilder
+from ml2sql.utils.output_scripts.sql_dialects import get_dialect
+
 logger = logging.getLogger(__name__)
 
 
@@ -56,6 +58,8 @@ def extract_parameters(model):
 def format_sql(
     model_name, model_type, pclasses, features, coefficients, intercept, post_params
 ):
+    dialect = get_dialect(post_params.get("sql_dialect", "default"))
+
     # round coefficients if needed
     coefficients = list(np.round(coefficients, post_params["sql_decimals"]))
 
@@ -86,109 +90,109 @@ def format_sql(
         )
 
     # Create the SQL query with the logistic regression formula and feature scores
+    sql = SQLBuilder()
     if not post_params["sql_split"]:
-        print("SELECT")
-        print(f"\t'{model_name}' AS model_name")
+        sql.print("SELECT")
+        sql.print(f"\t'{model_name}' AS model_name")
 
         if model_type == "regression":
-            print(f"\t, {intercept} AS intercept")
-            print(f"\t, {feature_scores}", end="")
-            print(f"\t, {score_cols} + intercept AS prediction")
+            sql.print(f"\t, {intercept} AS intercept")
+            sql.print(f"\t, {feature_scores}", end="")
+            sql.print(f"\t, {score_cols} + intercept AS prediction")
         elif model_type == "binary":
-            print(f"\t, {intercept} AS intercept")
-            print(f"\t, {feature_scores}", end="")
-            print(f"\t, {score_cols} + {intercept} AS score")
-            print("\t, 1 / (1 + EXP(-(score))) AS probability")
+            sql.print(f"\t, {intercept} AS intercept")
+            sql.print(f"\t, {feature_scores}", end="")
+            sql.print(f"\t, {score_cols} + {intercept} AS score")
+            sql.print(f"\t, 1 / (1 + {dialect.exp('-(score)')}) AS probability")
         elif model_type == "multiclass":
             for i, c in zip(intercept, pclasses):
-                print(f"\t, {i} AS intercept_{c}")
+                sql.print(f"\t, {i} AS intercept_{c}")
 
             for c in pclasses:
-                print(f"\t, {feature_scores[c]}", end="")
+                sql.print(f"\t, {feature_scores[c]}", end="")
 
             for c in pclasses:
-                print(f"\t, {score_cols[c]} + intercept_{c} AS score_{c}")
+                sql.print(f"\t, {score_cols[c]} + intercept_{c} AS score_{c}")
 
-            print("\t, (EXP(", end="")
-            class_score_list = [f"score_{c}" for c in pclasses]
-            print(*class_score_list, sep=") + EXP(", end=")) AS total_score\n")
+            class_exp_list = [dialect.exp(f"score_{c}") for c in pclasses]
+            sql.print("\t, (" + " + ".join(class_exp_list) + ") AS total_score")
 
             for c in pclasses:
-                print(f"\t, EXP(score_{c}) / total_score AS probability_{c}")
+                sql.print(
+                    f"\t, {dialect.exp(f'score_{c}')} / total_score AS probability_{c}"
+                )
 
-        print("FROM <source_table>;  -- TODO replace with correct table")
+        sql.print("FROM <source_table>;  -- TODO replace with correct table")
 
     elif post_params["sql_split"]:
         # Creating CTE to create table aliases
-        print("WITH feature_scores AS (\nSELECT")
-        print(f"\t'{model_name}' AS model_name")
+        sql.print("WITH feature_scores AS (\nSELECT")
+        sql.print(f"\t'{model_name}' AS model_name")
 
         if model_type == "regression":
-            print(f"\t, {intercept} AS intercept")
-            print(f"\t, {feature_scores}", end="")
+            sql.print(f"\t, {intercept} AS intercept")
+            sql.print(f"\t, {feature_scores}", end="")
         elif model_type == "binary":
-            print(f"\t, {intercept} AS intercept")
-            print(f"\t, {feature_scores}", end="")
+            sql.print(f"\t, {intercept} AS intercept")
+            sql.print(f"\t, {feature_scores}", end="")
         elif model_type == "multiclass":
             for i, c in zip(intercept, pclasses):
-                print(f"\t, {i} AS intercept_{c}")
+                sql.print(f"\t, {i} AS intercept_{c}")
 
             for c in pclasses:
-                print(f"\t, {feature_scores[c]}", end="")
+                sql.print(f"\t, {feature_scores[c]}", end="")
 
         # Add placeholder for source table
-        print("FROM <source_table> -- TODO replace with correct table")
+        sql.print("FROM <source_table> -- TODO replace with correct table")
 
         # Close CTE and create next SELECT statement
-        print("), add_sum_scores AS (")
-        print("SELECT *")
+        sql.print("), add_sum_scores AS (")
+        sql.print("SELECT *")
 
         if model_type == "regression":
-            print(f"\t, {score_cols} + intercept AS prediction")
+            sql.print(f"\t, {score_cols} + intercept AS prediction")
         elif model_type == "binary":
-            print(f"\t, {score_cols} + intercept AS score")
+            sql.print(f"\t, {score_cols} + intercept AS score")
         elif model_type == "multiclass":
             # scores per class
             for c in pclasses:
-                print(f"\t, {score_cols[c]} + intercept_{c} AS score_{c}")
-            class_score_list = [f"score_{c}" for c in pclasses]
-            print("\t, (EXP(", end="")
-            print(*class_score_list, sep=") + EXP(", end=")) AS total_score\n")
+                sql.print(f"\t, {score_cols[c]} + intercept_{c} AS score_{c}")
+            class_exp_list = [dialect.exp(f"score_{c}") for c in pclasses]
+            sql.print("\t, (" + " + ".join(class_exp_list) + ") AS total_score")
 
-        print("FROM feature_scores")
+        sql.print("FROM feature_scores")
 
         # Close CTE and make final Select statement
-        print(")")
-        print("SELECT *")
+        sql.print(")")
+        sql.print("SELECT *")
 
         if model_type == "binary":
             # TODO adjust accordingly for multiclass
             # Applying softmax
-            print(", 1 / (1 + EXP(-score)) AS probability")
+            sql.print(f", 1 / (1 + {dialect.exp('-score')}) AS probability")
         elif model_type == "multiclass":
             for c in pclasses:
-                print(f"\t, EXP(score_{c})/total_score AS probability_{c}")
+                sql.print(
+                    f"\t, {dialect.exp(f'score_{c}')}/total_score AS probability_{c}"
+                )
 
-        print("FROM add_sum_scores")
-    return
+        sql.print("FROM add_sum_scores")
+    return sql.getvalue()
 
 
 def save_model_and_extras(clf, model_name, post_params):
     model_type, pclasses, features, coefficients, intercept = extract_parameters(clf)
-    # Write printed output to file
     output_path = Path(model_name) / "model" / "lregression_in_sql.sql"
     output_path.parent.mkdir(parents=True, exist_ok=True)
 
-    with open(output_path, "w") as f:
-        with redirect_stdout(f):
-            model_name = Path(model_name).name
-            format_sql(
-                model_name,
-                model_type,
-                pclasses,
-                features,
-                coefficients,
-                intercept,
-                post_params,
-            )
+    sql = format_sql(
+        Path(model_name).name,
+        model_type,
+        pclasses,
+        features,
+        coefficients,
+        intercept,
+        post_params,
+    )
+    output_path.write_text(sql)
     logger.info("SQL version of logistic/linear regression saved")
@@ -0,0 +1,31 @@
+class SQLBuilder:
+    """Buffer collecting the fragments of a SQL query
+
+    Has the same interface as print (and a file), so the SQL is written exactly as
+    printing it would, but without touching sys.stdout. Builders are independent
+    of each other, so several models can be written at the same time (e.g. in
+    threads).
+
+    Example:
+        sql = SQLBuilder()
+        sql.print("SELECT", "a", sep="\\n")
+        query = sql.getvalue()
+    """
+
+    def __init__(self):
+        self._fragments = []
+
+    def print(self, *values, sep=" ", end="\n"):
+        """Add the values as print(*values, sep=sep, end=end) would write them"""
+        self._fragments.append(sep.join(map(str, values)) + end)
+
+    def write(self, text):
+        """Add text as is"""
+        self._fragments.append(text)
+
+    def getvalue(self):
+        """The SQL written so far"""
+        return "".join(self._fragments)
+
+    def __str__(self):
+        return self.getvalue()
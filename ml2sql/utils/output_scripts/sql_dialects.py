@@ -0,0 +1,113 @@
+class SQLDialect:
+    """SQL as written by the exporters, for engines like Postgres, DuckDB and Snowflake
+
+    Engine specific parts of the generated SQL go through the dialect, subclasses
+    override them for other engines or faster engine native formulations.
+    """
+
+    name = "default"
+
+    def exp(self, expression):
+        """Exponential function of an expression"""
+        return f"EXP({expression})"
+
+    def greatest(self, expressions):
+        """Largest of several expressions"""
+        return f"GREATEST({', '.join(expressions)})"
+
+    def cast_int(self, expression):
+        """Cast an expression to an integer"""
+        return f"{expression}::INT"
+
+    def numeric_bins_cte(self, name, bounds, scores):
+        """CTE with the upper bound and score(s) of every numeric bin of a feature
+
+        Dialects returning a CTE join each row to its bin (numeric_bins_join) instead
+        of finding it with CASE statements.
+
+        Args:
+            name: Name of the CTE
+            bounds: Upper bound per bin, ascending, the last bin is unbounded (inf)
+            scores: Dict of score column suffix to the score per bin
+
+        Returns:
+            The CTE definition (without WITH), None to write CASE statements
+        """
+        return None
+
+    def numeric_bins_join(self, name, feature):
+        """Join matching each source row (src) to its bin in the CTE of a feature
+
+        Only used by dialects returning a CTE from numeric_bins_cte.
+        """
+        return None
+
+    def bin_range_join(self, name, feature, lower, upper):
+        """Join matching each source row (src) to the bin lower < value <= upper of a table
+
+        Args:
+            name: Name of the table with a row per bin, covering all values
+            feature: Name of the feature column
+            lower: Column of the lower bounds, -inf for the first bin
+            upper: Column of the upper bounds, inf for the last bin
+
+        Returns:
+            The join clause
+        """
+        return (
+            f"LEFT JOIN {name} ON src.{feature} > {name}.{lower}"
+            f" AND src.{feature} <= {name}.{upper}"
+        )
+
+
+class DuckDBDialect(SQLDialect):
+    """DuckDB, numeric bins are found with an ASOF join instead of CASE statements
+
+    The ASOF join finds the bin of each value with a sorted merge, this is several
+    times faster than (nested) CASE statements for features with many bins, and than
+    the range join on both bounds.
+    """
+
+    name = "duckdb"
+
+    def numeric_bins_cte(self, name, bounds, scores):
+        columns = ["bin_upper"] + [f"bin_score{suffix}" for suffix in scores]
+        rows = []
+        for i, bound in enumerate(bounds):
+            upper = "'inf'" if bound == float("inf") else str(bound)
+            values = [upper] + [str(bin_scores[i]) for bin_scores in scores.values()]
+            if i == 0 or upper == "'inf'":
+                # Literals would otherwise be typed as (too narrow) DECIMALs
+                values = [f"{value}::DOUBLE" for value in values]
+            rows.append(f"({', '.join(values)})")
+        return (
+            f"{name} ({', '.join(columns)}) AS (\nVALUES\n" + ",\n".join(rows) + "\n)"
+        )
+
+    def numeric_bins_join(self, name, feature):
+        # Picks the first bin with an upper bound the value does not exceed
+        return f"ASOF LEFT JOIN {name} ON src.{feature} <= {name}.bin_upper"
+
+    def bin_range_join(self, name, feature, lower, upper):
+        # The bins cover all values, the first upper bound not exceeded is the bin
+        return f"ASOF LEFT JOIN {name} ON src.{feature} <= {name}.{upper}"
+
+
+# Dialects selectable with sql_dialect in post_params
+SQL_DIALECTS = {"default": SQLDialect, "duckdb": DuckDBDialect}
+
+
+def get_dialect(name):
+    """The SQL dialect of a name in SQL_DIALECTS
+
+    Args:
+        name: Name of the dialect
+
+    Returns:
+        An instance of the dialect
+    """
+    if name not in SQL_DIALECTS:
+        raise ValueError(
+            f"Unknown sql_dialect '{name}', use one of {', '.join(SQL_DIALECTS)}"
+        )
+    return SQL_DIALECTS[name]()
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from ml2sql import __version__
+from ml2sql.utils.helper_functions.data_loading import CACHE_DIR, file_signature
+
+logger = logging.getLogger(__name__)
+
+# Pre processing parameters which do not change the cleaned data or the folds
+NON_SEMANTIC_PRE_PARAMS = [
+    "cv_n_jobs",
+    "correlation_n_jobs",
+    "correlation_sample_rows",
+    "fold_cache",
+]
+
+
+def file_sha256(data_path: Union[str, Path]) -> str:
+    """
+    SHA-256 of a file's content, remembered per file size and modification time.
+
+    Args:
+        data_path (Union[str, Path]): Path to the file.
+
+    Returns:
+        str: Hex digest of the file content.
+    """
+    data_path = Path(data_path)
+    memo_path = data_path.parent / CACHE_DIR / "hashes" / f"{data_path.name}.json"
+    signature = file_signature(data_path)
+
+    try:
+        memo = json.loads(memo_path.read_text())
+        if memo["file"] == signature:
+            return memo["sha256"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    digest = hashlib.sha256()
+    with data_path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+
+    try:
+        memo_path.parent.mkdir(parents=True, exist_ok=True)
+        memo_path.write_text(
+            json.dumps({"file": signature, "sha256": digest.hexdigest()})
+        )
+    except OSError as e:
+        logger.debug(f"Could not remember hash of {data_path}: {e}")
+    return digest.hexdigest()
+
+
+def fold_cache_dir(
+    data_path: Union[str, Path],
+    target_col: str,
+    feature_cols: List[str],
+    model_type: str,
+    pre_params: Dict[str, str],
+    random_seed: int,
+) -> Path:
+    """
+    Directory of the cached folds, addressed by everything the pre processing depends on.
+
+    Args:
+        data_path (Union[str, Path]): Path to the data file.
+        target_col (str): The name of the target column.
+        feature_cols (List[str]): The list of feature column names (as configured).
+        model_type (str): The type of the model ('classification' or 'regression').
+        pre_params (Dict[str, str]): The preprocessing parameters.
+        random_seed (int): The random seed used for sampling and splitting.
+
+    Returns:
+        Path: The cache directory (which might not exist yet).
+    """
+    data_path = Path(data_path)
+    key = {
+        "data_sha256": file_sha256(data_path),
+        "target": target_col,
+        "features": list(feature_cols),
+        "model_type": model_type,
+        "pre_params": {
+            k: v for k, v in pre_params.items() if k not in NON_SEMANTIC_PRE_PARAMS
+        },
+        "random_seed": random_seed,
+        "ml2sql_version": __version__,
+    }
+    digest = hashlib.sha256(
+        json.dumps(key, sort_keys=True, default=str).encode()
+    ).hexdigest()
+    return data_path.parent / CACHE_DIR / "folds" / digest[:32]
+
+
+def load_folds(
+    cache_dir: Path,
+) -> Optional[Tuple[pd.DataFrame, List[str], Dict[str, np.ndarray]]]:
+    """
+    Load cleaned data, features and fold indices from the cache.
+
+    Args:
+        cache_dir (Path): The cache directory of these folds.
+
+    Returns:
+        Optional[Tuple[pd.DataFrame, List[str], Dict[str, np.ndarray]]]: The cleaned data,
+            cleaned feature columns and fold indices, None if not cached (or unreadable).
+    """
+    try:
+        meta = json.loads((cache_dir / "meta.json").read_text())
+        data_clean = pd.read_parquet(cache_dir / "data.parquet")
+        with np.load(cache_dir / "folds.npz") as npz:
+            fold_indices = {name: npz[name] for name in npz.files}
+    except (OSError, ValueError, KeyError, ImportError) as e:
+        if cache_dir.exists():
+            logger.warning(f"Ignoring unreadable fold cache {cache_dir}: {e}")
+        return None
+
+    logger.info(f"Loaded cleaned data and folds from cache {cache_dir}")
+    return data_clean, meta["features"], fold_indices
+
+
+def save_folds(
+    cache_dir: Path,
+    data_clean: pd.DataFrame,
+    features_clean: List[str],
+    fold_indices: Dict[str, np.ndarray],
+) -> None:
+    """
+    Store cleaned data (single Parquet file), features and fold indices in the cache.
+
+    Args:
+        cache_dir (Path): The cache directory of these folds.
+        data_clean (pd.DataFrame): The cleaned data the fold indices refer to.
+        features_clean (List[str]): The cleaned feature columns.
+        fold_indices (Dict[str, np.ndarray]): Positional row indices per fold.
+    """
+    # Write to a temporary directory first, so readers never see a partial cache
+    tmp_dir = cache_dir.with_name(f"{cache_dir.name}.tmp{os.getpid()}")
+    try:
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        data_clean.reset_index(drop=True).to_parquet(tmp_dir / "data.parquet")
+        np.savez(tmp_dir / "folds.npz", **fold_indices)
+        (tmp_dir / "meta.json").write_text(
+            json.dumps(
+                {"features": features_clean, "ml2sql_version": __version__}, indent=2
+            )
+        )
+        tmp_dir.rename(cache_dir)
+        logger.info(f"Stored cleaned data and folds in cache {cache_dir}")
+    except (OSError, ValueError, TypeError, ImportError, NotImplementedError) as e:
+        logger.warning(f"Could not store folds in cache {cache_dir}: {e}")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
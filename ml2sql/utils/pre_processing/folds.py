@@ -0,0 +1,39 @@
+from collections.abc import Sequence
+from typing import List, Union
+
+import numpy as np
+import pandas as pd
+
+
+class FoldView(Sequence):
+    """
+    Cross-validation folds as row selections of one shared DataFrame or Series.
+
+    Only the positional row indices are stored per fold, a fold is materialized when it is
+    accessed (e.g. right before training on it) instead of holding a copy of every fold.
+
+    Parameters
+    ----------
+    base : pd.DataFrame or pd.Series
+        The data all folds select their rows from.
+    indices : List[np.ndarray]
+        Positional row indices of each fold.
+    """
+
+    def __init__(
+        self, base: Union[pd.DataFrame, pd.Series], indices: List[np.ndarray]
+    ) -> None:
+        self.base = base
+        self.indices = list(indices)
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def __getitem__(self, fold_id):
+        if isinstance(fold_id, slice):
+            return FoldView(self.base, self.indices[fold_id])
+        return self.base.iloc[self.indices[fold_id]]
+
+    def __repr__(self) -> str:
+        sizes = ", ".join(str(len(ix)) for ix in self.indices)
+        return f"FoldView({len(self)} folds with rows: {sizes})"
@@ -2,8 +2,16 @@ import pandas as pd
 import numpy as np
 from imblearn.over_sampling import RandomOverSampler, SMOTE, SMOTENC
 from ml2sql.utils.feature_selection.correlations import plot_correlations
+from ml2sql.utils.helper_functions.config_handling import artifact_profile
+from ml2sql.utils.pre_processing.fold_cache import (
+    fold_cache_dir,
+    load_folds,
+    save_folds,
+)
+from ml2sql.utils.pre_processing.folds import FoldView
 import logging
-from typing import List, Tuple, Dict
+from pathlib import Path
+from typing import List, Tuple, Dict, Optional, Union
 
 logger = logging.getLogger(__name__)
 
@@ -24,8 +32,55 @@ def remove_rows_with_nan_target(data: pd.DataFrame, target_col: str) -> pd.DataF
     return data.loc[data[target_col].notna(), :].reset_index(drop=True)
 
 
+def profile_columns(data: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """
+    Profile columns with a single factorization each, for the cleaning and casting.
+
+    Args:
+        data (pd.DataFrame): The input DataFrame.
+        columns (List[str]): The columns to profile.
+
+    Returns:
+        pd.DataFrame: Per column (index) the share of missing values (null_share), number of
+            unique non missing values (n_unique), whether it is an object column holding
+            only booleans and missing values (is_bool) and for object and string columns
+            the column as category (categorical), the same as casting it on the current rows.
+    """
+    stats = []
+    categoricals = np.full(len(columns), None, dtype=object)
+    for i, col in enumerate(columns):
+        is_object = data[col].dtype == "object"
+        if is_object or isinstance(data[col].dtype, pd.StringDtype):
+            # Sorted like casting to category does, so the codes are reused for the cast
+            try:
+                codes, uniques = pd.factorize(data[col], sort=True)
+            except TypeError:
+                codes, uniques = pd.factorize(data[col])
+            categoricals[i] = pd.Categorical.from_codes(
+                codes, dtype=pd.CategoricalDtype(uniques)
+            )
+        else:
+            codes, uniques = pd.factorize(data[col])
+
+        # Missing values (NaN, None, NA) get code -1 and are not in the uniques
+        stats.append(
+            (
+                np.mean(codes == -1),
+                len(uniques),
+                # Compared by equality, so like the in operator 1 and 0 count as booleans
+                is_object and bool(uniques.isin([True, False]).all()),
+            )
+        )
+
+    profile = pd.DataFrame(
+        stats, index=columns, columns=["null_share", "n_unique", "is_bool"]
+    )
+    profile["categorical"] = categoricals
+    return profile
+
+
 def remove_single_unique_value_features(
-    data: pd.DataFrame, feature_cols: List[str]
+    data: pd.DataFrame, feature_cols: List[str], profile: Optional[pd.DataFrame] = None
 ) -> Tuple[pd.DataFrame, List[str]]:
     """
     Remove features from the DataFrame that have only a single unique value.
@@ -33,11 +88,17 @@ def remove_single_unique_value_features(
     Args:
         data (pd.DataFrame): The input DataFrame.
         feature_cols (List[str]): The list of feature column names.
+        profile (Optional[pd.DataFrame], optional): Profile of the columns (profile_columns), to
+            not count the unique values again. Defaults to None.
 
     Returns:
         Tuple[pd.DataFrame, List[str]]: The DataFrame with single unique value features removed, and the updated list of feature columns.
     """
-    one_nunique = data[feature_cols].columns[data[feature_cols].nunique() == 1]
+    if profile is None:
+        n_unique = data[feature_cols].nunique()
+    else:
+        n_unique = profile["n_unique"].reindex(feature_cols)
+    one_nunique = n_unique.index[n_unique == 1]
     if len(one_nunique) > 0:
         data = data.loc[:, ~data.columns.isin(one_nunique)]
         logger.info(f"Features being removed due to single unique value: {one_nunique}")
@@ -67,8 +128,69 @@ def remove_one_occurrence_classes(data: pd.DataFrame, target_col: str) -> pd.Dat
     return data
 
 
+def remove_categorical_features(
+    data: pd.DataFrame, feature_cols: List[str], model_name: Optional[str]
+) -> List[str]:
+    """
+    Remove categorical features for models which can not handle them (all but EBM).
+
+    Args:
+        data (pd.DataFrame): The input DataFrame.
+        feature_cols (List[str]): The list of feature column names.
+        model_name (Optional[str]): The name of the model, None keeps all features.
+
+    Returns:
+        List[str]: The updated list of feature columns.
+    """
+    if model_name in [None, "ebm"]:
+        return feature_cols
+
+    cat_cols = data[feature_cols].select_dtypes(include=["category"]).columns
+    logger.info(f"Features being removed due to type being categorical: {cat_cols}")
+    return [f for f in feature_cols if f not in cat_cols]
+
+
+def cast_object_columns(
+    data: pd.DataFrame, feature_cols: List[str], profile: Optional[pd.DataFrame] = None
+) -> pd.DataFrame:
+    """
+    Cast the object and string feature columns, boolean columns to int (float when missing
+    values are present) and others to category.
+
+    Args:
+        data (pd.DataFrame): The input DataFrame, changed in place.
+        feature_cols (List[str]): The list of feature column names.
+        profile (Optional[pd.DataFrame], optional): Profile of the columns (profile_columns),
+            profiled here if None. Defaults to None.
+
+    Returns:
+        pd.DataFrame: The DataFrame with casted feature columns.
+    """
+    # Selecting the types on the empty frame does not copy the data
+    object_cols = list(
+        data.head(0)[feature_cols].select_dtypes(include=["object", "string"]).columns
+    )
+    if profile is None:
+        profile = profile_columns(data, object_cols)
+
+    for col in object_cols:
+        # Booleans (string dtypes only hold strings)
+        if profile.at[col, "is_bool"]:
+            has_nulls = profile.at[col, "null_share"] > 0
+            data[col] = data[col].astype(float if has_nulls else int)
+        else:  # otherwise assume categorical
+            data[col] = pd.Series(
+                profile.at[col, "categorical"], index=data.index, name=col
+            )
+
+    return data
+
+
 def impute_and_cast_data(
-    data: pd.DataFrame, feature_cols: List[str], model_name: str
+    data: pd.DataFrame,
+    feature_cols: List[str],
+    model_name: Optional[str],
+    profile: Optional[pd.DataFrame] = None,
 ) -> Tuple[pd.DataFrame, List[str]]:
     """
     Impute missing values and cast data types for the feature columns in the DataFrame.
@@ -76,31 +198,35 @@ def impute_and_cast_data(
     Args:
         data (pd.DataFrame): The input DataFrame.
         feature_cols (List[str]): The list of feature column names.
-        model_name (str): The name of the model.
+        model_name (Optional[str]): The name of the model, None keeps categorical features.
+        profile (Optional[pd.DataFrame], optional): Profile of the columns (profile_columns) on
+            the current rows, profiled here if None. Defaults to None.
 
     Returns:
         pd.DataFrame: The DataFrame with imputed values and casted data types.
     """
+    if profile is None:
+        profile = profile_columns(data, list(data.columns))
+
     # Remove columns where more than 50% of rows are NaN/None/Null
-    nan_cols = data.columns[data.isna().mean() > 0.5]
+    null_share = profile["null_share"].reindex(data.columns)
+    nan_cols = data.columns[null_share > 0.5]
     if len(nan_cols) > 0:
         data.drop(nan_cols, axis=1, inplace=True)
+        feature_cols = [f for f in feature_cols if f not in nan_cols]
         logger.info(
             f"Columns with more than 50% NaN values removed: {', '.join(nan_cols)}"
         )
 
     # Adjust data types
-    for col in data[feature_cols].select_dtypes(include=["object"]).columns:
-        # Check if values are true/false/None then boolean
-        if all(val in [True, False, None, np.nan] for val in data[col].unique()):
-            data[col] = data[col].astype(int)
-        else:  # otherwise assume categorical
-            data[col] = data[col].astype({col: "category"})
+    data = cast_object_columns(data, feature_cols, profile)
+
+    # Categories without rows, left when the columns were cast before rows were removed
+    # (batch training), would otherwise be binned by the model
+    for col in data[feature_cols].select_dtypes(include=["category"]).columns:
+        data[col] = data[col].cat.remove_unused_categories()
 
-    if model_name != "ebm":  # otherwise model can't handle categorical features
-        cat_cols = data[feature_cols].select_dtypes(include=["category"]).columns
-        logger.info(f"Features being removed due to type being categorical: {cat_cols}")
-        feature_cols = [f for f in feature_cols if f not in cat_cols]
+    feature_cols = remove_categorical_features(data, feature_cols, model_name)
 
     # Overview of data types
     logger.info(
@@ -118,7 +244,7 @@ def cleanAndCastColumns(
     data: pd.DataFrame,
     feature_cols: List[str],
     target_col: str,
-    model_name: str,
+    model_name: Optional[str],
     model_type: str,
 ) -> Tuple[pd.DataFrame, List[str]]:
     """
@@ -128,7 +254,7 @@ def cleanAndCastColumns(
         data (pd.DataFrame): The input DataFrame.
         feature_cols (List[str]): The list of feature column names.
         target_col (str): The name of the target column.
-        model_name (str): The name of the model.
+        model_name (Optional[str]): The name of the model, None keeps categorical features.
         model_type (str): The type of the model ('classification' or 'regression').
 
     Returns:
@@ -139,19 +265,131 @@ def cleanAndCastColumns(
     # Clean out where target is NaN
     _data = remove_rows_with_nan_target(_data, target_col)
 
-    # Clean out features with only one unique value
-    _data, feature_cols = remove_single_unique_value_features(_data, feature_cols)
-
     if model_type == "classification":
         # Remove classes with only one occurrence
         _data = remove_one_occurrence_classes(_data, target_col)
 
+    # Profile the columns once, on the rows left, for removing features and casting
+    profile = profile_columns(_data, list(_data.columns))
+
+    # Clean out features with only one unique value
+    _data, feature_cols = remove_single_unique_value_features(
+        _data, feature_cols, profile
+    )
+
     # Impute missing values and cast data types
-    _data, features_clean = impute_and_cast_data(_data, feature_cols, model_name)
+    _data, features_clean = impute_and_cast_data(
+        _data, feature_cols, model_name, profile
+    )
 
     return _data, features_clean
 
 
+def sample_for_correlations(
+    data: pd.DataFrame,
+    target_col: str,
+    model_type: str,
+    n_rows: int,
+    random_seed: int = 42,
+) -> pd.DataFrame:
+    """
+    Take a row sample stratified on the target, to compute the correlation matrices on.
+
+    Args:
+        data (pd.DataFrame): The input DataFrame.
+        target_col (str): The name of the target column.
+        model_type (str): The type of the model ('classification' or 'regression').
+        n_rows (int): The (approximate) number of rows to sample.
+        random_seed (int, optional): The random seed for reproducibility. Defaults to 42.
+
+    Returns:
+        pd.DataFrame: The sampled DataFrame, or the input DataFrame if it has no more than n_rows rows.
+    """
+    if len(data) <= n_rows:
+        return data
+
+    if model_type == "classification":
+        strata = data[target_col]
+    else:
+        # Stratify a continuous target on its deciles
+        strata = pd.qcut(data[target_col], q=10, labels=False, duplicates="drop")
+
+    sample = (
+        data.groupby(strata, group_keys=False)
+        .sample(frac=n_rows / len(data), random_state=random_seed)
+        .reset_index(drop=True)
+    )
+
+    # Approximate 95% bound on the sampling error of a correlation (Fisher z transformation)
+    bound = np.tanh(1.96 / np.sqrt(max(len(sample) - 3, 1)))
+    logger.info(
+        f"Correlations computed on a stratified sample of {len(sample)} out of {len(data)} rows, "
+        f"sampling error within ±{bound:.3f} with 95% confidence"
+    )
+    return sample
+
+
+def create_fold_indices(
+    data_clean: pd.DataFrame,
+    target_col: str,
+    model_type: str,
+    pre_params: Dict[str, str],
+    random_seed: int = 42,
+) -> Dict[str, np.ndarray]:
+    """
+    Split the cleaned data into an optional out-of-time set and cross-validation folds.
+
+    Args:
+        data_clean (pd.DataFrame): The cleaned DataFrame.
+        target_col (str): The name of the target column.
+        model_type (str): The type of the model ('classification' or 'regression').
+        pre_params (Dict[str, str]): The preprocessing parameters.
+        random_seed (int, optional): The random seed for reproducibility. Defaults to 42.
+
+    Returns:
+        Dict[str, np.ndarray]: Positional row indices into data_clean, under "oot" (if requested)
+            and "train_<fold nr>"/"test_<fold nr>" per fold.
+    """
+    from sklearn.model_selection import StratifiedKFold, KFold, TimeSeriesSplit
+
+    # Initiate cross-validation method
+    if pre_params["cv_type"] == "timeseriesplit":
+        logger.info("Performing time series split cross-validation")
+        kfold = TimeSeriesSplit(n_splits=5)
+    elif model_type == "classification":
+        logger.info("Performing stratified kfold cross-validation")
+        kfold = StratifiedKFold(n_splits=5, shuffle=True, random_state=random_seed)
+    elif model_type == "regression":
+        logger.info("Performing normal kfold cross-validation")
+        kfold = KFold(n_splits=5, shuffle=True, random_state=random_seed)
+
+    fold_indices = {}
+    cv_ix = np.arange(len(data_clean))
+
+    # Create out-of-time (OOT) set from the most recent rows if requested
+    if pre_params["oot_set"] != "false":
+        time_order = pd.Series(
+            data_clean[pre_params["time_sensitive_column"]].to_numpy()
+        ).sort_values(ascending=True)
+        oot_ix = np.sort(time_order.tail(int(pre_params["oot_rows"])).index.to_numpy())
+        fold_indices["oot"] = oot_ix
+
+        # Cross validate on the rows excluding OOT
+        cv_ix = np.setdiff1d(cv_ix, oot_ix)
+
+    if pre_params["cv_type"] == "timeseriesplit":
+        # Order rows in time, so each fold is tested on data after its train data
+        time_values = data_clean[pre_params["time_sensitive_column"]].to_numpy()
+        cv_ix = cv_ix[np.argsort(time_values[cv_ix], kind="stable")]
+
+    y = data_clean[target_col].iloc[cv_ix]
+    for kfold_nr, (train_ix, test_ix) in enumerate(kfold.split(cv_ix, y)):
+        fold_indices[f"train_{kfold_nr}"] = cv_ix[train_ix]
+        fold_indices[f"test_{kfold_nr}"] = cv_ix[test_ix]
+
+    return fold_indices
+
+
 def pre_process_kfold(
     given_name: str,
     data: pd.DataFrame,
@@ -162,6 +400,7 @@ def pre_process_kfold(
     pre_params: Dict[str, str],
     post_params: Dict[str, str],
     random_seed: int = 42,
+    data_path: Optional[Union[str, Path]] = None,
 ) -> Dict[str, Dict[str, List[pd.DataFrame]]]:
     """
     Preprocess the data and create cross-validation folds.
@@ -176,38 +415,76 @@ def pre_process_kfold(
         pre_params (Dict[str, str]): The preprocessing parameters.
         post_params (Dict[str, str]): The post-processing parameters.
         random_seed (int, optional): The random seed for reproducibility. Defaults to 42.
+        data_path (Optional[Union[str, Path]], optional): Path of the data file, needed to cache
+            the cleaned data and folds (pre_params fold_cache). Defaults to None.
 
     Returns:
         Dict[str, Dict[str, List[pd.DataFrame]]]: A dictionary containing the preprocessed datasets for final training, cross-validation, and out-of-time validation (if applicable).
+            Cross-validation folds are FoldViews on the cleaned data (lists of DataFrames for upsampled train folds).
     """
-    # Clean and cast data types
-    data_clean, features_clean = cleanAndCastColumns(
-        data, feature_cols, target_col, model_name, model_type
-    )
-    logger.info(data_clean.columns)
-    # Limit dataset with respect to the max_rows parameter
-    if "max_rows" in pre_params:
-        max_rows = min(int(pre_params["max_rows"]), len(data_clean))
-        data_clean = data_clean.sample(n=max_rows).reset_index(drop=True)
-        logger.info(f"Limited dataset to {max_rows}")
+    cache_dir = None
+    cached = None
+    if pre_params.get("fold_cache", "false") == "true":
+        if data_path is None:
+            logger.warning("Fold cache requires the data file path, not using cache")
+        else:
+            cache_dir = fold_cache_dir(
+                data_path, target_col, feature_cols, model_type, pre_params, random_seed
+            )
+            cached = load_folds(cache_dir)
 
-    # Create correlation plots
-    plot_correlations(data_clean[features_clean], given_name, post_params["file_type"])
+    if cached is not None:
+        data_clean, features_clean, fold_indices = cached
+    else:
+        # Clean and cast data types (categorical features are removed per model below)
+        data_clean, features_clean = cleanAndCastColumns(
+            data, feature_cols, target_col, None, model_type
+        )
+        data_clean = data_clean.reset_index(drop=True)
+        logger.info(data_clean.columns)
+        # Limit dataset with respect to the max_rows parameter
+        if "max_rows" in pre_params:
+            max_rows = min(int(pre_params["max_rows"]), len(data_clean))
+            data_clean = data_clean.sample(
+                n=max_rows, random_state=random_seed
+            ).reset_index(drop=True)
+            logger.info(f"Limited dataset to {max_rows}")
+
+        fold_indices = create_fold_indices(
+            data_clean, target_col, model_type, pre_params, random_seed=random_seed
+        )
 
-    # Create cross-validation folds
-    from sklearn.model_selection import StratifiedKFold, KFold, TimeSeriesSplit
+        if cache_dir is not None:
+            save_folds(
+                cache_dir,
+                data_clean[[target_col] + features_clean],
+                features_clean,
+                fold_indices,
+            )
 
-    # Initiate cross-validation method
-    if pre_params["cv_type"] == "timeseriesplit":
-        logger.info("Performing time series split cross-validation")
-        data.sort_values(pre_params["time_sensitive_column"], inplace=True)
-        kfold = TimeSeriesSplit(n_splits=5)
-    elif model_type == "classification":
-        logger.info("Performing stratified kfold cross-validation")
-        kfold = StratifiedKFold(n_splits=5, shuffle=True, random_state=random_seed)
-    elif model_type == "regression":
-        logger.info("Performing normal kfold cross-validation")
-        kfold = KFold(n_splits=5, shuffle=True, random_state=random_seed)
+    features_clean = remove_categorical_features(data_clean, features_clean, model_name)
+
+    # Create correlation plots (only for the full artifact profile), optionally on a
+    # sample of the rows
+    if artifact_profile(post_params) != "full":
+        logger.info("Skipping correlation plots for this artifact profile")
+    else:
+        if "correlation_sample_rows" in pre_params:
+            corr_data = sample_for_correlations(
+                data_clean,
+                target_col,
+                model_type,
+                int(pre_params["correlation_sample_rows"]),
+                random_seed=random_seed,
+            )
+        else:
+            corr_data = data_clean
+        plot_correlations(
+            corr_data[features_clean],
+            given_name,
+            post_params["file_type"],
+            n_jobs=int(pre_params.get("correlation_n_jobs", 1)),
+        )
 
     # Create initial dictionary to collect datasets
     datasets = {}
@@ -226,40 +503,30 @@ def pre_process_kfold(
         # Add to datasets
         datasets["final_train"] = {"X": X, "y": y}
 
-    # Create out-of-time (OOT) dataset if requested
-    if pre_params["oot_set"] != "false":
-        oot_df = data_clean.sort_values(
-            pre_params["time_sensitive_column"], ascending=True
-        ).tail(pre_params["oot_rows"])
-        X_oot = oot_df[features_clean]
-        y_oot = oot_df[target_col]
-
-        datasets["oot"] = {"X": X_oot, "y": y_oot}
-
-        # Set new X and y data apart (excluding OOT)
-        data_wo_oot = pd.concat([data_clean, oot_df]).drop_duplicates(keep=False)
-        X = data_wo_oot[features_clean]
-        y = data_wo_oot[target_col]
-
-    # Create datasets based on the different folds
-    X_train_list, X_test_list, y_train_list, y_test_list = (
-        list(),
-        list(),
-        list(),
-        list(),
-    )
+    # Out-of-time (OOT) dataset if requested
+    if "oot" in fold_indices:
+        oot_ix = fold_indices["oot"]
+        datasets["oot"] = {"X": X.iloc[oot_ix], "y": y.iloc[oot_ix]}
+
+    # Folds hold row indices into X and y, upsampled train sets are materialized
+    train_ix_list, test_ix_list = list(), list()
+    X_train_list, y_train_list = list(), list()
 
     # Enumerate the folds and summarize the distributions
     kfold_nr = 0
-    for train_ix, test_ix in kfold.split(X, y):
+    while f"train_{kfold_nr}" in fold_indices:
+        train_ix = fold_indices[f"train_{kfold_nr}"]
+        test_ix = fold_indices[f"test_{kfold_nr}"]
+
         # Record fold number
         logger.info(f"Creating fold nr {kfold_nr + 1}")
 
-        # Select rows for train and test sets
-        X_train, X_test = X.iloc[train_ix, :], X.iloc[test_ix, :]
-        y_train, y_test = y[train_ix], y[test_ix]
+        y_train = y.iloc[train_ix]
+        n_train_rows = len(train_ix)
 
         if pre_params["upsampling"] != "false":
+            X_train = X.iloc[train_ix, :]
+
             # Report on number of rows
             logger.info(f"Number of rows before trimming: {len(X_train)}")
             logger.info(f"Imbalance before trimming: \n {y_train.value_counts()}")
@@ -278,27 +545,37 @@ def pre_process_kfold(
             X_train, y_train = upsample_data(
                 X_train_trim, y_train_trim, model_type, random_seed=random_seed
             )
+            n_train_rows = len(X_train)
+
+            X_train_list.append(X_train)
+            y_train_list.append(y_train)
 
         # Report on train and test set sizes
-        logger.info(f"Number of rows in train set: {len(X_train)}")
-        logger.info(f"Number of rows in test set: {len(X_test)}")
+        logger.info(f"Number of rows in train set: {n_train_rows}")
+        logger.info(f"Number of rows in test set: {len(test_ix)}")
 
         if y_train.nunique() > 10:
             logger.info(f"Mean: {np.mean(y_train)} \nStd dev: {np.std(y_train)}")
         else:
             logger.info(f"Imbalance in train set: \n {y_train.value_counts()}")
 
-        # Append to lists
-        X_train_list.append(X_train)
-        X_test_list.append(X_test)
-        y_train_list.append(y_train)
-        y_test_list.append(y_test)
+        train_ix_list.append(train_ix)
+        test_ix_list.append(test_ix)
 
         kfold_nr += 1
 
     # Add datasets to the dictionary
-    datasets["cv_train"] = {"X": X_train_list, "y": y_train_list}
-    datasets["cv_test"] = {"X": X_test_list, "y": y_test_list}
+    if pre_params["upsampling"] != "false":
+        datasets["cv_train"] = {"X": X_train_list, "y": y_train_list}
+    else:
+        datasets["cv_train"] = {
+            "X": FoldView(X, train_ix_list),
+            "y": FoldView(y, train_ix_list),
+        }
+    datasets["cv_test"] = {
+        "X": FoldView(X, test_ix_list),
+        "y": FoldView(y, test_ix_list),
+    }
 
     return datasets
 
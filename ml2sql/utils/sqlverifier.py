@@ -0,0 +1,406 @@
+import json
+import logging
+import re
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+import duckdb
+import numpy as np
+
+from ml2sql.utils.helper_functions.data_loading import iter_data, strings_as_category
+
+logger = logging.getLogger(__name__)
+
+# Quantiles of the absolute and relative differences in the report
+DIFF_QUANTILES = [0.5, 0.9, 0.99, 0.999]
+
+# Differences are counted in log spaced bins (20 per decade) for the quantiles, the
+# reported quantile is the upper edge of its bin (at most 12% above the exact value)
+DIFF_BIN_EDGES = np.logspace(-16, 4, 401)
+
+# Names of the tables in the SQL and the column identifying the source rows
+SOURCE_TABLE = "ml2sql_source"
+SCORE_TABLE = "ml2sql_score_table"
+ROW_ID_COLUMN = "ml2sql_row_id"
+
+
+def _finite_or_none(value):
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+def _json_value(value):
+    # numpy scalars to Python values
+    return value.item() if isinstance(value, np.generic) else value
+
+
+class ColumnComparison:
+    """
+    Differences between the SQL and model values of one output column, over batches.
+
+    Numeric columns are compared with a tolerance like numpy.isclose, label columns
+    (the predicted class) must be equal. Memory does not grow with the number of rows,
+    quantiles come from a histogram of the differences.
+
+    Parameters
+    ----------
+    exact : bool, optional
+        Whether the values are labels which have to be equal, by default False.
+    """
+
+    def __init__(self, exact=False):
+        self.exact = exact
+        self.n_rows = 0
+        self.n_violations = 0
+        self.first_violation = None
+        self.max_abs_diff = 0.0
+        self.max_rel_diff = 0.0
+        # First bin for exact matches, the last for differences above the last edge
+        self.abs_counts = np.zeros(len(DIFF_BIN_EDGES) + 2, dtype=np.int64)
+        self.rel_counts = np.zeros(len(DIFF_BIN_EDGES) + 2, dtype=np.int64)
+
+    def _count(self, counts, diff):
+        bins = np.where(diff == 0, 0, 1 + np.searchsorted(DIFF_BIN_EDGES, diff))
+        counts += np.bincount(bins, minlength=len(counts))
+
+    def update(self, row_ids, sql_values, model_values, rtol, atol):
+        """
+        Add a batch of values.
+
+        Parameters
+        ----------
+        row_ids : numpy.ndarray
+            Row number of each value in the data.
+        sql_values : array-like
+            The values computed by the SQL.
+        model_values : array-like
+            The values computed by the model, in the same row order.
+        rtol : float
+            Relative tolerance.
+        atol : float
+            Absolute tolerance.
+
+        Returns
+        -------
+        int
+            Number of rows of the batch outside the tolerance.
+        """
+        if self.exact:
+            violations = np.asarray(sql_values).astype(str) != np.asarray(
+                model_values
+            ).astype(str)
+        else:
+            sql_values = np.asarray(sql_values, dtype=float)
+            model_values = np.asarray(model_values, dtype=float)
+            both_nan = np.isnan(sql_values) & np.isnan(model_values)
+            abs_diff = np.abs(sql_values - model_values)
+            abs_diff[both_nan] = 0.0
+            # A value missing on one side only is an infinite difference
+            abs_diff[np.isnan(abs_diff)] = np.inf
+            with np.errstate(divide="ignore", invalid="ignore"):
+                rel_diff = np.where(abs_diff == 0, 0.0, abs_diff / np.abs(model_values))
+            rel_diff[np.isnan(rel_diff)] = np.inf
+
+            violations = ~(abs_diff <= atol + rtol * np.abs(model_values)) & ~both_nan
+            self._count(self.abs_counts, abs_diff)
+            self._count(self.rel_counts, rel_diff)
+            if len(abs_diff):
+                self.max_abs_diff = max(self.max_abs_diff, float(abs_diff.max()))
+                self.max_rel_diff = max(self.max_rel_diff, float(rel_diff.max()))
+
+        if violations.any():
+            # Batches can finish out of order, keep the violation of the first row
+            i = np.flatnonzero(violations)[np.argmin(row_ids[violations])]
+            if self.first_violation is None or row_ids[i] < self.first_violation["row"]:
+                self.first_violation = {
+                    "row": int(row_ids[i]),
+                    "sql": _json_value(np.asarray(sql_values)[i]),
+                    "model": _json_value(np.asarray(model_values)[i]),
+                }
+
+        self.n_rows += len(violations)
+        self.n_violations += int(violations.sum())
+        return int(violations.sum())
+
+    def _quantiles(self, counts, max_diff):
+        upper_edges = np.concatenate([[0.0], DIFF_BIN_EDGES, [np.inf]])
+        cumulative = np.cumsum(counts)
+        return {
+            f"p{q * 100:g}": _finite_or_none(
+                min(
+                    upper_edges[np.searchsorted(cumulative, q * self.n_rows)],
+                    max_diff,
+                )
+            )
+            for q in DIFF_QUANTILES
+        }
+
+    def result(self):
+        """
+        The comparison over all batches added so far.
+
+        Returns
+        -------
+        dict
+            Number of rows and violations, the first violation and for numeric columns
+            the maximum and quantiles of the absolute and relative differences.
+        """
+        result = {
+            "n_rows": self.n_rows,
+            "n_violations": self.n_violations,
+            "first_violation": self.first_violation,
+        }
+        if not self.exact and self.n_rows:
+            result.update(
+                {
+                    "max_abs_diff": _finite_or_none(self.max_abs_diff),
+                    "max_rel_diff": _finite_or_none(self.max_rel_diff),
+                    "abs_diff_quantiles": self._quantiles(
+                        self.abs_counts, self.max_abs_diff
+                    ),
+                    "rel_diff_quantiles": self._quantiles(
+                        self.rel_counts, self.max_rel_diff
+                    ),
+                }
+            )
+        return result
+
+
+def model_outputs(model, X):
+    """
+    Values of the SQL output columns computed by the model.
+
+    Parameters
+    ----------
+    model : object
+        The trained model.
+    X : pandas.DataFrame
+        The features.
+
+    Returns
+    -------
+    dict
+        Output column name to its values: 'prediction' for regression and the predicted
+        class plus 'probability' (binary) or 'probability_<class>' for classification.
+    """
+    if not hasattr(model, "classes_"):
+        return {"prediction": np.asarray(model.predict(X))}
+
+    classes = np.asarray(model.classes_)
+    y_prob = model.predict_proba(X)
+    outputs = {"prediction": classes[y_prob.argmax(axis=1)]}
+    if len(classes) == 2:
+        outputs["probability"] = y_prob[:, 1]
+    for i, c in enumerate(classes):
+        outputs[f"probability_{c}"] = y_prob[:, i]
+    return outputs
+
+
+def _as_arrow(df):
+    # Arrow tables are registered in DuckDB without copying, pandas is the fallback
+    try:
+        import pyarrow
+    except ImportError:
+        return df
+    return pyarrow.Table.from_pandas(df, preserve_index=False)
+
+
+def run_sql_batch(conn, sql, batch, copy_source=False):
+    """
+    Run the SQL of a model on a batch of rows, on its own cursor of the connection.
+
+    The rows are registered as Arrow data (without copying) and queried directly,
+    unless copy_source is set.
+
+    Parameters
+    ----------
+    conn : duckdb.DuckDBPyConnection
+        The connection, cursors of one connection can be used from several threads.
+    sql : str
+        The SQL, selecting from SOURCE_TABLE.
+    batch : pandas.DataFrame
+        The rows, the index is used as row number.
+    copy_source : bool, optional
+        Load the rows into a (cursor local) table first, by default False. The ASOF
+        joins of the duckdb dialect are several times faster on a table than on a
+        scan of the Arrow data.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The SQL output, in the row order of the batch.
+    """
+    row_ids = batch.index.to_numpy()
+    cursor = conn.cursor()
+    try:
+        data = _as_arrow(batch.assign(**{ROW_ID_COLUMN: row_ids}))
+        if copy_source:
+            cursor.register("ml2sql_batch", data)
+            cursor.execute(
+                f"CREATE TEMP TABLE {SOURCE_TABLE} AS SELECT * FROM ml2sql_batch"
+            )
+        else:
+            cursor.register(SOURCE_TABLE, data)
+        result = cursor.execute(sql).df()
+    finally:
+        cursor.close()
+
+    if ROW_ID_COLUMN in result.columns:
+        # Queries joining on the bins do not keep the row order
+        result = result.set_index(ROW_ID_COLUMN).reindex(row_ids)
+    if len(result) != len(batch):
+        raise ValueError(
+            f"SQL returned {len(result)} rows for a batch of {len(batch)} rows"
+        )
+    return result.reset_index(drop=True)
+
+
+def verify_sql(
+    sql,
+    model,
+    data_path,
+    batch_size=100_000,
+    n_jobs=1,
+    rtol=1e-5,
+    atol=1e-8,
+    fail_fast=False,
+    setup_sql=None,
+):
+    """
+    Check the SQL version of a model computes the same predictions as the model.
+
+    The data is read, scored by the SQL (in DuckDB) and the model and compared in
+    batches of rows, n_jobs batches at a time on cursors of a single connection.
+
+    Parameters
+    ----------
+    sql : str
+        The SQL of the model, with the <source_table> placeholder.
+    model : object
+        The trained (unpickled) model, with the feature_names set by ml2sql.
+    data_path : str or pathlib.Path
+        Path to the data file.
+    batch_size : int, optional
+        Number of rows per batch, by default 100_000.
+    n_jobs : int, optional
+        Number of batches checked at the same time, by default 1.
+    rtol : float, optional
+        Relative tolerance, by default 1e-5.
+    atol : float, optional
+        Absolute tolerance, by default 1e-8.
+    fail_fast : bool, optional
+        Stop at the first batch with a value outside the tolerance, by default False.
+    setup_sql : str, optional
+        SQL to run first, e.g. creating the score table (<score_table>), by default None.
+
+    Returns
+    -------
+    dict
+        The report: number of rows, whether all values are within the tolerance,
+        whether it stopped early and the comparison per output column.
+    """
+    feature_cols = [x for x in model.feature_names if " x " not in x]
+    sql = sql.replace("<source_table>", SOURCE_TABLE).replace(
+        "<score_table>", SCORE_TABLE
+    )
+
+    # Only SQL with ASOF joins (duckdb dialect) is faster on a copy of the rows
+    copy_source = re.search(r"\bASOF\b", sql, flags=re.IGNORECASE) is not None
+
+    conn = duckdb.connect()
+    if setup_sql:
+        conn.execute(setup_sql.replace("<score_table>", SCORE_TABLE))
+
+    def check_batch(batch):
+        sql_result = run_sql_batch(conn, sql, batch, copy_source)
+        return (
+            batch.index.to_numpy(),
+            sql_result,
+            model_outputs(model, strings_as_category(batch)),
+        )
+
+    comparisons = {}
+    n_rows = 0
+    stopped_early = False
+
+    def add_result(future):
+        nonlocal n_rows
+        row_ids, sql_result, outputs = future.result()
+        columns = [c for c in outputs if c in sql_result.columns]
+        if not columns:
+            raise ValueError(
+                f"None of the model outputs ({', '.join(outputs)}) are columns of the SQL"
+            )
+        n_violations = 0
+        for column in columns:
+            comparison = comparisons.setdefault(
+                column,
+                ColumnComparison(
+                    exact=column == "prediction" and hasattr(model, "classes_")
+                ),
+            )
+            n_violations += comparison.update(
+                row_ids, sql_result[column], outputs[column], rtol, atol
+            )
+        n_rows += len(row_ids)
+        logger.info(f"Verified {n_rows} rows")
+        return n_violations
+
+    try:
+        with ThreadPoolExecutor(n_jobs) as executor:
+            pending = set()
+            for batch in iter_data(data_path, batch_size, columns=feature_cols):
+                pending.add(executor.submit(check_batch, batch))
+                if len(pending) < 2 * n_jobs:
+                    continue
+                # Bounded number of batches in memory
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                if sum(add_result(future) for future in done) and fail_fast:
+                    stopped_early = True
+                    break
+
+            for future in pending:
+                if stopped_early:
+                    future.cancel()
+                elif add_result(future) and fail_fast:
+                    stopped_early = True
+    finally:
+        conn.close()
+
+    report = {
+        "n_rows": n_rows,
+        "passed": all(c.n_violations == 0 for c in comparisons.values()),
+        "stopped_early": stopped_early,
+        "rtol": rtol,
+        "atol": atol,
+        "columns": {column: c.result() for column, c in comparisons.items()},
+    }
+    level = logging.INFO if report["passed"] else logging.WARNING
+    for column, result in report["columns"].items():
+        logger.log(
+            level,
+            f"{column}: {result['n_violations']} of {result['n_rows']} rows outside tolerance"
+            + (
+                f", max abs diff {result['max_abs_diff']}, max rel diff {result['max_rel_diff']}"
+                if "max_abs_diff" in result
+                else ""
+            ),
+        )
+    return report
+
+
+def save_report(report, report_path):
+    """
+    Save the verification report as JSON.
+
+    Parameters
+    ----------
+    report : dict
+        The report as returned by verify_sql.
+    report_path : str or pathlib.Path
+        Path of the JSON file.
+    """
+    report_path = Path(report_path)
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    report_path.write_text(json.dumps(report, indent=2, default=str))
+    logger.info(f"Saved SQL verification report in {report_path}")
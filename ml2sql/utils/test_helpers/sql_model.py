@@ -4,6 +4,7 @@ import duckdb
 def execute_sql_script(sql_script, df, output_column):
     # Replace the <source_table> placeholder with the actual table name
     sql_script = sql_script.replace("<source_table>", "test_df")
+    sql_script = sql_script.replace("<score_table>", "score_table")
     print(sql_script)
     # Create a DuckDB connection and register the DataFrame
     conn = duckdb.connect()
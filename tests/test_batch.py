@@ -0,0 +1,168 @@
+import json
+import os
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from typer.testing import CliRunner
+
+from ml2sql.cli_run import cli_run
+from ml2sql.cli_run_batch import cli_run_batch
+from ml2sql.main import app
+
+
+@pytest.fixture
+def batch_environment(tmp_path):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {
+            "num": rng.normal(size=200),
+            "city": rng.choice(["amsterdam", "berlin", "paris"], size=200),
+            "flag": rng.choice(["true", "false"], size=200) == "true",
+        }
+    )
+    df["target_a"] = ((df["num"] > 0) ^ (df["city"] == "paris")).astype(float)
+    df["target_b"] = (df["num"] + rng.normal(size=200) > 0).astype(float)
+    # A city only in rows without target_a, unused once these rows are removed
+    df.loc[:9, "city"] = "rome"
+    df.loc[:9, "target_a"] = np.nan
+    df["constant"] = 1
+    df.to_parquet(tmp_path / "data.parquet")
+
+    configs = {
+        "market_a": {
+            "target": "target_a",
+            "features": ["num", "city", "flag"],
+            "model_params": {"interactions": 0},
+        },
+        "market_b": {"target": "target_b", "features": ["num", "city"]},
+        # Fails the input checks, a target with a single value
+        "broken": {"target": "constant", "features": ["num"]},
+    }
+    for name, config in configs.items():
+        (tmp_path / f"{name}.json").write_text(json.dumps(config))
+
+    return tmp_path
+
+
+def test_batch_matches_single_runs(batch_environment, caplog):
+    caplog.set_level(100000)
+    tmp_path = batch_environment
+    configs = [tmp_path / "market_a.json", tmp_path / "market_b.json"]
+
+    report_path = cli_run_batch(
+        tmp_path / "data.parquet", configs=configs, output_dir=tmp_path / "batch"
+    )
+    report = json.loads(report_path.read_text())
+
+    assert [r["status"] for r in report["models"]] == ["done", "done"]
+    assert report["n_rows"] == 200
+    for config, result in zip(configs, report["models"]):
+        assert result["seconds"] > 0
+        single_dir = cli_run(
+            data=tmp_path / "data.parquet",
+            config=config,
+            model="ebm",
+            name=config.stem,
+            output_dir=tmp_path / "single",
+        )
+        batch_sql = tmp_path / result["project_name"] / "model" / "ebm_in_sql.sql"
+        assert (single_dir / "model" / "ebm_in_sql.sql").read_text() == (
+            batch_sql.read_text()
+        )
+
+
+def test_parallel_batch_matches_sequential(batch_environment, caplog):
+    caplog.set_level(100000)
+    tmp_path = batch_environment
+    configs = [tmp_path / "market_a.json", tmp_path / "market_b.json"]
+
+    reports = {
+        n_jobs: json.loads(
+            cli_run_batch(
+                tmp_path / "data.parquet",
+                configs=configs,
+                output_dir=tmp_path / f"n_jobs_{n_jobs}",
+                n_jobs=n_jobs,
+            ).read_text()
+        )
+        for n_jobs in [1, 2]
+    }
+
+    for sequential, parallel in zip(reports[1]["models"], reports[2]["models"]):
+        assert sequential["status"] == parallel["status"] == "done"
+        sql = [
+            (tmp_path / r["project_name"] / "model" / "ebm_in_sql.sql").read_text()
+            for r in [sequential, parallel]
+        ]
+        assert sql[0] == sql[1]
+
+        # The cores are divided over the models trained at the same time
+        model = joblib.load(
+            next((tmp_path / parallel["project_name"] / "model").glob("*.sav"))
+        )
+        assert model.get_params()["n_jobs"] == max(1, (os.cpu_count() or 1) // 2)
+
+
+def test_run_batch_command_manifest(batch_environment, caplog):
+    caplog.set_level(100000)
+    tmp_path = batch_environment
+    manifest = [
+        "market_a.json",
+        {"config": "market_b.json", "model": "decision_tree", "name": "Market B"},
+        {"config": "broken.json", "model": "decision_tree"},
+    ]
+    (tmp_path / "manifest.json").write_text(json.dumps(manifest))
+
+    result = CliRunner().invoke(
+        app,
+        [
+            "run-batch",
+            "--data",
+            str(tmp_path / "data.parquet"),
+            "--manifest",
+            str(tmp_path / "manifest.json"),
+            "--output-dir",
+            str(tmp_path / "models"),
+            "--n-jobs",
+            "2",
+        ],
+    )
+
+    # A failing model does not stop the others
+    assert result.exit_code == 1
+    assert "1 models failed" in result.output
+    report = json.loads(next((tmp_path / "models").glob("batch_*.json")).read_text())
+    statuses = {
+        Path(r["project_name"]).name.split("_", 1)[1]: r["status"]
+        for r in report["models"]
+    }
+    assert statuses == {"market_a": "done", "market_b": "done", "broken": "failed"}
+    assert (
+        "Target column needs more than 1 unique value" in report["models"][2]["error"]
+    )
+    assert any((tmp_path / "models").glob("*_market_b/model/*.sav"))
+
+
+def test_run_batch_checks_before_training(batch_environment):
+    tmp_path = batch_environment
+    result = CliRunner().invoke(
+        app,
+        [
+            "run-batch",
+            "--data",
+            str(tmp_path / "data.parquet"),
+            "--config",
+            str(tmp_path / "market_a.json"),
+            "--config",
+            str(tmp_path / "market_a.json"),
+            "--output-dir",
+            str(tmp_path / "models"),
+        ],
+    )
+
+    assert result.exit_code == 1
+    assert "not unique" in result.output
+    assert not (tmp_path / "models").exists()
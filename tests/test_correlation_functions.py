@@ -26,6 +26,40 @@ def test_xicor():
     assert np.isclose(result, 0.7, atol=1e-1)  # Test correlation with tolerance
 
 
+def _xicor_reference(X, Y, seed=42):
+    # Direct implementation of the definition, with ties in X broken at random
+    rng = np.random.default_rng(seed)
+    n = len(X)
+    order = np.lexsort((rng.random(n), X))
+    Y_ordered = Y[order]
+    r = np.array([(Y <= y).sum() for y in Y_ordered])
+    L = np.array([(Y >= y).sum() for y in Y_ordered])
+    return 1 - n * np.abs(np.diff(r)).sum() / (2 * (L * (n - L)).sum())
+
+
+def test_xicor_matches_definition_with_ties():
+    rng = np.random.default_rng(3)
+    X = rng.integers(0, 10, size=300)
+    Y = X + rng.integers(0, 3, size=300)
+
+    assert np.isclose(xicor(X, Y), _xicor_reference(X, Y))
+
+
+def test_xicor_reproducible_and_no_global_seed():
+    rng = np.random.default_rng(4)
+    X = rng.integers(0, 5, size=200)
+    Y = rng.normal(size=200)
+
+    state = np.random.get_state()
+    assert xicor(X, Y, seed=1) == xicor(X, Y, seed=1)
+    assert np.array_equal(state[1], np.random.get_state()[1])
+
+
+def test_xicor_functional_relation():
+    X = np.linspace(-1, 1, 5000)
+    assert xicor(X, X**2) > 0.99
+
+
 def test_create_correlation_matrix_pearson():
     # Mock corr function to return a sample correlation matrix
     data = pd.DataFrame({"col1": [1, 2, 3], "col2": [4, 5, 6]})
@@ -51,3 +85,79 @@ def test_create_correlation_matrix_invalid_type():
 
     with pytest.raises(ValueError):
         create_correlation_matrix(data, "invalid_type")
+
+
+@pytest.fixture
+def mixed_data():
+    rng = np.random.default_rng(3)
+    n = 300
+    df = pd.DataFrame(
+        {
+            "num1": rng.integers(0, 20, size=n),
+            "num2": rng.normal(size=n),
+            "num3": rng.integers(0, 5, size=n) * 1.5,
+            "cat1": rng.choice(["a", "b", "c"], size=n),
+            "cat2": rng.choice(["x", "y"], size=n),
+            "flag": rng.integers(0, 2, size=n).astype(bool),
+        }
+    )
+    df.loc[rng.choice(n, 20, replace=False), "cat1"] = np.nan
+    return df
+
+
+def test_create_correlation_matrix_cramerv_matches_crosstab(mixed_data):
+    corr_matrix = create_correlation_matrix(mixed_data, "cramerv")
+    cols = ["cat1", "cat2", "flag"]
+
+    assert list(corr_matrix.columns) == cols
+    for i in cols:
+        for j in cols:
+            if i == j:
+                expected = 1.0
+            else:
+                crosstab = pd.crosstab(mixed_data[i], mixed_data[j])
+                expected = np.clip(cramers_corrected_stat(crosstab), 0, 1)
+            assert corr_matrix.at[i, j] == pytest.approx(expected)
+
+
+def test_create_correlation_matrix_xi_matches_pairwise(mixed_data):
+    corr_matrix = create_correlation_matrix(mixed_data, "xi")
+    cols = ["num1", "num2", "num3"]
+
+    assert list(corr_matrix.columns) == cols
+    for i in cols:
+        for j in cols:
+            expected = (
+                1.0 if i == j else np.clip(xicor(mixed_data[i], mixed_data[j]), 0, 1)
+            )
+            assert corr_matrix.at[i, j] == pytest.approx(expected)
+
+
+def test_create_correlation_matrix_xi_without_ties(mixed_data):
+    corr_matrix = create_correlation_matrix(mixed_data, "xi", ties=False)
+
+    # Same formula as xicor without ties
+    expected = np.clip(xicor(mixed_data["num1"], mixed_data["num2"], ties=False), 0, 1)
+    assert corr_matrix.at["num1", "num2"] == pytest.approx(expected)
+    assert not corr_matrix.equals(create_correlation_matrix(mixed_data, "xi"))
+
+
+@pytest.mark.parametrize("corr_type", ["cramerv", "xi"])
+def test_create_correlation_matrix_parallel_matches_sequential(mixed_data, corr_type):
+    sequential = create_correlation_matrix(mixed_data, corr_type, n_jobs=1)
+    parallel = create_correlation_matrix(mixed_data, corr_type, n_jobs=2)
+
+    pd.testing.assert_frame_equal(sequential, parallel)
+
+
+def test_create_correlation_matrix_xi_compact_ranks(mixed_data, mocker):
+    from ml2sql.utils.feature_selection import correlations
+
+    compute_pairs = mocker.spy(correlations, "_compute_pairs")
+    create_correlation_matrix(mixed_data, "xi")
+
+    # Orders and ranks as int32, L only as a denominator per column
+    orders, r, denominators = compute_pairs.call_args.args[1]
+    assert orders.dtype == r.dtype == np.int32
+    assert orders.shape == r.shape == (3, len(mixed_data))
+    assert denominators.shape == (3,)
@@ -0,0 +1,182 @@
+import shutil
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from ml2sql.utils.helper_functions.config_handling import config_columns
+from ml2sql.utils.helper_functions.data_loading import (
+    NA_VALUES,
+    BatchWriter,
+    iter_data,
+    list_data_files,
+    load_data,
+    read_cached_schema,
+    strings_as_category,
+    write_data,
+)
+
+EXAMPLE_DATA = Path(__file__).parents[1] / "ml2sql" / "data" / "data"
+
+pytest.importorskip("pyarrow")
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame(
+        {
+            "target": [0, 1, 0, 1],
+            "num": [1.5, 2.0, None, 4.0],
+            "cat": ["a", None, "b", "a"],
+            "unused": [1, 2, 3, 4],
+        }
+    )
+
+
+@pytest.mark.parametrize("extension", [".csv", ".parquet", ".feather", ".arrow"])
+def test_load_data_round_trip_with_projection(df, tmp_path, extension):
+    data_path = tmp_path / f"data{extension}"
+    write_data(df, data_path)
+
+    loaded = load_data(data_path, columns=["target", "num", "cat"])
+
+    assert list(loaded.columns) == ["target", "num", "cat"]
+    pd.testing.assert_series_equal(loaded["num"], df["num"])
+    assert loaded["cat"].isna().sum() == 1
+
+
+@pytest.mark.parametrize("extension", [".csv", ".parquet", ".feather", ".arrow"])
+def test_iter_data_batches_match_full_load(df, tmp_path, extension):
+    data_path = tmp_path / f"data{extension}"
+    write_data(df, data_path)
+
+    batches = list(iter_data(data_path, 3, columns=["num", "target"]))
+
+    assert [len(batch) for batch in batches] == [3, 1]
+    assert list(batches[1].index) == [3]
+    pd.testing.assert_frame_equal(
+        pd.concat(batches), load_data(data_path, columns=["num", "target"])
+    )
+
+
+@pytest.mark.parametrize("extension", [".csv", ".parquet", ".feather", ".arrow"])
+def test_batch_writer_appends_batches(df, tmp_path, extension):
+    data_path = tmp_path / f"data{extension}"
+    with BatchWriter(data_path) as writer:
+        writer.write(df.iloc[:3])
+        writer.write(df.iloc[3:])
+
+    assert writer.n_rows == 4
+    loaded = load_data(data_path)
+    pd.testing.assert_series_equal(loaded["num"], df["num"])
+    assert list(loaded["target"]) == list(df["target"])
+
+
+def test_batch_writer_unsupported_extension(tmp_path):
+    with pytest.raises(ValueError, match="Unsupported data file type"):
+        BatchWriter(tmp_path / "data.xlsx")
+
+
+@pytest.mark.parametrize("extension", [".parquet", ".feather", ".arrow"])
+def test_load_data_columnar_strings_are_arrow_backed(df, tmp_path, extension):
+    data_path = tmp_path / f"data{extension}"
+    write_data(df, data_path)
+
+    loaded = load_data(data_path)
+
+    assert loaded["cat"].dtype == pd.StringDtype("pyarrow")
+    assert loaded["target"].dtype == "int64"
+
+
+def test_load_data_unsupported_extension(tmp_path):
+    with pytest.raises(ValueError, match="Unsupported data file type"):
+        load_data(tmp_path / "data.xlsx")
+
+
+def test_list_data_files(df, tmp_path):
+    for name in ["b.parquet", "a.csv", "c.feather"]:
+        write_data(df, tmp_path / name)
+    (tmp_path / "notes.txt").write_text("not data")
+
+    assert [f.name for f in list_data_files(tmp_path)] == [
+        "a.csv",
+        "b.parquet",
+        "c.feather",
+    ]
+
+
+def test_config_columns():
+    assert config_columns({"target": "y"}) is None
+    assert config_columns({"target": "y", "features": ["a", "b", "y"]}) == [
+        "y",
+        "a",
+        "b",
+    ]
+    assert config_columns(
+        {
+            "target": "y",
+            "features": ["a"],
+            "pre_params": {"cv_type": "timeseriesplit", "time_sensitive_column": "t"},
+        }
+    ) == ["y", "a", "t"]
+    # Unused time column (e.g. placeholder of the automatic config) is not read
+    assert config_columns(
+        {
+            "target": "y",
+            "features": ["a"],
+            "pre_params": {"cv_type": "kfold_cv", "time_sensitive_column": "_"},
+        }
+    ) == ["y", "a"]
+
+
+def test_load_data_csv_with_unnamed_index_column(df, tmp_path):
+    # Header has one field less than the rows, pandas uses the first field as index
+    data_path = tmp_path / "data.csv"
+    df.to_csv(data_path, index=True, header=[c for c in df.columns])
+    lines = data_path.read_text().splitlines()
+    data_path.write_text("\n".join([lines[0].lstrip(",")] + lines[1:]))
+
+    loaded = load_data(data_path, columns=list(df.columns))
+
+    pd.testing.assert_series_equal(loaded["target"], df["target"])
+
+
+@pytest.mark.parametrize("data_file", sorted(EXAMPLE_DATA.glob("*.csv")))
+def test_load_data_csv_cached_schema_matches_inference(data_file, tmp_path, mocker):
+    data_path = tmp_path / data_file.name
+    shutil.copy(data_file, data_path)
+
+    inferred = load_data(data_path, na_values=NA_VALUES)
+    assert read_cached_schema(data_path) == {
+        col: str(dtype) for col, dtype in inferred.dtypes.items()
+    }
+
+    # Second read uses the cached dtypes, skipping the pandas reader when possible
+    read_csv = mocker.spy(pd, "read_csv")
+    cached = load_data(data_path, na_values=NA_VALUES)
+
+    pd.testing.assert_frame_equal(cached, inferred)
+    if data_file.name == "example_binary_titanic.csv":
+        assert all(call.kwargs.get("nrows") == 0 for call in read_csv.call_args_list)
+
+
+def test_load_data_csv_schema_invalidated_on_change(df, tmp_path):
+    data_path = tmp_path / "data.csv"
+    write_data(df, data_path)
+    load_data(data_path)
+    assert read_cached_schema(data_path)["num"] == "float64"
+
+    df["num"] = ["x", "y", "z", "w"]
+    write_data(df, data_path)
+    assert read_cached_schema(data_path) is None
+    assert load_data(data_path)["num"].tolist() == ["x", "y", "z", "w"]
+
+
+def test_strings_as_category(df, tmp_path):
+    write_data(df, tmp_path / "data.parquet")
+    loaded = strings_as_category(load_data(tmp_path / "data.parquet"))
+
+    string_cols = df.select_dtypes(include=["object"]).columns
+    assert len(string_cols) > 0
+    assert all(isinstance(loaded[c].dtype, pd.CategoricalDtype) for c in string_cols)
+    assert loaded.select_dtypes(include=["string"]).empty
@@ -0,0 +1,106 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.tree import DecisionTreeClassifier, DecisionTreeRegressor, _tree
+
+from ml2sql.utils.output_scripts.decision_tree_as_code import (
+    save_model_and_extras,
+    tree_to_sql,
+    tree_to_sql_rules,
+)
+from ml2sql.utils.test_helpers.sql_model import execute_sql_script
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(
+        {
+            "num": rng.normal(size=400),
+            "steps": rng.integers(0, 10, size=400).astype(float),
+        }
+    )
+    y = X["num"] * 2 + X["steps"] + rng.normal(size=400)
+    return X, y
+
+
+def chain_tree(depth):
+    # Every split sends one leaf left and continues right, nested depth levels deep
+    n_nodes = 2 * depth + 1
+    feature = np.full(n_nodes, _tree.TREE_UNDEFINED)
+    threshold = np.full(n_nodes, -2.0)
+    left = np.full(n_nodes, _tree.TREE_LEAF)
+    right = np.full(n_nodes, _tree.TREE_LEAF)
+    for i in range(depth):
+        node = 2 * i
+        feature[node], threshold[node] = 0, i + 0.25
+        left[node], right[node] = node + 1, node + 2
+    return SimpleNamespace(
+        feature_names_in_=np.array(["x"]),
+        tree_=SimpleNamespace(
+            feature=feature,
+            threshold=threshold,
+            children_left=left,
+            children_right=right,
+            value=np.arange(n_nodes, dtype=float).reshape(-1, 1, 1),
+            n_node_samples=np.ones(n_nodes, dtype=int),
+        ),
+    )
+
+
+@pytest.mark.parametrize("problem_type", ["classification", "regression"])
+def test_rules_match_nested_case(data, problem_type):
+    X, y = data
+    if problem_type == "classification":
+        tree = DecisionTreeClassifier(random_state=0).fit(
+            X, np.where(y > y.median(), "high", "low")
+        )
+    else:
+        tree = DecisionTreeRegressor(max_depth=8, random_state=0).fit(X, y)
+
+    nested = execute_sql_script(tree_to_sql(tree), X, "prediction")
+    rules_sql = tree_to_sql_rules(tree)
+    rules = execute_sql_script(rules_sql, X, "prediction")
+
+    # One WHEN per leaf, no nesting
+    assert rules_sql.count("WHEN") == tree.get_n_leaves()
+    assert rules_sql.count("CASE") == 1
+    pd.testing.assert_series_equal(rules, nested)
+    if problem_type == "regression":
+        np.testing.assert_allclose(rules, tree.predict(X))
+
+
+def test_deep_tree_beyond_recursion_limit():
+    tree = chain_tree(5000)
+    X = pd.DataFrame({"x": [-1.0, 0.25, 0.3, 2500.0, 6000.0, np.nan]})
+
+    nested_sql = tree_to_sql(tree)
+    rules_sql = tree_to_sql_rules(tree)
+
+    assert nested_sql.count("CASE WHEN") == 5000
+    # The bounds of all splits on a path merge into at most two comparisons
+    assert "WHEN x > 2499.25 AND x <= 2500.25 THEN 5001.0" in rules_sql
+    assert "WHEN (x > 4999.25 OR x IS NULL) THEN 10000.0" in rules_sql
+    np.testing.assert_allclose(
+        execute_sql_script(rules_sql, X, "prediction"),
+        [1.0, 1.0, 3.0, 5001.0, 10000.0, 10000.0],
+    )
+
+
+def test_single_leaf_tree():
+    tree = DecisionTreeRegressor().fit(pd.DataFrame({"x": [1.0, 2.0]}), [3.0, 3.0])
+    assert tree_to_sql_rules(tree) == tree_to_sql(tree)
+
+
+def test_sql_tree_format(data, tmp_path):
+    X, y = data
+    tree = DecisionTreeRegressor(max_depth=3, random_state=0).fit(X, y)
+
+    save_model_and_extras(tree, tmp_path, {"sql_tree_format": "rules"})
+    sql = (tmp_path / "model" / "decisiontree_in_sql.sql").read_text()
+    assert sql == tree_to_sql_rules(tree)
+
+    with pytest.raises(ValueError, match="Unknown sql_tree_format"):
+        save_model_and_extras(tree, tmp_path, {"sql_tree_format": "flat"})
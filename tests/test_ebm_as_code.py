@@ -0,0 +1,293 @@
+import copy
+import re
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+from interpret.glassbox import (
+    ExplainableBoostingClassifier,
+    ExplainableBoostingRegressor,
+)
+
+from ml2sql.utils.output_scripts.ebm_as_code import (
+    extractLookupTable,
+    lookup_table_to_sql,
+    save_model_and_extras,
+    score_table_to_sql,
+    scoreTable,
+)
+from ml2sql.utils.test_helpers.sql_model import execute_sql_script
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {
+            "num": rng.normal(size=600),
+            "steps": rng.integers(0, 40, size=600).astype(float),
+            "cat": rng.choice(["a", "b", "c"], size=600),
+        }
+    )
+    df.loc[::25, "num"] = np.nan
+    df["target_reg"] = (
+        df["num"].fillna(0) * 3 + np.sin(df["steps"]) + rng.normal(size=600)
+    )
+    df["target_bin"] = (df["target_reg"] > 0).astype(int)
+    df["target_multi"] = pd.cut(df["target_reg"], 3, labels=["x", "y", "z"]).astype(str)
+    return df
+
+
+def _sql(model, tmp_path, numeric_bins, split):
+    post_params = {
+        "sql_split": split,
+        "sql_decimals": 15,
+        "sql_numeric_bins": numeric_bins,
+    }
+    # Saving sets classes_ on regression models, keep the fitted model unchanged
+    save_model_and_extras(copy.deepcopy(model), tmp_path / numeric_bins, post_params)
+    return (tmp_path / numeric_bins / "model" / "ebm_in_sql.sql").read_text()
+
+
+@pytest.mark.parametrize("split", [True, False])
+@pytest.mark.parametrize("problem_type", ["binary", "multiclass", "regression"])
+def test_binary_numeric_bins_match_model(data, tmp_path, problem_type, split):
+    X = data[["num", "steps", "cat"]]
+    params = {"feature_names": X.columns, "interactions": 0, "random_state": 0}
+    if problem_type == "regression":
+        model = ExplainableBoostingRegressor(**params)
+        model.fit(X, data["target_reg"])
+        column, expected = "prediction", model.predict(X)
+    elif problem_type == "binary":
+        model = ExplainableBoostingClassifier(**params)
+        model.fit(X, data["target_bin"])
+        column, expected = "probability", model.predict_proba(X)[:, 1]
+    else:
+        model = ExplainableBoostingClassifier(**params)
+        model.fit(X, data["target_multi"])
+        column, expected = "probability_z", model.predict_proba(X)[:, 2]
+
+    linear_sql = _sql(model, tmp_path, "linear", split)
+    binary_sql = _sql(model, tmp_path, "binary", split)
+
+    # Nested comparisons instead of one range check per bin
+    assert "AND num <=" in linear_sql
+    assert "AND num <=" not in binary_sql
+    assert "CASE WHEN num <=" in binary_sql
+
+    linear_pred = execute_sql_script(linear_sql, X, column)
+    binary_pred = execute_sql_script(binary_sql, X, column)
+    np.testing.assert_allclose(binary_pred, linear_pred)
+    np.testing.assert_allclose(binary_pred, expected, rtol=1e-4)
+
+
+def test_unknown_numeric_bins(data, tmp_path):
+    model = ExplainableBoostingRegressor(
+        feature_names=["num"], interactions=0, max_rounds=10
+    )
+    model.fit(data[["num"]], data["target_reg"])
+    with pytest.raises(ValueError, match="Unknown sql_numeric_bins"):
+        _sql(model, tmp_path, "tree", True)
+
+
+@pytest.mark.parametrize("dialect", ["default", "duckdb"])
+@pytest.mark.parametrize("problem_type", ["binary", "multiclass", "regression"])
+def test_lookup_sql_format_matches_model(data, tmp_path, problem_type, dialect):
+    X = data[["num", "steps", "cat"]]
+    params = {"feature_names": X.columns, "random_state": 0}
+    if problem_type == "regression":
+        model = ExplainableBoostingRegressor(interactions=[(0, 2), (0, 1)], **params)
+        model.fit(X, data["target_reg"])
+        column, expected = "prediction", model.predict(X)
+    elif problem_type == "binary":
+        model = ExplainableBoostingClassifier(interactions=[(0, 2), (0, 1)], **params)
+        model.fit(X, data["target_bin"])
+        column, expected = "probability", model.predict_proba(X)[:, 1]
+    else:
+        model = ExplainableBoostingClassifier(interactions=0, **params)
+        model.fit(X, data["target_multi"])
+        column, expected = "probability_z", model.predict_proba(X)[:, 2]
+
+    post_params = {
+        "sql_split": True,
+        "sql_decimals": 15,
+        "sql_format": "lookup",
+        "sql_dialect": dialect,
+    }
+    save_model_and_extras(copy.deepcopy(model), tmp_path, post_params)
+    query = (tmp_path / "model" / "ebm_in_sql.sql").read_text()
+    score_table_sql = (tmp_path / "model" / "ebm_score_table.sql").read_text()
+
+    # Scores are not part of the query
+    assert not re.search(r"THEN -?\d", query)
+    # Joins on columns (categories on equality, numeric bins on their bounds)
+    assert " OR " not in query
+    assert "category_1 = CAST(src.cat AS VARCHAR)" in query
+    assert ("ASOF LEFT JOIN" in query) == (dialect == "duckdb")
+
+    # Rows come back in any order, the source columns are part of the output
+    result = execute_sql_script(
+        score_table_sql + query, X.assign(row_id=range(len(X))), ["row_id", column]
+    ).sort_values("row_id")
+    np.testing.assert_allclose(result[column], expected, rtol=1e-4)
+
+    # The CSV holds the same rows as the INSERT statements
+    score_table = pd.read_csv(tmp_path / "model" / "ebm_score_table.csv")
+    assert score_table_sql.count("\n(") == len(score_table)
+
+
+@pytest.mark.parametrize("dialect", ["default", "duckdb"])
+def test_lookup_sql_zero_score_bins(dialect):
+    df_dict = {
+        "feature_single": pd.DataFrame(
+            {
+                "feature": "x",
+                "feat_bound": [np.nan, 1.0, 2.0, np.inf],
+                "score": [0.0, 0.1, 0.0, 0.3],
+                "feat_type": "numeric",
+            }
+        ),
+        "feature_double": None,
+        "intercept": [0.0],
+    }
+    score_table = scoreTable(df_dict, [0])
+    query = lookup_table_to_sql("test", df_dict, score_table, [0], dialect)
+
+    # Numeric bins are kept when scoring 0.0, so the joins find the right bin
+    assert list(score_table["score"]) == [0.1, 0.0, 0.3]
+    X = pd.DataFrame({"x": [np.nan, 0.5, 1.0, 1.5, 2.0, 7.0], "row_id": range(6)})
+    result = execute_sql_script(
+        score_table_to_sql(score_table) + query, X, ["row_id", "prediction"]
+    ).sort_values("row_id")
+    np.testing.assert_allclose(result["prediction"], [0.0, 0.1, 0.1, 0.0, 0.0, 0.3])
+
+
+def test_unknown_sql_format(data, tmp_path):
+    model = ExplainableBoostingRegressor(
+        feature_names=["num"], interactions=0, max_rounds=10
+    )
+    model.fit(data[["num"]], data["target_reg"])
+    with pytest.raises(ValueError, match="Unknown sql_format"):
+        save_model_and_extras(
+            model, tmp_path, {"sql_split": True, "sql_decimals": 15, "sql_format": "x"}
+        )
+
+
+def test_case_sql_interaction_with_missing_values(data, tmp_path):
+    # num has missing values and is the first feature of the num & steps term
+    X = data[["num", "steps", "cat"]]
+    model = ExplainableBoostingRegressor(
+        feature_names=X.columns, interactions=[(0, 1)], random_state=0
+    )
+    model.fit(X, data["target_reg"])
+
+    sql = _sql(model, tmp_path, "linear", True)
+
+    sql_pred = execute_sql_script(sql, X, "prediction")
+    np.testing.assert_allclose(sql_pred, model.predict(X), rtol=1e-6)
+
+
+def test_case_sql_interaction_with_categorical_second_feature(data, tmp_path):
+    # Categorical first features are kept in place, so flag is the second feature
+    X = data[["num", "steps", "cat"]].assign(
+        flag=np.where(data["steps"] > 20, "y", "n")
+    )
+    model = ExplainableBoostingRegressor(
+        feature_names=X.columns, interactions=[(2, 3)], random_state=0
+    )
+    model.fit(X, data["target_reg"] + (X["cat"] == "b") * (X["flag"] == "y"))
+
+    sql = _sql(model, tmp_path, "linear", True)
+
+    assert "WHEN flag = 'n' THEN" in sql
+    assert "WHEN flag = 'nan'" not in sql
+    sql_pred = execute_sql_script(sql, X, "prediction")
+    np.testing.assert_allclose(sql_pred, model.predict(X), rtol=1e-6)
+
+
+def test_lookup_table_merges_adjacent_equal_scores():
+    # Bins of num: missing, <= 1, <= 2, <= 3, > 3 and unknown (never written)
+    ebm = SimpleNamespace(
+        feature_names=["num", "cat"],
+        term_features_=[(1,), (0,), (1, 0)],
+        term_scores_=[
+            np.array([0.0, 0.5, 0.5, 0.0]),
+            np.array([0.0, 1.0, 1.0, 2.0, 1.0, 9.0]),
+            np.array(
+                [
+                    [0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
+                    [0.0, 1.0, 1.0, 2.0, 2.0, 0.0],
+                    [3.0, 3.0, 3.0, 3.0, 3.0, 0.0],
+                    [0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
+                ]
+            ),
+        ],
+        standard_deviations_=[np.zeros(4), np.full(6, 0.1), np.zeros((4, 6))],
+        bins_=[[np.array([1.0, 2.0, 3.0])], [{"b": 2, "a": 1}]],
+        intercept_=np.array([0.0]),
+    )
+
+    lookup = extractLookupTable(ebm, {"sql_decimals": 15})
+
+    # Categories are sorted and never merged, numeric runs get their last bound
+    single = lookup["feature_single"]
+    assert single["feature"].tolist() == ["cat"] * 3 + ["num"] * 4
+    assert single["feat_bound"].tolist()[1:3] == ["a", "b"]
+    assert single["feat_bound"].tolist()[4:] == [2.0, 3.0, np.inf]
+    assert single["score"].tolist() == [0.0, 0.5, 0.5, 0.0, 1.0, 2.0, 1.0]
+    assert single["score_lower_bound"].tolist()[4] == pytest.approx(0.9)
+    assert single["score_upper_bound"].tolist()[4] == pytest.approx(1.1)
+
+    # The last (infinite) bin of the second feature is never merged
+    double = lookup["feature_double"]
+    assert double["feat_bound_1"].tolist()[1:] == ["a", "b"]
+    assert double["feat_bound_2"].tolist()[1][1:] == [2.0, 3.0, np.inf]
+    assert double["score"].tolist()[1] == [0.0, 1.0, 2.0, 2.0]
+    assert double["feat_bound_2"].tolist()[2] == [3.0, np.inf]
+    assert double["score"].tolist()[2] == [3.0, 3.0]
+
+
+@pytest.mark.parametrize("split", [True, False])
+@pytest.mark.parametrize("problem_type", ["binary", "multiclass", "regression"])
+def test_duckdb_dialect_matches_model(data, tmp_path, problem_type, split):
+    X = data[["num", "steps", "cat"]]
+    params = {"feature_names": X.columns, "random_state": 0}
+    if problem_type == "regression":
+        model = ExplainableBoostingRegressor(interactions=[(0, 2), (0, 1)], **params)
+        model.fit(X, data["target_reg"])
+        column, expected = "prediction", model.predict(X)
+    elif problem_type == "binary":
+        model = ExplainableBoostingClassifier(interactions=[(0, 2), (0, 1)], **params)
+        model.fit(X, data["target_bin"])
+        column, expected = "probability", model.predict_proba(X)[:, 1]
+    else:
+        model = ExplainableBoostingClassifier(interactions=0, **params)
+        model.fit(X, data["target_multi"])
+        column, expected = "probability_z", model.predict_proba(X)[:, 2]
+
+    post_params = {"sql_split": split, "sql_decimals": 15, "sql_dialect": "duckdb"}
+    save_model_and_extras(copy.deepcopy(model), tmp_path, post_params)
+    sql = (tmp_path / "model" / "ebm_in_sql.sql").read_text()
+
+    # Numeric bins are joined on, categories are still CASE statements
+    assert "ASOF LEFT JOIN num_bins ON src.num <= num_bins.bin_upper" in sql
+    assert "steps_bins" in sql
+    assert "cat_bins" not in sql
+
+    # Rows come back in any order, the source columns are part of the output
+    result = execute_sql_script(
+        sql, X.assign(row_id=range(len(X))), ["row_id", column]
+    ).sort_values("row_id")
+    np.testing.assert_allclose(result[column], expected, rtol=1e-4)
+
+
+def test_unknown_sql_dialect(data, tmp_path):
+    model = ExplainableBoostingRegressor(
+        feature_names=["num"], interactions=0, max_rounds=10
+    )
+    model.fit(data[["num"]], data["target_reg"])
+    post_params = {"sql_split": True, "sql_decimals": 15, "sql_dialect": "oracle"}
+    with pytest.raises(ValueError, match="Unknown sql_dialect"):
+        save_model_and_extras(model, tmp_path, post_params)
+    assert not (tmp_path / "model" / "ebm_in_sql.sql").exists()
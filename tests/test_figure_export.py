@@ -0,0 +1,62 @@
+import plotly.graph_objects as go
+import pytest
+
+from ml2sql.utils.helper_functions import figure_export
+from ml2sql.utils.helper_functions.figure_export import (
+    figure_export_pool,
+    wait_for_figures,
+    write_image,
+)
+
+
+def _figure(i):
+    return go.Figure(go.Bar(x=["a", "b"], y=[i, i + 1]), layout={"title": f"Fig {i}"})
+
+
+def test_write_image_without_pool_is_synchronous(tmp_path):
+    with figure_export_pool(1):
+        write_image(_figure(0), tmp_path / "fig.png")
+        assert (tmp_path / "fig.png").stat().st_size > 0
+
+    assert figure_export._executor is None
+
+
+def test_figure_export_pool_writes_all_figures(tmp_path):
+    paths = [tmp_path / f"fig_{i}.png" for i in range(6)]
+
+    with figure_export_pool(2):
+        for i, path in enumerate(paths):
+            write_image(_figure(i), path, width=300, height=200)
+        wait_for_figures()
+        assert all(path.stat().st_size > 0 for path in paths)
+
+        # Nested pools reuse the running one
+        with figure_export_pool(2):
+            write_image(_figure(6), tmp_path / "nested.png")
+
+    assert (tmp_path / "nested.png").exists()
+    assert figure_export._executor is None
+
+
+def test_figure_export_pool_raises_write_errors(tmp_path):
+    with pytest.raises(Exception):
+        with figure_export_pool(2):
+            write_image(_figure(0), tmp_path / "missing_dir" / "fig.png")
+            write_image(_figure(1), tmp_path / "fig.png")
+
+    # The other figures are still written
+    assert (tmp_path / "fig.png").exists()
+    assert figure_export._executor is None
+
+
+def test_figure_export_pool_drops_queued_figures_on_error(tmp_path):
+    with pytest.raises(ValueError, match="modelling failed"):
+        with figure_export_pool(2):
+            for i in range(20):
+                write_image(_figure(i), tmp_path / f"fig_{i}.png")
+            raise ValueError("modelling failed")
+
+    # The pool is shut down without waiting for the queued figures
+    assert figure_export._executor is None
+    assert figure_export._pending == []
+    assert len(list(tmp_path.glob("*.png"))) < 20
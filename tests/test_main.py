@@ -6,6 +6,7 @@ import json
 from datetime import datetime
 import os
 import pandas as pd
+from pathlib import Path
 
 
 @pytest.fixture
@@ -147,3 +148,98 @@ def test_run_command(setup_run_environment, caplog):
         print(f"Current working directory: {os.getcwd()}", file=sys.stderr)
         print(f"Contents of current directory: {os.listdir()}", file=sys.stderr)
         raise
+
+
+def test_run_and_check_model_headless(setup_run_environment, caplog):
+    # Avoid I/O error by not having any logger produce a message
+    caplog.set_level(100000)
+
+    runner = CliRunner()
+    temp_dir = setup_run_environment
+
+    # No input, every choice is given as option
+    result = runner.invoke(
+        app,
+        [
+            "run",
+            "--data",
+            "input/data/test.csv",
+            "--config",
+            "input/configuration/config.json",
+            "--model",
+            "decision_tree",
+            "--name",
+            "Headless model",
+            "--output-dir",
+            "models",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+
+    current_date = datetime.today().strftime("%Y%m%d")
+    model_dir = temp_dir / "models" / f"{current_date}_headless_model"
+    assert (model_dir / "model" / "decisiontree_in_sql.sql").exists()
+
+    result = runner.invoke(
+        app,
+        [
+            "check-model",
+            "--data",
+            "input/data/test.csv",
+            "--model",
+            str(next((model_dir / "model").glob("*.sav"))),
+            "--explain-rows",
+            "0",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    assert (model_dir / "tested_datasets" / "test" / "performance").is_dir()
+
+    # Existing model folders are not overwritten
+    result = runner.invoke(
+        app,
+        [
+            "run",
+            "--data",
+            "input/data/test.csv",
+            "--config",
+            "input/configuration/config.json",
+            "--model",
+            "decision_tree",
+            "--name",
+            "headless_model",
+            "--output-dir",
+            "models",
+        ],
+    )
+    assert result.exit_code == 1
+    assert "already exists" in result.output
+
+
+def test_run_unknown_model(setup_run_environment):
+    result = CliRunner().invoke(app, ["run", "--model", "random_forest"])
+
+    assert result.exit_code == 1
+    assert "Unknown model 'random_forest'" in result.output
+
+
+def test_cli_run_models_back_to_back(setup_run_environment, caplog):
+    caplog.set_level(100000)
+    from ml2sql.cli_run import cli_run
+
+    # Several models in one process, without prompts
+    model_dirs = [
+        cli_run(
+            data="input/data/test.csv",
+            config="input/configuration/config.json",
+            model=model,
+            name=f"back_to_back_{model}",
+        )
+        for model in ["decision_tree", "l_regression"]
+    ]
+
+    assert [model_dir.parent for model_dir in model_dirs] == [
+        Path("trained_models")
+    ] * 2
+    assert (model_dirs[0] / "model" / "decisiontree_in_sql.sql").exists()
+    assert (model_dirs[1] / "model" / "lregression_in_sql.sql").exists()
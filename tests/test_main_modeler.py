@@ -0,0 +1,216 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ml2sql.utils.modelling import main_modeler
+from ml2sql.utils.modelling.main_modeler import budget_n_jobs, make_model
+from ml2sql.utils.pre_processing.pre_process import pre_process_kfold
+
+
+@pytest.fixture
+def classification_datasets(tmp_path, mocker):
+    mocker.patch("ml2sql.utils.pre_processing.pre_process.plot_correlations")
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {
+            "col1": rng.normal(size=200),
+            "col2": rng.integers(0, 10, size=200),
+            "target": rng.integers(0, 2, size=200),
+        }
+    )
+    datasets = pre_process_kfold(
+        tmp_path,
+        df,
+        "target",
+        ["col1", "col2"],
+        model_name="decision_tree",
+        model_type="classification",
+        pre_params={"cv_type": "kfold_cv", "upsampling": "false", "oot_set": "false"},
+        post_params={"file_type": "png"},
+        random_seed=42,
+    )
+    (tmp_path / "model").mkdir()
+    return tmp_path, datasets
+
+
+def test_budget_n_jobs_limits_to_number_of_fits():
+    n_jobs, params = budget_n_jobs(6, 100, "decision_tree", {})
+    assert 1 <= n_jobs <= 6
+    assert params == {}
+
+
+def test_budget_n_jobs_sequential_keeps_params():
+    n_jobs, params = budget_n_jobs(6, 1, "ebm", {"max_bins": 10})
+    assert n_jobs == 1
+    assert params == {"max_bins": 10}
+
+
+def test_budget_n_jobs_respects_user_ebm_n_jobs(mocker):
+    mocker.patch("os.cpu_count", return_value=8)
+    n_jobs, params = budget_n_jobs(6, -1, "ebm", {})
+    assert n_jobs == 6
+    assert params["n_jobs"] == 1
+
+    n_jobs, params = budget_n_jobs(6, 2, "ebm", {"n_jobs": 3})
+    assert n_jobs == 2
+    assert params["n_jobs"] == 3
+
+
+def test_make_model_parallel_matches_sequential(classification_datasets, mocker):
+    given_name, datasets = classification_datasets
+    plots = mocker.patch("ml2sql.utils.modelling.main_modeler.postModellingPlots")
+    post_params = {"calibration": "false", "file_type": "png"}
+
+    post_datasets = []
+    for n_jobs in [1, 2]:
+        make_model(
+            given_name,
+            datasets,
+            model_name="decision_tree",
+            model_type="classification",
+            model_params={"random_state": 0},
+            post_params=post_params,
+            n_jobs=n_jobs,
+        )
+        post_datasets.append(plots.call_args.args[4])
+
+    sequential, parallel = post_datasets
+    np.testing.assert_array_equal(sequential["y_test_pred"], parallel["y_test_pred"])
+    np.testing.assert_array_equal(sequential["y_test_prob"], parallel["y_test_prob"])
+    np.testing.assert_array_equal(sequential["y_all_prob"], parallel["y_all_prob"])
+
+
+def test_make_model_plots_with_figure_export_pool(classification_datasets):
+    given_name, datasets = classification_datasets
+    (given_name / "feature_importance").mkdir()
+    post_params = {
+        "calibration": "false",
+        "file_type": "png",
+        "figure_export_workers": "2",
+    }
+
+    make_model(
+        given_name,
+        datasets,
+        model_name="decision_tree",
+        model_type="classification",
+        model_params={"random_state": 0},
+        post_params=post_params,
+    )
+
+    # All queued figures are written once the modelling plots are done
+    assert (given_name / "performance" / "test_roc_plot.png").stat().st_size > 0
+    assert (given_name / "feature_importance" / "gini_feature_importance.png").exists()
+
+    # Metrics computed by the plots are reported next to the plot images
+    metrics = json.loads((given_name / "performance" / "metrics.json").read_text())
+    assert set(metrics["test"]["aggregate"]) >= {"roc_auc", "roc_auc_fold_mean"}
+    assert len(metrics["test"]["folds"]) == 5
+
+
+@pytest.mark.parametrize("profile", ["metrics-only", "minimal"])
+def test_make_model_artifact_profiles_skip_plots(
+    classification_datasets, mocker, profile
+):
+    given_name, datasets = classification_datasets
+    plots = mocker.patch("ml2sql.utils.modelling.main_modeler.postModellingPlots")
+    train_fold = mocker.spy(main_modeler, "train_fold")
+    post_params = {"calibration": "false", "file_type": "png", "artifacts": profile}
+
+    make_model(
+        given_name,
+        datasets,
+        model_name="decision_tree",
+        model_type="classification",
+        model_params={"random_state": 0},
+        post_params=post_params,
+    )
+
+    plots.assert_not_called()
+    assert (given_name / "model" / "decision_tree_classification.sav").exists()
+
+    metrics = json.loads((given_name / "performance" / "metrics.json").read_text())
+    assert metrics["train"]["aggregate"]["n_rows"] == 200
+    assert 0 <= metrics["train"]["aggregate"]["roc_auc"] <= 1
+    if profile == "minimal":
+        # Only the final model is trained
+        train_fold.assert_not_called()
+        assert list(metrics) == ["train"]
+    else:
+        assert train_fold.call_count == 5
+        assert metrics["test"]["aggregate"]["n_rows"] == 200
+        # Per cross validation fold, adding up to all rows
+        assert sum(fold["n_rows"] for fold in metrics["test"]["folds"]) == 200
+        assert len(metrics["test"]["folds"]) == 5
+
+    frame = pd.read_parquet(given_name / "performance" / "metrics.parquet")
+    assert set(frame.columns) == {"dataset", "fold", "metric", "value"}
+
+
+def test_make_model_unknown_artifact_profile(classification_datasets):
+    given_name, datasets = classification_datasets
+    with pytest.raises(ValueError, match="Unknown artifacts profile"):
+        make_model(
+            given_name,
+            datasets,
+            model_name="decision_tree",
+            model_type="classification",
+            model_params={},
+            post_params={"calibration": "false", "artifacts": "none"},
+        )
+
+
+def test_budget_n_jobs_shares_cores_with_concurrent_models(mocker):
+    mocker.patch("os.cpu_count", return_value=8)
+    # Four batch models, each gets two cores
+    n_jobs, params = budget_n_jobs(6, 1, "ebm", {}, n_concurrent_models=4)
+    assert n_jobs == 1
+    assert params["n_jobs"] == 2
+
+    n_jobs, params = budget_n_jobs(6, -1, "ebm", {}, n_concurrent_models=4)
+    assert n_jobs == 2
+    assert params["n_jobs"] == 1
+
+    n_jobs, params = budget_n_jobs(6, 1, "decision_tree", {}, n_concurrent_models=4)
+    assert params == {}
+
+
+def test_make_model_logs_each_fit(classification_datasets, mocker, caplog):
+    given_name, datasets = classification_datasets
+    mocker.patch("ml2sql.utils.modelling.main_modeler.postModellingPlots")
+    caplog.set_level("INFO", logger=main_modeler.__name__)
+
+    make_model(
+        given_name,
+        datasets,
+        model_name="decision_tree",
+        model_type="classification",
+        model_params={"random_state": 0},
+        post_params={"calibration": "false", "file_type": "png"},
+    )
+
+    # Start and end of every fit, in the order they are trained
+    messages = [
+        r.getMessage() for r in caplog.records if r.name == main_modeler.__name__
+    ]
+    fits = [m.split(" - ")[0] for m in messages if " - Train" in m]
+    labels = [f"Fold {i}" for i in range(5)] + ["Final model"]
+    assert fits == [label for label in labels for _ in range(2)]
+    assert any(m.startswith("Fold 3 - Trained in") for m in messages)
+
+
+def test_train_model_logs_failing_fold(caplog):
+    X = pd.DataFrame({"col1": [1.0, 2.0]})
+    with pytest.raises(Exception):
+        main_modeler.train_model(
+            X,
+            pd.Series([0, 1]),
+            {"unknown": 1},
+            "classification",
+            "decision_tree",
+            "Fold 2",
+        )
+
+    assert "Fold 2 - Error training model" in caplog.text
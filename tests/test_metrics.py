@@ -0,0 +1,108 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.metrics import log_loss, r2_score, roc_auc_score
+
+from ml2sql.utils.modelling.metrics import (
+    MetricsCollector,
+    classificationMetrics,
+    regressionMetrics,
+    saveMetrics,
+)
+from ml2sql.utils.modelling.performance import plotCalibrationCurve
+
+
+def test_classification_metrics_binary():
+    y_true = np.array([0, 1, 1, 0, 1])
+    y_prob = np.array([0.1, 0.8, 0.3, 0.4, 0.9])
+    y_pred = (y_prob > 0.5).astype(int)
+
+    metrics = classificationMetrics(y_true, y_pred, y_prob, [0, 1])
+
+    assert metrics["n_rows"] == 5
+    assert metrics["accuracy"] == pytest.approx(0.8)
+    assert metrics["roc_auc"] == pytest.approx(roc_auc_score(y_true, y_prob))
+    assert metrics["brier_score"] == pytest.approx(np.mean((y_prob - y_true) ** 2))
+    assert metrics["log_loss"] == pytest.approx(log_loss(y_true, y_prob))
+
+
+def test_classification_metrics_multiclass():
+    classes = ["a", "b", "c"]
+    y_true = np.array(["a", "b", "c", "a"])
+    y_prob = np.array(
+        [[0.6, 0.3, 0.1], [0.2, 0.5, 0.3], [0.1, 0.2, 0.7], [0.3, 0.4, 0.3]]
+    )
+    y_pred = np.array(classes)[y_prob.argmax(axis=1)]
+
+    metrics = classificationMetrics(y_true, y_pred, y_prob, classes)
+
+    assert metrics["accuracy"] == pytest.approx(0.75)
+    assert metrics["roc_auc_class_c"] == pytest.approx(1.0)
+    assert "roc_auc" not in metrics
+
+
+def test_classification_metrics_undefined_auc_is_none():
+    metrics = classificationMetrics(
+        np.array([1, 1]), np.array([1, 1]), np.array([0.7, 0.9]), [0, 1]
+    )
+    assert metrics["roc_auc"] is None
+
+
+def test_regression_metrics_and_save(tmp_path):
+    y_true = np.array([1.0, 2.0, 3.0, 4.0, 5.0])
+    y_pred = np.array([1.1, 1.9, 3.3, 3.8, 5.0])
+
+    metrics = regressionMetrics(y_true, y_pred, n_features=2)
+
+    assert metrics["r2"] == pytest.approx(r2_score(y_true, y_pred))
+    assert metrics["max_error"] == pytest.approx(0.3)
+    assert metrics["adj_r2"] == pytest.approx(1 - (1 - metrics["r2"]) * 4 / 2)
+
+    path = saveMetrics(tmp_path, {"test": metrics})
+    assert path == tmp_path / "performance" / "metrics.json"
+
+
+def test_metrics_collector_aggregate_and_folds(tmp_path):
+    collector = MetricsCollector()
+    collector.record_all("test", {"n_rows": 10, "roc_auc": 0.8})
+    collector.record("test", "roc_auc", 0.7, fold=1)
+    collector.record("test", "roc_auc", 0.9, fold=0)
+    collector.record("test", "r2", float("nan"))
+    collector.record("train", "roc_auc", 0.95)
+
+    assert collector.to_dict() == {
+        "test": {
+            "aggregate": {"n_rows": 10, "roc_auc": 0.8, "r2": None},
+            "folds": [{"roc_auc": 0.9}, {"roc_auc": 0.7}],
+        },
+        "train": {"aggregate": {"roc_auc": 0.95}, "folds": []},
+    }
+
+    frame = collector.to_frame()
+    assert len(frame) == 6
+    assert frame["fold"].isna().sum() == 4
+
+    path = collector.save(tmp_path)
+    assert json.loads(path.read_text()) == collector.to_dict()
+    saved = pd.read_parquet(tmp_path / "performance" / "metrics.parquet")
+    pd.testing.assert_frame_equal(saved, frame)
+
+
+def test_plots_record_into_collector(tmp_path):
+    (tmp_path / "performance").mkdir()
+    rng = np.random.default_rng(0)
+    y_true = [rng.integers(0, 2, size=50) for _ in range(3)]
+    y_prob = [rng.uniform(size=50) for _ in range(3)]
+    collector = MetricsCollector()
+
+    plotCalibrationCurve(tmp_path, y_true, y_prob, "test", collector=collector)
+
+    result = collector.to_dict()["test"]
+    assert [fold["brier_score"] for fold in result["folds"]] == pytest.approx(
+        [np.mean((p - t) ** 2) for t, p in zip(y_true, y_prob)]
+    )
+    assert result["aggregate"]["brier_score_fold_mean"] == pytest.approx(
+        np.mean([fold["brier_score"] for fold in result["folds"]])
+    )
@@ -0,0 +1,189 @@
+import json
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from interpret.glassbox import ExplainableBoostingClassifier
+from sklearn.metrics import roc_auc_score
+
+from ml2sql.utils.helper_functions.data_loading import load_data
+from ml2sql.utils.modeltester import modeltester, select_explain_rows
+
+
+@pytest.fixture
+def binary_predictions():
+    y_true = pd.Series([0, 1, 1, 0, 1])
+    y_prob = np.array([[0.9, 0.1], [0.2, 0.8], [0.7, 0.3], [0.4, 0.6], [0.05, 0.95]])
+    y_pred = y_prob.argmax(axis=1)
+    return y_true, y_pred, y_prob
+
+
+def test_select_explain_rows_random_is_seeded_and_sorted(binary_predictions):
+    y_true, y_pred, y_prob = binary_predictions
+    rows = select_explain_rows(y_true, y_pred, y_prob, [0, 1], 3, "random")
+
+    assert len(set(rows)) == 3
+    assert list(rows) == sorted(rows)
+    assert list(rows) == list(
+        select_explain_rows(y_true, y_pred, y_prob, [0, 1], 3, "random")
+    )
+
+
+def test_select_explain_rows_caps_at_data_size(binary_predictions):
+    y_true, y_pred, y_prob = binary_predictions
+    rows = select_explain_rows(y_true, y_pred, y_prob, [0, 1], 10, "random")
+    assert list(rows) == [0, 1, 2, 3, 4]
+
+
+def test_select_explain_rows_classification(binary_predictions):
+    y_true, y_pred, y_prob = binary_predictions
+
+    top = select_explain_rows(y_true, y_pred, y_prob, [0, 1], 2, "top-score")
+    assert list(top) == [1, 4]
+
+    # Lowest probability of the true class
+    worst = select_explain_rows(y_true, y_pred, y_prob, [0, 1], 2, "worst-error")
+    assert list(worst) == [2, 3]
+
+
+def test_select_explain_rows_multiclass():
+    y_true = pd.Series(["a", "b", "c"])
+    y_prob = np.array([[0.5, 0.3, 0.2], [0.1, 0.8, 0.1], [0.6, 0.3, 0.1]])
+    y_pred = np.array(["a", "b", "a"])
+
+    top = select_explain_rows(y_true, y_pred, y_prob, ["a", "b", "c"], 1, "top-score")
+    assert list(top) == [1]
+
+    worst = select_explain_rows(
+        y_true, y_pred, y_prob, ["a", "b", "c"], 1, "worst-error"
+    )
+    assert list(worst) == [2]
+
+
+def test_select_explain_rows_regression():
+    y_true = pd.Series([1.0, 5.0, 3.0, 10.0])
+    y_pred = np.array([1.5, 2.0, 3.0, 4.0])
+
+    top = select_explain_rows(y_true, y_pred, None, None, 2, "top-score")
+    assert list(top) == [2, 3]
+
+    worst = select_explain_rows(y_true, y_pred, None, None, 2, "worst-error")
+    assert list(worst) == [1, 3]
+
+
+def test_select_explain_rows_unknown_selection(binary_predictions):
+    y_true, y_pred, y_prob = binary_predictions
+    with pytest.raises(ValueError, match="Unknown explain selection"):
+        select_explain_rows(y_true, y_pred, y_prob, [0, 1], 2, "best")
+
+
+@pytest.fixture
+def trained_ebm(tmp_path):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {"col1": rng.normal(size=300), "col2": rng.integers(0, 10, size=300)}
+    )
+    df["target"] = (df["col1"] + rng.normal(scale=0.5, size=300) > 0).astype(int)
+    df.to_csv(tmp_path / "data.csv", index=False)
+
+    clf = ExplainableBoostingClassifier(
+        max_rounds=50, interactions=0, outer_bags=1, random_state=0
+    )
+    clf.fit(df[["col1", "col2"]], df["target"])
+    clf.target = "target"
+    clf.feature_names = df[["col1", "col2"]].columns
+    joblib.dump(clf, tmp_path / "model.sav")
+
+    destination = tmp_path / "tested"
+    (destination / "performance").mkdir(parents=True)
+    (destination / "local_explanations").mkdir()
+    return df, clf, destination
+
+
+def test_modeltester_explains_selected_rows_once(trained_ebm, tmp_path, mocker):
+    df, clf, destination = trained_ebm
+    mocker.patch("ml2sql.utils.modeltester.plotConfusionMatrix")
+    mocker.patch("ml2sql.utils.modeltester.plotClassificationCurve")
+    mocker.patch("ml2sql.utils.modeltester.plotCalibrationCurve")
+    mocker.patch("ml2sql.utils.modeltester.plotProbabilityDistribution")
+    explain_local = mocker.spy(ExplainableBoostingClassifier, "explain_local")
+
+    modeltester(
+        str(tmp_path / "data.csv"),
+        str(tmp_path / "model.sav"),
+        str(destination),
+        explain_rows=3,
+        explain_selection="worst-error",
+        figure_export_workers=2,
+    )
+
+    # A single call on only the selected rows and the features
+    explain_local.assert_called_once()
+    X_explained = explain_local.call_args.args[1]
+    assert list(X_explained.columns) == ["col1", "col2"]
+    assert len(X_explained) == 3
+
+    saved = {p.name for p in (destination / "local_explanations").iterdir()}
+    assert saved == {f"explain_row_{row}.png" for row in X_explained.index}
+
+    metrics = json.loads((destination / "performance" / "metrics.json").read_text())
+    assert metrics["test"]["aggregate"]["n_rows"] == len(df)
+
+
+@pytest.mark.parametrize("predictions_format", ["parquet", "csv"])
+def test_modeltester_streaming(trained_ebm, tmp_path, mocker, predictions_format):
+    df, clf, destination = trained_ebm
+    predict_proba = mocker.spy(ExplainableBoostingClassifier, "predict_proba")
+    predict = mocker.spy(ExplainableBoostingClassifier, "predict")
+    write_explanation = mocker.patch(
+        "ml2sql.utils.modeltester._write_local_explanation"
+    )
+
+    metrics = modeltester(
+        str(tmp_path / "data.csv"),
+        str(tmp_path / "model.sav"),
+        str(destination),
+        explain_rows=4,
+        explain_selection="worst-error",
+        batch_size=70,
+        predictions_format=predictions_format,
+    )
+
+    # Each batch is scored once
+    assert predict_proba.call_count == 5
+    predict.assert_not_called()
+
+    predictions = load_data(destination / f"predictions.{predictions_format}")
+    y_prob = clf.predict_proba(df[["col1", "col2"]])
+    assert list(predictions.columns) == [
+        "target",
+        "prediction",
+        "probability_0",
+        "probability_1",
+    ]
+    assert (predictions["target"] == df["target"]).all()
+    assert (predictions["prediction"] == clf.predict(df[["col1", "col2"]])).all()
+    np.testing.assert_allclose(predictions["probability_1"], y_prob[:, 1])
+
+    assert metrics["n_rows"] == 300
+    assert metrics["roc_auc"] == pytest.approx(
+        roc_auc_score(df["target"], y_prob[:, 1]), abs=1e-3
+    )
+    # Saved like the metrics of scoring all rows at once
+    saved = json.loads((destination / "performance" / "metrics.json").read_text())
+    assert saved == {
+        "test": {
+            "aggregate": {k: v for k, v in metrics.items() if k != "confusion_matrix"},
+            "folds": [],
+        }
+    }
+
+    # Same rows explained as when scoring all rows at once
+    expected_rows = select_explain_rows(
+        df["target"], None, y_prob, [0, 1], 4, "worst-error"
+    )
+    explained = [call.args[1] for call in write_explanation.call_args_list]
+    assert explained == [
+        f"{destination}/local_explanations/explain_row_{row}" for row in expected_rows
+    ]
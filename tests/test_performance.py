@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from sklearn.metrics import classification_report, confusion_matrix
+
+from ml2sql.utils.modelling.performance import (
+    thresholdConfusionCounts,
+    thresholdClassificationReport,
+    plotConfusionMatrixSlider,
+)
+
+
+@pytest.fixture
+def binary_predictions():
+    rng = np.random.default_rng(1)
+    y_true = rng.integers(0, 2, size=500)
+    # Round to create ties on the thresholds
+    y_prob = np.round(np.clip(y_true * 0.3 + rng.random(500) * 0.7, 0, 1), 2)
+    return y_true, y_prob
+
+
+def test_threshold_confusion_counts(binary_predictions):
+    y_true, y_prob = binary_predictions
+    thresholds = np.arange(0.0, 1.05, 0.05)
+    counts = thresholdConfusionCounts(y_true, y_prob, thresholds)
+
+    for i, threshold in enumerate(thresholds):
+        y_pred = (y_prob > threshold).astype(int)
+        tn, fp, fn, tp = confusion_matrix(y_true, y_pred, labels=[0, 1]).ravel()
+        assert counts["tp"][i] == tp
+        assert counts["fp"][i] == fp
+        assert counts["tn"][i] == tn
+        assert counts["fn"][i] == fn
+
+
+def test_threshold_classification_report(binary_predictions):
+    y_true, y_prob = binary_predictions
+    thresholds = np.array([0.0, 0.25, 0.5, 0.73, 1.0])
+    report = thresholdClassificationReport(y_true, y_prob, thresholds)
+
+    for i, threshold in enumerate(thresholds):
+        y_pred = (y_prob > threshold).astype(int)
+        expected = classification_report(
+            y_true, y_pred, labels=[0, 1], output_dict=True, zero_division=0
+        )
+        assert list(report.keys()) == list(expected.keys())
+        assert report["accuracy"][i] == pytest.approx(expected["accuracy"])
+        for key in ["0", "1", "macro avg", "weighted avg"]:
+            for metric in ["precision", "recall", "f1-score", "support"]:
+                assert report[key][metric][i] == pytest.approx(expected[key][metric])
+
+
+def test_plot_confusion_matrix_slider_many_thresholds(binary_predictions, tmp_path):
+    y_true, y_prob = binary_predictions
+    plotConfusionMatrixSlider(
+        tmp_path, y_true, y_prob, "test", thresholds=np.linspace(0, 1, 1001)
+    )
+
+    assert (tmp_path / "performance" / "test_confusion_matrix.html").exists()
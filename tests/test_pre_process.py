@@ -0,0 +1,268 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ml2sql.utils.pre_processing import pre_process
+from ml2sql.utils.pre_processing.folds import FoldView
+from ml2sql.utils.pre_processing.pre_process import (
+    cleanAndCastColumns,
+    pre_process_kfold,
+    profile_columns,
+    sample_for_correlations,
+)
+
+
+@pytest.fixture
+def imbalanced_data():
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(
+        {
+            "col1": rng.normal(size=10_000),
+            "target": (rng.random(10_000) < 0.1).astype(int),
+        }
+    )
+
+
+def test_profile_columns():
+    data = pd.DataFrame(
+        {
+            "num": [1.0, np.nan, float("nan"), 2.0],
+            # Missing values of any kind, not only the np.nan object
+            "flag": [True, None, float("nan"), False],
+            "ints": pd.Series([1, 0, True, 0], dtype="object"),
+            "text": ["a", "b", None, "True"],
+            "cat": pd.Categorical(["a", "a", "a", "a"], categories=["a", "z"]),
+        }
+    )
+
+    profile = profile_columns(data, list(data.columns))
+
+    assert profile["null_share"].to_dict() == {
+        "num": 0.5,
+        "flag": 0.5,
+        "ints": 0.0,
+        "text": 0.25,
+        "cat": 0.0,
+    }
+    # Unused categories are not counted
+    assert profile["n_unique"].to_dict() == {
+        "num": 2,
+        "flag": 2,
+        "ints": 2,
+        "text": 3,
+        "cat": 1,
+    }
+    assert list(profile.index[profile["is_bool"]]) == ["flag", "ints"]
+
+
+def test_clean_and_cast_columns():
+    data = pd.DataFrame(
+        {
+            "target": [0, 1] * 50,
+            "mostly_nan": [np.nan] * 60 + [1.0, 2.0] * 20,
+            "flag": [True, None, False, True] * 25,
+            "text": pd.Series(["a", "b", "c", "d"] * 25, dtype="string[pyarrow]"),
+            "constant": 1,
+        }
+    )
+    features = ["mostly_nan", "flag", "text", "constant"]
+
+    clean, features_clean = cleanAndCastColumns(
+        data, features, "target", "ebm", "classification"
+    )
+
+    # Removed features are also left out of the features
+    assert features_clean == ["flag", "text"]
+    assert list(clean.columns) == ["target", "flag", "text"]
+    # Booleans with missing values are kept as missing
+    assert clean["flag"].dtype == float
+    assert clean["flag"].isna().sum() == 25
+    assert isinstance(clean["text"].dtype, pd.CategoricalDtype)
+
+
+def test_sample_for_correlations_stratified(imbalanced_data):
+    sample = sample_for_correlations(
+        imbalanced_data, "target", "classification", 1_000, random_seed=1
+    )
+
+    assert len(sample) == pytest.approx(1_000, abs=2)
+    assert sample["target"].mean() == pytest.approx(
+        imbalanced_data["target"].mean(), abs=0.002
+    )
+    pd.testing.assert_frame_equal(
+        sample,
+        sample_for_correlations(
+            imbalanced_data, "target", "classification", 1_000, random_seed=1
+        ),
+    )
+
+
+def test_sample_for_correlations_small_data_untouched(imbalanced_data):
+    data = imbalanced_data.head(100)
+    assert sample_for_correlations(data, "target", "regression", 1_000) is data
+
+
+def test_pre_process_kfold_samples_only_correlations(imbalanced_data, tmp_path, mocker):
+    plot = mocker.patch("ml2sql.utils.pre_processing.pre_process.plot_correlations")
+    datasets = pre_process_kfold(
+        tmp_path,
+        imbalanced_data,
+        "target",
+        ["col1"],
+        model_name="decision_tree",
+        model_type="classification",
+        pre_params={
+            "cv_type": "kfold_cv",
+            "upsampling": "false",
+            "oot_set": "false",
+            "correlation_sample_rows": "500",
+        },
+        post_params={"file_type": "png"},
+    )
+
+    assert len(plot.call_args.args[0]) == pytest.approx(500, abs=2)
+    assert len(datasets["final_train"]["X"]) == len(imbalanced_data)
+
+
+@pytest.mark.parametrize("profile", ["metrics-only", "minimal"])
+def test_pre_process_kfold_skips_correlations(
+    imbalanced_data, tmp_path, mocker, profile
+):
+    plot = mocker.patch("ml2sql.utils.pre_processing.pre_process.plot_correlations")
+    pre_process_kfold(
+        tmp_path,
+        imbalanced_data,
+        "target",
+        ["col1"],
+        model_name="decision_tree",
+        model_type="classification",
+        pre_params={"cv_type": "kfold_cv", "upsampling": "false", "oot_set": "false"},
+        post_params={"file_type": "png", "artifacts": profile},
+    )
+
+    plot.assert_not_called()
+
+
+@pytest.fixture
+def cached_run(tmp_path, mocker):
+    mocker.patch("ml2sql.utils.pre_processing.pre_process.plot_correlations")
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame(
+        {
+            "num": rng.normal(size=300),
+            "cat": rng.choice(["a", "b", "c"], size=300),
+            "day": rng.integers(0, 1000, size=300),
+            "target": rng.integers(0, 2, size=300),
+        }
+    )
+    data_path = tmp_path / "data.csv"
+    data.to_csv(data_path, index=False)
+
+    def run(model_name="ebm", **extra_pre_params):
+        pre_params = {
+            "cv_type": "kfold_cv",
+            "upsampling": "false",
+            "oot_set": "true",
+            "oot_rows": 50,
+            "time_sensitive_column": "day",
+            "fold_cache": "true",
+            **extra_pre_params,
+        }
+        return pre_process_kfold(
+            tmp_path,
+            pd.read_csv(data_path),
+            "target",
+            ["num", "cat"],
+            model_name=model_name,
+            model_type="classification",
+            pre_params=pre_params,
+            post_params={"file_type": "png"},
+            data_path=data_path,
+        )
+
+    return tmp_path, run
+
+
+def _assert_datasets_equal(first, second):
+    assert first.keys() == second.keys()
+    for name in first:
+        for part in ["X", "y"]:
+            if isinstance(first[name][part], (list, FoldView)):
+                for a, b in zip(first[name][part], second[name][part]):
+                    pd.testing.assert_frame_equal(
+                        pd.DataFrame(a), pd.DataFrame(b), check_categorical=False
+                    )
+            else:
+                pd.testing.assert_frame_equal(
+                    pd.DataFrame(first[name][part]),
+                    pd.DataFrame(second[name][part]),
+                    check_categorical=False,
+                )
+
+
+def test_fold_cache_reuses_preprocessing(cached_run, mocker):
+    tmp_path, run = cached_run
+    first = run()
+    fold_dirs = list((tmp_path / ".ml2sql_cache" / "folds").iterdir())
+    assert len(fold_dirs) == 1
+
+    clean = mocker.spy(pre_process, "cleanAndCastColumns")
+    second = run(cv_n_jobs="2")
+
+    clean.assert_not_called()
+    _assert_datasets_equal(first, second)
+    assert len(list((tmp_path / ".ml2sql_cache" / "folds").iterdir())) == 1
+
+
+def test_fold_cache_shared_between_models(cached_run):
+    tmp_path, run = cached_run
+    ebm = run(model_name="ebm")
+    tree = run(model_name="decision_tree")
+
+    assert list(ebm["final_train"]["X"].columns) == ["num", "cat"]
+    assert list(tree["final_train"]["X"].columns) == ["num"]
+    assert len(list((tmp_path / ".ml2sql_cache" / "folds").iterdir())) == 1
+
+
+def test_fold_cache_key_depends_on_pre_params(cached_run):
+    tmp_path, run = cached_run
+    run()
+    run(max_rows=200)
+
+    assert len(list((tmp_path / ".ml2sql_cache" / "folds").iterdir())) == 2
+
+
+def test_oot_and_folds_are_disjoint(cached_run):
+    _, run = cached_run
+    datasets = run(fold_cache="false")
+
+    oot_rows = set(datasets["oot"]["X"].index)
+    assert len(oot_rows) == 50
+    for X_train, X_test in zip(datasets["cv_train"]["X"], datasets["cv_test"]["X"]):
+        assert not oot_rows & set(X_train.index)
+        assert not oot_rows & set(X_test.index)
+        assert not set(X_train.index) & set(X_test.index)
+
+
+def test_folds_are_views_on_one_frame(cached_run):
+    _, run = cached_run
+    datasets = run(fold_cache="false", oot_set="false")
+
+    X_all = datasets["final_train"]["X"]
+    for part in ["cv_train", "cv_test"]:
+        folds = datasets[part]["X"]
+        assert isinstance(folds, FoldView)
+        assert folds.base is X_all
+        assert len(folds) == 5
+        pd.testing.assert_frame_equal(folds[0], X_all.iloc[folds.indices[0]])
+
+    test_rows = np.concatenate(datasets["cv_test"]["X"].indices)
+    assert sorted(test_rows) == list(range(len(X_all)))
+
+
+def test_upsampled_train_folds_are_materialized(cached_run):
+    _, run = cached_run
+    datasets = run(fold_cache="false", oot_set="false", upsampling="true")
+
+    assert isinstance(datasets["cv_train"]["X"], list)
+    assert isinstance(datasets["cv_test"]["X"], FoldView)
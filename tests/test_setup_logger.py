@@ -0,0 +1,37 @@
+import logging
+
+from ml2sql.utils.helper_functions import setup_logger as setup_logger_module
+from ml2sql.utils.helper_functions.setup_logger import setup_logger
+
+
+def test_setup_logger_per_model(tmp_path, monkeypatch):
+    root = logging.getLogger()
+    # Without the handlers of pytest, as in a process training several models
+    monkeypatch.setattr(root, "handlers", [])
+    monkeypatch.setattr(root, "level", root.level)
+    monkeypatch.setattr(setup_logger_module, "_handlers", [])
+    logger = logging.getLogger("ml2sql.test")
+
+    setup_logger(tmp_path / "first.log")
+    logger.info("first model")
+    setup_logger(tmp_path / "second.log")
+    logger.info("second model")
+    for handler in root.handlers:
+        handler.close()
+
+    assert len(root.handlers) == 2
+    assert "first model" in (tmp_path / "first.log").read_text()
+    assert "second model" not in (tmp_path / "first.log").read_text()
+    assert "second model" in (tmp_path / "second.log").read_text()
+
+
+def test_setup_logger_keeps_other_logging(tmp_path, monkeypatch):
+    root = logging.getLogger()
+    handler = logging.NullHandler()
+    monkeypatch.setattr(root, "handlers", [handler])
+    monkeypatch.setattr(setup_logger_module, "_handlers", [])
+
+    setup_logger(tmp_path / "model.log")
+
+    assert root.handlers == [handler]
+    assert not (tmp_path / "model.log").exists()
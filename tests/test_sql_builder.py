@@ -0,0 +1,54 @@
+import contextlib
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from interpret.glassbox import ExplainableBoostingClassifier
+from sklearn.tree import DecisionTreeClassifier
+
+from ml2sql.utils.output_scripts.decision_tree_as_code import tree_to_sql
+from ml2sql.utils.output_scripts.ebm_as_code import ebm_to_sql, extractLookupTable
+from ml2sql.utils.output_scripts.sql_builder import SQLBuilder
+
+
+def test_sql_builder_writes_like_print():
+    expected = io.StringIO()
+    with contextlib.redirect_stdout(expected):
+        print("SELECT")
+        print(", ", end="")
+        print("a", "b", 1.5, sep=" + ")
+        print("FROM t")
+
+    sql = SQLBuilder()
+    sql.print("SELECT")
+    sql.print(", ", end="")
+    sql.print("a", "b", 1.5, sep=" + ")
+    sql.write("FROM t\n")
+
+    assert sql.getvalue() == expected.getvalue()
+    assert str(sql) == expected.getvalue()
+
+
+def test_sql_generation_in_threads(capsys):
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(300, 4)), columns=["a", "b", "c", "d"])
+    y = (X["a"] + X["b"] > 0).astype(int)
+
+    ebm = ExplainableBoostingClassifier(
+        feature_names=X.columns, interactions=0, max_rounds=100, random_state=0
+    ).fit(X, y)
+    lookup_df = extractLookupTable(ebm, {"sql_decimals": 15})
+    tree = DecisionTreeClassifier(max_depth=4, random_state=0).fit(X, y)
+
+    def generate(i):
+        return ebm_to_sql(f"model_{i}", lookup_df, ebm.classes_), tree_to_sql(tree)
+
+    sequential = [generate(i) for i in range(8)]
+    with ThreadPoolExecutor(4) as executor:
+        threaded = list(executor.map(generate, range(8)))
+
+    assert threaded == sequential
+    assert "'model_3' AS model_name" in threaded[3][0]
+    # Nothing is written to stdout
+    assert capsys.readouterr().out == ""
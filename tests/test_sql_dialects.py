@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.tree import DecisionTreeRegressor
+
+from ml2sql.utils.output_scripts.decision_tree_as_code import tree_to_sql
+from ml2sql.utils.output_scripts.sql_dialects import (
+    DuckDBDialect,
+    SQLDialect,
+    get_dialect,
+)
+from ml2sql.utils.test_helpers.sql_model import execute_sql_script
+
+
+def test_get_dialect():
+    assert type(get_dialect("default")) is SQLDialect
+    assert type(get_dialect("duckdb")) is DuckDBDialect
+    with pytest.raises(ValueError, match="Unknown sql_dialect 'oracle'"):
+        get_dialect("oracle")
+
+
+def test_default_dialect_expressions():
+    dialect = SQLDialect()
+    assert dialect.exp("score") == "EXP(score)"
+    assert dialect.greatest(["a", "b"]) == "GREATEST(a, b)"
+    assert dialect.cast_int("x") == "x::INT"
+    # Numeric bins are written as CASE statements, not joined on
+    assert dialect.numeric_bins_cte("x_bins", [1.0, np.inf], {"": [0.1, 0.2]}) is None
+    assert dialect.numeric_bins_join("x_bins", "x") is None
+
+
+def test_duckdb_numeric_bins_join():
+    dialect = DuckDBDialect()
+    cte = dialect.numeric_bins_cte("x_bins", [1.0, 2.0, np.inf], {"": [0.1, 0.2, 0.3]})
+    join = dialect.numeric_bins_join("x_bins", "x")
+    df = pd.DataFrame({"x": [0.5, 1.0, 1.5, 2.0, 7.0], "row_id": range(5)})
+
+    result = execute_sql_script(
+        f"WITH {cte} SELECT src.row_id, x_bins.bin_score AS score"
+        f" FROM <source_table> AS src {join}",
+        df,
+        ["row_id", "score"],
+    ).sort_values("row_id")
+
+    # Values on a bound belong to the bin below it, like the CASE statements
+    np.testing.assert_allclose(result["score"], [0.1, 0.1, 0.2, 0.2, 0.3])
+
+
+def test_tree_to_sql_dialect():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame({"a": rng.integers(0, 10, 200), "b": rng.normal(size=200)})
+    tree = DecisionTreeRegressor(max_depth=3, random_state=0).fit(X, X["a"] + X["b"])
+
+    sql = tree_to_sql(tree, "duckdb")
+
+    assert sql == tree_to_sql(tree)
+    np.testing.assert_allclose(
+        execute_sql_script(sql, X, "prediction"), tree.predict(X)
+    )
@@ -0,0 +1,171 @@
+import copy
+import json
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from interpret.glassbox import ExplainableBoostingRegressor
+from sklearn.tree import DecisionTreeClassifier
+from typer.testing import CliRunner
+
+from ml2sql import main
+from ml2sql.utils import sqlverifier
+from ml2sql.utils.output_scripts import decision_tree_as_code, ebm_as_code
+from ml2sql.utils.sqlverifier import ColumnComparison, verify_sql
+
+runner = CliRunner()
+
+
+@pytest.fixture(scope="module")
+def data(tmp_path_factory):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {
+            "num": rng.normal(size=500),
+            "steps": rng.integers(0, 20, size=500).astype(float),
+        }
+    )
+    df["target"] = df["num"] * 2 + np.sin(df["steps"]) + rng.normal(size=500)
+    path = tmp_path_factory.mktemp("data") / "data.parquet"
+    df.to_parquet(path)
+    return df, path
+
+
+def _tree(data, tmp_path):
+    df, _ = data
+    X = df[["num", "steps"]]
+    model = DecisionTreeClassifier(max_depth=4, random_state=0)
+    model.fit(X, np.where(df["target"] > 0, "high", "low"))
+    model.target, model.feature_names = "target", list(X.columns)
+    decision_tree_as_code.save_model_and_extras(copy.deepcopy(model), tmp_path, {})
+    joblib.dump(model, tmp_path / "model" / "tree_model_decision_tree.sav")
+    return model, tmp_path / "model" / "decisiontree_in_sql.sql"
+
+
+def test_column_comparison():
+    comparison = ColumnComparison()
+    # Batches finishing out of order
+    comparison.update(
+        np.array([3, 4]), [1.0, np.nan], [1.0 + 1e-3, 5.0], rtol=1e-5, atol=0
+    )
+    comparison.update(
+        np.array([0, 1, 2]), [0.0, np.nan, 2.0], [0.0, np.nan, 2.0], rtol=1e-5, atol=0
+    )
+    result = comparison.result()
+
+    assert result["n_rows"] == 5
+    # NaN on both sides is equal, on one side a violation
+    assert result["n_violations"] == 2
+    assert result["first_violation"] == {"row": 3, "sql": 1.0, "model": 1.001}
+    # Infinite differences are reported as None
+    assert result["max_abs_diff"] is None
+    assert result["abs_diff_quantiles"]["p50"] == 0.0
+    assert result["abs_diff_quantiles"]["p90"] is None
+
+
+def test_column_comparison_quantiles():
+    comparison = ColumnComparison()
+    diffs = np.linspace(0.01, 1, 100)
+    comparison.update(np.arange(100), diffs, np.zeros(100), rtol=0, atol=1)
+    result = comparison.result()
+
+    assert result["n_violations"] == 0
+    assert result["max_abs_diff"] == 1
+    # Upper edge of the histogram bin of the exact quantile
+    assert 0.5 <= result["abs_diff_quantiles"]["p50"] <= 0.5 * 1.13
+    assert 0.9 <= result["abs_diff_quantiles"]["p90"] <= 0.9 * 1.13
+    assert result["abs_diff_quantiles"]["p99.9"] == 1
+
+
+@pytest.mark.parametrize(
+    "n_jobs,dialect", [(1, "default"), (3, "default"), (3, "duckdb")]
+)
+def test_lookup_sql_matches_model(data, tmp_path, mocker, n_jobs, dialect):
+    df, path = data
+    X = df[["num", "steps"]]
+    model = ExplainableBoostingRegressor(interactions=[(0, 1)], random_state=0)
+    model.fit(X, df["target"])
+    model.feature_names = list(X.columns) + ["num x steps"]
+    post_params = {
+        "sql_split": True,
+        "sql_decimals": 15,
+        "sql_format": "lookup",
+        "sql_dialect": dialect,
+    }
+    ebm_as_code.save_model_and_extras(copy.deepcopy(model), tmp_path, post_params)
+    run_sql_batch = mocker.spy(sqlverifier, "run_sql_batch")
+
+    report = verify_sql(
+        (tmp_path / "model" / "ebm_in_sql.sql").read_text(),
+        model,
+        path,
+        batch_size=64,
+        n_jobs=n_jobs,
+        setup_sql=(tmp_path / "model" / "ebm_score_table.sql").read_text(),
+    )
+
+    assert report["passed"]
+    assert report["n_rows"] == len(df)
+    assert list(report["columns"]) == ["prediction"]
+    assert report["columns"]["prediction"]["max_rel_diff"] < 1e-10
+    # The rows are only copied into a table for the ASOF joins of the duckdb dialect
+    copied = {call.args[3] for call in run_sql_batch.call_args_list}
+    assert copied == {dialect == "duckdb"}
+
+
+def test_fail_fast_stops_at_first_violation(data, tmp_path):
+    _, path = data
+    model, sql_path = _tree(data, tmp_path)
+    # Every row gets the same class
+    sql = "SELECT 'low' AS prediction FROM <source_table>"
+
+    full = verify_sql(sql, model, path, batch_size=50)
+    fast = verify_sql(sql, model, path, batch_size=50, fail_fast=True)
+
+    assert not full["passed"] and not full["stopped_early"]
+    assert full["n_rows"] == 500
+    assert not fast["passed"] and fast["stopped_early"]
+    assert fast["n_rows"] < 500
+    assert (
+        fast["columns"]["prediction"]["first_violation"]
+        == full["columns"]["prediction"]["first_violation"]
+    )
+
+
+def test_verify_sql_command(data, tmp_path, caplog):
+    caplog.set_level(100000)
+    _, path = data
+    _tree(data, tmp_path)
+    model_path = tmp_path / "model" / "tree_model_decision_tree.sav"
+
+    result = runner.invoke(
+        main.app,
+        ["verify-sql", "--model", str(model_path), "--data", str(path)],
+    )
+
+    assert result.exit_code == 0, result.output
+    report = json.loads((tmp_path / "model" / "sql_verification_data.json").read_text())
+    assert report["passed"]
+
+
+def test_verify_sql_command_fails_on_difference(data, tmp_path, caplog):
+    caplog.set_level(100000)
+    _, path = data
+    _, sql_path = _tree(data, tmp_path)
+    sql_path.write_text(sql_path.read_text().replace("'high'", "'low'"))
+
+    result = runner.invoke(
+        main.app,
+        [
+            "verify-sql",
+            "--model",
+            str(tmp_path / "model" / "tree_model_decision_tree.sav"),
+            "--data",
+            str(path),
+            "--fail-fast",
+        ],
+    )
+
+    assert result.exit_code == 1
+    assert "differ from the model" in result.output
@@ -0,0 +1,60 @@
+# tests/test_startup.py
+
+import re
+import subprocess
+import sys
+
+import pytest
+
+# Libraries only needed by the run, check-model and clean-data commands
+HEAVY_MODULES = [
+    "pandas",
+    "numpy",
+    "sklearn",
+    "scipy",
+    "interpret",
+    "imblearn",
+    "plotly",
+    "matplotlib",
+    "duckdb",
+    "pyarrow",
+]
+
+# Generous upper bound of the total import time (in seconds) of a light command
+IMPORT_BUDGET = 1.5
+
+
+def _import_times(args):
+    """
+    Run the CLI with the given arguments in a new interpreter, returns all imported
+    modules and the cumulative import time (in microseconds) per top level import
+    """
+    code = (
+        "import sys; from ml2sql.main import app; "
+        f"sys.argv = ['ml2sql'] + {args!r}; app()"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+
+    modules, times = [], {}
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|( +)(\S+)", line)
+        if match:
+            modules.append(match.group(3))
+            if match.group(2) == " ":
+                times[match.group(3)] = int(match.group(1))
+    return modules, times
+
+
+@pytest.mark.parametrize("command", [["--version"], ["init", "--dest", "{tmp}"]])
+def test_light_commands_skip_heavy_imports(command, tmp_path):
+    args = [arg.format(tmp=tmp_path) for arg in command]
+    modules, times = _import_times(args)
+
+    heavy = [m for m in modules if m.split(".")[0] in HEAVY_MODULES]
+    assert heavy == []
+    assert sum(times.values()) / 1e6 < IMPORT_BUDGET
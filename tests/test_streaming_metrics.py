@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+from sklearn.metrics import (
+    accuracy_score,
+    average_precision_score,
+    brier_score_loss,
+    confusion_matrix,
+    explained_variance_score,
+    log_loss,
+    mean_absolute_error,
+    mean_absolute_percentage_error,
+    mean_squared_error,
+    mean_squared_log_error,
+    r2_score,
+    roc_auc_score,
+)
+
+from ml2sql.utils.modelling.streaming_metrics import (
+    ClassificationMetrics,
+    RegressionMetrics,
+)
+
+
+def _in_batches(n, batch_size):
+    return [slice(i, i + batch_size) for i in range(0, n, batch_size)]
+
+
+def test_binary_classification_metrics_match_sklearn():
+    rng = np.random.default_rng(0)
+    y_true = rng.integers(0, 2, size=5000)
+    # Probabilities rounded to 3 decimals, so the score bins are exact
+    p1 = np.round(np.clip(0.3 * y_true + rng.uniform(0, 0.7, size=5000), 0, 1), 3)
+    y_prob = np.column_stack([1 - p1, p1])
+
+    metrics = ClassificationMetrics([0, 1])
+    for batch in _in_batches(len(y_true), 700):
+        metrics.update(y_true[batch], y_prob[batch])
+    result = metrics.result()
+
+    assert result["n_rows"] == 5000
+    assert result["accuracy"] == pytest.approx(
+        accuracy_score(y_true, y_prob.argmax(axis=1))
+    )
+    assert result["log_loss"] == pytest.approx(log_loss(y_true, y_prob))
+    assert result["brier_score"] == pytest.approx(brier_score_loss(y_true, p1))
+    assert result["roc_auc"] == pytest.approx(roc_auc_score(y_true, p1))
+    assert result["average_precision"] == pytest.approx(
+        average_precision_score(y_true, p1)
+    )
+    assert result["confusion_matrix"]["counts"] == (
+        confusion_matrix(y_true, y_prob.argmax(axis=1)).tolist()
+    )
+
+
+def test_multiclass_classification_metrics_match_sklearn():
+    rng = np.random.default_rng(1)
+    classes = np.array(["a", "b", "c"])
+    y_true = classes[rng.integers(0, 3, size=3000)]
+    y_prob = rng.dirichlet([1, 1, 1], size=3000).round(4)
+    y_prob = y_prob / y_prob.sum(axis=1, keepdims=True)
+
+    metrics = ClassificationMetrics(classes)
+    for batch in _in_batches(len(y_true), 1000):
+        metrics.update(y_true[batch], y_prob[batch])
+    result = metrics.result()
+
+    assert result["accuracy"] == pytest.approx(
+        accuracy_score(y_true, classes[y_prob.argmax(axis=1)])
+    )
+    assert result["log_loss"] == pytest.approx(log_loss(y_true, y_prob))
+    for i, c in enumerate(classes):
+        assert result[f"roc_auc_class_{c}"] == pytest.approx(
+            roc_auc_score(y_true == c, y_prob[:, i]), abs=1e-3
+        )
+
+
+def test_classification_metrics_unknown_class():
+    metrics = ClassificationMetrics([0, 1])
+    with pytest.raises(ValueError, match="unknown to the model"):
+        metrics.update(np.array([0, 2]), np.array([[0.5, 0.5], [0.1, 0.9]]))
+
+
+def test_regression_metrics_match_sklearn():
+    rng = np.random.default_rng(2)
+    y_true = rng.gamma(2, 1000, size=4000) + 1e6
+    y_pred = y_true + rng.normal(0, 300, size=4000)
+
+    metrics = RegressionMetrics(n_features=3)
+    for batch in _in_batches(len(y_true), 999):
+        metrics.update(y_true[batch], y_pred[batch])
+    result = metrics.result()
+
+    r2 = r2_score(y_true, y_pred)
+    assert result["mae"] == pytest.approx(mean_absolute_error(y_true, y_pred))
+    assert result["mse"] == pytest.approx(mean_squared_error(y_true, y_pred))
+    assert result["r2"] == pytest.approx(r2)
+    assert result["adj_r2"] == pytest.approx(1 - (1 - r2) * 3999 / 3996)
+    assert result["mape"] == pytest.approx(
+        mean_absolute_percentage_error(y_true, y_pred)
+    )
+    assert result["explained_variance"] == pytest.approx(
+        explained_variance_score(y_true, y_pred)
+    )
+    assert result["max_error"] == pytest.approx(np.abs(y_true - y_pred).max())
+    assert result["msle"] == pytest.approx(mean_squared_log_error(y_true, y_pred))